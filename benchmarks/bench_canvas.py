@@ -0,0 +1,127 @@
+"""Бенчмарк отрисовки холста: перерисовка по областям против полной перерисовки
+
+Имитирует поток событий мыши с высокой частотой (как у планшета) и
+сравнивает прежнюю схему (QPainter и QPen на каждое событие, полная
+перерисовка с масштабированием) с текущей (один кадр на ~16 мс,
+перерисовка только рамки новых сегментов).
+
+Запуск:
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_canvas [--size 1200] [--rate 1000]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+from PyQt6.QtCore import QEvent, QPoint, QPointF, Qt
+from PyQt6.QtGui import QMouseEvent, QPainter, QPen
+from PyQt6.QtWidgets import QApplication
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.drawing_widget import DrawingWidget  # noqa: E402
+
+
+class LegacyDrawingWidget(DrawingWidget):
+    """Прежняя схема отрисовки для сравнения"""
+    
+    def paintEvent(self, event):
+        start = time.perf_counter()
+        canvas_painter = QPainter(self)
+        canvas_painter.drawImage(self.rect(), self.image, self.image.rect())
+        canvas_painter.end()
+        self.frame_stats.record(time.perf_counter() - start, self.width() * self.height())
+    
+    def mouseMoveEvent(self, event):
+        if (event.buttons() & Qt.MouseButton.LeftButton) and self.drawing:
+            painter = QPainter(self.image)
+            painter.setPen(QPen(
+                self.brush_color, self.brush_size, Qt.PenStyle.SolidLine,
+                Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin
+            ))
+            painter.drawLine(self.last_point, event.position().toPoint())
+            painter.end()
+            self.last_point = event.position().toPoint()
+            self.update()
+
+
+def mouse_event(event_type, point, button, buttons):
+    """Создание синтетического события мыши"""
+    position = QPointF(point)
+    return QMouseEvent(event_type, position, position, button, buttons, Qt.KeyboardModifier.NoModifier)
+
+
+def run(widget_class, size, rate, events):
+    """
+    Прогон штриха по спирали через виджет
+    
+    Returns:
+        (сводка FrameStats, суммарное время обработки событий в секундах)
+    """
+    app = QApplication.instance()
+    widget = widget_class()
+    widget.resize(size, size)
+    widget.show()
+    app.processEvents()
+    widget.frame_stats.reset()
+    
+    center = size / 2
+    points = [
+        QPoint(
+            int(center + (0.1 + 0.3 * i / events) * size * math.cos(i / 25)),
+            int(center + (0.1 + 0.3 * i / events) * size * math.sin(i / 25)),
+        )
+        for i in range(events)
+    ]
+    
+    left = Qt.MouseButton.LeftButton
+    busy = 0.0
+    interval = 1.0 / rate
+    next_event = time.perf_counter()
+    
+    app.sendEvent(widget, mouse_event(QEvent.Type.MouseButtonPress, points[0], left, left))
+    for point in points[1:]:
+        while time.perf_counter() < next_event:
+            pass
+        next_event += interval
+        
+        start = time.perf_counter()
+        app.sendEvent(widget, mouse_event(QEvent.Type.MouseMove, point, Qt.MouseButton.NoButton, left))
+        app.processEvents()
+        busy += time.perf_counter() - start
+    
+    app.sendEvent(
+        widget, mouse_event(QEvent.Type.MouseButtonRelease, points[-1], left, Qt.MouseButton.NoButton)
+    )
+    app.processEvents()
+    
+    summary = widget.frame_stats.summary()
+    widget.close()
+    return summary, busy
+
+
+def main():
+    """Запуск бенчмарка"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1200, help="размер холста в пикселях")
+    parser.add_argument("--rate", type=int, default=1000, help="частота событий мыши, Гц")
+    parser.add_argument("--events", type=int, default=1000)
+    args = parser.parse_args()
+    
+    app = QApplication(sys.argv)  # noqa: F841 - должен жить до конца прогона
+    
+    print(f"Холст {args.size}x{args.size}, {args.events} событий с частотой {args.rate} Гц")
+    for name, widget_class in (("Прежняя схема", LegacyDrawingWidget), ("По областям", DrawingWidget)):
+        summary, busy = run(widget_class, args.size, args.rate, args.events)
+        print(
+            f"{name:14s}: кадров {summary['frames']:5d}, "
+            f"отрисовка {summary['paint_mean_ms']:.3f} мс (p95 {summary['paint_p95_ms']:.3f}), "
+            f"площадь {summary['pixels_mean']:.0f} пикс., "
+            f"занятость потока GUI {busy * 1000:.1f} мс"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Микробенчмарк предобработки: NumPy без копирования против прежнего пути через PIL
+
+Запуск:
+    python -m benchmarks.bench_preprocess [--repeats 500] [--size 280]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+from PyQt6.QtCore import Qt, QPoint
+from PyQt6.QtGui import QImage, QPainter, QPen
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils import preprocess_image_for_model  # noqa: E402
+
+
+def legacy_preprocess(qt_image, target_size=28):
+    """Прежняя реализация preprocess_image_for_model через PIL (для сравнения)"""
+    byte_data = qt_image.bits().asstring(qt_image.width() * qt_image.height() * 4)
+    pil_image = Image.frombuffer(
+        "RGBA", (qt_image.width(), qt_image.height()), byte_data, "raw", "RGBA", 0, 1
+    )
+    pil_image = pil_image.convert('L')
+    pil_image = ImageOps.invert(pil_image)
+    pil_image = pil_image.resize((target_size, target_size), Image.Resampling.LANCZOS)
+    image_array = np.array(pil_image)
+    image_array = image_array.astype(np.float32) / 255.0
+    return image_array.reshape(1, target_size, target_size, 1)
+
+
+def make_canvas(size):
+    """Холст с нарисованной цифрой 7"""
+    image = QImage(size, size, QImage.Format.Format_RGB32)
+    image.fill(Qt.GlobalColor.white)
+    
+    painter = QPainter(image)
+    painter.setPen(QPen(
+        Qt.GlobalColor.black, size // 14,
+        Qt.PenStyle.SolidLine, Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin
+    ))
+    painter.drawLine(QPoint(size // 4, size // 4), QPoint(3 * size // 4, size // 4))
+    painter.drawLine(QPoint(3 * size // 4, size // 4), QPoint(size // 3, 4 * size // 5))
+    painter.end()
+    return image
+
+
+def measure(function, repeats):
+    """Медианное время вызова функции в микросекундах"""
+    function()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1e6
+
+
+def main():
+    """Запуск бенчмарка"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=500)
+    parser.add_argument("--size", type=int, default=280)
+    args = parser.parse_args()
+    
+    image = make_canvas(args.size)
+    buffer = np.empty((1, 28, 28, 1), dtype=np.float32)
+    
+    legacy = measure(lambda: legacy_preprocess(image), args.repeats)
+    numpy_path = measure(lambda: preprocess_image_for_model(image), args.repeats)
+    numpy_reused = measure(lambda: preprocess_image_for_model(image, out=buffer), args.repeats)
+    centered = measure(
+        lambda: preprocess_image_for_model(image, out=buffer, center=True), args.repeats
+    )
+    
+    difference = np.abs(legacy_preprocess(image) - preprocess_image_for_model(image)).max()
+    
+    print(f"Холст {args.size}x{args.size}, повторов: {args.repeats}")
+    print(f"PIL (прежний путь):           {legacy:8.1f} мкс")
+    print(f"NumPy без копирования:        {numpy_path:8.1f} мкс  (x{legacy / numpy_path:.1f})")
+    print(f"NumPy + предвыделенный буфер: {numpy_reused:8.1f} мкс  (x{legacy / numpy_reused:.1f})")
+    print(f"NumPy + центрирование MNIST:  {centered:8.1f} мкс")
+    print(f"Максимальное расхождение с PIL: {difference:.3f}")
+
+
+if __name__ == "__main__":
+    main()
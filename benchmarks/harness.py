@@ -0,0 +1,165 @@
+"""Общие средства бенчмарков: замер задержек и памяти, сохранение и сравнение результатов"""
+
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Перцентили задержки в отчете
+PERCENTILES = (50, 95, 99)
+
+
+def max_rss_kb():
+    """Пиковый размер резидентной памяти процесса в КБ (None, если недоступен)"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS возвращает байты, Linux - килобайты
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+
+def measure(function, repeats=200, warmup=10, items=1, setup=None, memory_calls=5):
+    """
+    Замер задержки, пропускной способности и пиковой памяти функции
+    
+    Память измеряется отдельным прогоном под tracemalloc, чтобы его
+    накладные расходы не искажали время.
+    
+    Args:
+        function: функция без аргументов
+        repeats: количество замеряемых вызовов
+        warmup: количество вызовов для прогрева
+        items: количество элементов (изображений), обрабатываемых за вызов
+        setup: функция, вызываемая перед каждым вызовом вне замера
+        memory_calls: количество вызовов в прогоне под tracemalloc
+    
+    Returns:
+        словарь: repeats, items, p50_ms, p95_ms, p99_ms, mean_ms, min_ms,
+        throughput (элементов в секунду), peak_alloc_kb, max_rss_kb
+    """
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        function()
+    
+    timings = np.empty(repeats, dtype=np.float64)
+    for i in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings[i] = time.perf_counter() - start
+    
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for _ in range(memory_calls):
+        if setup is not None:
+            setup()
+        function()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    if not tracing:
+        tracemalloc.stop()
+    
+    timings_ms = timings * 1000.0
+    result = {"repeats": repeats, "items": items}
+    for q, value in zip(PERCENTILES, np.percentile(timings_ms, PERCENTILES)):
+        result[f"p{q}_ms"] = float(value)
+    result.update({
+        "mean_ms": float(timings_ms.mean()),
+        "min_ms": float(timings_ms.min()),
+        "throughput": items * repeats / max(float(timings.sum()), 1e-12),
+        "peak_alloc_kb": max(peak, 0) / 1024.0,
+        "max_rss_kb": max_rss_kb(),
+    })
+    return result
+
+
+def environment_info():
+    """Сведения об окружении для воспроизводимости результатов"""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def save_results(path, results, settings=None):
+    """
+    Сохранение результатов в JSON
+    
+    Args:
+        path: путь к файлу
+        results: словарь {имя замера: результат measure}
+        settings: параметры прогона
+    """
+    document = {"environment": environment_info(), "settings": settings or {}, "results": results}
+    with open(path, "w", encoding="utf-8") as stream:
+        json.dump(document, stream, ensure_ascii=False, indent=2)
+
+
+def load_results(path):
+    """Загрузка результатов, сохраненных save_results"""
+    with open(path, encoding="utf-8") as stream:
+        return json.load(stream)["results"]
+
+
+def compare(results, baseline, threshold=0.25, metric="p50_ms"):
+    """
+    Сравнение результатов с эталоном
+    
+    Замер считается регрессией, если значение метрики выросло больше
+    чем на threshold (доля). Замеры, которых нет в эталоне, пропускаются.
+    
+    Args:
+        results, baseline: словари {имя замера: результат measure}
+        threshold: допустимый относительный рост
+        metric: сравниваемая метрика (по умолчанию медианная задержка)
+    
+    Returns:
+        (список строк сравнения, список имен замеров с регрессией)
+    """
+    lines, regressions = [], []
+    for name, result in results.items():
+        reference = baseline.get(name, {}).get(metric)
+        if not reference:
+            continue
+        ratio = result[metric] / reference
+        regressed = ratio > 1.0 + threshold
+        if regressed:
+            regressions.append(name)
+        lines.append(
+            f"{name:32s} {reference:10.4f} -> {result[metric]:10.4f} {metric} "
+            f"({ratio - 1.0:+.1%}){'  РЕГРЕССИЯ' if regressed else ''}"
+        )
+    return lines, regressions
+
+
+def format_results(results):
+    """Текстовая таблица результатов"""
+    lines = [
+        f"{'замер':32s} {'p50, мс':>9s} {'p95, мс':>9s} {'p99, мс':>9s} "
+        f"{'элем./с':>10s} {'пик, КБ':>9s} {'RSS, МБ':>8s}"
+    ]
+    for name, result in results.items():
+        rss = result["max_rss_kb"]
+        lines.append(
+            f"{name:32s} {result['p50_ms']:9.4f} {result['p95_ms']:9.4f} {result['p99_ms']:9.4f} "
+            f"{result['throughput']:10.0f} {result['peak_alloc_kb']:9.1f} "
+            f"{rss / 1024 if rss is not None else float('nan'):8.1f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,311 @@
+"""Набор бенчмарков: предобработка, инференс и распознавание от кнопки до результата
+
+Работает без сети и без дисплея (платформа Qt offscreen). Цифры рисуются
+синтетически с фиксированным зерном; можно добавить сохраненные
+изображения цифр (--images). Без --model используется синтетическая
+полносвязная модель, поэтому результаты воспроизводимы на любой машине.
+
+Запуск:
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --baseline results.json --threshold 0.25
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PyQt6.QtCore import QEventLoop, QPointF, Qt, QTimer
+from PyQt6.QtGui import QImage, QPainter, QPen, QPolygonF
+from PyQt6.QtWidgets import QApplication
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+from benchmarks.harness import (  # noqa: E402
+    compare, format_results, load_results, measure, save_results
+)
+from src.model_handler import ModelHandler  # noqa: E402
+from src.numpy_backend import WEIGHTS_CACHE_NAME, NumpyDenseModel  # noqa: E402
+from src.strokes import StrokeStore, rasterize_strokes  # noqa: E402
+from src.utils import preprocess_image_for_model  # noqa: E402
+
+STAGES = ("preprocess", "inference", "end_to_end")
+
+# Штрихи цифр в координатах единичного квадрата
+DIGIT_STROKES = {
+    0: [[(0.5, 0.2), (0.3, 0.3), (0.3, 0.7), (0.5, 0.8), (0.7, 0.7), (0.7, 0.3), (0.5, 0.2)]],
+    1: [[(0.4, 0.3), (0.55, 0.2), (0.55, 0.8)]],
+    2: [[(0.3, 0.3), (0.5, 0.2), (0.7, 0.3), (0.3, 0.8), (0.7, 0.8)]],
+    3: [[(0.3, 0.2), (0.7, 0.25), (0.45, 0.5), (0.7, 0.7), (0.3, 0.8)]],
+    4: [[(0.6, 0.8), (0.6, 0.2), (0.3, 0.6), (0.75, 0.6)]],
+    5: [[(0.7, 0.2), (0.35, 0.2), (0.3, 0.45), (0.65, 0.5), (0.6, 0.8), (0.3, 0.8)]],
+    6: [[(0.65, 0.2), (0.35, 0.5), (0.35, 0.75), (0.6, 0.8), (0.65, 0.55), (0.35, 0.55)]],
+    7: [[(0.3, 0.2), (0.7, 0.2), (0.4, 0.8)]],
+    8: [[(0.5, 0.5), (0.3, 0.3), (0.5, 0.2), (0.7, 0.3), (0.3, 0.7), (0.5, 0.8), (0.7, 0.7),
+         (0.5, 0.5)]],
+    9: [[(0.65, 0.45), (0.35, 0.45), (0.35, 0.2), (0.65, 0.2), (0.6, 0.8)]],
+}
+
+
+def make_strokes(digit, size, rng, points_per_segment=8):
+    """
+    Синтетическая цифра в виде штрихов со случайным дрожанием
+    
+    Returns:
+        StrokeStore для холста size x size
+    """
+    store = StrokeStore(canvas_size=(size, size))
+    timestamp = 0.0
+    for polyline in DIGIT_STROKES[digit]:
+        vertices = np.array(polyline) + rng.normal(0.0, 0.015, (len(polyline), 2))
+        path = [vertices[0]]
+        for start, end in zip(vertices[:-1], vertices[1:]):
+            for step in range(1, points_per_segment + 1):
+                path.append(start + (end - start) * step / points_per_segment)
+        
+        x, y = path[0] * size
+        store.begin_stroke(float(x), float(y), timestamp)
+        for point in path[1:]:
+            timestamp += 0.008
+            x, y = point * size
+            store.add_point(float(x), float(y), timestamp)
+        store.end_stroke()
+    return store
+
+
+def render_strokes(store, size, brush_size):
+    """Растр холста для штрихов, как в DrawingWidget.render_strokes"""
+    image = QImage(size, size, QImage.Format.Format_RGB32)
+    image.fill(Qt.GlobalColor.white)
+    painter = QPainter(image)
+    painter.setPen(QPen(
+        Qt.GlobalColor.black, brush_size, Qt.PenStyle.SolidLine,
+        Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin
+    ))
+    for stroke in store.strokes():
+        painter.drawPolyline(QPolygonF([QPointF(x, y) for x, y in stroke[:, :2].tolist()]))
+    painter.end()
+    return image
+
+
+def load_stored_images(directory):
+    """Сохраненные изображения цифр (PNG/JPEG/BMP) из директории"""
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith((".png", ".jpg", ".jpeg", ".bmp")):
+            image = QImage(os.path.join(directory, name))
+            if not image.isNull():
+                images.append(image.convertToFormat(QImage.Format.Format_RGB32))
+    return images
+
+
+def create_synthetic_model(directory, seed=0):
+    """Полносвязная модель 784-128-10 со случайными весами для NumPy-бэкенда"""
+    rng = np.random.default_rng(seed)
+    model = NumpyDenseModel(
+        [rng.normal(0, 0.05, (784, 128)).astype(np.float32),
+         rng.normal(0, 0.1, (128, 10)).astype(np.float32)],
+        [np.zeros(128, dtype=np.float32), np.zeros(10, dtype=np.float32)],
+        ["relu", "softmax"]
+    )
+    model.save_npz(os.path.join(directory, WEIGHTS_CACHE_NAME))
+
+
+class Cycle:
+    """Циклический перебор входов, чтобы замеры не использовали один объект"""
+    
+    def __init__(self, items):
+        self.items = items
+        self.index = 0
+    
+    def next(self):
+        item = self.items[self.index % len(self.items)]
+        self.index += 1
+        return item
+
+
+def bench_preprocess(results, canvases, strokes, stored, args):
+    """Предобработка: растр QImage, растр с центрированием, векторные штрихи"""
+    buffer = np.empty((1, 28, 28, 1), dtype=np.float32)
+    images = Cycle(canvases)
+    results["preprocess/raster"] = measure(
+        lambda: preprocess_image_for_model(images.next(), out=buffer), args.repeats
+    )
+    results["preprocess/raster_center"] = measure(
+        lambda: preprocess_image_for_model(images.next(), out=buffer, center=True), args.repeats
+    )
+    
+    stores = Cycle(strokes)
+    results["preprocess/vector_center"] = measure(
+        lambda: rasterize_strokes(stores.next(), brush_size=args.brush_size, center=True),
+        args.repeats
+    )
+    
+    if stored:
+        stored_images = Cycle(stored)
+        results["preprocess/stored_center"] = measure(
+            lambda: preprocess_image_for_model(stored_images.next(), out=buffer, center=True),
+            args.repeats
+        )
+
+
+def bench_inference(results, handler, inputs, args):
+    """Инференс: predict для одного изображения и predict_batch по размерам батча"""
+    single = Cycle([inputs[i:i + 1] for i in range(len(inputs))])
+    results["inference/predict"] = measure(lambda: handler.predict(single.next()), args.repeats)
+    
+    for batch_size in args.batch_sizes:
+        repeats = max(10, args.repeats * 8 // max(batch_size, 8))
+        batch = np.resize(inputs, (batch_size,) + inputs.shape[1:])
+        results[f"inference/batch_{batch_size}"] = measure(
+            lambda: handler.predict_batch(batch), repeats, items=batch_size
+        )
+
+
+def bench_end_to_end(results, model_path, strokes, args):
+    """
+    Распознавание по кнопке: снимок холста, предобработка и инференс
+    в рабочем потоке, доставка результата сигналом в поток GUI
+    """
+    from src.main_window import MainWindow
+    
+    saved_model_path, config.MODEL_PATH = config.MODEL_PATH, model_path
+    try:
+        window = MainWindow()
+    finally:
+        config.MODEL_PATH = saved_model_path
+    window.live_checkbox.setChecked(False)
+    window.model_loader.wait()
+    QApplication.processEvents()
+    if not window.is_model_ready():
+        print("Модель не загрузилась, замер end_to_end пропущен", file=sys.stderr)
+        window.close()
+        return
+    # Кэш превратил бы повторяющиеся цифры в попадания
+    window.model_handler.disable_prediction_cache()
+    
+    widget = window.drawing_widget
+    stores = Cycle(strokes)
+    loop = QEventLoop()
+    window.recognizer.result_ready.connect(lambda *_: loop.quit())
+    timeout = QTimer()
+    timeout.setSingleShot(True)
+    timeout.setInterval(5000)
+    timeout.timeout.connect(loop.quit)
+    
+    def next_canvas():
+        widget.strokes = stores.next().snapshot()
+        widget.strokes.canvas_size = (widget.width(), widget.height())
+        widget.generation += 1
+        if config.PREPROCESS_SOURCE != "vector":
+            widget.render_strokes()
+    
+    def click():
+        window.on_recognize_clicked()
+        timeout.start()
+        loop.exec()
+        timeout.stop()
+    
+    results["end_to_end/recognize_click"] = measure(
+        click, max(20, args.repeats // 4), warmup=3, setup=next_canvas, memory_calls=2
+    )
+    window.close()
+
+
+def run(args):
+    """
+    Прогон выбранных этапов
+    
+    Returns:
+        словарь {имя замера: результат measure}
+    """
+    app = QApplication.instance() or QApplication(sys.argv[:1])  # noqa: F841
+    rng = np.random.default_rng(args.seed)
+    
+    strokes = [make_strokes(i % 10, args.canvas_size, rng) for i in range(args.samples)]
+    canvases = [render_strokes(store, args.canvas_size, args.brush_size) for store in strokes]
+    stored = load_stored_images(args.images) if args.images else []
+    
+    tmp_dir = None
+    model_path = args.model
+    if model_path is None:
+        tmp_dir = tempfile.mkdtemp()
+        create_synthetic_model(tmp_dir, args.seed)
+        model_path = tmp_dir
+    
+    results = {}
+    try:
+        if "preprocess" in args.stages:
+            bench_preprocess(results, canvases, strokes, stored, args)
+        
+        if "inference" in args.stages:
+            handler = ModelHandler(model_path, backend=args.backend, warmup_batch_sizes=())
+            if not handler.is_loaded:
+                raise RuntimeError(f"Не удалось загрузить модель из {model_path}")
+            inputs = np.stack([
+                rasterize_strokes(store, brush_size=args.brush_size, center=True)
+                for store in strokes
+            ])[..., np.newaxis]
+            bench_inference(results, handler, inputs, args)
+        
+        if "end_to_end" in args.stages:
+            bench_end_to_end(results, model_path, strokes, args)
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return results
+
+
+def build_parser():
+    """Парсер аргументов командной строки"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 256])
+    parser.add_argument("--samples", type=int, default=50, help="количество синтетических цифр")
+    parser.add_argument("--canvas-size", type=int, default=config.CANVAS_WIDTH)
+    parser.add_argument("--brush-size", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--images", help="директория с сохраненными изображениями цифр")
+    parser.add_argument("--model", help="директория модели (по умолчанию синтетическая модель)")
+    parser.add_argument("--backend", default="numpy", choices=("auto", "numpy", "tensorflow"))
+    parser.add_argument("--output", help="файл JSON для результатов")
+    parser.add_argument("--baseline", help="файл JSON с эталонными результатами")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="допустимый относительный рост метрики")
+    parser.add_argument("--metric", default="p50_ms", help="метрика для сравнения с эталоном")
+    return parser
+
+
+def main(argv=None):
+    """
+    Запуск набора бенчмарков
+    
+    Returns:
+        0 или 1, если относительно эталона найдена регрессия
+    """
+    args = build_parser().parse_args(argv)
+    results = run(args)
+    print(format_results(results))
+    
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+        save_results(args.output, results, settings)
+        print(f"Результаты сохранены в {args.output}")
+    
+    if args.baseline:
+        lines, regressions = compare(results, load_results(args.baseline), args.threshold, args.metric)
+        print("\n".join(["", f"Сравнение с {args.baseline} (порог {args.threshold:.0%}):"] + lines))
+        if regressions:
+            print(f"Регрессии: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,9 +7,127 @@ CANVAS_HEIGHT = 280
 # Параметры изображения для модели
 MODEL_IMAGE_SIZE = 28
 
+# Нормализация цифры в стиле MNIST: обрезка по рамке чернил, вписывание
+# в квадрат MNIST_BOX_SIZE с сохранением пропорций и сдвиг по центру масс
+PREPROCESS_CENTERING = True
+MNIST_BOX_SIZE = 20
+
+# Источник изображения для модели: "vector" - растеризация штрихов сразу
+# в 28x28, "raster" - уменьшение полноразмерного изображения холста
+PREPROCESS_SOURCE = "vector"
+
+# Распознавание числа из нескольких цифр: холст делится на связные области,
+# каждая цифра нормализуется отдельно, и все они распознаются одним батчем.
+# Если найдена одна цифра, используется обычная предобработка
+MULTI_DIGIT_ENABLED = True
+
 # Путь к модели
 MODEL_PATH = "mnist_model"
 
+# Бэкенд инференса: "numpy" (без импорта TensorFlow), "tensorflow" или "auto".
+# В режиме "auto" NumPy используется для полносвязных моделей, остальные
+# графы выполняются через TensorFlow
+MODEL_BACKEND = "auto"
+
+# Формат весов NumPy-бэкенда: "float32", "float16" или "int8".
+# Квантованные варианты создаются из float32 при первой загрузке
+# (python -m src.cli quantize); сравнение точности: python -m src.cli evaluate
+MODEL_VARIANT = "float32"
+
+# Реестр версий модели (src/model_registry.py): подкаталоги 1, 2, v3, ...
+# с SavedModel. Если задан, загружается самая новая версия (MODEL_PATH -
+# только если версий нет), а новые версии подхватываются без перезапуска
+MODEL_REGISTRY_DIR = None
+MODEL_REGISTRY_POLL_MS = 2000  # период проверки директории
+MODEL_REGISTRY_SETTLE_S = 2.0  # версия моложе этого считается недокопированной
+MODEL_REGISTRY_HISTORY = 1  # сколько предыдущих версий держать загруженными для отката
+MODEL_ROLLBACK_SHORTCUT = "Ctrl+Shift+R"
+
+# Каскад моделей (src/cascade.py): ступени из директории модели в виде
+# (файл, порог уверенности, порог отрыва лучшей цифры от второй). Ответ
+# ступени принимается, если оба порога пройдены, иначе изображение уходит
+# на следующую ступень и в конце - на полную модель. Ступень обучается
+# командой python -m src.cli cascade-train, пороги подбираются по отчету
+# python -m src.cli cascade-evaluate
+CASCADE_ENABLED = False
+CASCADE_STAGES = (("cascade_stage.npz", 0.95, 0.0),)
+
+# Адаптивная аугментация при распознавании (src/tta.py): если уверенность
+# ниже порога, сдвинутые, повернутые и утолщенные копии изображения 28x28
+# проходят через модель одним батчем, и вероятности усредняются. Точность и
+# добавленная задержка при разных порогах: python -m src.cli tta-evaluate
+TTA_ENABLED = True
+TTA_CONFIDENCE_THRESHOLD = 0.8
+TTA_SHIFT_PX = 1
+TTA_ANGLES = (-10.0, 10.0)
+TTA_THICKENING = True
+
+# Обучение модели на файлах IDX (python -m src.training)
+TRAINING_EPOCHS = 10
+TRAINING_BATCH_SIZE = 128
+TRAINING_HIDDEN_UNITS = (128,)
+
+# Запись нарисованных образцов для дообучения (src/capture_store.py): при
+# очистке холста изображение 28x28, вероятности и метка, набранная клавишами
+# 0-9, дописываются в хранилище в фоновом потоке. Образцы с метками
+# выгружаются в файлы IDX командой python -m src.cli capture-export
+CAPTURE_ENABLED = False
+CAPTURE_DIR = "captures"
+CAPTURE_SEGMENT_MB = 64  # размер сегмента, после которого начинается новый
+CAPTURE_MAX_SEGMENTS = None  # сколько последних сегментов хранить, None - все
+
+# Живое распознавание во время рисования
+LIVE_RECOGNITION_ENABLED = True
+LIVE_RECOGNITION_DEBOUNCE_MS = 150
+
 # Цвета
 CANVAS_BACKGROUND_COLOR = "white"
 DRAWING_COLOR = "black"
+
+# Очередь микробатчинга одиночных запросов (ModelHandler.enable_batch_queue)
+BATCH_MAX_SIZE = 32
+BATCH_MAX_WAIT_MS = 5.0
+
+# Компилируемый путь инференса
+MODEL_JIT_COMPILE = False  # XLA-компиляция графа инференса
+MODEL_WARMUP_BATCH_SIZES = (1,)  # размеры батчей для прогрева при загрузке
+
+# Локальный HTTP-сервер распознавания (python -m src.server)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_MAX_PENDING = 256  # сверх этого числа запросов /predict отвечает 503
+SERVER_MAX_BODY_BYTES = 1 << 20
+SERVER_KEEPALIVE_TIMEOUT_S = 15.0
+
+# Кэш результатов распознавания по квантованному изображению 28x28
+PREDICTION_CACHE_SIZE = 1024  # 0 - кэш отключен
+PREDICTION_CACHE_TTL_S = None  # время жизни записи, None - без ограничения
+
+# Пул процессов инференса (src/worker_pool.py) для сервера: 0 - модель
+# в процессе сервера; каждый процесс загружает свою копию модели
+WORKER_POOL_SIZE = 0
+WORKER_POOL_THREADS = 1  # потоков BLAS/TensorFlow на процесс
+WORKER_POOL_JOB_TIMEOUT_S = 30.0
+
+# Ресурсы процесса инференса (src/runtime_config.py), применяются до загрузки
+# модели. 0 и None - значения библиотек по умолчанию. Переопределяются
+# файлом подбора (python -m src.cli runtime-tune) и переменными окружения
+# DIGITS_INTRA_OP_THREADS, DIGITS_INTER_OP_THREADS, DIGITS_CPU_AFFINITY,
+# DIGITS_MEMORY_BUDGET_MB, DIGITS_SETTINGS_FILE
+RUNTIME_INTRA_OP_THREADS = 0  # потоков внутри операции (TensorFlow, BLAS)
+RUNTIME_INTER_OP_THREADS = 0  # потоков для параллельных операций графа
+RUNTIME_CPU_AFFINITY = None  # ядра процесса, например "0-3"
+RUNTIME_MEMORY_BUDGET_MB = None  # мягкий предел памяти: при превышении очищается кэш
+RUNTIME_MEMORY_CHECK_MS = 5000  # период проверки предела в окне приложения
+RUNTIME_SETTINGS_FILE = "runtime_settings.json"
+
+# Журнал (модуль logging): DEBUG, INFO, WARNING, ERROR
+LOG_LEVEL = "INFO"
+
+# Инструментация горячих путей (src/instrumentation.py): выключенная почти
+# ничего не стоит; панель производительности включает ее на время показа
+INSTRUMENTATION_ENABLED = False
+INSTRUMENTATION_EXPORT_PATH = None  # файл .json или .prom, записывается при закрытии окна
+PERF_OVERLAY_VISIBLE = False
+PERF_OVERLAY_SHORTCUT = "F12"
+PERF_OVERLAY_REFRESH_MS = 500
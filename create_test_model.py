@@ -5,8 +5,13 @@ from tensorflow import keras
 import os
 
 
-def create_and_save_test_model():
-    """Создание и сохранение простой тестовой модели"""
+def create_and_save_test_model(model_path='mnist_model'):
+    """
+    Создание и сохранение простой тестовой модели
+    
+    Args:
+        model_path: директория для сохранения модели
+    """
     
     # Создаем простую модель
     model = keras.Sequential([
@@ -25,12 +30,12 @@ def create_and_save_test_model():
     )
     
     # Создаем директорию для модели если её нет
-    os.makedirs('mnist_model', exist_ok=True)
+    os.makedirs(model_path, exist_ok=True)
     
     # Сохраняем модель в формате SavedModel
-    tf.saved_model.save(model, 'mnist_model')
+    tf.saved_model.save(model, model_path)
     
-    print("Тестовая модель создана и сохранена в mnist_model/")
+    print(f"Тестовая модель создана и сохранена в {model_path}/")
 
 
 if __name__ == "__main__":
@@ -1,23 +1,29 @@
 """Точка входа в приложение"""
 
+# Таймер запуска импортируется первым, чтобы учесть время остальных импортов
+from src.startup import startup_timer
+
+# Потоки и привязка к ядрам задаются до импорта NumPy и TensorFlow
+from src.runtime_config import apply_runtime_settings
+apply_runtime_settings()
+
+import logging
 import sys
-import os
 from PyQt6.QtWidgets import QApplication
 
+from src.instrumentation import setup_logging
 from src.main_window import MainWindow
 
+startup_timer.mark("импорт")
+
+logger = logging.getLogger(__name__)
+
 
 def main():
     """Основная функция запуска приложения"""
+    setup_logging()
     try:
-        print("Запуск приложения распознавания рукописных цифр...")
-        print(f"Текущая директория: {os.getcwd()}")
-        print(f"Содержимое директории: {os.listdir('.')}")
-        
-        if os.path.exists('mnist_model'):
-            print("Содержимое mnist_model:", os.listdir('mnist_model'))
-            if os.path.exists('mnist_model/variables'):
-                print("Содержимое mnist_model/variables:", os.listdir('mnist_model/variables'))
+        logger.info("Запуск приложения распознавания рукописных цифр...")
         
         # Создаем QApplication
         app = QApplication(sys.argv)
@@ -25,16 +31,15 @@ def main():
         # Создаем и показываем главное окно
         window = MainWindow()
         window.show()
+        startup_timer.mark("окно создано")
         
-        print("Приложение запущено успешно")
+        logger.info("Приложение запущено успешно")
         
         # Запускаем event loop
         sys.exit(app.exec())
         
     except Exception as e:
-        print(f"Критическая ошибка при запуске приложения: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Критическая ошибка при запуске приложения: {e}")
         sys.exit(1)
 
 
@@ -0,0 +1,119 @@
+"""Очередь запросов, объединяющая одиночные предсказания в батчи"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Динамический микробатчинг одиночных запросов
+    
+    Запросы из разных потоков складываются в очередь, фоновый поток
+    собирает их в батч (не больше max_batch_size элементов, ожидание
+    не дольше max_wait_ms после первого запроса) и выполняет одну
+    батчевую функцию предсказания.
+    """
+    
+    def __init__(self, predict_batch_fn, max_batch_size=32, max_wait_ms=5.0):
+        """
+        Инициализация очереди
+        
+        Args:
+            predict_batch_fn: функция (N, ...) -> (N, 10)
+            max_batch_size: максимальный размер батча
+            max_wait_ms: максимальное время ожидания добора батча в мс
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size должен быть положительным")
+        
+        self.predict_batch_fn = predict_batch_fn
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000.0
+        
+        self._queue = queue.Queue()
+        self._closed = False
+        # Проверка _closed и постановка в очередь выполняются атомарно, иначе
+        # запрос может оказаться за маркером остановки и не получить ответа
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._worker, name="MicroBatcher", daemon=True
+        )
+        self._thread.start()
+    
+    def submit(self, image):
+        """
+        Постановка одного изображения в очередь
+        
+        Args:
+            image: numpy array одного изображения без батчевой оси
+        
+        Returns:
+            Future с numpy array вероятностей формы (10,)
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Очередь батчинга закрыта")
+            self._queue.put((image, future))
+        return future
+    
+    def predict(self, image, timeout=None):
+        """Синхронное предсказание одного изображения через очередь"""
+        return self.submit(image).result(timeout)
+    
+    def close(self):
+        """Остановка фонового потока после обработки накопленных запросов"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+    
+    def _collect_batch(self, first):
+        """Добор батча до max_batch_size или истечения max_wait"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            
+            if item is None:
+                # Возвращаем маркер остановки, чтобы завершить цикл после батча
+                self._queue.put(None)
+                break
+            batch.append(item)
+        
+        return batch
+    
+    def _worker(self):
+        """Цикл фонового потока"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            
+            batch = self._collect_batch(first)
+            futures = [future for _, future in batch]
+            
+            try:
+                images = np.stack([image for image, _ in batch])
+                probabilities = self.predict_batch_fn(images)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            
+            for future, row in zip(futures, probabilities):
+                future.set_result(row)
@@ -0,0 +1,454 @@
+"""Хранилище нарисованных образцов и предсказаний для дообучения
+
+Каждый образец - предобработанное изображение 28x28 (uint8, как в MNIST),
+вектор вероятностей, время записи и подтвержденная пользователем метка
+(-1, если не подтверждена). Хранилище - директория с сегментами:
+
+    captures/
+        index.json
+        000001/images-idx3-ubyte
+        000001/probabilities-idx2-float
+        000001/timestamps-idx1-double
+        000001/labels-idx1-byte
+        000002/...
+
+Каждое поле сегмента - обычный файл IDX, в который записи только
+дописываются, а количество в заголовке обновляется после записи данных.
+Поэтому файлы читаются без копирования через memmap_idx, а изображения
+сегмента можно сразу подать в src.training или python -m src.cli evaluate.
+Когда сегмент достигает предельного размера, начинается следующий.
+
+Запись идет в фоновом потоке: append только ставит копию данных в
+очередь, а поток накапливает записи и пишет их блоками.
+
+Экспорт образцов с метками в пару файлов IDX:
+    python -m src.cli capture-export captures --images user-images-idx3-ubyte --labels user-labels-idx1-ubyte
+"""
+
+import json
+import logging
+import os
+import queue
+import shutil
+import struct
+import threading
+import time
+
+import numpy as np
+
+from src.idx_io import memmap_idx, read_idx_header, write_idx
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "index.json"
+
+# Поля образца: имя, файл в сегменте, тип элементов IDX
+FIELDS = (
+    ("images", "images-idx3-ubyte", np.dtype(np.uint8)),
+    ("probabilities", "probabilities-idx2-float", np.dtype(">f4")),
+    ("timestamps", "timestamps-idx1-double", np.dtype(">f8")),
+    ("labels", "labels-idx1-byte", np.dtype(np.int8)),
+)
+
+# Метка образца, не подтвержденного пользователем
+NO_LABEL = -1
+
+
+def quantize_images(images):
+    """Изображения [0, 1] -> uint8 0..255 (uint8 возвращаются как есть)"""
+    images = np.asarray(images)
+    if images.dtype == np.uint8:
+        return images
+    scaled = np.multiply(images, 255.0, dtype=np.float32)
+    scaled += 0.5
+    np.clip(scaled, 0.0, 255.0, out=scaled)
+    return scaled.astype(np.uint8)
+
+
+class CaptureWriter:
+    """
+    Буферизованная запись образцов в фоновом потоке с ротацией по размеру
+    
+    При переполнении очереди образцы отбрасываются и учитываются в
+    статистике: вызывающий поток (поток GUI) никогда не ждет диска.
+    """
+    
+    def __init__(self, path, max_segment_bytes=64 << 20, max_segments=None, image_size=28,
+                 classes=10, flush_records=64, flush_interval=2.0, max_pending=1024):
+        """
+        Открытие хранилища (существующее продолжается с последнего сегмента)
+        
+        Args:
+            path: директория хранилища
+            max_segment_bytes: предельный размер сегмента в байтах
+            max_segments: сколько последних сегментов хранить (None - все)
+            image_size: размер стороны изображения
+            classes: длина вектора вероятностей
+            flush_records: записей в буфере, после которых он пишется на диск
+            flush_interval: наибольшее время в секундах между append и записью
+            max_pending: наибольшее число вызовов append в очереди
+        """
+        self.path = path
+        self.max_segments = max_segments
+        self.image_size = int(image_size)
+        self.classes = int(classes)
+        self.flush_records = max(int(flush_records), 1)
+        self.flush_interval = float(flush_interval)
+        
+        self.item_shapes = {
+            "images": (self.image_size, self.image_size),
+            "probabilities": (self.classes,),
+            "timestamps": (),
+            "labels": (),
+        }
+        self.item_bytes = {
+            name: dtype.itemsize * int(np.prod(self.item_shapes[name], dtype=np.int64))
+            for name, _, dtype in FIELDS
+        }
+        self.record_bytes = sum(self.item_bytes.values())
+        self.max_segment_records = max(int(max_segment_bytes) // self.record_bytes, 1)
+        
+        self.segments = []
+        self._files = {}
+        self._count = 0
+        
+        self.appended = 0
+        self.written = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        
+        os.makedirs(path, exist_ok=True)
+        self._resume()
+        
+        self._queue = queue.Queue(max_pending)
+        self._closed = False
+        self._thread = threading.Thread(target=self._worker, name="CaptureWriter", daemon=True)
+        self._thread.start()
+    
+    def append(self, images, probabilities, labels=None, timestamp=None):
+        """
+        Постановка образцов в очередь записи
+        
+        Args:
+            images: изображения [0, 1] или uint8 формы (N, 28, 28) (также
+                (28, 28) и (N, 28, 28, 1)); копируются, буфер можно переиспользовать
+            probabilities: вероятности формы (N, 10)
+            labels: подтвержденные метки: None, число или последовательность длины N
+            timestamp: время записи (по умолчанию текущее)
+        
+        Returns:
+            True, если образцы поставлены в очередь, False - если отброшены
+        """
+        if self._closed:
+            raise RuntimeError("Хранилище образцов закрыто")
+        
+        images = np.array(images).reshape(-1, self.image_size, self.image_size)
+        probabilities = np.array(probabilities, dtype=np.float32).reshape(-1, self.classes)
+        if len(images) != len(probabilities):
+            raise ValueError("Количество изображений и векторов вероятностей не совпадает")
+        labels = np.broadcast_to(NO_LABEL if labels is None else labels, len(images))
+        timestamps = np.full(len(images), time.time() if timestamp is None else timestamp)
+        
+        try:
+            self._queue.put_nowait((images, probabilities, labels.astype(np.int8), timestamps))
+        except queue.Full:
+            with self._lock:
+                self.dropped += len(images)
+            logger.warning(f"Очередь записи образцов переполнена, отброшено: {len(images)}")
+            return False
+        
+        with self._lock:
+            self.appended += len(images)
+        return True
+    
+    def flush(self, timeout=None):
+        """
+        Ожидание записи всех поставленных в очередь образцов
+        
+        Returns:
+            True, если запись завершилась за timeout секунд
+        """
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+    
+    def close(self):
+        """Запись оставшихся образцов и остановка фонового потока"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._close_files()
+    
+    def stats(self):
+        """Счетчики записи и размер хранилища"""
+        with self._lock:
+            return {
+                "appended": self.appended,
+                "written": self.written,
+                "dropped": self.dropped,
+                "segments": len(self.segments),
+                "records": sum(segment["count"] for segment in self.segments),
+            }
+    
+    def _worker(self):
+        """Цикл фонового потока: накопление записей и запись блоками"""
+        pending = []
+        pending_count = 0
+        deadline = None
+        
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False  # время буферизации истекло
+            
+            if isinstance(item, tuple):
+                pending.append(item)
+                pending_count += len(item[0])
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if pending_count < self.flush_records:
+                    continue
+            
+            if pending:
+                try:
+                    self._write([np.concatenate(columns) for columns in zip(*pending)])
+                except (OSError, ValueError) as e:
+                    logger.error(f"Ошибка при записи образцов в {self.path}: {e}")
+                    with self._lock:
+                        self.dropped += pending_count
+                pending, pending_count, deadline = [], 0, None
+            
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                break
+    
+    def _write(self, columns):
+        """Дозапись столбцов (images, probabilities, labels, timestamps) с ротацией"""
+        images, probabilities, labels, timestamps = columns
+        values = {
+            "images": quantize_images(images),
+            "probabilities": probabilities,
+            "timestamps": timestamps,
+            "labels": labels,
+        }
+        
+        start = 0
+        total = len(images)
+        while start < total:
+            if not self._files or self._count >= self.max_segment_records:
+                self._rotate()
+            stop = min(start + self.max_segment_records - self._count, total)
+            
+            # Сначала данные, затем количество в заголовке: читатель не
+            # увидит записей, данные которых еще не записаны
+            for name, _, dtype in FIELDS:
+                stream = self._files[name]
+                stream.seek(0, os.SEEK_END)
+                stream.write(values[name][start:stop].astype(dtype, copy=False).tobytes())
+                stream.flush()
+            self._count += stop - start
+            for stream in self._files.values():
+                stream.seek(4)
+                stream.write(struct.pack(">I", self._count))
+                stream.flush()
+            
+            segment = self.segments[-1]
+            with self._lock:
+                segment["count"] = self._count
+                if segment["first_timestamp"] is None:
+                    segment["first_timestamp"] = float(timestamps[start])
+                segment["last_timestamp"] = float(timestamps[stop - 1])
+                self.written += stop - start
+            start = stop
+        
+        self._save_index()
+    
+    def _segment_dir(self, name):
+        return os.path.join(self.path, name)
+    
+    def _open_files(self, name):
+        """Открытие файлов полей сегмента для дозаписи"""
+        self._files = {
+            field: open(os.path.join(self._segment_dir(name), filename), "r+b")
+            for field, filename, _ in FIELDS
+        }
+    
+    def _close_files(self):
+        for stream in self._files.values():
+            stream.close()
+        self._files = {}
+    
+    def _rotate(self):
+        """Начало нового сегмента и удаление самых старых сверх max_segments"""
+        self._close_files()
+        number = int(self.segments[-1]["name"]) + 1 if self.segments else 1
+        name = f"{number:06d}"
+        os.makedirs(self._segment_dir(name), exist_ok=True)
+        for field, filename, dtype in FIELDS:
+            empty = np.empty((0,) + self.item_shapes[field], dtype=dtype)
+            write_idx(os.path.join(self._segment_dir(name), filename), empty)
+        
+        with self._lock:
+            self.segments.append({"name": name, "count": 0, "first_timestamp": None,
+                                  "last_timestamp": None})
+            removed = []
+            if self.max_segments and len(self.segments) > self.max_segments:
+                removed = self.segments[:-self.max_segments]
+                del self.segments[:-self.max_segments]
+        for segment in removed:
+            shutil.rmtree(self._segment_dir(segment["name"]), ignore_errors=True)
+            logger.info(f"Удален старый сегмент образцов {segment['name']}")
+        
+        self._open_files(name)
+        self._count = 0
+        self._save_index()
+    
+    def _resume(self):
+        """Продолжение последнего сегмента существующего хранилища"""
+        self.segments = [dict(segment) for segment in read_index(self.path)["segments"]
+                         if os.path.isdir(self._segment_dir(segment["name"]))]
+        for segment in self.segments:
+            if segment["count"] is None:
+                try:
+                    segment["count"] = len(open_segment(self._segment_dir(segment["name"]))["labels"])
+                except (OSError, ValueError):
+                    segment["count"] = 0
+        if not self.segments:
+            return
+        
+        name = self.segments[-1]["name"]
+        try:
+            self._open_files(name)
+            shapes = {}
+            for field, stream in self._files.items():
+                stream.seek(0)
+                _, shapes[field] = read_idx_header(stream)
+        except (OSError, ValueError) as e:
+            # Поврежденный сегмент не дописывается, запись начнется с нового
+            logger.warning(f"Сегмент образцов {name} не продолжен: {e}")
+            self._close_files()
+            return
+        
+        # После сбоя поля могли остаться разной длины или с хвостом
+        # недописанных данных: обрезаем до общего количества
+        self._count = min(shape[0] for shape in shapes.values())
+        for field, stream in self._files.items():
+            header_bytes = 4 + 4 * len(shapes[field])
+            stream.truncate(header_bytes + self._count * self.item_bytes[field])
+            stream.seek(4)
+            stream.write(struct.pack(">I", self._count))
+            stream.flush()
+        self.segments[-1]["count"] = self._count
+    
+    def _save_index(self):
+        """Атомарная запись index.json"""
+        with self._lock:
+            index = {
+                "version": 1,
+                "image_size": self.image_size,
+                "classes": self.classes,
+                "segments": [dict(segment) for segment in self.segments],
+            }
+        temporary = os.path.join(self.path, INDEX_NAME + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as stream:
+            json.dump(index, stream, indent=2)
+        os.replace(temporary, os.path.join(self.path, INDEX_NAME))
+
+
+def read_index(path):
+    """
+    Содержимое index.json хранилища
+    
+    Если индекс отсутствует или поврежден, сегменты находятся по именам
+    директорий (количество записей тогда берется из файлов).
+    """
+    try:
+        with open(os.path.join(path, INDEX_NAME), encoding="utf-8") as stream:
+            return json.load(stream)
+    except (OSError, ValueError):
+        names = sorted(name for name in os.listdir(path) if name.isdigit()) if os.path.isdir(path) else []
+        return {"version": 1, "segments": [
+            {"name": name, "count": None, "first_timestamp": None, "last_timestamp": None}
+            for name in names
+        ]}
+
+
+def open_segment(segment_dir):
+    """
+    Поля сегмента без копирования данных
+    
+    Args:
+        segment_dir: директория сегмента
+    
+    Returns:
+        словарь images, probabilities, timestamps, labels: отображения файлов
+        в память одинаковой длины (вероятности и время - big-endian, как в IDX)
+    """
+    arrays = {name: memmap_idx(os.path.join(segment_dir, filename)) for name, filename, _ in FIELDS}
+    # Запись могла обновить заголовки не всех файлов: берем общую часть
+    count = min(len(array) for array in arrays.values())
+    return {name: array[:count] for name, array in arrays.items()}
+
+
+def iter_capture(path):
+    """
+    Сегменты хранилища по порядку записи
+    
+    Yields:
+        словари полей сегмента (см. open_segment)
+    """
+    for segment in read_index(path)["segments"]:
+        segment_dir = os.path.join(path, segment["name"])
+        if os.path.isdir(segment_dir):
+            yield open_segment(segment_dir)
+
+
+def read_capture(path):
+    """
+    Все образцы хранилища одним набором массивов
+    
+    Данные одного сегмента возвращаются без копирования, несколько
+    сегментов объединяются в память.
+    
+    Returns:
+        словарь полей (см. open_segment)
+    """
+    segments = list(iter_capture(path))
+    if len(segments) == 1:
+        return segments[0]
+    if not segments:
+        index = read_index(path)
+        size = index.get("image_size", 28)
+        shapes = {"images": (size, size), "probabilities": (index.get("classes", 10),)}
+        return {name: np.empty((0,) + shapes.get(name, ()), dtype=dtype) for name, _, dtype in FIELDS}
+    return {name: np.concatenate([segment[name] for segment in segments]) for name, _, _ in FIELDS}
+
+
+def export_labeled(path, images_path, labels_path):
+    """
+    Запись образцов с подтвержденными метками в пару файлов IDX
+    
+    Результат читается src.training и командами оценки так же, как MNIST.
+    
+    Returns:
+        количество экспортированных образцов
+    """
+    images = []
+    labels = []
+    for segment in iter_capture(path):
+        labeled = segment["labels"] >= 0
+        images.append(segment["images"][labeled])
+        labels.append(segment["labels"][labeled])
+    
+    images = np.concatenate(images) if images else np.empty((0, 28, 28), dtype=np.uint8)
+    labels = np.concatenate(labels) if labels else np.empty(0, dtype=np.int8)
+    write_idx(images_path, images)
+    write_idx(labels_path, labels.astype(np.uint8))
+    return len(labels)
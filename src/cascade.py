@@ -0,0 +1,448 @@
+"""Каскад моделей с ранним выходом по уверенности
+
+Первая ступень - крошечная модель NumPy (логистическая регрессия на
+изображении, уменьшенном усреднением до 14x14 или 7x7). Если ее
+уверенность и отрыв лучшей цифры от второй не ниже порогов ступени,
+ответ принимается; неоднозначные изображения уходят на следующую
+ступень и в конце - на полную модель.
+
+Ступени хранятся в директории модели в формате NumpyDenseModel (.npz);
+размер входа ступени задает коэффициент уменьшения. Усреднение линейно,
+поэтому при загрузке оно сворачивается в веса первого слоя: ступень
+выполняется одним умножением на матрицу 784 x 10 без уменьшения
+изображения во время распознавания.
+
+Запуск:
+    python -m src.cli cascade-train --images train-images.gz --labels train-labels.gz
+    python -m src.cli cascade-evaluate --images t10k-images.gz --labels t10k-labels.gz
+"""
+
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from src.idx_io import iter_idx
+from src.numpy_backend import NumpyDenseModel
+
+logger = logging.getLogger(__name__)
+
+# Имя файла первой ступени внутри директории модели
+STAGE_FILE_NAME = "cascade_stage.npz"
+
+
+def downsample(images, factor):
+    """
+    Уменьшение изображений усреднением блоков factor x factor
+    
+    Args:
+        images: numpy array формы (N, H, W) или (N, H, W, 1)
+        factor: коэффициент уменьшения (делитель H и W)
+    
+    Returns:
+        numpy array float32 формы (N, H / factor, W / factor, 1)
+    """
+    images = np.asarray(images, dtype=np.float32)
+    n, height, width = images.shape[:3]
+    if factor == 1:
+        return images.reshape(n, height, width, 1)
+    blocks = images.reshape(n, height // factor, factor, width // factor, factor)
+    return blocks.mean(axis=(2, 4))[..., np.newaxis]
+
+
+def expand_input(model, image_size):
+    """
+    Перенос уменьшения усреднением в веса первого слоя
+    
+    Args:
+        model: NumpyDenseModel на уменьшенном входе (h, w, 1)
+        image_size: сторона исходного изображения
+    
+    Returns:
+        NumpyDenseModel на входе (image_size, image_size, 1)
+    """
+    height, width = model.input_shape[:2]
+    factor = image_size // height
+    if factor == 1:
+        return model
+    if height * factor != image_size or width * factor != image_size:
+        raise ValueError(f"Вход ступени {model.input_shape} не делит изображение {image_size}")
+    
+    kernel = model.kernels[0].reshape(height, width, -1)
+    kernel = np.repeat(np.repeat(kernel, factor, axis=0), factor, axis=1) / (factor * factor)
+    expanded = NumpyDenseModel(
+        [kernel.reshape(image_size * image_size, -1)] + model.kernels[1:], model.biases,
+        model.activations, (image_size, image_size, 1)
+    )
+    expanded.variant = model.variant
+    return expanded
+
+
+class CascadeStage:
+    """Ступень каскада: быстрая модель и пороги раннего выхода"""
+    
+    __slots__ = ("model", "name", "threshold", "margin")
+    
+    def __init__(self, model, threshold=0.95, margin=0.0, name=None, image_size=28):
+        """
+        Инициализация ступени
+        
+        Args:
+            model: NumpyDenseModel с выходным softmax (вход может быть уменьшенным)
+            threshold: минимальная вероятность лучшей цифры
+            margin: минимальный отрыв лучшей цифры от второй
+            name: имя ступени в статистике
+            image_size: сторона изображения, подаваемого в каскад
+        """
+        self.name = name or f"{model.input_shape[0]}x{model.input_shape[1]}"
+        self.model = expand_input(model, image_size)
+        self.threshold = threshold
+        self.margin = margin
+    
+    @classmethod
+    def load(cls, path, threshold=0.95, margin=0.0):
+        """Загрузка ступени из файла .npz"""
+        name = os.path.splitext(os.path.basename(path))[0]
+        return cls(NumpyDenseModel.load_npz(path), threshold, margin, name)
+    
+    def __call__(self, images):
+        """
+        Вероятности ступени для батча
+        
+        Args:
+            images: numpy array формы (N, 28, 28, 1)
+        
+        Returns:
+            numpy array вероятностей формы (N, 10)
+        """
+        return self.model(images)
+    
+    def accepts(self, probabilities):
+        """
+        Маска уверенных ответов
+        
+        Args:
+            probabilities: numpy array формы (N, 10)
+        
+        Returns:
+            numpy array bool формы (N,)
+        """
+        top2 = np.partition(probabilities, -2, axis=1)[:, -2:]
+        return (top2[:, 1] >= self.threshold) & (top2[:, 1] - top2[:, 0] >= self.margin)
+
+
+class Cascade:
+    """
+    Последовательный прогон ступеней со статистикой раннего выхода
+    
+    Счетчики потокобезопасны: каскад вызывается из рабочих потоков
+    распознавания и очереди микробатчинга.
+    """
+    
+    def __init__(self, stages):
+        """
+        Инициализация каскада
+        
+        Args:
+            stages: список CascadeStage в порядке прогона
+        """
+        self.stages = list(stages)
+        self._lock = threading.Lock()
+        self.reset_stats()
+    
+    def reset_stats(self):
+        """Сброс статистики"""
+        with self._lock:
+            self.requests = 0
+            self.handled = [0] * (len(self.stages) + 1)
+            self.seconds = [0.0] * (len(self.stages) + 1)
+    
+    def run(self, images, full_model):
+        """
+        Вероятности для батча с ранним выходом
+        
+        Args:
+            images: numpy array формы (N, 28, 28, 1)
+            full_model: функция полной модели, images -> (N, 10)
+        
+        Returns:
+            numpy array вероятностей формы (N, 10)
+        """
+        result = np.empty((len(images), 10), dtype=np.float32)
+        remaining = np.arange(len(images))
+        handled = [0] * (len(self.stages) + 1)
+        seconds = [0.0] * (len(self.stages) + 1)
+        
+        for i, stage in enumerate(self.stages):
+            start = time.perf_counter()
+            probabilities = stage(images[remaining])
+            accepted = stage.accepts(probabilities)
+            result[remaining[accepted]] = probabilities[accepted]
+            seconds[i] = time.perf_counter() - start
+            handled[i] = int(accepted.sum())
+            remaining = remaining[~accepted]
+            if len(remaining) == 0:
+                break
+        
+        if len(remaining):
+            start = time.perf_counter()
+            result[remaining] = full_model(images[remaining])
+            seconds[-1] = time.perf_counter() - start
+            handled[-1] = len(remaining)
+        
+        with self._lock:
+            self.requests += len(images)
+            for i in range(len(handled)):
+                self.handled[i] += handled[i]
+                self.seconds[i] += seconds[i]
+        return result
+    
+    def stats(self):
+        """
+        Доли запросов, обработанных ступенями
+        
+        Returns:
+            словарь: requests и stages - список {name, handled, fraction,
+            time_ms} по ступеням, последняя - полная модель
+        """
+        with self._lock:
+            requests = self.requests
+            handled = list(self.handled)
+            seconds = list(self.seconds)
+        
+        names = [stage.name for stage in self.stages] + ["full"]
+        return {
+            "requests": requests,
+            "stages": [
+                {
+                    "name": name,
+                    "handled": count,
+                    "fraction": count / requests if requests else 0.0,
+                    "time_ms": total * 1000.0,
+                }
+                for name, count, total in zip(names, handled, seconds)
+            ],
+        }
+
+
+def load_cascade(model_path, stages):
+    """
+    Каскад по настройкам ступеней
+    
+    Args:
+        model_path: директория модели (пути ступеней относительно нее)
+        stages: последовательность (файл, порог уверенности, порог отрыва)
+    
+    Returns:
+        Cascade
+    """
+    return Cascade([
+        CascadeStage.load(os.path.join(model_path, file_name), threshold, margin)
+        for file_name, threshold, margin in stages
+    ])
+
+
+def _load_features(images_path, factor, batch_size=1024):
+    """Уменьшенные изображения набора IDX"""
+    features = [downsample(images.astype(np.float32) / 255.0, factor)
+                for images in iter_idx(images_path, batch_size)]
+    if not features:
+        raise ValueError(f"Файл {images_path} не содержит изображений")
+    return np.concatenate(features)
+
+
+def train_stage(features, targets, epochs=20, batch_size=128, learning_rate=0.5,
+                l2=1e-4, seed=0):
+    """
+    Обучение логистической регрессии первой ступени
+    
+    Args:
+        features: numpy array формы (N, h, w, 1) - уменьшенные изображения
+        targets: метки формы (N,) или вероятности полной модели формы (N, 10)
+            для обучения по ее ответам (дистилляция)
+        epochs: количество эпох
+        batch_size: размер мини-батча
+        learning_rate: шаг градиентного спуска
+        l2: коэффициент L2-регуляризации весов
+        seed: зерно перемешивания
+    
+    Returns:
+        NumpyDenseModel с одним слоем softmax
+    """
+    inputs = features.reshape(len(features), -1)
+    if targets.ndim == 1:
+        targets = np.eye(10, dtype=np.float32)[targets]
+    targets = targets.astype(np.float32)
+    
+    rng = np.random.default_rng(seed)
+    model = NumpyDenseModel([np.zeros((inputs.shape[1], 10), dtype=np.float32)],
+                            [np.zeros(10, dtype=np.float32)], ["softmax"], features.shape[1:])
+    kernel, bias = model.kernels[0], model.biases[0]
+    
+    for epoch in range(epochs):
+        # Шаг уменьшается к концу обучения
+        step = learning_rate / (1.0 + epoch)
+        order = rng.permutation(len(inputs))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            x = inputs[batch]
+            gradient = model(x) - targets[batch]
+            kernel -= step * (x.T @ gradient / len(batch) + l2 * kernel)
+            bias -= step * gradient.mean(axis=0)
+    return model
+
+
+def train_first_stage(images_path, labels_path=None, model_path=None, factor=2, distill=False,
+                      output=None, **train_options):
+    """
+    Обучение и сохранение первой ступени на наборе IDX
+    
+    Args:
+        images_path: файл IDX с изображениями
+        labels_path: файл IDX с метками (не нужен при distill)
+        model_path: директория полной модели (для distill и по умолчанию для output)
+        factor: коэффициент уменьшения изображения (2 - 14x14, 4 - 7x7)
+        distill: обучать по ответам полной модели вместо меток
+        output: путь файла ступени, по умолчанию model_path/STAGE_FILE_NAME
+        **train_options: параметры train_stage
+    
+    Returns:
+        (путь к файлу ступени, точность на обучающем наборе)
+    """
+    from src.model_handler import ModelHandler
+    
+    if not distill and labels_path is None:
+        raise ValueError("Для обучения по меткам нужен файл IDX с метками")
+    
+    features = _load_features(images_path, factor)
+    labels = None
+    if labels_path is not None:
+        labels = np.concatenate(list(iter_idx(labels_path, 1 << 16))).astype(np.int64)
+        if len(labels) != len(features):
+            raise ValueError(f"Количество меток ({len(labels)}) не совпадает с количеством "
+                             f"изображений ({len(features)})")
+    
+    targets = labels
+    if distill:
+        handler = ModelHandler(model_path, warmup_batch_sizes=())
+        if not handler.is_loaded:
+            raise ValueError(f"Не удалось загрузить модель из {model_path}")
+        targets = np.concatenate([
+            handler.predict_batch(images.astype(np.float32)[..., np.newaxis] / 255.0)
+            for images in iter_idx(images_path, 1024)
+        ])
+        if labels is None:
+            labels = targets.argmax(axis=1)
+    
+    model = train_stage(features, targets, **train_options)
+    output = output or os.path.join(model_path, STAGE_FILE_NAME)
+    model.save_npz(output)
+    accuracy = float((model(features).argmax(axis=1) == labels).mean())
+    logger.info(f"Первая ступень сохранена в {output}: точность на обучающем наборе {accuracy:.4f}")
+    return output, accuracy
+
+
+def _median_latency(function, image, repeats):
+    """Медианное время прогона одного изображения в секундах"""
+    function(image)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(image)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def evaluate_cascade(handler, stage, images_path, labels_path, thresholds, margin=0.0,
+                     batch_size=256, latency_repeats=200):
+    """
+    Компромисс точности и задержки каскада при разных порогах
+    
+    Полная модель и ступень прогоняются по набору один раз; для каждого
+    порога по их ответам считается доля раннего выхода и точность.
+    Задержка одного изображения оценивается как время ступени плюс
+    время полной модели для доли изображений, ушедших дальше.
+    
+    Args:
+        handler: ModelHandler полной модели (без каскада)
+        stage: CascadeStage первой ступени
+        images_path, labels_path: файлы IDX с изображениями и метками
+        thresholds: проверяемые пороги уверенности
+        margin: порог отрыва лучшей цифры от второй
+        batch_size: размер батча
+        latency_repeats: количество повторов для оценки задержки
+    
+    Returns:
+        список словарей: threshold, early_exit, accuracy, accuracy_delta,
+        stage_accuracy (на принятых ступенью), latency_ms, speedup;
+        первая строка - полная модель без каскада (threshold None)
+    """
+    thresholds = list(thresholds)
+    correct_full = 0
+    counts = np.zeros((len(thresholds), 3), dtype=np.int64)  # принято, верно ступенью, верно каскадом
+    total = 0
+    
+    for images, labels in zip(iter_idx(images_path, batch_size), iter_idx(labels_path, batch_size)):
+        batch = images.astype(np.float32)[..., np.newaxis] / 255.0
+        full = handler.predict_batch(batch).argmax(axis=1) == labels
+        probabilities = stage(batch)
+        top2 = np.partition(probabilities, -2, axis=1)[:, -2:]
+        stage_correct = probabilities.argmax(axis=1) == labels
+        
+        for i, threshold in enumerate(thresholds):
+            accepted = (top2[:, 1] >= threshold) & (top2[:, 1] - top2[:, 0] >= margin)
+            counts[i, 0] += int(accepted.sum())
+            counts[i, 1] += int((accepted & stage_correct).sum())
+            counts[i, 2] += int(np.where(accepted, stage_correct, full).sum())
+        correct_full += int(full.sum())
+        total += len(labels)
+    
+    if total == 0:
+        raise ValueError(f"Файл {images_path} не содержит изображений")
+    
+    single = np.zeros((1, 28, 28, 1), dtype=np.float32)
+    full_latency = _median_latency(handler.predict_batch, single, latency_repeats)
+    stage_latency = _median_latency(stage, single, latency_repeats)
+    
+    full_accuracy = correct_full / total
+    report = [{
+        "threshold": None,
+        "early_exit": 0.0,
+        "accuracy": full_accuracy,
+        "accuracy_delta": 0.0,
+        "stage_accuracy": None,
+        "latency_ms": full_latency * 1000.0,
+        "speedup": 1.0,
+    }]
+    for threshold, (accepted, stage_correct, correct) in zip(thresholds, counts.tolist()):
+        early_exit = accepted / total
+        latency = stage_latency + (1.0 - early_exit) * full_latency
+        report.append({
+            "threshold": threshold,
+            "early_exit": early_exit,
+            "accuracy": correct / total,
+            "accuracy_delta": correct / total - full_accuracy,
+            "stage_accuracy": stage_correct / accepted if accepted else None,
+            "latency_ms": latency * 1000.0,
+            "speedup": full_latency / latency,
+        })
+    return report
+
+
+def format_report(report):
+    """Текстовая таблица результатов evaluate_cascade"""
+    lines = [
+        f"{'порог':>8s} {'ранний выход':>12s} {'точность':>9s} {'разница':>8s} "
+        f"{'точн. ступени':>13s} {'задержка, мс':>12s} {'ускорение':>9s}"
+    ]
+    for row in report:
+        threshold = "полная" if row["threshold"] is None else f"{row['threshold']:.3f}"
+        stage_accuracy = "-" if row["stage_accuracy"] is None else f"{row['stage_accuracy']:.4f}"
+        lines.append(
+            f"{threshold:>8s} {row['early_exit']:12.1%} {row['accuracy']:9.4f} "
+            f"{row['accuracy_delta']:+8.4f} {stage_accuracy:>13s} {row['latency_ms']:12.4f} "
+            f"{row['speedup']:8.2f}x"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,641 @@
+"""Пакетное распознавание цифр без GUI
+
+Изображения читаются потоком из директорий, архивов zip/tar и файлов IDX
+(формат MNIST), предобрабатываются в рабочих процессах, распознаются
+батчами и сразу записываются в CSV или JSONL. В памяти одновременно
+находится только несколько батчей, поэтому расход памяти не зависит от
+количества изображений. PyQt6 и модули GUI не импортируются.
+
+Запуск:
+    python -m src.cli recognize images/ digits.zip t10k-images-idx3-ubyte.gz -o results.csv
+    python -m src.cli quantize mnist_model
+    python -m src.cli evaluate --images t10k-images-idx3-ubyte.gz --labels t10k-labels-idx1-ubyte.gz
+    python -m src.cli cascade-train --images train-images-idx3-ubyte.gz --labels train-labels-idx1-ubyte.gz
+    python -m src.cli cascade-evaluate --images t10k-images-idx3-ubyte.gz --labels t10k-labels-idx1-ubyte.gz
+    python -m src.cli tta-evaluate --images t10k-images-idx3-ubyte.gz --labels t10k-labels-idx1-ubyte.gz
+    python -m src.cli runtime-tune --objective throughput
+    python -m src.cli capture-export captures --images user-images-idx3-ubyte --labels user-labels-idx1-ubyte
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import tarfile
+import time
+import zipfile
+from collections import deque
+from itertools import islice
+
+import numpy as np
+
+import config
+from src import capture_store, cascade, runtime_config, tta
+from src.idx_io import is_idx_file, iter_idx
+from src.instrumentation import setup_logging
+from src.model_handler import BACKENDS, ModelHandler
+from src.quantization import VARIANTS, evaluate_variants, format_report, quantize_model
+from src.utils import decode_gray, preprocess_gray_array
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+OUTPUT_FORMATS = ("csv", "jsonl")
+
+# Параметры предобработки рабочего процесса (задаются в _init_worker)
+_worker_options = {}
+
+
+def is_image_name(name):
+    """Является ли имя файла изображением поддерживаемого формата"""
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def iter_directory(path):
+    """Файлы изображений директории рекурсивно в стабильном порядке"""
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if is_image_name(name):
+                file_path = os.path.join(root, name)
+                yield file_path, "path", file_path
+
+
+def iter_zip(path):
+    """Изображения из архива zip"""
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if not info.is_dir() and is_image_name(info.filename):
+                yield f"{path}:{info.filename}", "encoded", archive.read(info)
+
+
+def iter_tar(path):
+    """Изображения из архива tar (читается потоком, без индекса в памяти)"""
+    with tarfile.open(path, mode="r|*") as archive:
+        for member in archive:
+            if member.isfile() and is_image_name(member.name):
+                yield f"{path}:{member.name}", "encoded", archive.extractfile(member).read()
+            # TarFile запоминает все прочитанные заголовки; на миллионах
+            # файлов это единственное, что росло бы вместе с архивом
+            archive.members = []
+
+
+def iter_idx_records(path):
+    """Изображения из файла IDX (светлая цифра на черном фоне)"""
+    index = 0
+    for chunk in iter_idx(path):
+        if chunk.ndim != 3:
+            raise ValueError(f"Файл IDX не содержит изображений: {path}")
+        for image in chunk:
+            yield f"{path}:{index}", "pixels", image
+            index += 1
+
+
+def iter_records(inputs):
+    """
+    Поток записей из всех входов
+    
+    Args:
+        inputs: пути к директориям, архивам, файлам IDX или изображениям
+    
+    Yields:
+        (имя, вид, данные), где вид - "path" (путь к файлу),
+        "encoded" (байты PNG/JPEG) или "pixels" (массив uint8)
+    """
+    for path in inputs:
+        lower = path.lower()
+        if os.path.isdir(path):
+            yield from iter_directory(path)
+        elif lower.endswith(".zip"):
+            yield from iter_zip(path)
+        elif lower.endswith(TAR_EXTENSIONS):
+            yield from iter_tar(path)
+        elif is_idx_file(path):
+            yield from iter_idx_records(path)
+        elif is_image_name(path):
+            yield path, "path", path
+        else:
+            raise ValueError(f"Неподдерживаемый вход: {path}")
+
+
+def _init_worker(options):
+    """Инициализация параметров предобработки в рабочем процессе"""
+    _worker_options.clear()
+    _worker_options.update(options)
+
+
+def preprocess_record(record):
+    """
+    Предобработка одной записи (выполняется в рабочем процессе)
+    
+    Args:
+        record: (имя, вид, данные) из iter_records
+    
+    Returns:
+        (имя, массив float32 (size, size) или None, текст ошибки или None)
+    """
+    name, kind, data = record
+    target_size = _worker_options.get("target_size", config.MODEL_IMAGE_SIZE)
+    center = _worker_options.get("center", False)
+    box_size = _worker_options.get("box_size", config.MNIST_BOX_SIZE)
+    
+    try:
+        if kind == "pixels":
+            if data.shape == (target_size, target_size):
+                # Изображения MNIST уже в формате модели
+                return name, data.astype(np.float32) / 255.0, None
+            return name, preprocess_gray_array(
+                data, target_size, center, box_size, white_background=False
+            ), None
+        
+        gray = decode_gray(kind, data, target_size)
+        return name, preprocess_gray_array(gray, target_size, center, box_size), None
+        
+    except Exception as e:
+        return name, None, str(e)
+
+
+def batched(iterable, size):
+    """Разбиение потока на списки длиной size"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def preprocess_batches(records, batch_size, pool=None, prefetch=2, chunksize=1):
+    """
+    Предобработка потока записей батчами
+    
+    В пуле одновременно находится не более prefetch + 1 батчей: пока
+    модель обрабатывает один батч, рабочие процессы готовят следующие,
+    а входной поток не читается дальше, чем нужно.
+    
+    Args:
+        records: поток записей из iter_records
+        batch_size: размер батча
+        pool: multiprocessing.Pool или None для обработки в текущем процессе
+        prefetch: количество батчей, готовящихся заранее
+        chunksize: количество записей в одной задаче рабочего процесса
+    
+    Yields:
+        список результатов preprocess_record в исходном порядке
+    """
+    if pool is None:
+        for batch in batched(records, batch_size):
+            yield [preprocess_record(record) for record in batch]
+        return
+    
+    # Готовые массивы пикселей (IDX) дешевле обработать на месте,
+    # чем передавать в рабочие процессы; в пул уходит только декодирование
+    pending = deque()
+    for batch in batched(records, batch_size):
+        encoded = [record for record in batch if record[1] != "pixels"]
+        pending.append((batch, pool.map_async(preprocess_record, encoded, chunksize)))
+        if len(pending) > prefetch:
+            yield _merge_results(*pending.popleft())
+    
+    while pending:
+        yield _merge_results(*pending.popleft())
+
+
+def _merge_results(batch, async_result):
+    """Сборка результатов батча в исходном порядке"""
+    decoded = iter(async_result.get())
+    return [
+        preprocess_record(record) if record[1] == "pixels" else next(decoded)
+        for record in batch
+    ]
+
+
+PROBABILITIES_FORMAT = ",".join(["%.6f"] * 10)
+
+
+class CsvResultWriter:
+    """Запись результатов в CSV: имя, цифра, уверенность, вероятности, ошибка"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self.writer = csv.writer(stream)
+        self.writer.writerow(
+            ["name", "digit", "confidence"] + [f"p{i}" for i in range(10)] + ["error"]
+        )
+    
+    @staticmethod
+    def _quote(field):
+        """Экранирование поля CSV"""
+        if any(char in field for char in ',"\r\n'):
+            return '"' + field.replace('"', '""') + '"'
+        return field
+    
+    def write_batch(self, names, rows, errors):
+        """
+        Запись батча результатов
+        
+        Строки форматируются одной строкой шаблона, а не через
+        csv.writer по полям: на миллионах строк запись иначе
+        занимает больше времени, чем инференс.
+        
+        Args:
+            names: имена изображений
+            rows: списки из 10 вероятностей или None для ошибок
+            errors: тексты ошибок или None
+        """
+        lines = []
+        for name, row, error in zip(names, rows, errors):
+            if row is None:
+                lines.append(f"{self._quote(name)},,{',' * 10},{self._quote(error or '')}\n")
+                continue
+            digit = max(range(10), key=row.__getitem__)
+            lines.append(
+                f"{self._quote(name)},{digit},{row[digit]:.6f},"
+                f"{PROBABILITIES_FORMAT % tuple(row)},\n"
+            )
+        self.stream.write("".join(lines))
+
+
+class JsonlResultWriter:
+    """Запись результатов в JSON Lines, по одному объекту на строку"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+    
+    def write_batch(self, names, rows, errors):
+        """Запись батча результатов (аргументы как у CsvResultWriter.write_batch)"""
+        lines = []
+        for name, row, error in zip(names, rows, errors):
+            name_json = json.dumps(name, ensure_ascii=False)
+            if row is None:
+                lines.append(f'{{"name": {name_json}, "error": {json.dumps(error, ensure_ascii=False)}}}\n')
+                continue
+            digit = max(range(10), key=row.__getitem__)
+            lines.append(
+                f'{{"name": {name_json}, "digit": {digit}, "confidence": {row[digit]:.6f}, '
+                f'"probabilities": [{PROBABILITIES_FORMAT % tuple(row)}]}}\n'
+            )
+        self.stream.write("".join(lines))
+
+
+WRITERS = {"csv": CsvResultWriter, "jsonl": JsonlResultWriter}
+
+
+def output_format(path, requested=None):
+    """Формат вывода: явно заданный или по расширению файла (по умолчанию CSV)"""
+    if requested:
+        return requested
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "csv"
+
+
+def recognize(args):
+    """
+    Команда recognize: распознавание всех изображений входов
+    
+    Returns:
+        код завершения процесса
+    """
+    fmt = output_format(args.output, args.format)
+    to_stdout = args.output == "-"
+    options = {
+        "target_size": config.MODEL_IMAGE_SIZE,
+        "center": args.center,
+        "box_size": config.MNIST_BOX_SIZE,
+    }
+    
+    # Пул создается до загрузки модели, чтобы рабочие процессы не
+    # наследовали TensorFlow и веса модели
+    pool = None
+    chunksize = max(1, args.batch_size // (4 * max(args.workers, 1)))
+    if args.workers > 0:
+        pool = multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(options,))
+    else:
+        _init_worker(options)
+    
+    # Сообщения о загрузке модели идут в журнал (stderr) и не смешиваются с результатами
+    handler = ModelHandler(args.model, backend=args.backend, variant=args.variant,
+                           warmup_batch_sizes=())
+    
+    if not handler.is_loaded:
+        print(f"Не удалось загрузить модель из {args.model}", file=sys.stderr)
+        if pool is not None:
+            pool.terminate()
+        return 1
+    if args.cache_size > 0:
+        # Повторяющиеся изображения (дубликаты в наборах данных) не прогоняются через модель
+        handler.enable_prediction_cache(args.cache_size)
+    if args.cascade:
+        try:
+            handler.enable_cascade(cascade.load_cascade(args.model, config.CASCADE_STAGES))
+        except (OSError, ValueError) as e:
+            print(f"Не удалось загрузить ступени каскада: {e}", file=sys.stderr)
+            if pool is not None:
+                pool.terminate()
+            return 1
+    
+    stream = sys.stdout if to_stdout else open(args.output, "w", newline="", encoding="utf-8")
+    writer = WRITERS[fmt](stream)
+    batch_input = np.empty((args.batch_size, config.MODEL_IMAGE_SIZE, config.MODEL_IMAGE_SIZE, 1),
+                           dtype=np.float32)
+    processed = failed = 0
+    started = time.perf_counter()
+    
+    try:
+        records = iter_records(args.inputs)
+        for results in preprocess_batches(records, args.batch_size, pool, chunksize=chunksize):
+            valid = [i for i, (_, image, _) in enumerate(results) if image is not None]
+            for slot, i in enumerate(valid):
+                batch_input[slot, :, :, 0] = results[i][1]
+            probabilities = handler.predict_batch(batch_input[:len(valid)]).tolist()
+            
+            rows = [None] * len(results)
+            for i, row in zip(valid, probabilities):
+                rows[i] = row
+            writer.write_batch([name for name, _, _ in results], rows,
+                               [error for _, _, error in results])
+            
+            processed += len(results)
+            failed += len(results) - len(valid)
+            stream.flush()
+            
+            if args.progress and processed % (args.batch_size * 20) < args.batch_size:
+                elapsed = time.perf_counter() - started
+                print(f"Обработано {processed} изображений, {processed / elapsed:.0f} изобр./с",
+                      file=sys.stderr)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        if not to_stdout:
+            stream.close()
+    
+    elapsed = time.perf_counter() - started
+    print(
+        f"Готово: {processed} изображений ({failed} с ошибками) за {elapsed:.1f} с, "
+        f"{processed / max(elapsed, 1e-9):.0f} изобр./с",
+        file=sys.stderr
+    )
+    if handler.cache is not None:
+        print(f"Кэш результатов: {handler.cache.stats()}", file=sys.stderr)
+    if handler.cascade is not None:
+        for stage in handler.cascade.stats()["stages"]:
+            print(f"Каскад, ступень {stage['name']}: {stage['handled']} изображений "
+                  f"({stage['fraction']:.1%}), {stage['time_ms']:.1f} мс", file=sys.stderr)
+    return 0
+
+
+def quantize(args):
+    """Команда quantize: создание квантованных вариантов весов"""
+    try:
+        sizes = quantize_model(args.model, args.variants)
+    except (ValueError, OSError) as e:
+        print(f"Ошибка при квантовании модели: {e}", file=sys.stderr)
+        return 1
+    
+    for variant, size in sizes.items():
+        print(f"{variant}: {size / 1024:.1f} КБ ({size / sizes['float32']:.0%} от float32)")
+    return 0
+
+
+def evaluate(args):
+    """Команда evaluate: сравнение точности и скорости вариантов модели"""
+    try:
+        report = evaluate_variants(args.model, args.images, args.labels, args.variants,
+                                   batch_size=args.batch_size)
+    except (ValueError, OSError) as e:
+        print(f"Ошибка при оценке модели: {e}", file=sys.stderr)
+        return 1
+    
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
+    return 0
+
+
+def cascade_train(args):
+    """Команда cascade-train: обучение первой ступени каскада"""
+    try:
+        path, accuracy = cascade.train_first_stage(
+            args.images, args.labels, args.model, factor=args.factor, distill=args.distill,
+            output=args.output, epochs=args.epochs
+        )
+    except (ValueError, OSError) as e:
+        print(f"Ошибка при обучении ступени каскада: {e}", file=sys.stderr)
+        return 1
+    
+    print(f"Ступень сохранена в {path}, точность на обучающем наборе {accuracy:.4f}")
+    return 0
+
+
+def cascade_evaluate(args):
+    """Команда cascade-evaluate: точность и задержка каскада при разных порогах"""
+    try:
+        stage_path = args.stage or os.path.join(args.model, cascade.STAGE_FILE_NAME)
+        stage = cascade.CascadeStage.load(stage_path)
+        handler = ModelHandler(args.model, backend=args.backend, warmup_batch_sizes=())
+        if not handler.is_loaded:
+            raise ValueError(f"Не удалось загрузить модель из {args.model}")
+        report = cascade.evaluate_cascade(handler, stage, args.images, args.labels, args.thresholds,
+                                          margin=args.margin, batch_size=args.batch_size)
+    except (ValueError, OSError) as e:
+        print(f"Ошибка при оценке каскада: {e}", file=sys.stderr)
+        return 1
+    
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json
+          else cascade.format_report(report))
+    return 0
+
+
+def tta_evaluate(args):
+    """Команда tta-evaluate: точность и добавленная задержка аугментации при разных порогах"""
+    try:
+        handler = ModelHandler(args.model, backend=args.backend, warmup_batch_sizes=())
+        if not handler.is_loaded:
+            raise ValueError(f"Не удалось загрузить модель из {args.model}")
+        augmentation = tta.AdaptiveTTA(shift=args.shift, angles=args.angles,
+                                       thickening=args.thickening)
+        report = tta.evaluate_tta(handler, augmentation, args.images, args.labels,
+                                  args.thresholds, batch_size=args.batch_size)
+    except (ValueError, OSError) as e:
+        print(f"Ошибка при оценке аугментации: {e}", file=sys.stderr)
+        return 1
+    
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json
+          else tta.format_report(report))
+    return 0
+
+
+def runtime_tune(args):
+    """Команда runtime-tune: подбор числа потоков и запись лучшего варианта"""
+    try:
+        report = runtime_config.autotune(
+            args.model, args.backend, args.intra, args.inter,
+            batch_size=args.batch_size, repeats=args.repeats
+        )
+        runtime_config.save_tuned_settings(report, args.output, args.objective)
+    except (RuntimeError, OSError) as e:
+        print(f"Ошибка при подборе настроек: {e}", file=sys.stderr)
+        return 1
+    
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json
+          else runtime_config.format_report(report))
+    return 0
+
+
+def capture_export(args):
+    """Команда capture-export: образцы с подтвержденными метками в пару файлов IDX"""
+    try:
+        count = capture_store.export_labeled(args.store, args.images, args.labels)
+    except (ValueError, OSError) as e:
+        print(f"Ошибка при экспорте образцов: {e}", file=sys.stderr)
+        return 1
+    
+    print(f"Экспортировано образцов с метками: {count}")
+    return 0
+
+
+def build_parser():
+    """Парсер аргументов командной строки"""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli",
+        description="Пакетное распознавание рукописных цифр без GUI"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    recognize_parser = commands.add_parser("recognize", help="распознать изображения")
+    recognize_parser.add_argument(
+        "inputs", nargs="+",
+        help="директории, архивы zip/tar, файлы IDX или отдельные изображения"
+    )
+    recognize_parser.add_argument("-o", "--output", default="-",
+                                  help="файл результатов (по умолчанию stdout)")
+    recognize_parser.add_argument("--format", choices=OUTPUT_FORMATS,
+                                  help="формат вывода (по умолчанию по расширению, иначе csv)")
+    recognize_parser.add_argument("--batch-size", type=int, default=256)
+    recognize_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                                  help="количество процессов предобработки (0 - в текущем)")
+    recognize_parser.add_argument("--model", default=config.MODEL_PATH)
+    recognize_parser.add_argument("--backend", default=config.MODEL_BACKEND,
+                                  choices=BACKENDS)
+    recognize_parser.add_argument("--variant", default=config.MODEL_VARIANT, choices=VARIANTS,
+                                  help="формат весов NumPy-бэкенда")
+    recognize_parser.add_argument("--center", action=argparse.BooleanOptionalAction,
+                                  default=config.PREPROCESS_CENTERING,
+                                  help="нормализация цифры в стиле MNIST")
+    recognize_parser.add_argument("--cache-size", type=int, default=config.PREDICTION_CACHE_SIZE,
+                                  help="размер кэша результатов для дубликатов (0 - без кэша)")
+    recognize_parser.add_argument("--cascade", action=argparse.BooleanOptionalAction,
+                                  default=config.CASCADE_ENABLED,
+                                  help="ранний выход через ступени config.CASCADE_STAGES")
+    recognize_parser.add_argument("--progress", action="store_true",
+                                  help="выводить ход обработки в stderr")
+    recognize_parser.set_defaults(handler=recognize)
+    
+    quantize_parser = commands.add_parser("quantize", help="создать квантованные варианты весов")
+    quantize_parser.add_argument("model", nargs="?", default=config.MODEL_PATH)
+    quantize_parser.add_argument("--variants", nargs="+", choices=VARIANTS,
+                                 default=["float16", "int8"])
+    quantize_parser.set_defaults(handler=quantize)
+    
+    evaluate_parser = commands.add_parser(
+        "evaluate", help="сравнить точность и скорость вариантов модели на наборе IDX"
+    )
+    evaluate_parser.add_argument("--images", required=True, help="файл IDX с изображениями")
+    evaluate_parser.add_argument("--labels", required=True, help="файл IDX с метками")
+    evaluate_parser.add_argument("--model", default=config.MODEL_PATH)
+    evaluate_parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS))
+    evaluate_parser.add_argument("--batch-size", type=int, default=256)
+    evaluate_parser.add_argument("--json", action="store_true", help="вывести отчет в JSON")
+    evaluate_parser.set_defaults(handler=evaluate)
+    
+    train_parser = commands.add_parser(
+        "cascade-train", help="обучить первую ступень каскада на наборе IDX"
+    )
+    train_parser.add_argument("--images", required=True, help="файл IDX с изображениями")
+    train_parser.add_argument("--labels", help="файл IDX с метками (необязателен с --distill)")
+    train_parser.add_argument("--model", default=config.MODEL_PATH)
+    train_parser.add_argument("--factor", type=int, default=2, choices=(1, 2, 4),
+                              help="уменьшение изображения: 2 - 14x14, 4 - 7x7")
+    train_parser.add_argument("--distill", action="store_true",
+                              help="обучать по ответам полной модели")
+    train_parser.add_argument("--epochs", type=int, default=20)
+    train_parser.add_argument("-o", "--output",
+                              help="файл ступени (по умолчанию в директории модели)")
+    train_parser.set_defaults(handler=cascade_train)
+    
+    cascade_parser = commands.add_parser(
+        "cascade-evaluate", help="сравнить точность и задержку каскада при разных порогах"
+    )
+    cascade_parser.add_argument("--images", required=True, help="файл IDX с изображениями")
+    cascade_parser.add_argument("--labels", required=True, help="файл IDX с метками")
+    cascade_parser.add_argument("--model", default=config.MODEL_PATH)
+    cascade_parser.add_argument("--backend", default=config.MODEL_BACKEND, choices=BACKENDS)
+    cascade_parser.add_argument("--stage", help="файл ступени (по умолчанию в директории модели)")
+    cascade_parser.add_argument("--thresholds", nargs="+", type=float,
+                                default=[0.8, 0.9, 0.95, 0.98, 0.99])
+    cascade_parser.add_argument("--margin", type=float, default=0.0,
+                                help="порог отрыва лучшей цифры от второй")
+    cascade_parser.add_argument("--batch-size", type=int, default=256)
+    cascade_parser.add_argument("--json", action="store_true", help="вывести отчет в JSON")
+    cascade_parser.set_defaults(handler=cascade_evaluate)
+    
+    tta_parser = commands.add_parser(
+        "tta-evaluate", help="сравнить точность и задержку аугментации при разных порогах"
+    )
+    tta_parser.add_argument("--images", required=True, help="файл IDX с изображениями")
+    tta_parser.add_argument("--labels", required=True, help="файл IDX с метками")
+    tta_parser.add_argument("--model", default=config.MODEL_PATH)
+    tta_parser.add_argument("--backend", default=config.MODEL_BACKEND, choices=BACKENDS)
+    tta_parser.add_argument("--thresholds", nargs="+", type=float,
+                            default=[0.5, 0.7, 0.8, 0.9, 1.01])
+    tta_parser.add_argument("--shift", type=int, default=config.TTA_SHIFT_PX,
+                            help="сдвиг в пикселях (0 - без сдвигов)")
+    tta_parser.add_argument("--angles", nargs="*", type=float, default=list(config.TTA_ANGLES),
+                            help="углы поворота в градусах")
+    tta_parser.add_argument("--thickening", action=argparse.BooleanOptionalAction,
+                            default=config.TTA_THICKENING, help="вариант с утолщенными штрихами")
+    tta_parser.add_argument("--batch-size", type=int, default=256)
+    tta_parser.add_argument("--json", action="store_true", help="вывести отчет в JSON")
+    tta_parser.set_defaults(handler=tta_evaluate)
+    
+    tune_parser = commands.add_parser(
+        "runtime-tune", help="подобрать число потоков инференса на этой машине"
+    )
+    tune_parser.add_argument("--model", default=config.MODEL_PATH)
+    tune_parser.add_argument("--backend", default=config.MODEL_BACKEND, choices=BACKENDS)
+    tune_parser.add_argument("--intra", nargs="+", type=int,
+                             help="числа потоков операций (по умолчанию степени двойки до числа ядер)")
+    tune_parser.add_argument("--inter", nargs="+", type=int, default=[1, 2],
+                             help="числа потоков графа TensorFlow")
+    tune_parser.add_argument("--objective", choices=("latency", "throughput"), default="latency",
+                             help="какой вариант применять при запуске")
+    tune_parser.add_argument("-o", "--output", default=config.RUNTIME_SETTINGS_FILE,
+                             help="файл результатов, читаемый при запуске")
+    tune_parser.add_argument("--batch-size", type=int, default=64)
+    tune_parser.add_argument("--repeats", type=int, default=200)
+    tune_parser.add_argument("--json", action="store_true", help="вывести отчет в JSON")
+    tune_parser.set_defaults(handler=runtime_tune)
+    
+    export_parser = commands.add_parser(
+        "capture-export", help="выгрузить записанные образцы с метками в файлы IDX"
+    )
+    export_parser.add_argument("store", nargs="?", default=config.CAPTURE_DIR,
+                               help="директория хранилища образцов")
+    export_parser.add_argument("--images", required=True, help="файл IDX для изображений")
+    export_parser.add_argument("--labels", required=True, help="файл IDX для меток")
+    export_parser.set_defaults(handler=capture_export)
+    return parser
+
+
+def main(argv=None):
+    """Точка входа командной строки"""
+    args = build_parser().parse_args(argv)
+    setup_logging()
+    # NumPy уже импортирован: действуют привязка к ядрам и потоки TensorFlow
+    runtime_config.apply_runtime_settings()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
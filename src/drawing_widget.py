@@ -1,13 +1,30 @@
 """Виджет для рисования цифр"""
 
+import logging
+import time
+
 from PyQt6.QtWidgets import QWidget
-from PyQt6.QtGui import QPainter, QPen, QImage, QPixmap, QColor
-from PyQt6.QtCore import Qt, QPoint
+from PyQt6.QtGui import (
+    QPainter, QPen, QImage, QPolygon, QPolygonF, QKeySequence, QShortcut
+)
+from PyQt6.QtCore import Qt, QPoint, QPointF, QTimer, pyqtSignal
+
+from src.frame_stats import FrameStats
+from src.instrumentation import metrics
+from src.strokes import StrokeStore
+
+logger = logging.getLogger(__name__)
 
 
 class DrawingWidget(QWidget):
     """Виджет для рисования рукописных цифр"""
     
+    # Сигнал об изменении штриха на холсте
+    stroke_updated = pyqtSignal()
+    
+    # Интервал объединения событий мыши в один кадр (~60 fps)
+    FRAME_INTERVAL_MS = 16
+    
     def __init__(self):
         """Инициализация виджета рисования"""
         super().__init__()
@@ -16,6 +33,13 @@ class DrawingWidget(QWidget):
         self.drawing = False
         self.brush_size = 20
         self.brush_color = Qt.GlobalColor.black
+        self.pen = QPen(
+            self.brush_color,
+            self.brush_size,
+            Qt.PenStyle.SolidLine,
+            Qt.PenCapStyle.RoundCap,
+            Qt.PenJoinStyle.RoundJoin
+        )
         
         # Создаем изображение для рисования
         self.image = QImage(
@@ -28,6 +52,28 @@ class DrawingWidget(QWidget):
         # Последняя точка для рисования
         self.last_point = QPoint()
         
+        # Векторная модель штрихов - основной источник данных холста,
+        # растровое изображение служит только для отображения
+        self.strokes = StrokeStore()
+        
+        # Номер версии содержимого холста: увеличивается при каждом изменении,
+        # по нему повторное распознавание неизменного холста пропускается
+        self.generation = 0
+        
+        # Точки штриха, накопленные до следующего кадра
+        self.pending_points = []
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setInterval(self.FRAME_INTERVAL_MS)
+        self.frame_timer.timeout.connect(self.flush_pending_points)
+        
+        # Статистика времени кадров
+        self.frame_stats = FrameStats()
+        
+        # Отмена и повтор штрихов
+        QShortcut(QKeySequence.StandardKey.Undo, self, self.undo)
+        QShortcut(QKeySequence.StandardKey.Redo, self, self.redo)
+        
         # Настройки виджета
         self.setMinimumSize(280, 280)
         self.resize(280, 280)
@@ -35,34 +81,75 @@ class DrawingWidget(QWidget):
     def resizeEvent(self, event):
         """Обработка изменения размера виджета"""
         try:
-            # Создаем новое изображение с новыми размерами
-            new_image = QImage(
+            # Создаем новое изображение с новыми размерами и восстанавливаем
+            # его из векторных штрихов вместо копирования старого растра
+            self.image = QImage(
                 self.width(),
                 self.height(),
                 QImage.Format.Format_RGB32
             )
-            new_image.fill(Qt.GlobalColor.white)
-            
-            # Копируем старое изображение на новое
-            painter = QPainter(new_image)
-            painter.drawImage(QPoint(0, 0), self.image)
-            painter.end()
-            
-            self.image = new_image
+            self.strokes.canvas_size = (self.width(), self.height())
+            self.generation += 1
+            self.render_strokes()
             
         except Exception as e:
-            print(f"Ошибка при изменении размера: {e}")
+            logger.error(f"Ошибка при изменении размера: {e}")
         
         super().resizeEvent(event)
     
+    def render_strokes(self):
+        """Перерисовка растрового изображения из векторных штрихов"""
+        self.image.fill(Qt.GlobalColor.white)
+        
+        if not self.strokes.is_empty():
+            painter = QPainter(self.image)
+            painter.setPen(self.pen)
+            for stroke in self.strokes.strokes():
+                painter.drawPolyline(QPolygonF([QPointF(x, y) for x, y in stroke[:, :2].tolist()]))
+            painter.end()
+        
+        self.update()
+    
+    def undo(self):
+        """Отмена последнего штриха"""
+        try:
+            if self.drawing:
+                return
+            if self.strokes.undo():
+                self.generation += 1
+                self.render_strokes()
+                self.stroke_updated.emit()
+        except Exception as e:
+            logger.error(f"Ошибка при отмене штриха: {e}")
+    
+    def redo(self):
+        """Повтор отмененного штриха"""
+        try:
+            if self.drawing:
+                return
+            if self.strokes.redo():
+                self.generation += 1
+                self.render_strokes()
+                self.stroke_updated.emit()
+        except Exception as e:
+            logger.error(f"Ошибка при повторе штриха: {e}")
+    
     def paintEvent(self, event):
-        """Отрисовка содержимого виджета"""
+        """Отрисовка только измененной области виджета"""
         try:
+            start = time.perf_counter()
+            
+            # Изображение совпадает по размеру с виджетом, масштабирование не нужно
+            dirty_rect = event.rect()
             canvas_painter = QPainter(self)
-            canvas_painter.drawImage(self.rect(), self.image, self.image.rect())
+            canvas_painter.drawImage(dirty_rect, self.image, dirty_rect)
             canvas_painter.end()
+            
+            paint_time = time.perf_counter() - start
+            self.frame_stats.record(paint_time, dirty_rect.width() * dirty_rect.height())
+            metrics.record("paint", paint_time)
         except Exception as e:
-            print(f"Ошибка при отрисовке: {e}")
+            logger.error(f"Ошибка при отрисовке: {e}")
     
     def mousePressEvent(self, event):
         """Обработка нажатия кнопки мыши"""
@@ -70,46 +157,85 @@ class DrawingWidget(QWidget):
             if event.button() == Qt.MouseButton.LeftButton:
                 self.drawing = True
                 self.last_point = event.position().toPoint()
+                self.pending_points = [self.last_point]
+                
+                position = event.position()
+                self.generation += 1
+                self.strokes.begin_stroke(
+                    position.x(), position.y(),
+                    event.timestamp() / 1000.0, event.point(0).pressure()
+                )
         except Exception as e:
-            print(f"Ошибка при обработке нажатия мыши: {e}")
+            logger.error(f"Ошибка при обработке нажатия мыши: {e}")
     
     def mouseMoveEvent(self, event):
         """Обработка движения мыши"""
         try:
             if (event.buttons() & Qt.MouseButton.LeftButton) and self.drawing:
-                painter = QPainter(self.image)
-                painter.setPen(QPen(
-                    self.brush_color,
-                    self.brush_size,
-                    Qt.PenStyle.SolidLine,
-                    Qt.PenCapStyle.RoundCap,
-                    Qt.PenJoinStyle.RoundJoin
-                ))
+                # Точки копятся до следующего кадра, рисование - в flush_pending_points
+                self.last_point = event.position().toPoint()
+                self.pending_points.append(self.last_point)
                 
-                # Рисуем линию от последней точки до текущей
-                painter.drawLine(self.last_point, event.position().toPoint())
-                painter.end()
+                position = event.position()
+                self.generation += 1
+                self.strokes.add_point(
+                    position.x(), position.y(),
+                    event.timestamp() / 1000.0, event.point(0).pressure()
+                )
                 
-                self.last_point = event.position().toPoint()
-                self.update()
+                if not self.frame_timer.isActive():
+                    self.frame_timer.start()
+        except Exception as e:
+            logger.error(f"Ошибка при рисовании: {e}")
+    
+    def flush_pending_points(self):
+        """Отрисовка накопленных точек штриха одним проходом и перерисовка их области"""
+        try:
+            self.frame_timer.stop()
+            
+            if len(self.pending_points) < 2:
+                return
+            
+            polyline = QPolygon(self.pending_points)
+            
+            painter = QPainter(self.image)
+            painter.setPen(self.pen)
+            painter.drawPolyline(polyline)
+            painter.end()
+            
+            # Перерисовываем только рамку новых сегментов с запасом на толщину кисти
+            margin = self.brush_size // 2 + 2
+            self.update(polyline.boundingRect().adjusted(-margin, -margin, margin, margin))
+            
+            # Следующий кадр продолжает штрих с последней точки
+            self.pending_points = [self.pending_points[-1]]
+            self.stroke_updated.emit()
         except Exception as e:
-            print(f"Ошибка при рисовании: {e}")
+            logger.error(f"Ошибка при рисовании: {e}")
     
     def mouseReleaseEvent(self, event):
         """Обработка отпускания кнопки мыши"""
         try:
             if event.button() == Qt.MouseButton.LeftButton:
+                self.flush_pending_points()
+                self.strokes.end_stroke()
+                self.generation += 1
                 self.drawing = False
+                self.pending_points = []
         except Exception as e:
-            print(f"Ошибка при отпускании мыши: {e}")
+            logger.error(f"Ошибка при отпускании мыши: {e}")
     
     def clear_canvas(self):
         """Очистка холста"""
         try:
+            self.frame_timer.stop()
+            self.pending_points = []
+            self.strokes.clear()
+            self.generation += 1
             self.image.fill(Qt.GlobalColor.white)
             self.update()
         except Exception as e:
-            print(f"Ошибка при очистке холста: {e}")
+            logger.error(f"Ошибка при очистке холста: {e}")
     
     def get_image(self):
         """
@@ -121,7 +247,7 @@ class DrawingWidget(QWidget):
         try:
             return self.image
         except Exception as e:
-            print(f"Ошибка при получении изображения: {e}")
+            logger.error(f"Ошибка при получении изображения: {e}")
             # Возвращаем пустое изображение в случае ошибки
             empty_image = QImage(
                 self.width(),
@@ -130,3 +256,12 @@ class DrawingWidget(QWidget):
             )
             empty_image.fill(Qt.GlobalColor.white)
             return empty_image
+    
+    def get_strokes(self):
+        """
+        Получение снимка векторных штрихов
+        
+        Returns:
+            StrokeStore - независимая копия, безопасная для других потоков
+        """
+        return self.strokes.snapshot()
@@ -0,0 +1,73 @@
+"""Счетчик времени кадров для виджетов"""
+
+import time
+from collections import deque
+
+import numpy as np
+
+
+class FrameStats:
+    """Скользящая статистика времени отрисовки и интервалов между кадрами"""
+    
+    def __init__(self, window=240):
+        """
+        Инициализация счетчика
+        
+        Args:
+            window: количество последних кадров в статистике
+        """
+        self.paint_times = deque(maxlen=window)
+        self.frame_times = deque(maxlen=window)
+        self.painted_pixels = deque(maxlen=window)
+        self.total_frames = 0
+        self._last_frame = None
+    
+    def record(self, paint_time, pixels=0):
+        """
+        Регистрация отрисованного кадра
+        
+        Args:
+            paint_time: длительность paintEvent в секундах
+            pixels: площадь перерисованной области в пикселях
+        """
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            self.frame_times.append(now - self._last_frame)
+        self._last_frame = now
+        
+        self.paint_times.append(paint_time)
+        self.painted_pixels.append(pixels)
+        self.total_frames += 1
+    
+    def reset(self):
+        """Сброс статистики"""
+        self.paint_times.clear()
+        self.frame_times.clear()
+        self.painted_pixels.clear()
+        self.total_frames = 0
+        self._last_frame = None
+    
+    def summary(self):
+        """
+        Сводка по последним кадрам
+        
+        Returns:
+            словарь со средним и p95 временем отрисовки (мс), частотой
+            кадров и средней перерисованной площадью
+        """
+        if not self.paint_times:
+            return {"frames": 0, "paint_mean_ms": 0.0, "paint_p95_ms": 0.0,
+                    "fps": 0.0, "pixels_mean": 0.0}
+        
+        paint_ms = np.array(self.paint_times) * 1000.0
+        fps = 0.0
+        if self.frame_times:
+            fps = 1.0 / max(float(np.mean(self.frame_times)), 1e-9)
+        
+        return {
+            "frames": self.total_frames,
+            "paint_mean_ms": float(paint_ms.mean()),
+            "paint_p95_ms": float(np.percentile(paint_ms, 95)),
+            "fps": fps,
+            "pixels_mean": float(np.mean(self.painted_pixels)),
+        }
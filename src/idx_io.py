@@ -0,0 +1,151 @@
+"""Потоковое чтение и запись файлов IDX (формат MNIST)"""
+
+import gzip
+import os
+import shutil
+import struct
+
+import numpy as np
+
+# Код типа данных IDX -> тип NumPy (big-endian, как в формате)
+IDX_DTYPES = {
+    0x08: np.dtype(np.uint8),
+    0x09: np.dtype(np.int8),
+    0x0B: np.dtype(">i2"),
+    0x0C: np.dtype(">i4"),
+    0x0D: np.dtype(">f4"),
+    0x0E: np.dtype(">f8"),
+}
+
+
+def is_idx_file(path):
+    """Похож ли путь на файл IDX (в том числе сжатый gzip)"""
+    name = str(path).lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return "-idx" in name or name.endswith((".idx", ".idx1", ".idx3"))
+
+
+def open_idx(path):
+    """Открытие файла IDX для чтения (gzip распознается по расширению)"""
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def read_idx_header(stream):
+    """
+    Чтение заголовка IDX
+    
+    Args:
+        stream: бинарный файловый объект, позиция в начале файла
+    
+    Returns:
+        (dtype, shape) - тип элементов и полная форма массива
+    """
+    magic = stream.read(4)
+    if len(magic) != 4 or magic[0] != 0 or magic[1] != 0:
+        raise ValueError("Неверная сигнатура файла IDX")
+    
+    type_code, ndim = magic[2], magic[3]
+    if type_code not in IDX_DTYPES:
+        raise ValueError(f"Неизвестный тип данных IDX: {type_code:#x}")
+    
+    shape = struct.unpack(f">{ndim}I", stream.read(4 * ndim))
+    return IDX_DTYPES[type_code], shape
+
+
+def iter_idx(path, chunk_size=1024):
+    """
+    Потоковое чтение файла IDX блоками по первой оси
+    
+    В памяти одновременно находится только один блок, поэтому файлы
+    любого размера читаются с постоянным расходом памяти.
+    
+    Args:
+        path: путь к файлу IDX
+        chunk_size: количество элементов по первой оси в блоке
+    
+    Yields:
+        numpy array формы (k, *shape[1:]) в порядке байтов платформы
+    """
+    with open_idx(path) as stream:
+        dtype, shape = read_idx_header(stream)
+        item_shape = shape[1:]
+        item_bytes = dtype.itemsize * int(np.prod(item_shape, dtype=np.int64))
+        
+        remaining = shape[0]
+        while remaining > 0:
+            count = min(chunk_size, remaining)
+            data = stream.read(count * item_bytes)
+            if len(data) != count * item_bytes:
+                raise ValueError(f"Файл IDX обрезан: {path}")
+            
+            chunk = np.frombuffer(data, dtype=dtype).reshape((count,) + item_shape)
+            yield chunk.astype(dtype.newbyteorder("="), copy=False)
+            remaining -= count
+
+
+def read_idx(path):
+    """Чтение файла IDX целиком"""
+    chunks = list(iter_idx(path, chunk_size=1 << 16))
+    if not chunks:
+        with open_idx(path) as stream:
+            dtype, shape = read_idx_header(stream)
+        return np.empty(shape, dtype=dtype.newbyteorder("="))
+    return np.concatenate(chunks)
+
+
+def memmap_idx(path, cache_dir=None):
+    """
+    Отображение файла IDX в память без чтения целиком
+    
+    Сжатый файл один раз распаковывается рядом (или в cache_dir) и
+    отображается уже распакованный; повторные вызовы используют его,
+    пока он не старше архива.
+    
+    Args:
+        path: путь к файлу IDX (в том числе .gz)
+        cache_dir: директория для распакованной копии сжатого файла
+    
+    Returns:
+        numpy.memmap только для чтения полной формы файла (порядок байтов
+        файла: многобайтовые типы остаются big-endian)
+    """
+    path = str(path)
+    if path.endswith(".gz"):
+        target = os.path.join(cache_dir or os.path.dirname(path) or ".", os.path.basename(path)[:-3])
+        if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(path):
+            tmp_path = target + ".tmp"
+            with gzip.open(path, "rb") as source, open(tmp_path, "wb") as destination:
+                shutil.copyfileobj(source, destination, 1 << 20)
+            os.replace(tmp_path, target)
+        path = target
+    
+    with open(path, "rb") as stream:
+        dtype, shape = read_idx_header(stream)
+        offset = stream.tell()
+    if int(np.prod(shape, dtype=np.int64)) == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+
+def write_idx(path, array):
+    """
+    Запись массива в файл IDX
+    
+    Args:
+        path: путь к файлу (.gz - со сжатием)
+        array: numpy array одного из типов IDX_DTYPES
+    """
+    array = np.asarray(array)
+    codes = {dtype.newbyteorder("="): code for code, dtype in IDX_DTYPES.items()}
+    code = codes.get(array.dtype.newbyteorder("="))
+    if code is None:
+        raise ValueError(f"Тип {array.dtype} не поддерживается форматом IDX")
+    
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "wb") as stream:
+        stream.write(bytes([0, 0, code, array.ndim]))
+        stream.write(struct.pack(f">{array.ndim}I", *array.shape))
+        stream.write(array.astype(IDX_DTYPES[code], copy=False).tobytes())
@@ -0,0 +1,201 @@
+"""Легкая инструментация горячих путей: именованные таймеры и счетчики
+
+Выключенная инструментация почти ничего не стоит: timer() возвращает
+общий пустой контекстный менеджер, а record() и count() сразу выходят.
+Включенная хранит для каждого этапа счетчики и скользящее окно
+последних длительностей, по которому считаются перцентили.
+
+Пример:
+    from src.instrumentation import metrics
+    
+    with metrics.timer("preprocess"):
+        ...
+    metrics.export("metrics.prom")
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import config
+
+# Этапы распознавания и отрисовки в порядке отображения
+STAGES = ("preprocess", "inference", "softmax", "ui_update", "paint")
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+def setup_logging(level=None):
+    """
+    Настройка модуля logging для приложения, CLI и сервера
+    
+    Args:
+        level: уровень ("DEBUG", "INFO", ...), по умолчанию config.LOG_LEVEL
+    """
+    logging.basicConfig(level=(level or config.LOG_LEVEL).upper(), format=LOG_FORMAT)
+
+
+class _NullTimer:
+    """Пустой контекстный менеджер для выключенной инструментации"""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    """Замер длительности блока with с записью в Instrumentation"""
+    
+    __slots__ = ("_owner", "_name", "_start")
+    
+    def __init__(self, owner, name):
+        self._owner = owner
+        self._name = name
+    
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._owner.record(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class _Stage:
+    """Статистика одного таймера"""
+    
+    __slots__ = ("count", "total", "max", "last", "window")
+    
+    def __init__(self, window):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.window = deque(maxlen=window)
+
+
+class Instrumentation:
+    """Потокобезопасный реестр таймеров и счетчиков"""
+    
+    def __init__(self, enabled=False, window=256):
+        """
+        Инициализация реестра
+        
+        Args:
+            enabled: включена ли запись
+            window: количество последних замеров для перцентилей
+        """
+        self.enabled = enabled
+        self.window = window
+        self._stages = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+    
+    def timer(self, name):
+        """Контекстный менеджер, записывающий длительность блока в таймер name"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+    
+    def record(self, name, seconds):
+        """Запись длительности в таймер name"""
+        if not self.enabled:
+            return
+        with self._lock:
+            stage = self._stages.get(name)
+            if stage is None:
+                stage = self._stages[name] = _Stage(self.window)
+            stage.count += 1
+            stage.total += seconds
+            stage.last = seconds
+            if seconds > stage.max:
+                stage.max = seconds
+            stage.window.append(seconds)
+    
+    def count(self, name, value=1):
+        """Увеличение счетчика name"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+    
+    def reset(self):
+        """Сброс всех таймеров и счетчиков"""
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+    
+    def snapshot(self):
+        """
+        Текущее состояние таймеров и счетчиков
+        
+        Returns:
+            словарь {"timers": {имя: count, total_ms, mean_ms, last_ms, max_ms,
+            p50_ms, p95_ms, p99_ms}, "counters": {имя: значение}}
+        """
+        with self._lock:
+            stages = {name: (stage.count, stage.total, stage.last, stage.max, list(stage.window))
+                      for name, stage in self._stages.items()}
+            counters = dict(self._counters)
+        
+        timers = {}
+        for name, (count, total, last, maximum, window) in stages.items():
+            p50, p95, p99 = np.percentile(window, (50, 95, 99)) * 1000.0
+            timers[name] = {
+                "count": count,
+                "total_ms": total * 1000.0,
+                "mean_ms": total * 1000.0 / count,
+                "last_ms": last * 1000.0,
+                "max_ms": maximum * 1000.0,
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+            }
+        return {"timers": timers, "counters": counters}
+    
+    def render_prometheus(self, prefix="digits"):
+        """Состояние в текстовом формате Prometheus (summary и counter)"""
+        state = self.snapshot()
+        lines = []
+        if state["timers"]:
+            name = f"{prefix}_stage_seconds"
+            lines += [f"# HELP {name} Длительность этапов распознавания и отрисовки",
+                      f"# TYPE {name} summary"]
+            for stage, stats in state["timers"].items():
+                for quantile in (50, 95, 99):
+                    lines.append(f'{name}{{stage="{stage}",quantile="{quantile / 100:g}"}} '
+                                 f"{stats[f'p{quantile}_ms'] / 1000.0:.9f}")
+                lines.append(f'{name}_sum{{stage="{stage}"}} {stats["total_ms"] / 1000.0:.9f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {stats["count"]}')
+        for counter, value in state["counters"].items():
+            lines += [f"# TYPE {prefix}_{counter}_total counter", f"{prefix}_{counter}_total {value}"]
+        return "\n".join(lines) + "\n"
+    
+    def export(self, path):
+        """
+        Запись состояния в файл: .json - JSON, иначе текстовый формат Prometheus
+        
+        Args:
+            path: путь к файлу
+        """
+        if str(path).endswith(".json"):
+            content = json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+        else:
+            content = self.render_prometheus()
+        with open(path, "w", encoding="utf-8") as stream:
+            stream.write(content)
+
+
+# Общий реестр приложения
+metrics = Instrumentation(enabled=config.INSTRUMENTATION_ENABLED)
@@ -1,17 +1,35 @@
 """Главное окно приложения"""
 
+import logging
+
 from PyQt6.QtWidgets import (
     QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, 
-    QPushButton, QLabel, QMessageBox
+    QPushButton, QLabel, QMessageBox, QCheckBox
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QImage, QKeySequence, QShortcut
+import numpy as np
 
+from src.capture_store import CaptureWriter
+from src.cascade import load_cascade
 from src.drawing_widget import DrawingWidget
+from src.instrumentation import metrics
+from src.perf_overlay import PerfOverlay
 from src.prediction_display import PredictionDisplay
-from src.model_handler import ModelHandler
-from src.utils import preprocess_image_for_model
+from src.prediction_result import SequenceResult
+from src.model_loader import ModelLoader
+from src.model_registry import ModelRegistry
+from src.recognition_worker import BackgroundRecognizer
+from src.runtime_config import active_settings, enforce_memory_budget
+from src.segmentation import count_stroke_columns, segment_rgb32_array, segment_strokes
+from src.strokes import StrokeStore, rasterize_strokes
+from src.tta import AdaptiveTTA
+from src.startup import startup_timer
+from src.utils import preprocess_image_for_model, qimage_to_array
 import config
 
+logger = logging.getLogger(__name__)
+
 
 class MainWindow(QMainWindow):
     """Главное окно приложения для распознавания рукописных цифр"""
@@ -23,14 +41,101 @@ class MainWindow(QMainWindow):
         # Инициализация компонентов
         self.drawing_widget = DrawingWidget()
         self.prediction_display = PredictionDisplay()
-        self.model_handler = ModelHandler(config.MODEL_PATH)
+        
+        # Модель загружается в фоне, окно показывается сразу
+        self.model_handler = None
+        self.model_loader = ModelLoader(self)
+        
+        # Реестр версий: новые версии загружаются и прогреваются в фоне
+        # отдельным загрузчиком и подменяют активную между запросами
+        self.model_registry = None
+        self.loading_version = None
+        self.reload_loader = ModelLoader(self)
+        if config.MODEL_REGISTRY_DIR:
+            self.model_registry = ModelRegistry(
+                config.MODEL_REGISTRY_DIR,
+                history=config.MODEL_REGISTRY_HISTORY,
+                settle_seconds=config.MODEL_REGISTRY_SETTLE_S
+            )
+        
+        # Предвыделенный буфер входного тензора модели. Распознавание идет
+        # в единственном рабочем потоке, поэтому буфер не используется параллельно
+        self.input_buffer = np.empty(
+            (1, config.MODEL_IMAGE_SIZE, config.MODEL_IMAGE_SIZE, 1),
+            dtype=np.float32
+        )
+        
+        # Последний результат и версия холста, для которой он получен
+        self.last_result = None
+        self.requested_generation = None
+        
+        # Запись образцов для дообучения: метка, набранная клавишами 0-9,
+        # сохраняется вместе с рисунком при очистке холста
+        self.capture = None
+        self.confirmed_label = ""
+        if config.CAPTURE_ENABLED:
+            try:
+                self.capture = CaptureWriter(
+                    config.CAPTURE_DIR, config.CAPTURE_SEGMENT_MB << 20,
+                    config.CAPTURE_MAX_SEGMENTS, config.MODEL_IMAGE_SIZE
+                )
+            except OSError as e:
+                logger.error(f"Запись образцов отключена: {e}")
+        
+        # Распознавание вне потока GUI
+        self.recognizer = BackgroundRecognizer(
+            self.recognize_image,
+            debounce_ms=config.LIVE_RECOGNITION_DEBOUNCE_MS,
+            parent=self
+        )
         
         # Настройка интерфейса
         self.setup_ui()
         self.setup_connections()
         
-        # Проверка загрузки модели
-        self.check_model_status()
+        # Панель производительности поверх окна (переключается клавишей)
+        self.perf_overlay = PerfOverlay(
+            self, metrics, self.drawing_widget.frame_stats, config.PERF_OVERLAY_REFRESH_MS
+        )
+        QShortcut(QKeySequence(config.PERF_OVERLAY_SHORTCUT), self, self.perf_overlay.toggle)
+        self.perf_overlay.set_visible(config.PERF_OVERLAY_VISIBLE)
+        if self.capture is not None:
+            for digit in range(10):
+                QShortcut(QKeySequence(str(digit)), self,
+                          lambda digit=digit: self.confirm_label(digit))
+        
+        # Запуск загрузки модели: самой новой версии из реестра, если он задан
+        self.set_model_loading_state()
+        model_path = config.MODEL_PATH
+        if self.model_registry is not None:
+            QShortcut(QKeySequence(config.MODEL_ROLLBACK_SHORTCUT), self, self.rollback_model)
+            update = self.model_registry.next_version()
+            if update is not None:
+                self.loading_version, model_path = update
+            self.registry_timer = QTimer(self)
+            self.registry_timer.setInterval(config.MODEL_REGISTRY_POLL_MS)
+            self.registry_timer.timeout.connect(self.check_model_updates)
+            self.registry_timer.start()
+        self.model_loader.load(model_path, **self.handler_kwargs())
+        
+        # Периодическая проверка мягкого предела памяти
+        self.memory_timer = None
+        settings = active_settings()
+        if settings is not None and settings.memory_budget_mb:
+            self.memory_timer = QTimer(self)
+            self.memory_timer.setInterval(config.RUNTIME_MEMORY_CHECK_MS)
+            self.memory_timer.timeout.connect(self.check_memory_budget)
+            self.memory_timer.start()
+    
+    @staticmethod
+    def handler_kwargs():
+        """Аргументы ModelHandler из конфигурации"""
+        return {
+            "backend": config.MODEL_BACKEND,
+            "variant": config.MODEL_VARIANT,
+            "jit_compile": config.MODEL_JIT_COMPILE,
+            "warmup_batch_sizes": config.MODEL_WARMUP_BATCH_SIZES,
+        }
     
     def setup_ui(self):
         """Настройка пользовательского интерфейса"""
@@ -65,6 +170,11 @@ class MainWindow(QMainWindow):
             button_layout.addWidget(self.clear_button)
             drawing_layout.addLayout(button_layout)
             
+            # Переключатель живого распознавания во время рисования
+            self.live_checkbox = QCheckBox("Распознавать во время рисования")
+            self.live_checkbox.setChecked(config.LIVE_RECOGNITION_ENABLED)
+            drawing_layout.addWidget(self.live_checkbox)
+            
             content_layout.addLayout(drawing_layout)
             
             # Область результатов
@@ -78,12 +188,16 @@ class MainWindow(QMainWindow):
             main_layout.addLayout(content_layout)
             central_widget.setLayout(main_layout)
             
+            # Активная версия модели и время ее загрузки (при заданном реестре)
+            self.model_status_label = QLabel()
+            self.statusBar().addPermanentWidget(self.model_status_label)
+            
             # Настройки окна
             self.setWindowTitle("Распознавание рукописных цифр MNIST")
             self.setMinimumSize(800, 400)
             
         except Exception as e:
-            print(f"Ошибка при настройке интерфейса: {e}")
+            logger.error(f"Ошибка при настройке интерфейса: {e}")
             self.show_error_message("Ошибка интерфейса", f"Не удалось создать интерфейс: {e}")
     
     def setup_connections(self):
@@ -91,53 +205,353 @@ class MainWindow(QMainWindow):
         try:
             self.recognize_button.clicked.connect(self.on_recognize_clicked)
             self.clear_button.clicked.connect(self.on_clear_clicked)
+            self.drawing_widget.stroke_updated.connect(self.on_stroke_updated)
+            self.recognizer.result_ready.connect(self.on_result_ready)
+            self.recognizer.error_occurred.connect(self.on_recognition_failed)
+            self.model_loader.ready.connect(self.on_model_ready)
+            self.model_loader.failed.connect(self.on_model_failed)
+            self.reload_loader.ready.connect(self.on_model_reloaded)
+            self.reload_loader.failed.connect(self.on_model_reload_failed)
         except Exception as e:
-            print(f"Ошибка при настройке соединений: {e}")
+            logger.error(f"Ошибка при настройке соединений: {e}")
+    
+    def is_model_ready(self):
+        """Загружена ли модель"""
+        return self.model_handler is not None and self.model_handler.is_loaded
+    
+    def set_model_loading_state(self):
+        """Состояние окна на время загрузки модели"""
+        self.recognize_button.setEnabled(False)
+        self.recognize_button.setText("Загрузка модели...")
+        self.statusBar().showMessage("Загрузка модели...")
+    
+    def on_model_ready(self, model_handler):
+        """Обработка завершения фоновой загрузки модели"""
+        if self.loading_version is not None:
+            version, self.loading_version = self.loading_version, None
+            try:
+                self.model_registry.activate(
+                    version, model_handler.model_path, model_handler, model_handler.load_timings
+                )
+            except ValueError as e:
+                logger.error(f"Ошибка при активации модели: {e}")
+        self.set_model_handler(model_handler)
+        startup_timer.mark("модель готова")
+        for name, seconds in self.model_loader.timings.items():
+            startup_timer.add_duration(name, seconds)
+        
+        self.recognize_button.setText("Распознать")
+        self.recognize_button.setEnabled(True)
+        if model_handler.is_loaded:
+            self.statusBar().showMessage(f"Модель загружена (бэкенд: {model_handler.backend_name})", 5000)
+        else:
+            self.statusBar().showMessage("Модель не загружена")
+        self.update_model_status()
+        
+        self.log_startup_timings()
+        self.check_model_status()
+        
+        # Холст мог измениться во время загрузки
+        if not self.drawing_widget.strokes.is_empty():
+            self.on_stroke_updated()
+    
+    def check_memory_budget(self):
+        """Очистка кэша результатов при превышении предела памяти"""
+        enforce_memory_budget(self.model_handler)
+    
+    def set_model_handler(self, model_handler):
+        """
+        Подмена обработчика модели между запросами
+        
+        Запрос, уже выполняющийся в рабочем потоке, завершается на прежнем
+        обработчике; сохраненный результат сбрасывается, чтобы следующее
+        распознавание шло через новую модель.
+        """
+        if config.PREDICTION_CACHE_SIZE > 0 and model_handler.cache is None:
+            model_handler.enable_prediction_cache(
+                config.PREDICTION_CACHE_SIZE, config.PREDICTION_CACHE_TTL_S
+            )
+        if config.CASCADE_ENABLED and model_handler.is_loaded and model_handler.cascade is None:
+            try:
+                cascade = load_cascade(model_handler.model_path, config.CASCADE_STAGES)
+                model_handler.enable_cascade(cascade)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Каскад не включен, используется полная модель: {e}")
+        if config.TTA_ENABLED and model_handler.tta is None:
+            model_handler.enable_tta(AdaptiveTTA(
+                config.TTA_CONFIDENCE_THRESHOLD, config.TTA_SHIFT_PX, config.TTA_ANGLES,
+                config.TTA_THICKENING, config.MODEL_IMAGE_SIZE
+            ))
+        replaced = self.model_handler is not None
+        self.model_handler = model_handler
+        self.last_result = None
+        self.requested_generation = None
+        
+        # Результат на экране получен прежней моделью
+        if replaced and not self.drawing_widget.strokes.is_empty():
+            self.on_stroke_updated()
+    
+    def update_model_status(self):
+        """Постоянная надпись в строке состояния: активная версия и время ее загрузки"""
+        if self.model_registry is None:
+            return
+        parts = []
+        active = self.model_registry.active
+        if active is not None:
+            parts.append(f"Модель v{active.version}")
+            parts += [f"{stage} {seconds:.2f} с" for stage, seconds in active.timings.items()]
+        if self.reload_loader.loading:
+            parts.append(f"загружается v{self.loading_version}")
+        self.model_status_label.setText(" · ".join(parts))
+    
+    def check_model_updates(self):
+        """Запуск фоновой загрузки новой версии из реестра"""
+        if self.model_loader.loading or self.reload_loader.loading:
+            return
+        update = self.model_registry.next_version()
+        if update is None:
+            return
+        self.loading_version, model_path = update
+        logger.info(f"Найдена новая версия модели {self.loading_version}: {model_path}")
+        self.reload_loader.load(model_path, **self.handler_kwargs())
+        self.update_model_status()
+    
+    def on_model_reloaded(self, model_handler):
+        """Активация загруженной и прогретой версии"""
+        version, self.loading_version = self.loading_version, None
+        try:
+            entry = self.model_registry.activate(
+                version, model_handler.model_path, model_handler, model_handler.load_timings
+            )
+        except ValueError as e:
+            logger.error(f"Ошибка при активации модели: {e}")
+            self.statusBar().showMessage(f"Версия модели {version} не загружена", 5000)
+        else:
+            self.set_model_handler(entry.handler)
+            self.statusBar().showMessage(f"Активна версия модели {version}", 5000)
+        self.update_model_status()
+    
+    def on_model_reload_failed(self, message):
+        """Обработка ошибки фоновой загрузки новой версии"""
+        version, self.loading_version = self.loading_version, None
+        logger.error(f"Ошибка при загрузке версии модели {version}: {message}")
+        self.model_registry.mark_failed(version)
+        self.update_model_status()
+    
+    def rollback_model(self):
+        """Мгновенный возврат к предыдущей версии модели"""
+        try:
+            entry = self.model_registry.rollback()
+        except RuntimeError as e:
+            self.statusBar().showMessage(str(e), 5000)
+            return
+        self.set_model_handler(entry.handler)
+        self.statusBar().showMessage(f"Откат к версии модели {entry.version}", 5000)
+        self.update_model_status()
+    
+    def on_model_failed(self, message):
+        """Обработка ошибки фоновой загрузки модели"""
+        logger.error(f"Ошибка при загрузке модели: {message}")
+        self.recognize_button.setText("Распознать")
+        self.recognize_button.setEnabled(True)
+        self.statusBar().showMessage("Модель не загружена")
+        self.show_error_message("Ошибка", f"Не удалось загрузить модель: {message}")
+    
+    def paintEvent(self, event):
+        """Отметка первой отрисовки окна для замера времени запуска"""
+        super().paintEvent(event)
+        if not startup_timer.has("первая отрисовка"):
+            startup_timer.mark("первая отрисовка")
+            self.log_startup_timings()
+    
+    def log_startup_timings(self):
+        """Вывод этапов запуска, когда окно отрисовано и модель готова"""
+        if startup_timer.has("первая отрисовка", "модель готова"):
+            logger.info(f"Время запуска: {startup_timer.report()}")
     
     def check_model_status(self):
         """Проверка статуса загрузки модели"""
         try:
-            if not self.model_handler.is_loaded:
+            if not self.is_model_ready():
                 QMessageBox.warning(
                     self,
                     "Предупреждение",
                     "Модель не загружена. Распознавание может не работать корректно."
                 )
         except Exception as e:
-            print(f"Ошибка при проверке статуса модели: {e}")
+            logger.error(f"Ошибка при проверке статуса модели: {e}")
+    
+    def capture_canvas(self):
+        """
+        Снимок холста для распознавания в рабочем потоке
+        
+        Returns:
+            StrokeStore со штрихами или QImage, в зависимости от config.PREPROCESS_SOURCE
+        """
+        self.requested_generation = self.drawing_widget.generation
+        
+        if config.PREPROCESS_SOURCE == "vector":
+            return self.drawing_widget.get_strokes()
+        
+        # Снимок разделяет данные с оригиналом (implicit sharing),
+        # рисование после этого создаст собственную копию
+        return QImage(self.drawing_widget.get_image())
+    
+    def recognize_image(self, canvas):
+        """
+        Предобработка и предсказание для снимка холста
+        
+        Выполняется в рабочем потоке BackgroundRecognizer.
+        
+        Args:
+            canvas: снимок холста из capture_canvas
+        
+        Returns:
+            PredictionResult с вероятностями цифр 0-9 или SequenceResult,
+            если на холсте несколько цифр
+        """
+        if config.MULTI_DIGIT_ENABLED:
+            with metrics.timer("segmentation"):
+                segments = self.segment_canvas(canvas)
+            if segments is not None and len(segments[0]) > 1:
+                result = self.model_handler.predict_sequence(*segments)
+                if self.capture is not None:
+                    result.inputs = segments[0]
+                return result
+        
+        with metrics.timer("preprocess"):
+            if isinstance(canvas, StrokeStore):
+                # Штрихи растеризуются сразу в 28x28, минуя полноразмерный холст
+                self.input_buffer[0, :, :, 0] = rasterize_strokes(
+                    canvas,
+                    brush_size=self.drawing_widget.brush_size,
+                    target_size=config.MODEL_IMAGE_SIZE,
+                    center=config.PREPROCESS_CENTERING,
+                    box_size=config.MNIST_BOX_SIZE
+                )
+                processed_image = self.input_buffer
+            else:
+                # Предобрабатываем изображение для модели
+                processed_image = preprocess_image_for_model(
+                    canvas, 
+                    config.MODEL_IMAGE_SIZE,
+                    out=self.input_buffer,
+                    center=config.PREPROCESS_CENTERING,
+                    box_size=config.MNIST_BOX_SIZE
+                )
+        
+        # Выполняем предсказание
+        result = self.model_handler.predict(processed_image)
+        if self.capture is not None:
+            # Буфер входа переиспользуется следующим распознаванием
+            result.inputs = processed_image[0, :, :, 0].copy()
+        return result
+    
+    def segment_canvas(self, canvas):
+        """
+        Выделение цифр на снимке холста
+        
+        Args:
+            canvas: снимок холста из capture_canvas
+        
+        Returns:
+            (images, boxes) - нормализованные цифры слева направо и их рамки
+            на холсте, или None, если по штрихам видно, что цифра одна
+        """
+        if isinstance(canvas, StrokeStore):
+            if count_stroke_columns(canvas, self.drawing_widget.brush_size) < 2:
+                return None
+            return segment_strokes(canvas, self.drawing_widget.brush_size,
+                                   config.MODEL_IMAGE_SIZE, config.MNIST_BOX_SIZE)
+        return segment_rgb32_array(qimage_to_array(canvas), config.MODEL_IMAGE_SIZE,
+                                   config.MNIST_BOX_SIZE)
     
     def on_recognize_clicked(self):
         """Обработка нажатия кнопки 'Распознать'"""
         try:
-            if not self.model_handler.is_loaded:
+            if not self.is_model_ready():
                 self.show_error_message(
                     "Ошибка", 
                     "Модель не загружена. Проверьте наличие файлов модели."
                 )
                 return
             
-            # Получаем изображение с холста
-            image = self.drawing_widget.get_image()
-            
-            # Предобрабатываем изображение для модели
-            processed_image = preprocess_image_for_model(
-                image, 
-                config.MODEL_IMAGE_SIZE
-            )
-            
-            # Выполняем предсказание
-            probabilities = self.model_handler.predict(processed_image)
+            # Холст не менялся с последнего распознавания: показываем
+            # сохраненный результат без предобработки и инференса
+            if self.last_result is not None and self.last_result[0] == self.drawing_widget.generation:
+                self.prediction_display.update_predictions(self.last_result[1])
+                return
             
-            # Обновляем отображение результатов
-            self.prediction_display.update_predictions(probabilities)
+            # Результат придет сигналом result_ready в on_result_ready
+            self.recognizer.recognize_now(self.capture_canvas(), self.drawing_widget.generation)
             
         except Exception as e:
-            print(f"Ошибка при распознавании: {e}")
+            logger.error(f"Ошибка при распознавании: {e}")
             self.show_error_message("Ошибка", f"Ошибка при распознавании: {e}")
     
+    def on_stroke_updated(self):
+        """Запуск живого распознавания после изменения штриха"""
+        try:
+            if not (self.live_checkbox.isChecked() and self.is_model_ready()):
+                return
+            if self.requested_generation == self.drawing_widget.generation:
+                return
+            self.recognizer.schedule(self.capture_canvas(), self.drawing_widget.generation)
+        except Exception as e:
+            logger.error(f"Ошибка при живом распознавании: {e}")
+    
+    def on_result_ready(self, canvas_generation, result):
+        """Отображение результата и запоминание версии холста, для которой он получен"""
+        # Версия холста приходит вместе с результатом: requested_generation
+        # к этому моменту может относиться к новому снимку, ждущему дебаунса
+        self.last_result = (canvas_generation, result)
+        with metrics.timer("ui_update"):
+            self.prediction_display.update_predictions(result)
+        metrics.count("recognitions")
+    
+    def on_recognition_failed(self, message):
+        """Обработка ошибки фонового распознавания"""
+        logger.error(f"Ошибка при распознавании: {message}")
+        self.show_error_message("Ошибка", f"Ошибка при распознавании: {message}")
+    
+    def confirm_label(self, digit):
+        """Подтверждение метки рисунка клавишей цифры (для числа - цифра за цифрой)"""
+        if self.drawing_widget.strokes.is_empty():
+            return
+        self.confirmed_label += str(digit)
+        self.statusBar().showMessage(f"Метка рисунка: {self.confirmed_label}", 5000)
+    
+    def capture_sample(self):
+        """Постановка последнего результата для текущего рисунка в очередь записи"""
+        if self.capture is None or self.last_result is None:
+            return
+        generation, result = self.last_result
+        # Рисунок изменился после распознавания - результат к нему не относится
+        if generation != self.drawing_widget.generation or result.inputs is None:
+            return
+        
+        digits = result.digits if isinstance(result, SequenceResult) else (result,)
+        labels = None
+        if len(self.confirmed_label) == len(digits):
+            labels = [int(digit) for digit in self.confirmed_label]
+        elif self.confirmed_label:
+            logger.warning(f"Метка {self.confirmed_label} не соответствует количеству цифр "
+                           f"({len(digits)}), образец записан без метки")
+        probabilities = np.stack([digit.probabilities for digit in digits])
+        self.capture.append(result.inputs, probabilities, labels)
+    
     def on_clear_clicked(self):
         """Обработка нажатия кнопки 'Очистить'"""
         try:
+            # Рисунок и его результат сохраняются до очистки
+            self.capture_sample()
+            self.confirmed_label = ""
+            
+            # Отменяем ожидающее распознавание, чтобы оно не вернуло старый результат
+            self.recognizer.cancel()
+            self.last_result = None
+            self.requested_generation = None
+            
             # Очищаем холст
             self.drawing_widget.clear_canvas()
             
@@ -145,9 +559,36 @@ class MainWindow(QMainWindow):
             self.prediction_display.clear_predictions()
             
         except Exception as e:
-            print(f"Ошибка при очистке: {e}")
+            logger.error(f"Ошибка при очистке: {e}")
             self.show_error_message("Ошибка", f"Ошибка при очистке: {e}")
     
+    def closeEvent(self, event):
+        """Остановка фоновой загрузки и распознавания при закрытии окна"""
+        self.recognizer.cancel()
+        self.recognizer.wait()
+        if self.model_registry is not None:
+            self.registry_timer.stop()
+        if self.memory_timer is not None:
+            self.memory_timer.stop()
+        self.model_loader.wait()
+        self.reload_loader.wait()
+        self.perf_overlay.set_visible(False)
+        if self.model_handler is not None and self.model_handler.cascade is not None:
+            logger.info(f"Статистика каскада: {self.model_handler.cascade.stats()}")
+        if self.model_handler is not None and self.model_handler.tta is not None:
+            logger.info(f"Статистика аугментации: {self.model_handler.tta.stats()}")
+        if self.capture is not None:
+            self.capture_sample()
+            capture, self.capture = self.capture, None
+            capture.close()
+            logger.info(f"Статистика записи образцов: {capture.stats()}")
+        if config.INSTRUMENTATION_EXPORT_PATH:
+            try:
+                metrics.export(config.INSTRUMENTATION_EXPORT_PATH)
+            except OSError as e:
+                logger.error(f"Ошибка при сохранении метрик: {e}")
+        super().closeEvent(event)
+    
     def show_error_message(self, title, message):
         """
         Отображение сообщения об ошибке
@@ -159,5 +600,5 @@ class MainWindow(QMainWindow):
         try:
             QMessageBox.critical(self, title, message)
         except Exception as e:
-            print(f"Ошибка при отображении сообщения об ошибке: {e}")
+            logger.error(f"Ошибка при отображении сообщения об ошибке: {e}")
 
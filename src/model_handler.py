@@ -1,71 +1,427 @@
 """Работа с ML моделью для распознавания цифр"""
 
+import logging
 import os
+import time
 import numpy as np
-import tensorflow as tf
+
+from src.batching import MicroBatcher
+from src.instrumentation import metrics
+from src.prediction_cache import PredictionCache
+from src.prediction_result import PredictionResult, SequenceResult
+from src.quantization import VARIANTS, load_variant
+from src.runtime_config import configure_tensorflow
+
+logger = logging.getLogger(__name__)
+
+# TensorFlow импортируется лениво: NumPy-бэкенду он не нужен
+BACKENDS = ("auto", "numpy", "tensorflow")
+
+# Операции графа, через которые значение проходит без изменений
+_PASSTHROUGH_OPS = ("Identity", "IdentityN", "StopGradient")
+_CALL_OPS = ("StatefulPartitionedCall", "PartitionedCall")
 
 
 class ModelHandler:
     """Класс для работы с предобученной моделью MNIST"""
     
-    def __init__(self, model_path="mnist_model"):
+    def __init__(self, model_path="mnist_model", backend="auto", jit_compile=False,
+                 warmup_batch_sizes=(1,), variant="float32"):
         """
         Инициализация обработчика модели
         
         Args:
             model_path: путь к директории с моделью
+            backend: "numpy", "tensorflow" или "auto" (NumPy, если граф поддерживается)
+            jit_compile: компилировать ли граф инференса через XLA (только TensorFlow)
+            warmup_batch_sizes: размеры батчей для прогрева после загрузки
+            variant: формат весов NumPy-бэкенда: "float32", "float16" или "int8"
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"Неизвестный бэкенд: {backend}")
+        if variant not in VARIANTS:
+            raise ValueError(f"Неизвестный вариант модели: {variant}")
+        if variant != "float32" and backend == "tensorflow":
+            raise ValueError("Квантованные варианты поддерживаются только NumPy-бэкендом")
+        
         self.model = None
         self.model_path = model_path
         self.is_loaded = False
+        self.backend = backend
+        self.backend_name = None
+        self.variant = variant
+        self.batcher = None
+        self.cache = None
+        self.cascade = None
+        self.tta = None
+        # Номер загруженной модели: входит в ключи кэша, меняется при перезагрузке
+        self.model_generation = 0
+        self.jit_compile = jit_compile
+        self.warmup_batch_sizes = tuple(warmup_batch_sizes)
+        self.warmup_report = {}
+        # Длительности последней загрузки: {"загрузка": с, "прогрев": с}
+        self.load_timings = {}
+        self.input_shape = (None, 28, 28, 1)
+        # Выход модели уже является вероятностями (последний слой softmax);
+        # определяется один раз при загрузке
+        self.outputs_probabilities = False
+        self._infer = None
         
         try:
             self.load_model()
         except Exception as e:
-            print(f"Ошибка при загрузке модели: {e}")
+            logger.error(f"Ошибка при загрузке модели: {e}")
             self.is_loaded = False
     
     def load_model(self):
-        """Загрузка SavedModel"""
+        """Загрузка модели выбранным бэкендом"""
         try:
+            start = time.perf_counter()
             if not os.path.exists(self.model_path):
                 raise FileNotFoundError(f"Директория модели не найдена: {self.model_path}")
             
-            # Проверяем наличие необходимых файлов
-            required_files = [
-                os.path.join(self.model_path, "saved_model.pb"),
-                os.path.join(self.model_path, "variables")
-            ]
+            self.model = None
             
-            for file_path in required_files:
-                if not os.path.exists(file_path):
-                    raise FileNotFoundError(f"Не найден необходимый файл: {file_path}")
+            if self.backend in ("auto", "numpy"):
+                try:
+                    self._load_numpy_model()
+                except (ValueError, OSError) as e:
+                    # Квантованный вариант без NumPy-бэкенда не имеет смысла
+                    if self.backend == "numpy" or self.variant != "float32":
+                        raise
+                    logger.warning(f"NumPy-бэкенд не поддерживает модель ({e}), используется TensorFlow")
             
-            # Загружаем модель
-            self.model = tf.saved_model.load(self.model_path)
-            
-            # Проверяем, есть ли у модели метод __call__
-            if not hasattr(self.model, '__call__'):
-                raise RuntimeError("Модель не содержит callable метода")
+            if self.model is None:
+                self._load_tensorflow_model()
             
             self.is_loaded = True
-            print("Модель успешно загружена")
-            print(f"Тип модели: {type(self.model)}")
+            self.model_generation += 1
+            if self.cache is not None:
+                self.cache.clear()
+            logger.info(f"Модель успешно загружена (бэкенд: {self.backend_name}, веса: {self.variant})")
+            logger.debug(f"Тип модели: {type(self.model)}")
+            
+            loaded = time.perf_counter()
+            self.warm_up()
+            self.load_timings = {"загрузка": loaded - start, "прогрев": time.perf_counter() - loaded}
             
         except Exception as e:
-            print(f"Ошибка при загрузке модели из {self.model_path}: {e}")
+            logger.error(f"Ошибка при загрузке модели из {self.model_path}: {e}")
             self.is_loaded = False
             raise
     
+    def _load_numpy_model(self):
+        """Загрузка весов полносвязной модели в NumPy"""
+        self.model = load_variant(self.model_path, self.variant)
+        self.input_shape = (None,) + self.model.input_shape
+        self._infer = self.model
+        self.outputs_probabilities = self.model.activations[-1] == "softmax"
+        self.backend_name = "numpy"
+    
+    def _load_tensorflow_model(self):
+        """Загрузка SavedModel через TensorFlow"""
+        # Проверяем наличие необходимых файлов
+        required_files = [
+            os.path.join(self.model_path, "saved_model.pb"),
+            os.path.join(self.model_path, "variables")
+        ]
+        
+        for file_path in required_files:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"Не найден необходимый файл: {file_path}")
+        
+        import tensorflow as tf
+        
+        # Потоки и память задаются до первого выполнения операций
+        configure_tensorflow(tf)
+        
+        # Загружаем модель
+        self.model = tf.saved_model.load(self.model_path)
+        
+        # Однократно привязываем сигнатуру и трассируем граф инференса
+        self._infer = self._build_inference_function(tf)
+        self.backend_name = "tensorflow"
+    
+    def _build_inference_function(self, tf):
+        """
+        Построение трассируемой функции инференса
+        
+        Предпочтительно используется сигнатура serving_default: имена входа
+        и выхода определяются один раз, а вызов оборачивается в tf.function
+        с фиксированной input_signature, поэтому граф трассируется единожды.
+        
+        Args:
+            tf: модуль tensorflow
+        
+        Returns:
+            функция, принимающая numpy array (N, 28, 28, 1) и возвращающая (N, k)
+        """
+        signatures = getattr(self.model, "signatures", {})
+        
+        if "serving_default" in signatures:
+            signature = signatures["serving_default"]
+            input_specs = signature.structured_input_signature[1]
+            input_name = sorted(input_specs)[0]
+            output_name = sorted(signature.structured_outputs)[0]
+            
+            input_shape = input_specs[input_name].shape
+            if input_shape.rank == 4:
+                self.input_shape = (None,) + tuple(input_shape.as_list()[1:])
+            
+            def call(images):
+                return signature(**{input_name: images})[output_name]
+                
+        elif callable(self.model):
+            model = self.model
+            
+            def call(images):
+                prediction = model(images)
+                if isinstance(prediction, dict):
+                    prediction = prediction[sorted(prediction)[0]]
+                return prediction
+                
+        else:
+            raise RuntimeError("Модель не содержит callable метода или сигнатуры")
+        
+        traced = tf.function(
+            call,
+            input_signature=[tf.TensorSpec(self.input_shape, tf.float32)],
+            jit_compile=self.jit_compile,
+        )
+        
+        concrete = traced.get_concrete_function()
+        try:
+            self.outputs_probabilities = _graph_output_op(
+                concrete.graph.as_graph_def(), concrete.outputs[0].op.name
+            ) == "Softmax"
+        except Exception as e:
+            logger.warning(f"Не удалось определить формат выхода модели ({e}), применяется softmax")
+            self.outputs_probabilities = False
+        
+        def infer(images):
+            return traced(tf.convert_to_tensor(images)).numpy()
+        
+        return infer
+    
+    def warm_up(self, repeats=5):
+        """
+        Прогрев модели для фиксированных размеров батча
+        
+        Первый вызов включает трассировку (и XLA-компиляцию), поэтому его
+        время логируется отдельно от установившегося времени вызова.
+        
+        Args:
+            repeats: количество повторов для оценки установившегося времени
+        
+        Returns:
+            словарь {размер батча: (первый вызов, установившийся вызов)} в секундах
+        """
+        self.warmup_report = {}
+        
+        for batch_size in self.warmup_batch_sizes:
+            dummy = np.zeros((batch_size,) + self.input_shape[1:], dtype=np.float32)
+            
+            start = time.perf_counter()
+            self._run_model(dummy)
+            first_call = time.perf_counter() - start
+            
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                self._run_model(dummy)
+                timings.append(time.perf_counter() - start)
+            steady_call = float(np.median(timings))
+            
+            self.warmup_report[batch_size] = (first_call, steady_call)
+            logger.info(
+                f"Прогрев модели (батч {batch_size}): первый вызов {first_call * 1000:.1f} мс, "
+                f"установившийся {steady_call * 1000:.2f} мс"
+            )
+        
+        return self.warmup_report
+    
+    def enable_batch_queue(self, max_batch_size=32, max_wait_ms=5.0):
+        """
+        Включение очереди, объединяющей одиночные вызовы predict в батчи
+        
+        Args:
+            max_batch_size: максимальный размер батча
+            max_wait_ms: максимальное время ожидания добора батча в мс
+        """
+        self.disable_batch_queue()
+        self.batcher = MicroBatcher(self.predict_batch, max_batch_size, max_wait_ms)
+    
+    def disable_batch_queue(self):
+        """Отключение очереди батчинга"""
+        if self.batcher is not None:
+            self.batcher.close()
+            self.batcher = None
+    
+    def enable_prediction_cache(self, max_size=1024, ttl=None):
+        """
+        Включение LRU-кэша результатов для повторяющихся изображений
+        
+        Args:
+            max_size: максимальное количество записей
+            ttl: время жизни записи в секундах (None - без ограничения)
+        
+        Returns:
+            PredictionCache
+        """
+        self.cache = PredictionCache(max_size, ttl)
+        return self.cache
+    
+    def disable_prediction_cache(self):
+        """Отключение кэша результатов"""
+        self.cache = None
+    
+    def enable_cascade(self, cascade):
+        """
+        Включение каскада: уверенные ответы дает быстрая первая ступень,
+        полная модель считает только неоднозначные изображения
+        
+        Args:
+            cascade: Cascade со ступенями (см. src/cascade.py)
+        
+        Returns:
+            Cascade
+        """
+        self.cascade = cascade
+        # Ответы каскада отличаются от ответов полной модели
+        if self.cache is not None:
+            self.cache.clear()
+        return cascade
+    
+    def disable_cascade(self):
+        """Отключение каскада"""
+        self.cascade = None
+        if self.cache is not None:
+            self.cache.clear()
+    
+    def enable_tta(self, tta):
+        """
+        Включение адаптивной аугментации: для неуверенных ответов predict и
+        predict_sequence усредняют вероятности по искаженным копиям
+        изображения, прогоняемым через модель одним батчем
+        
+        Args:
+            tta: AdaptiveTTA (см. src/tta.py)
+        
+        Returns:
+            AdaptiveTTA
+        """
+        self.tta = tta
+        return tta
+    
+    def disable_tta(self):
+        """Отключение адаптивной аугментации"""
+        self.tta = None
+    
+    def _apply_tta(self, images, probabilities):
+        """Уточнение неуверенных ответов аугментацией, если она включена"""
+        tta = self.tta
+        if tta is None:
+            return probabilities
+        # Варианты не кладутся в кэш: они нужны только для усреднения
+        return tta.run(images, probabilities, self._predict_probabilities)
+    
+    def _run_model(self, images):
+        """
+        Прямой прогон батча через модель
+        
+        Args:
+            images: numpy array формы (N, 28, 28, 1)
+        
+        Returns:
+            numpy array выходов модели формы (N, k)
+        """
+        outputs = self._infer(images)
+        return np.asarray(outputs).reshape(len(images), -1)
+    
+    def predict_batch(self, images):
+        """
+        Выполнение предсказания для батча изображений
+        
+        Args:
+            images: numpy array формы (N, 28, 28, 1) или (N, 28, 28)
+        
+        Returns:
+            numpy array вероятностей формы (N, 10)
+        """
+        if not self.is_loaded:
+            raise RuntimeError("Модель не загружена")
+        
+        images = np.asarray(images, dtype=np.float32)
+        if images.ndim == 3:
+            images = images[..., np.newaxis]
+        if images.ndim != 4:
+            raise ValueError(f"Неподдерживаемая форма батча: {images.shape}")
+        if len(images) == 0:
+            return np.empty((0, 10), dtype=np.float32)
+        
+        cache = self.cache
+        if cache is None:
+            return self._predict_probabilities(images)
+        
+        # Из кэша берутся готовые строки, модель считает только промахи
+        # (одинаковые изображения внутри батча считаются один раз)
+        keys = cache.keys_for(images, self.model_generation)
+        cached = cache.get_many(keys)
+        missing = {}
+        for i, (key, row) in enumerate(zip(keys, cached)):
+            if row is None:
+                missing.setdefault(key, []).append(i)
+        
+        if not missing:
+            return np.stack(cached)
+        
+        first = [indices[0] for indices in missing.values()]
+        computed = self._predict_probabilities(images[first])
+        cache.put_many(zip(missing.keys(), computed))
+        
+        result = np.empty((len(images), computed.shape[1]), dtype=computed.dtype)
+        for row, indices in zip(computed, missing.values()):
+            result[indices] = row
+        for i, row in enumerate(cached):
+            if row is not None:
+                result[i] = row
+        return result
+    
+    def _predict_probabilities(self, images):
+        """Вероятности для батча без кэша (через каскад, если он включен)"""
+        cascade = self.cascade
+        if cascade is not None:
+            return cascade.run(images, self._predict_full)
+        return self._predict_full(images)
+    
+    def _predict_full(self, images):
+        """Вероятности полной модели для батча"""
+        with metrics.timer("inference"):
+            logits = self._run_model(images)
+        if logits.shape[1] < 10:
+            raise ValueError(f"Неправильное количество выходов: {logits.shape[1]}")
+        
+        # Модель с выходным softmax уже вернула вероятности: повторный softmax
+        # сгладил бы их, поэтому лишние выходы отбрасываются с перенормировкой
+        if self.outputs_probabilities:
+            if logits.shape[1] == 10:
+                return logits
+            probabilities = logits[:, :10]
+            return probabilities / np.maximum(probabilities.sum(axis=1, keepdims=True), 1e-12)
+        
+        # Берем первые 10 выходов если их больше
+        with metrics.timer("softmax"):
+            return softmax(logits[:, :10])
+    
     def predict(self, image_array):
         """
         Выполнение предсказания для изображения
         
         Args:
             image_array: numpy array с изображением
-            
+        
         Returns:
-            список вероятностей для каждой цифры (0-9)
+            PredictionResult с вероятностями цифр 0-9, argmax и top-k
         """
         try:
             if not self.is_loaded:
@@ -74,77 +430,112 @@ class ModelHandler:
             if image_array is None:
                 raise ValueError("Пустое изображение")
             
-            # Выполняем предсказание напрямую через модель
-            prediction = self.model(tf.constant(image_array))
-            
-            # Обрабатываем разные форматы возвращаемых значений
-            if isinstance(prediction, dict):
-                # Если результат - словарь, пробуем извлечь значения
-                output_keys = list(prediction.keys())
-                print(f"Ключи выходных данных: {output_keys}")
-                
-                # Берем первый доступный ключ
-                if output_keys:
-                    logits = prediction[output_keys[0]]
-                else:
-                    raise RuntimeError("Пустой словарь результатов")
+            if self.batcher is not None:
+                # Одиночный запрос объединяется с конкурентными в общий батч
+                image = np.asarray(image_array, dtype=np.float32)
+                if image.ndim == 4:
+                    image = image[0]
+                probabilities = self.batcher.predict(image)
             else:
-                # Если результат - тензор
-                logits = prediction
-            
-            # Конвертируем в numpy
-            if hasattr(logits, 'numpy'):
-                logits_array = logits.numpy()
-            else:
-                logits_array = np.array(logits)
-            
-            print(f"Форма выходного тензора: {logits_array.shape}")
-            
-            # Обрабатываем различные формы тензора
-            if len(logits_array.shape) == 2 and logits_array.shape[0] == 1 and logits_array.shape[1] == 10:
-                # Форма (1, 10) - логиты для батча из 1 элемента
-                flat_logits = logits_array[0]
-            elif len(logits_array.shape) == 1 and logits_array.shape[0] == 10:
-                # Форма (10,) - логиты
-                flat_logits = logits_array
-            elif len(logits_array.shape) > 1:
-                # Многомерный тензор - пытаемся преобразовать
-                flat_logits = logits_array.flatten()
-                if len(flat_logits) != 10:
-                    # Берем первые 10 элементов если их больше
-                    if len(flat_logits) > 10:
-                        flat_logits = flat_logits[:10]
-                    else:
-                        raise ValueError(f"Неправильное количество выходов: {len(flat_logits)}")
-            else:
-                raise ValueError(f"Неподдерживаемая форма тензора: {logits_array.shape}")
-            
-            # Применяем softmax для получения вероятностей
-            probabilities = tf.nn.softmax(flat_logits).numpy()
+                probabilities = self.predict_batch(image_array)[0]
             
-            return probabilities.tolist()
+            return PredictionResult(self._apply_tta(image_array, probabilities[np.newaxis])[0])
             
         except Exception as e:
-            print(f"Ошибка при выполнении предсказания: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Ошибка при выполнении предсказания: {e}")
             # Возвращаем равномерные вероятности в случае ошибки
-            return [0.1] * 10
+            return PredictionResult.uniform()
+    
+    def predict_sequence(self, images, boxes=None):
+        """
+        Распознавание нескольких цифр одного числа
+        
+        Все цифры проходят через модель одним вызовом predict_batch, поэтому
+        время растет с количеством цифр значительно медленнее линейного.
+        
+        Args:
+            images: numpy array формы (N, 28, 28) или (N, 28, 28, 1), цифры слева направо
+            boxes: рамки цифр на холсте, сохраняются в результате
+        
+        Returns:
+            SequenceResult с PredictionResult для каждой цифры
+        """
+        try:
+            probabilities = self._apply_tta(images, self.predict_batch(images))
+            return SequenceResult.from_probabilities(probabilities, boxes)
+        except Exception as e:
+            logger.exception(f"Ошибка при распознавании числа: {e}")
+            return SequenceResult([PredictionResult.uniform() for _ in range(len(images))], boxes)
     
     def get_prediction_result(self, probabilities):
         """
         Получение результата предсказания (цифра с наибольшей вероятностью)
         
         Args:
-            probabilities: список вероятностей
-            
+            probabilities: PredictionResult или список вероятностей
+        
         Returns:
             индекс цифры с максимальной вероятностью
         """
         try:
-            if not probabilities:
+            if isinstance(probabilities, PredictionResult):
+                return probabilities.digit
+            if probabilities is None or len(probabilities) == 0:
                 return -1
             return int(np.argmax(probabilities))
         except Exception as e:
-            print(f"Ошибка при определении результата: {e}")
+            logger.error(f"Ошибка при определении результата: {e}")
             return -1
+
+
+def softmax(logits):
+    """
+    Численно устойчивый softmax по последней оси
+    
+    Args:
+        logits: numpy array формы (N, k)
+    
+    Returns:
+        numpy array вероятностей той же формы
+    """
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def _graph_output_op(graph_def, node_name):
+    """
+    Тип операции, вычисляющей выход графа
+    
+    Проходит назад через Identity и вызовы функций (StatefulPartitionedCall)
+    библиотеки графа, пока не встретит содержательную операцию.
+    
+    Args:
+        graph_def: GraphDef трассированной функции инференса
+        node_name: имя узла выхода
+    
+    Returns:
+        тип операции, например "Softmax" или "BiasAdd"
+    """
+    functions = {function.signature.name: function for function in graph_def.library.function}
+    nodes = {node.name: node for node in graph_def.node}
+    output_index = 0
+    
+    for _ in range(256):
+        node = nodes[node_name]
+        if node.op in _PASSTHROUGH_OPS:
+            reference = node.input[output_index]
+        elif node.op in _CALL_OPS:
+            function = functions[node.attr["f"].func.name]
+            output = function.signature.output_arg[output_index].name
+            reference = function.ret[output]
+            nodes = {inner.name: inner for inner in function.node_def}
+        else:
+            return node.op
+        
+        # Ссылки имеют вид "узел", "узел:индекс" или "узел:выход:индекс"
+        parts = reference.split(":")
+        node_name = parts[0]
+        output_index = int(parts[-1]) if len(parts) > 1 else 0
+    
+    raise ValueError("Слишком длинная цепочка операций выхода")
@@ -0,0 +1,111 @@
+"""Фоновая загрузка модели без блокировки потока GUI"""
+
+import time
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class ModelLoaderSignals(QObject):
+    """Сигналы задачи загрузки (QRunnable не является QObject)"""
+    
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(str)
+
+
+class ModelLoadTask(QRunnable):
+    """Импорт модуля модели и создание ModelHandler в рабочем потоке"""
+    
+    def __init__(self, model_path, handler_kwargs):
+        """
+        Инициализация задачи
+        
+        Args:
+            model_path: путь к директории модели
+            handler_kwargs: дополнительные аргументы ModelHandler
+        """
+        super().__init__()
+        self.model_path = model_path
+        self.handler_kwargs = handler_kwargs
+        self.signals = ModelLoaderSignals()
+    
+    def run(self):
+        """Загрузка модели в рабочем потоке"""
+        try:
+            start = time.perf_counter()
+            # Модуль модели (и при необходимости TensorFlow) импортируется
+            # только здесь, чтобы не задерживать появление окна
+            from src.model_handler import ModelHandler
+            imported = time.perf_counter()
+            
+            handler = ModelHandler(self.model_path, **self.handler_kwargs)
+            loaded = time.perf_counter()
+            
+            timings = {
+                "импорт модуля модели": imported - start,
+                "загрузка и прогрев модели": loaded - imported,
+            }
+            self.signals.finished.emit(handler, timings)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+
+
+class ModelLoader(QObject):
+    """
+    Загрузчик модели в отдельном потоке
+    
+    Сигнал ready приходит в поток GUI с готовым ModelHandler (даже если
+    модель не удалось загрузить - это видно по is_loaded), сигнал failed -
+    при исключении во время импорта или создания обработчика.
+    """
+    
+    ready = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    
+    def __init__(self, parent=None):
+        """
+        Инициализация загрузчика
+        
+        Args:
+            parent: родительский QObject
+        """
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.timings = {}
+        self.handler = None
+        self.loading = False
+    
+    def load(self, model_path, **handler_kwargs):
+        """
+        Запуск загрузки модели
+        
+        Args:
+            model_path: путь к директории модели
+            **handler_kwargs: аргументы ModelHandler (backend, jit_compile, ...)
+        """
+        self.loading = True
+        task = ModelLoadTask(model_path, handler_kwargs)
+        task.signals.finished.connect(self._on_finished)
+        task.signals.failed.connect(self._on_failed)
+        self.pool.start(task)
+    
+    def wait(self, timeout_ms=-1):
+        """
+        Ожидание завершения загрузки
+        
+        Нужно вызвать до удаления загрузчика: деструктор пула ждет рабочий
+        поток, не отпуская GIL, а поток при завершении задачи его запрашивает.
+        """
+        return self.pool.waitForDone(timeout_ms)
+    
+    def _on_finished(self, handler, timings):
+        """Передача загруженного обработчика в поток GUI"""
+        self.loading = False
+        self.handler = handler
+        self.timings = timings
+        self.ready.emit(handler)
+    
+    def _on_failed(self, message):
+        """Передача ошибки загрузки"""
+        self.loading = False
+        self.failed.emit(message)
@@ -0,0 +1,209 @@
+"""Реестр версий модели для горячей замены без перезапуска приложения
+
+Версии лежат в подкаталогах общей директории, имя подкаталога - номер
+версии (как в TensorFlow Serving): models/1, models/2 или models/v3.
+Реестр только выбирает версии и хранит загруженные обработчики: загрузка
+и прогрев выполняются вызывающим кодом в фоне (в GUI - ModelLoader), а
+activate() лишь подменяет ссылку на активную версию, поэтому запросы,
+уже получившие обработчик, дорабатывают на нем без ожидания.
+
+Пример:
+    registry = ModelRegistry("models")
+    update = registry.next_version()
+    if update is not None:
+        version, path = update
+        registry.activate(version, path, ModelHandler(path))
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from src.numpy_backend import WEIGHTS_CACHE_NAME
+
+logger = logging.getLogger(__name__)
+
+VERSION_PATTERN = re.compile(r"^v?(\d+)$")
+
+# Файлы, по которым подкаталог считается моделью
+MODEL_MARKERS = ("saved_model.pb", WEIGHTS_CACHE_NAME)
+
+
+def list_versions(models_dir, settle_seconds=0.0):
+    """
+    Версии моделей в директории
+    
+    Args:
+        models_dir: директория с подкаталогами версий
+        settle_seconds: пропускать версии, измененные позже этого
+            количества секунд назад (модель еще копируется)
+    
+    Returns:
+        список (номер версии, путь) по возрастанию номера
+    """
+    try:
+        entries = list(os.scandir(models_dir))
+    except OSError:
+        return []
+    
+    now = time.time()
+    versions = []
+    for entry in entries:
+        match = VERSION_PATTERN.match(entry.name)
+        if match is None or not entry.is_dir():
+            continue
+        markers = [os.path.join(entry.path, name) for name in MODEL_MARKERS]
+        existing = [path for path in markers if os.path.exists(path)]
+        if not existing:
+            continue
+        if settle_seconds > 0:
+            modified = max(os.path.getmtime(path) for path in existing + [entry.path])
+            if now - modified < settle_seconds:
+                continue
+        versions.append((int(match.group(1)), entry.path))
+    return sorted(versions)
+
+
+class ModelVersion:
+    """Загруженная версия модели"""
+    
+    __slots__ = ("version", "path", "handler", "timings", "activated_at")
+    
+    def __init__(self, version, path, handler, timings=None):
+        """
+        Инициализация записи
+        
+        Args:
+            version: номер версии
+            path: директория модели
+            handler: загруженный ModelHandler
+            timings: словарь {этап: секунды} загрузки и прогрева
+        """
+        self.version = version
+        self.path = path
+        self.handler = handler
+        self.timings = dict(timings or {})
+        self.activated_at = None
+    
+    def __repr__(self):
+        return f"ModelVersion({self.version}, {self.path!r})"
+
+
+class ModelRegistry:
+    """
+    Активная версия модели и предыдущие версии для мгновенного отката
+    
+    Версия, загрузка которой не удалась, и версия, от которой откатились,
+    больше не предлагаются next_version(), пока в директории не появится
+    более новая.
+    """
+    
+    def __init__(self, models_dir, history=1, settle_seconds=2.0):
+        """
+        Инициализация реестра
+        
+        Args:
+            models_dir: директория с подкаталогами версий
+            history: сколько предыдущих версий держать загруженными для отката
+            settle_seconds: минимальный возраст версии перед загрузкой
+        """
+        self.models_dir = models_dir
+        self.settle_seconds = settle_seconds
+        self.active = None
+        self.previous = deque(maxlen=history)
+        self.skipped = set()
+        self._lock = threading.Lock()
+    
+    def next_version(self):
+        """
+        Самая новая версия, которую стоит загрузить
+        
+        Returns:
+            (номер версии, путь) или None, если новее активной версии нет
+        """
+        active = self.active
+        current = active.version if active is not None else None
+        for version, path in reversed(list_versions(self.models_dir, self.settle_seconds)):
+            if current is not None and version <= current:
+                return None
+            if version not in self.skipped:
+                return version, path
+        return None
+    
+    def mark_failed(self, version):
+        """Исключение версии, которую не удалось загрузить"""
+        with self._lock:
+            self.skipped.add(version)
+        logger.warning(f"Версия модели {version} пропущена")
+    
+    def activate(self, version, path, handler, timings=None):
+        """
+        Подмена активной версии загруженной и прогретой моделью
+        
+        Args:
+            version: номер версии
+            path: директория модели
+            handler: ModelHandler с загруженной моделью
+            timings: словарь {этап: секунды} загрузки и прогрева
+        
+        Returns:
+            ModelVersion новой активной версии
+        
+        Raises:
+            ValueError: если модель в handler не загружена
+        """
+        if not handler.is_loaded:
+            self.mark_failed(version)
+            raise ValueError(f"Модель версии {version} не загружена: {path}")
+        
+        entry = ModelVersion(version, path, handler, timings)
+        with self._lock:
+            if self.active is not None:
+                self.previous.append(self.active)
+            entry.activated_at = time.time()
+            self.active = entry
+        logger.info(f"Активна версия модели {version} ({path})")
+        return entry
+    
+    def rollback(self):
+        """
+        Возврат к предыдущей версии без повторной загрузки
+        
+        Текущая версия больше не предлагается для автоматической загрузки.
+        
+        Returns:
+            ModelVersion восстановленной версии
+        
+        Raises:
+            RuntimeError: если предыдущей версии нет
+        """
+        with self._lock:
+            if not self.previous:
+                raise RuntimeError("Нет предыдущей версии модели для отката")
+            rejected = self.active
+            self.active = self.previous.pop()
+            self.active.activated_at = time.time()
+            if rejected is not None:
+                self.skipped.add(rejected.version)
+        logger.info(f"Откат модели: версия {rejected.version if rejected else '-'} -> {self.active.version}")
+        return self.active
+    
+    def status(self):
+        """
+        Состояние реестра для интерфейса и журнала
+        
+        Returns:
+            словарь: active (номер или None), previous (список номеров),
+            skipped (список номеров), timings активной версии
+        """
+        with self._lock:
+            active = self.active
+            return {
+                "active": active.version if active is not None else None,
+                "previous": [entry.version for entry in self.previous],
+                "skipped": sorted(self.skipped),
+                "timings": dict(active.timings) if active is not None else {},
+            }
@@ -0,0 +1,392 @@
+"""Инференс полносвязной модели MNIST на чистом NumPy"""
+
+import hashlib
+import logging
+import os
+import re
+import tempfile
+
+import numpy as np
+
+from src.tensor_bundle import (
+    checkpoint_prefix, read_checkpoint, read_graph_functions, read_keras_metadata
+)
+
+logger = logging.getLogger(__name__)
+
+# Имя файла кэша весов внутри директории модели
+WEIGHTS_CACHE_NAME = "numpy_weights.npz"
+
+_LAYER_VARIABLE = re.compile(r"^(.+)/(_?kernel|bias)/\.ATTRIBUTES/VARIABLE_VALUE$")
+_SERVICE_PREFIXES = ("optimizer/", "save_counter/", "_CHECKPOINTABLE_OBJECT_GRAPH")
+
+_ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0.0, out=x),
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "tanh": np.tanh,
+    "softmax": lambda x: _softmax(x),
+}
+
+# Операции активаций в графе SavedModel
+_GRAPH_ACTIVATIONS = {"Relu": "relu", "Sigmoid": "sigmoid", "Tanh": "tanh", "Softmax": "softmax"}
+_BIAS_OPS = ("BiasAdd", "Add", "AddV2")
+
+# Слои Keras без весов, не меняющие результат инференса
+_PASSIVE_LAYERS = ("InputLayer", "Flatten", "Dropout")
+
+
+class UnsupportedModelError(ValueError):
+    """Граф модели не может быть выполнен NumPy-бэкендом"""
+
+
+def _softmax(x):
+    """Численно устойчивый softmax по последней оси"""
+    x = x - x.max(axis=-1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=-1, keepdims=True)
+    return x
+
+
+def write_npz(path, arrays):
+    """Атомарная запись массивов в файл .npz"""
+    # Пишем во временный файл, чтобы параллельный запуск не прочитал обрывок;
+    # имя уникально, иначе процессы пула и CLI пишут в один и тот же файл
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp.npz", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as stream:
+            np.savez(stream, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def file_fingerprint(path):
+    """
+    Отпечаток содержимого файла (SHA-1) или None, если файла нет
+    
+    Кэши весов хранят отпечаток файла, из которого получены, и
+    пересоздаются, когда модель обновлена на месте.
+    """
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha1()
+    with open(path, "rb") as stream:
+        for block in iter(lambda: stream.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_fingerprint(model_path):
+    """Отпечаток чекпоинта variables/ модели (None, если чекпоинта нет)"""
+    # Индекс содержит контрольные суммы всех переменных и меняется вместе с весами
+    return file_fingerprint(checkpoint_prefix(model_path) + ".index")
+
+
+def _metadata_activations(metadata):
+    """Активации Dense-слоев из конфигурации модели Keras"""
+    layers = metadata.get("config", {}).get("layers")
+    if not isinstance(layers, list):
+        raise UnsupportedModelError("В метаданных Keras нет списка слоев")
+    
+    activations = []
+    for layer in layers:
+        class_name = layer.get("class_name")
+        activation = layer.get("config", {}).get("activation", "linear")
+        if isinstance(activation, dict):
+            activation = activation.get("config")
+        if class_name == "Dense":
+            activations.append(activation)
+        elif class_name == "Activation" and activations and activations[-1] == "linear":
+            activations[-1] = activation
+        elif class_name not in _PASSIVE_LAYERS:
+            raise UnsupportedModelError(f"Неподдерживаемый слой модели: {class_name}")
+    return activations
+
+
+def _function_activations(nodes):
+    """
+    Активации Dense-слоев одной функции графа (None, если в ней нет MatMul)
+    
+    От каждого MatMul проходим вперед: BiasAdd, затем операция активации
+    или следующий MatMul (линейная активация).
+    """
+    consumers = {}
+    for name, op, inputs in nodes:
+        for reference in inputs:
+            if not reference.startswith("^"):
+                consumers.setdefault(reference.split(":")[0], []).append((name, op))
+    
+    def follow(name):
+        # Единственный потребитель узла, минуя Identity
+        while True:
+            found = consumers.get(name, [])
+            if len(found) != 1:
+                return None
+            if found[0][1] != "Identity":
+                return found[0]
+            name = found[0][0]
+    
+    layers = {}
+    for name, op, _ in nodes:
+        if op != "MatMul":
+            continue
+        bias = follow(name)
+        if bias is None or bias[1] not in _BIAS_OPS:
+            raise UnsupportedModelError(f"После {name} нет прибавления смещения")
+        after = follow(bias[0])
+        if after is not None and after[1] in _GRAPH_ACTIVATIONS:
+            activation = _GRAPH_ACTIVATIONS[after[1]]
+            after = follow(after[0])
+        else:
+            activation = "linear"
+        if after is not None and after[1] != "MatMul":
+            raise UnsupportedModelError(f"Неподдерживаемая операция графа: {after[1]}")
+        layers[name] = (activation, after[0] if after is not None else None)
+    
+    if not layers:
+        return None
+    following = {next_layer for _, next_layer in layers.values()}
+    first = [name for name in layers if name not in following]
+    if len(first) != 1:
+        raise UnsupportedModelError("Слои графа не образуют последовательную цепочку")
+    
+    activations = []
+    name = first[0]
+    while name is not None and len(activations) < len(layers):
+        activation, name = layers[name]
+        activations.append(activation)
+    return activations
+
+
+def read_activations(model_path):
+    """
+    Активации Dense-слоев модели
+    
+    Берутся из keras_metadata.pb, а если его нет - из операций графа
+    saved_model.pb: имена активаций в переменных чекпоинта не записаны.
+    
+    Args:
+        model_path: путь к директории SavedModel
+    
+    Returns:
+        список имен активаций по слоям
+    
+    Raises:
+        UnsupportedModelError: активации не удалось определить
+    """
+    try:
+        metadata = read_keras_metadata(model_path)
+        if metadata is not None:
+            return _metadata_activations(metadata)
+        functions = read_graph_functions(model_path)
+    except UnsupportedModelError:
+        raise
+    except (OSError, ValueError, IndexError) as e:
+        raise UnsupportedModelError(f"Не удалось прочитать граф модели: {e}") from e
+    
+    # Функции инференса (serving_default, __call__) должны давать одну цепочку
+    found = {tuple(activations) for activations in map(_function_activations, functions.values())
+             if activations is not None}
+    if len(found) != 1:
+        raise UnsupportedModelError("Не удалось определить активации слоев по графу модели")
+    return list(found.pop())
+
+
+def _layer_order(prefix):
+    """Ключ сортировки слоев по числовым компонентам пути"""
+    return tuple(int(number) for number in re.findall(r"\d+", prefix)), prefix
+
+
+class NumpyDenseModel:
+    """
+    Модель Flatten -> Dense -> ... -> Dense, выполняемая векторизованным NumPy
+    
+    Скрытые слои по умолчанию используют relu, выходной - softmax, как в
+    модели из create_test_model.py. При загрузке SavedModel активации
+    читаются из модели и сохраняются в кэше весов под ключом "activations".
+    """
+    
+    def __init__(self, kernels, biases, activations=None, input_shape=(28, 28, 1)):
+        """
+        Инициализация модели
+        
+        Args:
+            kernels: список матриц весов (in, out)
+            biases: список векторов смещений (out,)
+            activations: список имен активаций по слоям
+            input_shape: форма одного входного изображения
+        """
+        if not kernels or len(kernels) != len(biases):
+            raise UnsupportedModelError("Модель должна состоять из Dense слоев с весами и смещениями")
+        
+        if activations is None:
+            activations = ["relu"] * (len(kernels) - 1) + ["softmax"]
+        activations = [str(name) for name in activations]
+        if len(activations) != len(kernels):
+            raise UnsupportedModelError("Количество активаций не совпадает с количеством слоев")
+        
+        unknown = [name for name in activations if name not in _ACTIVATIONS]
+        if unknown:
+            raise UnsupportedModelError(f"Неподдерживаемые активации: {unknown}")
+        
+        in_features = int(np.prod(input_shape))
+        for kernel, bias in zip(kernels, biases):
+            if kernel.ndim != 2 or bias.shape != (kernel.shape[1],):
+                raise UnsupportedModelError(f"Неподдерживаемая форма слоя: {kernel.shape}")
+            if kernel.shape[0] != in_features:
+                raise UnsupportedModelError(
+                    f"Слой ожидает {kernel.shape[0]} входов, получено {in_features}"
+                )
+            in_features = kernel.shape[1]
+        
+        self.kernels = [np.ascontiguousarray(kernel, dtype=np.float32) for kernel in kernels]
+        self.biases = [np.ascontiguousarray(bias, dtype=np.float32) for bias in biases]
+        self.activations = activations
+        self.input_shape = tuple(input_shape)
+        self.output_size = in_features
+        # Формат хранения весов, из которого загружена модель (см. src/quantization.py)
+        self.variant = "float32"
+        # Отпечаток исходных весов, из которых получен файл .npz
+        self.source = None
+    
+    @classmethod
+    def from_variables(cls, variables, activations=None):
+        """
+        Построение модели из переменных чекпоинта
+        
+        Args:
+            variables: словарь {имя переменной: numpy array}
+            activations: список имен активаций по слоям (см. read_activations)
+        
+        Returns:
+            NumpyDenseModel
+        """
+        layers = {}
+        for name, value in variables.items():
+            if name.startswith(_SERVICE_PREFIXES):
+                continue
+            
+            match = _LAYER_VARIABLE.match(name)
+            if match is None:
+                # BatchNorm, свертки и прочие переменные NumPy-бэкенд не выполняет
+                raise UnsupportedModelError(f"Неподдерживаемая переменная модели: {name}")
+            
+            prefix, kind = match.groups()
+            layers.setdefault(prefix, {})[kind.lstrip("_")] = value
+        
+        kernels, biases = [], []
+        for prefix in sorted(layers, key=_layer_order):
+            layer = layers[prefix]
+            if "kernel" not in layer or "bias" not in layer:
+                raise UnsupportedModelError(f"Слой {prefix} без весов или смещений")
+            kernels.append(layer["kernel"])
+            biases.append(layer["bias"])
+        
+        return cls(kernels, biases, activations)
+    
+    @classmethod
+    def load(cls, model_path, use_cache=True):
+        """
+        Загрузка весов из директории SavedModel
+        
+        Сначала используется кэш numpy_weights.npz, если он получен из
+        текущего чекпоинта variables/ (или чекпоинта нет), иначе веса
+        читаются из чекпоинта, активации - из графа модели, и кэш
+        сохраняется для следующих запусков.
+        
+        Args:
+            model_path: путь к директории модели
+            use_cache: читать и сохранять ли кэш .npz
+        
+        Returns:
+            NumpyDenseModel
+        """
+        cache_path = os.path.join(model_path, WEIGHTS_CACHE_NAME)
+        prefix = checkpoint_prefix(model_path)
+        source = source_fingerprint(model_path)
+        
+        if use_cache and os.path.exists(cache_path):
+            model = cls.load_npz(cache_path)
+            if source is None or model.source == source:
+                return model
+            logger.info(f"Кэш весов {cache_path} устарел, веса читаются из чекпоинта")
+        
+        if source is None:
+            raise FileNotFoundError(f"Не найден чекпоинт модели: {prefix}.index")
+        
+        model = cls.from_variables(read_checkpoint(prefix), read_activations(model_path))
+        model.source = source
+        
+        if use_cache:
+            try:
+                model.save_npz(cache_path)
+            except OSError as e:
+                logger.error(f"Не удалось сохранить кэш весов {cache_path}: {e}")
+        
+        return model
+    
+    @classmethod
+    def load_npz(cls, path):
+        """
+        Загрузка модели из файла .npz
+        
+        Квантованные веса (int8 с масштабами kernel_scale_i или float16)
+        один раз переводятся во float32 при загрузке: матричное умножение
+        NumPy быстрое только для float32/float64.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            count = int(data["num_layers"])
+            kernels = []
+            for i in range(count):
+                kernel = data[f"kernel_{i}"].astype(np.float32)
+                if f"kernel_scale_{i}" in data:
+                    kernel *= data[f"kernel_scale_{i}"]
+                kernels.append(kernel)
+            biases = [data[f"bias_{i}"] for i in range(count)]
+            activations = list(data["activations"]) if "activations" in data else None
+            input_shape = tuple(data["input_shape"]) if "input_shape" in data else (28, 28, 1)
+            variant = str(data["variant"]) if "variant" in data else "float32"
+            source = str(data["source"]) if "source" in data else None
+        
+        model = cls(kernels, biases, activations, input_shape)
+        model.variant = variant
+        model.source = source
+        return model
+    
+    def npz_arrays(self):
+        """Массивы для сохранения модели в .npz (веса float32)"""
+        arrays = {
+            "num_layers": np.array(len(self.kernels)),
+            "activations": np.array(self.activations),
+            "input_shape": np.array(self.input_shape),
+        }
+        if self.source is not None:
+            arrays["source"] = np.array(self.source)
+        for i, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            arrays[f"kernel_{i}"] = kernel
+            arrays[f"bias_{i}"] = bias
+        return arrays
+    
+    def save_npz(self, path):
+        """Сохранение весов и активаций в файл .npz"""
+        write_npz(path, self.npz_arrays())
+    
+    def __call__(self, images):
+        """
+        Прямой проход батча
+        
+        Args:
+            images: numpy array формы (N, 28, 28, 1)
+        
+        Returns:
+            numpy array выходов модели формы (N, 10)
+        """
+        x = np.asarray(images, dtype=np.float32).reshape(len(images), -1)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            x = x @ kernel
+            x += bias
+            x = _ACTIVATIONS[activation](x)
+        return x
@@ -0,0 +1,86 @@
+"""Панель производительности поверх главного окна"""
+
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import QLabel
+
+from src.instrumentation import STAGES
+
+
+class PerfOverlay(QLabel):
+    """
+    Полупрозрачная панель с задержками этапов и временем кадров
+    
+    Пока панель показана, инструментация включена; при скрытии
+    восстанавливается прежнее состояние, чтобы горячие пути снова
+    работали без замеров.
+    """
+    
+    def __init__(self, parent, metrics, frame_stats, refresh_ms=500):
+        """
+        Инициализация панели
+        
+        Args:
+            parent: окно, поверх которого показывается панель
+            metrics: Instrumentation с таймерами этапов
+            frame_stats: FrameStats холста
+            refresh_ms: период обновления в мс
+        """
+        super().__init__(parent)
+        self.metrics = metrics
+        self.frame_stats = frame_stats
+        self._was_enabled = metrics.enabled
+        
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop)
+        self.setStyleSheet(
+            "background-color: rgba(0, 0, 0, 170); color: #b8f5b0; "
+            "font-family: monospace; font-size: 11px; padding: 6px; border-radius: 4px;"
+        )
+        
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(refresh_ms)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.hide()
+    
+    def toggle(self):
+        """Показ или скрытие панели"""
+        self.set_visible(not self.isVisible())
+    
+    def set_visible(self, visible):
+        """Показ панели с включением инструментации или скрытие"""
+        if visible == self.isVisible():
+            return
+        if visible:
+            self._was_enabled = self.metrics.enabled
+            self.metrics.enabled = True
+            self.refresh()
+            self.show()
+            self.raise_()
+            self.refresh_timer.start()
+        else:
+            self.refresh_timer.stop()
+            self.metrics.enabled = self._was_enabled
+            self.hide()
+    
+    def format_text(self):
+        """Текст панели по текущему состоянию таймеров"""
+        timers = self.metrics.snapshot()["timers"]
+        lines = [f"{'этап':11s} {'посл.':>7s} {'p50':>7s} {'p95':>7s}  мс"]
+        for stage in STAGES + tuple(sorted(set(timers) - set(STAGES))):
+            stats = timers.get(stage)
+            if stats is None:
+                lines.append(f"{stage:11s} {'-':>7s} {'-':>7s} {'-':>7s}")
+            else:
+                lines.append(f"{stage:11s} {stats['last_ms']:7.3f} {stats['p50_ms']:7.3f} "
+                             f"{stats['p95_ms']:7.3f}")
+        
+        frames = self.frame_stats.summary()
+        lines.append(f"кадры: {frames['fps']:.0f} fps, отрисовка {frames['paint_mean_ms']:.3f} мс "
+                     f"(p95 {frames['paint_p95_ms']:.3f})")
+        return "\n".join(lines)
+    
+    def refresh(self):
+        """Обновление текста и положения панели"""
+        self.setText(self.format_text())
+        self.adjustSize()
+        self.move(self.parentWidget().width() - self.width() - 8, 8)
@@ -0,0 +1,146 @@
+"""LRU-кэш результатов распознавания по хэшу квантованного изображения"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """
+    Потокобезопасный LRU-кэш вероятностей с ограничением размера и TTL
+    
+    Ключ - изображение 28x28, квантованное до uint8, вместе с номером
+    поколения модели: после перезагрузки модели старые записи перестают
+    совпадать с ключами и вытесняются, даже если запрос был начат до
+    перезагрузки.
+    """
+    
+    def __init__(self, max_size=1024, ttl=None):
+        """
+        Инициализация кэша
+        
+        Args:
+            max_size: максимальное количество записей
+            ttl: время жизни записи в секундах (None - без ограничения)
+        """
+        if max_size < 1:
+            raise ValueError("max_size должен быть положительным")
+        
+        self.max_size = int(max_size)
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    @staticmethod
+    def keys_for(images, generation=0):
+        """
+        Ключи кэша для батча изображений
+        
+        Ключ - квантованные байты изображения: хэш по ним считает сам
+        словарь (SipHash), это в несколько раз быстрее криптографического
+        хэша, а коллизии исключены полным сравнением ключей.
+        
+        Args:
+            images: numpy array [0, 1] формы (N, ...)
+            generation: номер поколения модели
+        
+        Returns:
+            список ключей (поколение, форма, байты) длиной N
+        """
+        # Квантование до 256 уровней: неразличимые для модели отличия
+        # в младших разрядах float не порождают промахов
+        scaled = np.multiply(images, 255.0, dtype=np.float32)
+        scaled += 0.5
+        np.clip(scaled, 0.0, 255.0, out=scaled)
+        quantized = scaled.astype(np.uint8)
+        
+        shape = quantized.shape[1:]
+        return [(generation, shape, row.tobytes()) for row in quantized.reshape(len(quantized), -1)]
+    
+    def get(self, key):
+        """
+        Значение по ключу с обновлением порядка LRU
+        
+        Returns:
+            сохраненное значение или None при промахе
+        """
+        return self.get_many([key])[0]
+    
+    def get_many(self, keys):
+        """
+        Значения для списка ключей за одну блокировку
+        
+        Returns:
+            список значений (None для промахов)
+        """
+        now = time.monotonic() if self.ttl is not None else None
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                    values.append(None)
+                    continue
+                
+                value, expires = entry
+                if expires is not None and now > expires:
+                    del self._entries[key]
+                    self.expirations += 1
+                    self.misses += 1
+                    values.append(None)
+                    continue
+                
+                self._entries.move_to_end(key)
+                self.hits += 1
+                values.append(value)
+        return values
+    
+    def put(self, key, value):
+        """Сохранение значения с вытеснением самых старых записей"""
+        self.put_many([(key, value)])
+    
+    def put_many(self, items):
+        """Сохранение пар (ключ, значение) за одну блокировку"""
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            for key, value in items:
+                self._entries[key] = (value, expires)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Удаление всех записей (счетчики сохраняются)"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        """
+        Счетчики кэша
+        
+        Returns:
+            словарь с размером, попаданиями, промахами, вытеснениями,
+            истекшими записями и долей попаданий
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -1,8 +1,15 @@
 """Виджет для отображения результатов предсказания"""
 
+import logging
+
+import numpy as np
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QProgressBar
 from PyQt6.QtCore import Qt
 
+from src.prediction_result import PredictionResult, SequenceResult
+
+logger = logging.getLogger(__name__)
+
 
 class PredictionDisplay(QWidget):
     """Виджет для отображения результатов распознавания"""
@@ -20,6 +27,12 @@ class PredictionDisplay(QWidget):
         self.result_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.result_label.setStyleSheet("font-size: 16px; font-weight: bold;")
         
+        # Уверенность каждой цифры числа (скрыта для одной цифры)
+        self.details_label = QLabel()
+        self.details_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.details_label.setWordWrap(True)
+        self.details_label.hide()
+        
         # Настройка интерфейса
         self.setup_ui()
     
@@ -28,6 +41,7 @@ class PredictionDisplay(QWidget):
         try:
             layout = QVBoxLayout()
             layout.addWidget(self.result_label)
+            layout.addWidget(self.details_label)
             
             # Создаем прогресс-бары для каждой цифры (0-9)
             for i in range(10):
@@ -52,39 +66,72 @@ class PredictionDisplay(QWidget):
             self.setLayout(layout)
             
         except Exception as e:
-            print(f"Ошибка при настройке интерфейса: {e}")
+            logger.error(f"Ошибка при настройке интерфейса: {e}")
     
-    def update_predictions(self, probabilities):
+    def update_predictions(self, result):
         """
         Обновление отображения результатов
         
         Args:
-            probabilities: список вероятностей для каждой цифры
+            result: PredictionResult (список вероятностей оборачивается в него)
+                или SequenceResult для числа из нескольких цифр
         """
         try:
-            if not probabilities or len(probabilities) != 10:
+            if isinstance(result, SequenceResult):
+                self.update_sequence(result)
                 return
+            if result is None or len(result) != 10:
+                return
+            if not isinstance(result, PredictionResult):
+                result = PredictionResult(result)
             
-            # Обновляем прогресс-бары
-            for i, (progress_bar, probability) in enumerate(zip(self.progress_bars, probabilities)):
-                percentage = int(probability * 100)
-                progress_bar.setValue(percentage)
-                progress_bar.setFormat(f"{percentage}%")
-            
-            # Определяем цифру с максимальной вероятностью
-            max_prob_index = probabilities.index(max(probabilities))
-            max_probability = max(probabilities)
+            # Проценты считаются одной векторной операцией, цифра и ее
+            # вероятность уже вычислены в результате
+            self.set_probabilities(result)
+            self.details_label.hide()
             
             # Обновляем метку результата
             self.result_label.setText(
-                f"Результат: {max_prob_index} "
-                f"(вероятность: {max_probability:.2%})"
+                f"Результат: {result.digit} "
+                f"(вероятность: {result.confidence:.2%})"
             )
             
         except Exception as e:
-            print(f"Ошибка при обновлении результатов: {e}")
+            logger.error(f"Ошибка при обновлении результатов: {e}")
             self.result_label.setText("Ошибка при распознавании")
     
+    def update_sequence(self, result):
+        """
+        Отображение числа из нескольких цифр
+        
+        Шкалы показывают распределение наименее уверенной цифры: именно
+        она чаще всего делает ошибочным все число.
+        
+        Args:
+            result: SequenceResult
+        """
+        weakest = result.least_confident
+        if weakest is None:
+            return
+        self.set_probabilities(weakest)
+        
+        self.result_label.setText(
+            f"Результат: {result.text} "
+            f"(вероятность: {result.confidence:.2%})"
+        )
+        self.details_label.setText("   ".join(
+            f"{digit.digit}: {digit.confidence:.0%}" for digit in result.digits
+        ) + f"\nШкалы - цифра №{result.digits.index(weakest) + 1} (наименее уверенная)")
+        self.details_label.show()
+    
+    def set_probabilities(self, result):
+        """Заполнение шкал вероятностями PredictionResult"""
+        # Проценты считаются одной векторной операцией
+        percentages = (result.probabilities * 100).astype(np.int32).tolist()
+        for progress_bar, percentage in zip(self.progress_bars, percentages):
+            progress_bar.setValue(percentage)
+            progress_bar.setFormat(f"{percentage}%")
+    
     def clear_predictions(self):
         """Очистка отображения результатов"""
         try:
@@ -95,7 +142,8 @@ class PredictionDisplay(QWidget):
             
             # Сбрасываем метку результата
             self.result_label.setText("Нарисуйте цифру и нажмите 'Распознать'")
+            self.details_label.hide()
             
         except Exception as e:
-            print(f"Ошибка при очистке результатов: {e}")
+            logger.error(f"Ошибка при очистке результатов: {e}")
 
@@ -0,0 +1,105 @@
+"""Результат распознавания одного изображения"""
+
+import numpy as np
+
+# Количество лучших вариантов, сохраняемых в результате
+TOP_K = 3
+
+
+class PredictionResult:
+    """
+    Вероятности цифр с однократно вычисленными argmax и top-k
+    
+    Результат создается один раз после инференса и передается в
+    отображение как есть, поэтому поиск максимума не повторяется ни в
+    виджете, ни в get_prediction_result. Для совместимости со старым
+    кодом объект ведет себя как последовательность вероятностей.
+    """
+    
+    __slots__ = ("probabilities", "digit", "confidence", "top_k", "inputs")
+    
+    def __init__(self, probabilities, k=TOP_K):
+        """
+        Инициализация результата
+        
+        Args:
+            probabilities: вероятности цифр 0-9 (numpy array или список)
+            k: количество лучших вариантов в top_k
+        """
+        probabilities = np.asarray(probabilities, dtype=np.float32)
+        # Устойчивая сортировка: при равенстве выигрывает меньшая цифра, как у argmax
+        order = np.argsort(-probabilities, kind="stable")[:k]
+        
+        self.probabilities = probabilities
+        self.digit = int(order[0])
+        self.confidence = float(probabilities[self.digit])
+        self.top_k = tuple((int(i), float(probabilities[i])) for i in order)
+        # Изображение 28x28, поданное в модель; заполняет вызывающий код,
+        # если оно понадобится после распознавания (запись образцов)
+        self.inputs = None
+    
+    @classmethod
+    def uniform(cls, classes=10):
+        """Равномерный результат, возвращаемый при ошибке предсказания"""
+        return cls(np.full(classes, 1.0 / classes, dtype=np.float32))
+    
+    def tolist(self):
+        """Вероятности в виде списка чисел Python"""
+        return self.probabilities.tolist()
+    
+    def __len__(self):
+        return len(self.probabilities)
+    
+    def __getitem__(self, index):
+        return self.probabilities[index]
+    
+    def __iter__(self):
+        return iter(self.probabilities)
+    
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None or dtype == self.probabilities.dtype:
+            return self.probabilities.copy() if copy else self.probabilities
+        return self.probabilities.astype(dtype)
+    
+    def __repr__(self):
+        return f"PredictionResult(digit={self.digit}, confidence={self.confidence:.4f})"
+
+
+class SequenceResult:
+    """
+    Результат распознавания числа из нескольких цифр
+    
+    Все цифры распознаются одним батчем, поэтому результат хранит
+    PredictionResult для каждой цифры в порядке слева направо.
+    """
+    
+    __slots__ = ("digits", "boxes", "text", "confidence", "inputs")
+    
+    def __init__(self, digits, boxes=None):
+        """
+        Инициализация результата
+        
+        Args:
+            digits: последовательность PredictionResult слева направо
+            boxes: рамки цифр на холсте (left, top, right, bottom) или None
+        """
+        self.digits = tuple(digits)
+        self.boxes = boxes
+        self.text = "".join(str(result.digit) for result in self.digits)
+        # Число верно, только если верны все цифры: берем наименьшую уверенность
+        self.confidence = min((result.confidence for result in self.digits), default=0.0)
+        # Изображения цифр формы (N, 28, 28), если их сохранил вызывающий код
+        self.inputs = None
+    
+    @classmethod
+    def from_probabilities(cls, probabilities, boxes=None):
+        """Результат по вероятностям батча формы (N, 10)"""
+        return cls((PredictionResult(row) for row in probabilities), boxes)
+    
+    @property
+    def least_confident(self):
+        """Результат цифры с наименьшей уверенностью (None для пустого числа)"""
+        return min(self.digits, key=lambda result: result.confidence, default=None)
+    
+    def __repr__(self):
+        return f"SequenceResult(text={self.text!r}, confidence={self.confidence:.4f})"
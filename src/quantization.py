@@ -0,0 +1,237 @@
+"""Квантованные варианты весов модели и оценка точности и скорости
+
+Варианты хранятся рядом с моделью:
+    numpy_weights.npz   - float32 (кэш NumPy-бэкенда)
+    weights_float16.npz - веса и смещения float16
+    weights_int8.npz    - веса int8 с масштабом на каждый выходной нейрон
+                          (симметричное квантование), смещения float32
+
+Варианты хранят отпечаток исходных весов и пересоздаются, когда модель
+обновлена на месте.
+"""
+
+import logging
+import os
+import time
+
+import numpy as np
+
+from src.idx_io import iter_idx
+from src.numpy_backend import (
+    WEIGHTS_CACHE_NAME, NumpyDenseModel, file_fingerprint, source_fingerprint, write_npz
+)
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = ("float32", "float16", "int8")
+
+
+def variant_path(model_path, variant):
+    """Путь к файлу весов варианта внутри директории модели"""
+    if variant not in VARIANTS:
+        raise ValueError(f"Неизвестный вариант модели: {variant}")
+    if variant == "float32":
+        return os.path.join(model_path, WEIGHTS_CACHE_NAME)
+    return os.path.join(model_path, f"weights_{variant}.npz")
+
+
+def weights_fingerprint(model_path):
+    """
+    Отпечаток весов float32, из которых создаются варианты
+    
+    Если у модели есть чекпоинт variables/, это его отпечаток, иначе -
+    отпечаток файла numpy_weights.npz.
+    """
+    return source_fingerprint(model_path) or file_fingerprint(variant_path(model_path, "float32"))
+
+
+def quantize_int8(kernel):
+    """
+    Симметричное квантование матрицы весов по выходным нейронам
+    
+    Args:
+        kernel: numpy array float32 формы (in, out)
+    
+    Returns:
+        (веса int8 формы (in, out), масштабы float32 формы (out,))
+    """
+    scale = np.abs(kernel).max(axis=0) / 127.0
+    scale[scale == 0] = 1.0
+    quantized = np.clip(np.rint(kernel / scale), -127, 127).astype(np.int8)
+    return quantized, scale.astype(np.float32)
+
+
+def save_variant(model, path, variant, source=None):
+    """
+    Сохранение модели в квантованном формате
+    
+    Args:
+        model: NumpyDenseModel с весами float32
+        path: путь к файлу .npz
+        variant: "float32", "float16" или "int8"
+        source: отпечаток исходных весов (см. weights_fingerprint)
+    """
+    arrays = model.npz_arrays()
+    arrays["variant"] = np.array(variant)
+    if source is not None:
+        arrays["source"] = np.array(source)
+    
+    for i in range(len(model.kernels)):
+        if variant == "float16":
+            arrays[f"kernel_{i}"] = arrays[f"kernel_{i}"].astype(np.float16)
+            arrays[f"bias_{i}"] = arrays[f"bias_{i}"].astype(np.float16)
+        elif variant == "int8":
+            arrays[f"kernel_{i}"], arrays[f"kernel_scale_{i}"] = quantize_int8(arrays[f"kernel_{i}"])
+    
+    write_npz(path, arrays)
+
+
+def load_variant(model_path, variant="float32", create=True):
+    """
+    Загрузка варианта модели для NumPy-бэкенда
+    
+    Вариант, созданный из других весов float32, считается устаревшим и
+    создается заново.
+    
+    Args:
+        model_path: путь к директории модели
+        variant: "float32", "float16" или "int8"
+        create: создать ли отсутствующий или устаревший вариант из весов float32
+    
+    Returns:
+        NumpyDenseModel
+    """
+    if variant == "float32":
+        return NumpyDenseModel.load(model_path)
+    
+    path = variant_path(model_path, variant)
+    if os.path.exists(path):
+        model = NumpyDenseModel.load_npz(path)
+        if model.source == weights_fingerprint(model_path):
+            return model
+        if not create:
+            logger.warning(f"Вариант модели {variant} создан из других весов: {path}")
+            return model
+        logger.info(f"Вариант модели {variant} устарел: {path}")
+    elif not create:
+        raise FileNotFoundError(f"Не найден вариант модели {variant}: {path}")
+    
+    logger.info(f"Создание варианта модели {variant}: {path}")
+    base = NumpyDenseModel.load(model_path)
+    save_variant(base, path, variant, weights_fingerprint(model_path))
+    return NumpyDenseModel.load_npz(path)
+
+
+def quantize_model(model_path, variants=("float16", "int8")):
+    """
+    Создание квантованных вариантов модели
+    
+    Returns:
+        словарь {вариант: размер файла в байтах}
+    """
+    base = NumpyDenseModel.load(model_path)
+    source = weights_fingerprint(model_path)
+    sizes = {"float32": os.path.getsize(variant_path(model_path, "float32"))}
+    for variant in variants:
+        path = variant_path(model_path, variant)
+        if variant != "float32":
+            save_variant(base, path, variant, source)
+        sizes[variant] = os.path.getsize(path)
+    return sizes
+
+
+def _median_latency(model, image, repeats):
+    """Медианное время прогона одного изображения в секундах"""
+    model(image)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model(image)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def evaluate_variants(model_path, images_path, labels_path, variants=VARIANTS,
+                      batch_size=256, latency_repeats=200):
+    """
+    Сравнение вариантов модели на наборе IDX
+    
+    Данные читаются потоком блоками batch_size, на каждом блоке
+    прогоняются все варианты, поэтому совпадение предсказаний с float32
+    считается без хранения всех результатов.
+    
+    Args:
+        model_path: путь к директории модели
+        images_path, labels_path: файлы IDX с изображениями и метками
+        variants: сравниваемые варианты (float32 добавляется как эталон)
+        batch_size: размер батча
+        latency_repeats: количество повторов для оценки задержки
+    
+    Returns:
+        список словарей по вариантам: variant, size_bytes, load_ms, accuracy,
+        accuracy_delta, agreement, latency_ms, throughput
+    """
+    variants = ["float32"] + [variant for variant in variants if variant != "float32"]
+    
+    models, rows = {}, {}
+    for variant in variants:
+        # Создает отсутствующий или устаревший вариант
+        load_variant(model_path, variant)
+        path = variant_path(model_path, variant)
+        
+        # Время загрузки меряется по уже существующему файлу варианта
+        start = time.perf_counter()
+        models[variant] = NumpyDenseModel.load_npz(path)
+        rows[variant] = {
+            "variant": variant,
+            "size_bytes": os.path.getsize(path),
+            "load_ms": (time.perf_counter() - start) * 1000.0,
+            "correct": 0,
+            "agree": 0,
+            "inference_s": 0.0,
+        }
+    
+    total = 0
+    for images, labels in zip(iter_idx(images_path, batch_size), iter_idx(labels_path, batch_size)):
+        batch = images.astype(np.float32)[..., np.newaxis] / 255.0
+        reference = None
+        for variant in variants:
+            start = time.perf_counter()
+            predicted = models[variant](batch).argmax(axis=1)
+            rows[variant]["inference_s"] += time.perf_counter() - start
+            
+            if reference is None:
+                reference = predicted
+            rows[variant]["correct"] += int((predicted == labels).sum())
+            rows[variant]["agree"] += int((predicted == reference).sum())
+        total += len(labels)
+    
+    if total == 0:
+        raise ValueError(f"Файл {images_path} не содержит изображений")
+    
+    single = np.zeros((1,) + models["float32"].input_shape, dtype=np.float32)
+    report = []
+    for variant in variants:
+        row = rows[variant]
+        row["accuracy"] = row.pop("correct") / total
+        row["agreement"] = row.pop("agree") / total
+        row["accuracy_delta"] = row["accuracy"] - rows["float32"]["accuracy"]
+        row["throughput"] = total / max(row.pop("inference_s"), 1e-9)
+        row["latency_ms"] = _median_latency(models[variant], single, latency_repeats) * 1000.0
+        report.append(row)
+    return report
+
+
+def format_report(report):
+    """Текстовая таблица результатов evaluate_variants"""
+    lines = [
+        f"{'вариант':8s} {'размер, КБ':>10s} {'загрузка, мс':>12s} {'точность':>9s} "
+        f"{'разница':>8s} {'совпадение':>10s} {'задержка, мс':>12s} {'изобр./с':>10s}"
+    ]
+    for row in report:
+        lines.append(
+            f"{row['variant']:8s} {row['size_bytes'] / 1024:10.1f} {row['load_ms']:12.2f} "
+            f"{row['accuracy']:9.4f} {row['accuracy_delta']:+8.4f} {row['agreement']:10.4f} "
+            f"{row['latency_ms']:12.4f} {row['throughput']:10.0f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,145 @@
+"""Фоновое распознавание с дебаунсом вне потока GUI"""
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+
+class RecognitionSignals(QObject):
+    """Сигналы задачи распознавания (QRunnable не является QObject)"""
+    
+    finished = pyqtSignal(int, int, object)
+    failed = pyqtSignal(int, str)
+
+
+class RecognitionTask(QRunnable):
+    """Задача распознавания одного снимка холста"""
+    
+    def __init__(self, generation, image, canvas_generation, recognize_fn, latest_generation):
+        """
+        Инициализация задачи
+        
+        Args:
+            generation: номер запроса
+            image: снимок холста (QImage или StrokeStore)
+            canvas_generation: версия холста, с которой снят снимок
+            recognize_fn: функция снимок холста -> вероятности
+            latest_generation: функция, возвращающая номер последнего запроса
+        """
+        super().__init__()
+        self.generation = generation
+        self.image = image
+        self.canvas_generation = canvas_generation
+        self.recognize_fn = recognize_fn
+        self.latest_generation = latest_generation
+        self.signals = RecognitionSignals()
+    
+    def run(self):
+        """Выполнение распознавания в рабочем потоке"""
+        # Если за время ожидания в очереди пришел более новый запрос, пропускаем
+        if self.generation != self.latest_generation():
+            return
+        
+        try:
+            probabilities = self.recognize_fn(self.image)
+            self.signals.finished.emit(self.generation, self.canvas_generation, probabilities)
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+
+
+class BackgroundRecognizer(QObject):
+    """
+    Распознавание в пуле потоков с дебаунсом и отменой устаревших запросов
+    
+    Каждый запрос получает возрастающий номер. Устаревшие задачи не
+    запускаются, а их результаты, пришедшие после более нового запроса,
+    отбрасываются, поэтому отображается только последний результат.
+    Результат передается вместе с версией холста, с которой снят снимок:
+    пока новый снимок ждет дебаунса, может прийти результат предыдущего.
+    """
+    
+    result_ready = pyqtSignal(int, object)
+    error_occurred = pyqtSignal(str)
+    
+    def __init__(self, recognize_fn, debounce_ms=150, parent=None):
+        """
+        Инициализация распознавателя
+        
+        Args:
+            recognize_fn: функция снимок холста -> вероятности, выполняется в рабочем потоке
+            debounce_ms: задержка после последнего изменения холста в мс
+            parent: родительский QObject
+        """
+        super().__init__(parent)
+        self.recognize_fn = recognize_fn
+        self.generation = 0
+        self._pending_image = None
+        self._pending_canvas_generation = 0
+        
+        # Один рабочий поток: распознавание последовательно, GUI свободен
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(int(debounce_ms))
+        self.debounce_timer.timeout.connect(self._start_pending)
+    
+    def schedule(self, image, canvas_generation):
+        """
+        Запрос распознавания с дебаунсом
+        
+        Args:
+            image: снимок холста (QImage или StrokeStore)
+            canvas_generation: версия холста, с которой снят снимок
+        """
+        self._pending_image = image
+        self._pending_canvas_generation = canvas_generation
+        self.debounce_timer.start()
+    
+    def recognize_now(self, image, canvas_generation):
+        """Немедленный запрос распознавания без дебаунса"""
+        self._pending_image = image
+        self._pending_canvas_generation = canvas_generation
+        self.debounce_timer.stop()
+        self._start_pending()
+    
+    def cancel(self):
+        """Отмена ожидающих и выполняющихся запросов"""
+        self.debounce_timer.stop()
+        self._pending_image = None
+        self.generation += 1
+        self.pool.clear()
+    
+    def wait(self, timeout_ms=-1):
+        """Ожидание завершения рабочего потока"""
+        return self.pool.waitForDone(timeout_ms)
+    
+    def _start_pending(self):
+        """Запуск задачи для последнего снимка холста"""
+        if self._pending_image is None:
+            return
+        
+        self.generation += 1
+        # Задачи из очереди устарели, выполняющаяся будет отброшена по номеру
+        self.pool.clear()
+        
+        task = RecognitionTask(
+            self.generation,
+            self._pending_image,
+            self._pending_canvas_generation,
+            self.recognize_fn,
+            lambda: self.generation
+        )
+        task.signals.finished.connect(self._on_finished)
+        task.signals.failed.connect(self._on_failed)
+        self._pending_image = None
+        self.pool.start(task)
+    
+    def _on_finished(self, generation, canvas_generation, probabilities):
+        """Передача результата, если он относится к последнему запросу"""
+        if generation == self.generation:
+            self.result_ready.emit(canvas_generation, probabilities)
+    
+    def _on_failed(self, generation, message):
+        """Передача ошибки, если она относится к последнему запросу"""
+        if generation == self.generation:
+            self.error_occurred.emit(message)
@@ -0,0 +1,334 @@
+"""Просмотр результатов пакетного распознавания
+
+Таблица построена на модели/представлении Qt: представление запрашивает
+данные только для видимых строк, а модель читает изображение и
+вероятности строки из отображенных в память файлов в момент запроса.
+Миниатюры и строки вероятностей хранятся в небольших LRU-кэшах, поэтому
+память растет с числом видимых строк, а не с размером набора.
+Сортировка и фильтры работают по индексам ResultsIndex.
+
+Запуск:
+    python -m src.results_browser results.csv --images t10k-images-idx3-ubyte.gz --labels t10k-labels-idx1-ubyte.gz
+    python -m src.results_browser --capture captures
+"""
+
+import argparse
+import logging
+import sys
+from collections import OrderedDict
+
+import numpy as np
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, QSize, Qt
+from PyQt6.QtGui import QColor, QImage
+from PyQt6.QtWidgets import (
+    QAbstractItemView, QApplication, QCheckBox, QComboBox, QDoubleSpinBox, QHBoxLayout,
+    QHeaderView, QLabel, QSplitter, QTableView, QVBoxLayout, QWidget
+)
+
+from src.instrumentation import setup_logging
+from src.prediction_display import PredictionDisplay
+from src.prediction_result import PredictionResult
+from src.results_index import open_capture, open_results
+
+logger = logging.getLogger(__name__)
+
+# Столбцы таблицы: ключ, заголовок, ключ сортировки ResultsIndex
+COLUMNS = (
+    ("index", "№", "index"),
+    ("image", "Изображение", None),
+    ("digit", "Цифра", "digit"),
+    ("confidence", "Уверенность", "confidence"),
+    ("label", "Метка", "label"),
+    ("top", "Лучшие варианты", None),
+)
+
+# Цвет строк, где распознанная цифра не совпала с известной меткой
+MISMATCH_COLOR = QColor(255, 225, 225)
+
+
+class ResultsTableModel(QAbstractTableModel):
+    """
+    Модель таблицы результатов с ленивой загрузкой строк
+    
+    Номер строки таблицы переводится в номер строки источника через
+    текущий порядок ResultsIndex; данные строки читаются только по
+    запросу представления.
+    """
+    
+    def __init__(self, results, thumbnail_size=56, cache_size=512, parent=None):
+        """
+        Инициализация модели
+        
+        Args:
+            results: ResultsIndex
+            thumbnail_size: сторона миниатюры в пикселях
+            cache_size: сколько миниатюр и строк вероятностей держать в памяти
+            parent: родительский объект Qt
+        """
+        super().__init__(parent)
+        self.results = results
+        self.thumbnail_size = thumbnail_size
+        self.cache_size = cache_size
+        self.columns = [
+            column for column in COLUMNS
+            if not (column[0] == "image" and results.images is None)
+            and not (column[0] == "label" and results.labels is None)
+        ]
+        
+        self.sort_key = "index"
+        self.descending = False
+        self.filters = {}
+        self._thumbnails = OrderedDict()
+        self._rows = OrderedDict()
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.results.order)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+    
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.columns[section][1]
+        return None
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        key = self.columns[index.column()][0]
+        source = int(self.results.order[index.row()])
+        
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._display(key, source)
+        if role == Qt.ItemDataRole.DecorationRole and key == "image":
+            return self.thumbnail(source)
+        if role == Qt.ItemDataRole.TextAlignmentRole and key != "top":
+            return Qt.AlignmentFlag.AlignCenter
+        if role == Qt.ItemDataRole.BackgroundRole and self._is_mismatch(source):
+            return MISMATCH_COLOR
+        return None
+    
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        """Сортировка по индексу ResultsIndex (столбцы без ключа не сортируются)"""
+        sort_key = self.columns[column][2]
+        if sort_key is None:
+            return
+        self.sort_key = sort_key
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        self.refresh()
+    
+    def set_filters(self, digit=None, min_confidence=None, max_confidence=None, mismatches=False):
+        """Фильтры строк (аргументы как у ResultsIndex.query)"""
+        self.filters = {"digit": digit, "min_confidence": min_confidence,
+                        "max_confidence": max_confidence, "mismatches": mismatches}
+        self.refresh()
+    
+    def refresh(self):
+        """Пересчет порядка строк; кэши строк остаются действительными"""
+        self.beginResetModel()
+        self.results.query(self.sort_key, self.descending, **self.filters)
+        self.endResetModel()
+    
+    def source_row(self, row):
+        """Номер строки источника для строки таблицы"""
+        return int(self.results.order[row])
+    
+    def probabilities(self, source):
+        """Вероятности строки источника (из кэша или файла)"""
+        return self._cached(self._rows, source, lambda: self.results.row_probabilities(source))
+    
+    def thumbnail(self, source):
+        """Миниатюра изображения строки источника: темная цифра на светлом фоне"""
+        def load():
+            image = np.ascontiguousarray(255 - np.asarray(self.results.images[source], dtype=np.uint8))
+            height, width = image.shape
+            # scaled создает собственную копию пикселей, буфер NumPy можно освободить
+            return QImage(image.data, width, height, width, QImage.Format.Format_Grayscale8).scaled(
+                self.thumbnail_size, self.thumbnail_size,
+                Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.FastTransformation
+            )
+        return self._cached(self._thumbnails, source, load)
+    
+    def _display(self, key, source):
+        results = self.results
+        if key == "index":
+            return str(source)
+        if key == "digit":
+            digit = int(results.digits[source])
+            return str(digit) if digit >= 0 else "ошибка"
+        if key == "confidence":
+            confidence = float(results.confidence[source])
+            return "" if np.isnan(confidence) else f"{confidence:.4f}"
+        if key == "label":
+            label = int(results.labels[source])
+            return str(label) if label >= 0 else ""
+        if key == "top":
+            probabilities = self.probabilities(source)
+            if np.isnan(probabilities).any():
+                return ""
+            top = PredictionResult(probabilities).top_k
+            return "   ".join(f"{digit}: {probability:.2f}" for digit, probability in top)
+        return None
+    
+    def _is_mismatch(self, source):
+        labels = self.results.labels
+        return labels is not None and 0 <= labels[source] != self.results.digits[source]
+    
+    def _cached(self, cache, key, load):
+        """Значение из LRU-кэша ограниченного размера"""
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+            return value
+        value = load()
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+
+class ResultsBrowser(QWidget):
+    """Окно просмотра результатов: фильтры, таблица и шкалы выбранной строки"""
+    
+    def __init__(self, results, thumbnail_size=56):
+        """
+        Инициализация окна
+        
+        Args:
+            results: ResultsIndex
+            thumbnail_size: сторона миниатюры в пикселях
+        """
+        super().__init__()
+        self.results = results
+        self.model = ResultsTableModel(results, thumbnail_size, parent=self)
+        self.prediction_display = PredictionDisplay()
+        self.setup_ui(thumbnail_size)
+        self.update_count()
+    
+    def setup_ui(self, thumbnail_size):
+        """Настройка пользовательского интерфейса"""
+        filters_layout = QHBoxLayout()
+        
+        self.digit_combo = QComboBox()
+        self.digit_combo.addItem("Все цифры", None)
+        for digit in range(10):
+            self.digit_combo.addItem(f"Цифра {digit}", digit)
+        filters_layout.addWidget(self.digit_combo)
+        
+        filters_layout.addWidget(QLabel("Уверенность от"))
+        self.min_spin = self._confidence_spin(0.0)
+        filters_layout.addWidget(self.min_spin)
+        filters_layout.addWidget(QLabel("до"))
+        self.max_spin = self._confidence_spin(1.0)
+        filters_layout.addWidget(self.max_spin)
+        
+        self.mismatch_checkbox = QCheckBox("Только несовпадения с меткой")
+        self.mismatch_checkbox.setEnabled(self.results.labels is not None)
+        filters_layout.addWidget(self.mismatch_checkbox)
+        filters_layout.addStretch()
+        
+        self.count_label = QLabel()
+        filters_layout.addWidget(self.count_label)
+        
+        # Все строки одной высоты: представлению не нужно измерять строки,
+        # и прокрутка миллиона строк обходится без чтения данных
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setIconSize(QSize(thumbnail_size, thumbnail_size))
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.setWordWrap(False)
+        self.table.verticalHeader().hide()
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(thumbnail_size + 4)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(0, Qt.SortOrder.AscendingOrder)
+        
+        splitter = QSplitter()
+        splitter.addWidget(self.table)
+        splitter.addWidget(self.prediction_display)
+        splitter.setStretchFactor(0, 3)
+        
+        layout = QVBoxLayout()
+        layout.addLayout(filters_layout)
+        layout.addWidget(splitter)
+        self.setLayout(layout)
+        
+        self.digit_combo.currentIndexChanged.connect(self.apply_filters)
+        self.min_spin.valueChanged.connect(self.apply_filters)
+        self.max_spin.valueChanged.connect(self.apply_filters)
+        self.mismatch_checkbox.toggled.connect(self.apply_filters)
+        self.model.modelReset.connect(self.update_count)
+        self.table.selectionModel().currentRowChanged.connect(self.on_current_row_changed)
+        
+        self.setWindowTitle("Результаты распознавания")
+        self.resize(900, 600)
+    
+    @staticmethod
+    def _confidence_spin(value):
+        spin = QDoubleSpinBox()
+        spin.setRange(0.0, 1.0)
+        spin.setSingleStep(0.05)
+        spin.setDecimals(2)
+        spin.setValue(value)
+        return spin
+    
+    def apply_filters(self):
+        """Применение фильтров из элементов управления"""
+        minimum = self.min_spin.value()
+        maximum = self.max_spin.value()
+        self.model.set_filters(
+            digit=self.digit_combo.currentData(),
+            min_confidence=minimum if minimum > 0.0 else None,
+            max_confidence=maximum if maximum < 1.0 else None,
+            mismatches=self.mismatch_checkbox.isChecked(),
+        )
+    
+    def update_count(self):
+        """Количество показанных строк"""
+        self.count_label.setText(f"Показано {self.model.rowCount()} из {len(self.results)}")
+    
+    def on_current_row_changed(self, current, previous):
+        """Шкалы вероятностей выбранной строки"""
+        if not current.isValid():
+            self.prediction_display.clear_predictions()
+            return
+        probabilities = self.model.probabilities(self.model.source_row(current.row()))
+        if np.isnan(probabilities).any():
+            self.prediction_display.clear_predictions()
+            return
+        self.prediction_display.update_predictions(PredictionResult(probabilities))
+
+
+def main(argv=None):
+    """Точка входа: загрузка индексов и показ окна"""
+    parser = argparse.ArgumentParser(description="Просмотр результатов пакетного распознавания")
+    parser.add_argument("results", nargs="?",
+                        help="результаты recognize (.csv, .jsonl) или файл IDX вероятностей")
+    parser.add_argument("--images", help="файл IDX изображений, по которому получены результаты")
+    parser.add_argument("--labels", help="файл IDX меток")
+    parser.add_argument("--capture", help="директория хранилища записанных образцов")
+    args = parser.parse_args(argv)
+    setup_logging()
+    
+    if bool(args.results) == bool(args.capture):
+        parser.error("укажите файл результатов или --capture")
+    try:
+        if args.capture:
+            results = open_capture(args.capture)
+        else:
+            results = open_results(args.results, args.images, args.labels)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка при открытии результатов: {e}", file=sys.stderr)
+        return 1
+    logger.info(f"Загружено строк: {len(results)}")
+    
+    app = QApplication(sys.argv[:1])
+    window = ResultsBrowser(results)
+    window.show()
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""Данные для просмотра результатов пакетного распознавания
+
+Источник - хранилище записанных образцов (src/capture_store.py) или файл
+результатов python -m src.cli recognize вместе с файлом IDX изображений,
+по которому он получен. Изображения и вероятности отображаются в память
+и читаются по одной строке, когда строка видна; заранее в памяти
+строятся только компактные индексы: цифра (1 байт), уверенность
+(4 байта) и порядок строк (4 байта на строку) для сортировки и фильтров.
+
+Вероятности из CSV/JSONL один раз переписываются в файл IDX рядом с
+результатами (как распаковка .gz в memmap_idx) и дальше отображаются в
+память, а не разбираются заново.
+"""
+
+import csv
+import json
+import logging
+import os
+import struct
+
+import numpy as np
+
+from src.capture_store import iter_capture
+from src.idx_io import memmap_idx, write_idx
+
+logger = logging.getLogger(__name__)
+
+# Суффикс файла IDX с вероятностями рядом с CSV/JSONL
+PROBABILITIES_SUFFIX = ".probabilities-idx2-float"
+
+# Ключи сортировки строк
+SORT_KEYS = ("index", "digit", "confidence", "label")
+
+# Строк в блоке при проходах по всем данным
+CHUNK_SIZE = 1 << 16
+
+
+class SegmentedArray:
+    """
+    Несколько массивов как один по первой оси без копирования
+    
+    Сегменты хранилища образцов отображаются в память по отдельности,
+    строка ищется двоичным поиском по границам сегментов.
+    """
+    
+    def __init__(self, arrays):
+        self.arrays = [array for array in arrays if len(array)]
+        self.starts = np.cumsum([0] + [len(array) for array in self.arrays])
+        self.shape = (int(self.starts[-1]),) + (self.arrays[0].shape[1:] if self.arrays else ())
+    
+    def __len__(self):
+        return self.shape[0]
+    
+    def __getitem__(self, index):
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+        index %= len(self)
+        segment = int(np.searchsorted(self.starts, index, side="right")) - 1
+        return self.arrays[segment][index - self.starts[segment]]
+    
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        """Блоки строк по порядку"""
+        for array in self.arrays:
+            yield from iter_chunks(array, chunk_size)
+
+
+def iter_chunks(array, chunk_size=CHUNK_SIZE):
+    """Блоки строк массива или SegmentedArray по порядку"""
+    if isinstance(array, SegmentedArray):
+        yield from array.iter_chunks(chunk_size)
+        return
+    for start in range(0, len(array), chunk_size):
+        yield array[start:start + chunk_size]
+
+
+class ResultsIndex:
+    """
+    Результаты распознавания с индексами сортировки и фильтров
+    
+    Порядок строк для каждого ключа сортировки вычисляется один раз при
+    первом запросе; фильтр - одна векторная маска по этому порядку,
+    поэтому смена сортировки или фильтра на миллионе строк занимает
+    миллисекунды.
+    """
+    
+    def __init__(self, probabilities, images=None, labels=None, chunk_size=CHUNK_SIZE):
+        """
+        Построение индексов
+        
+        Args:
+            probabilities: массив (N, 10) или SegmentedArray; строки ошибок - NaN
+            images: массив (N, 28, 28) uint8 или SegmentedArray, либо None
+            labels: метки (N,), -1 - метка неизвестна, либо None
+            chunk_size: строк в блоке при вычислении индексов
+        """
+        if images is not None and len(images) != len(probabilities):
+            raise ValueError("Количество изображений и строк результатов не совпадает")
+        if labels is not None and len(labels) != len(probabilities):
+            raise ValueError("Количество меток и строк результатов не совпадает")
+        
+        self.probabilities = probabilities
+        self.images = images
+        self.labels = None
+        
+        count = len(probabilities)
+        self.digits = np.empty(count, dtype=np.int8)
+        self.confidence = np.empty(count, dtype=np.float32)
+        start = 0
+        for chunk in iter_chunks(probabilities, chunk_size):
+            chunk = np.asarray(chunk, dtype=np.float32)
+            stop = start + len(chunk)
+            failed = np.isnan(chunk).any(axis=1)
+            digits = np.nan_to_num(chunk, nan=-1.0).argmax(axis=1)
+            self.confidence[start:stop] = np.where(failed, np.nan, chunk[np.arange(len(chunk)), digits])
+            self.digits[start:stop] = np.where(failed, -1, digits)
+            start = stop
+        
+        if labels is not None:
+            self.labels = np.empty(count, dtype=np.int8)
+            start = 0
+            for chunk in iter_chunks(labels, chunk_size):
+                self.labels[start:start + len(chunk)] = chunk
+                start += len(chunk)
+        
+        self._failed = int(np.isnan(self.confidence).sum())
+        self._orders = {}
+        self.order = self.query()
+    
+    def __len__(self):
+        return len(self.digits)
+    
+    def sorted_order(self, key):
+        """
+        Порядок строк по возрастанию ключа (вычисляется один раз)
+        
+        При равных значениях строки идут по номеру; строки ошибок
+        (уверенность NaN) идут последними.
+        """
+        if key not in SORT_KEYS:
+            raise ValueError(f"Неизвестный ключ сортировки: {key}")
+        if key not in self._orders:
+            index_dtype = np.int32 if len(self) < 2 ** 31 else np.int64
+            if key == "index":
+                order = np.arange(len(self), dtype=index_dtype)
+            else:
+                values = {"digit": self.digits, "confidence": self.confidence,
+                          "label": self.labels}[key]
+                if values is None:
+                    raise ValueError("В результатах нет меток")
+                order = np.argsort(values, kind="stable").astype(index_dtype)
+            self._orders[key] = order
+        return self._orders[key]
+    
+    def query(self, sort_key="index", descending=False, digit=None, min_confidence=None,
+              max_confidence=None, mismatches=False):
+        """
+        Номера строк с учетом сортировки и фильтров
+        
+        Args:
+            sort_key: один из SORT_KEYS
+            descending: по убыванию
+            digit: только строки с этой распознанной цифрой
+            min_confidence: нижняя граница уверенности (включительно)
+            max_confidence: верхняя граница уверенности (включительно)
+            mismatches: только строки, где известная метка не совпала с цифрой
+        
+        Returns:
+            numpy array номеров строк; он же сохраняется в self.order
+        """
+        order = self.sorted_order(sort_key)
+        if descending:
+            order = order[::-1]
+            if sort_key == "confidence" and self._failed:
+                # Строки ошибок остаются в конце и при сортировке по убыванию
+                order = np.concatenate([order[self._failed:], order[:self._failed]])
+        
+        mask = None
+        if digit is not None:
+            mask = self.digits == digit
+        if min_confidence is not None:
+            mask = _combine(mask, self.confidence >= min_confidence)
+        if max_confidence is not None:
+            mask = _combine(mask, self.confidence <= max_confidence)
+        if mismatches:
+            if self.labels is None:
+                raise ValueError("В результатах нет меток")
+            mask = _combine(mask, (self.labels >= 0) & (self.labels != self.digits))
+        
+        self.order = order if mask is None else order[mask[order]]
+        return self.order
+    
+    def row_probabilities(self, index):
+        """Вероятности (10,) float32 строки источника с номером index"""
+        return np.asarray(self.probabilities[index], dtype=np.float32)
+
+
+def _combine(mask, condition):
+    return condition if mask is None else mask & condition
+
+
+def _result_rows(path):
+    """Строки вероятностей файла результатов CSV/JSONL (None для ошибок)"""
+    with open(path, encoding="utf-8", newline="") as stream:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line).get("probabilities")
+            return
+        
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return
+        try:
+            first = header.index("p0")
+        except ValueError:
+            raise ValueError(f"В файле {path} нет столбцов вероятностей p0..p9")
+        for fields in reader:
+            values = fields[first:first + 10]
+            yield [float(value) for value in values] if all(values) else None
+
+
+def _write_probabilities(path, target, chunk_size):
+    """Запись вероятностей CSV/JSONL блоками в файл IDX; возвращает число строк"""
+    write_idx(target, np.empty((0, 10), dtype=np.float32))
+    count = 0
+    with open(target, "r+b") as output:
+        output.seek(0, os.SEEK_END)
+        block = []
+        for row in _result_rows(path):
+            block.append(row if row is not None else [np.nan] * 10)
+            if len(block) == chunk_size:
+                output.write(np.asarray(block, dtype=">f4").tobytes())
+                count += len(block)
+                block = []
+        if block:
+            output.write(np.asarray(block, dtype=">f4").tobytes())
+            count += len(block)
+        output.seek(4)
+        output.write(struct.pack(">I", count))
+    return count
+
+
+def memmap_results(path, chunk_size=CHUNK_SIZE):
+    """
+    Вероятности файла результатов, отображенные в память
+    
+    Файл IDX (N, 10) отображается как есть. CSV/JSONL один раз
+    переписываются блоками в файл IDX рядом с результатами; повторные
+    вызовы используют его, пока он не старше результатов.
+    
+    Args:
+        path: файл результатов (.csv, .jsonl или IDX)
+        chunk_size: строк в блоке при переписывании
+    
+    Returns:
+        numpy.memmap формы (N, 10); строки ошибок - NaN
+    """
+    if not path.lower().endswith((".csv", ".jsonl", ".ndjson")):
+        return memmap_idx(path)
+    
+    target = path + PROBABILITIES_SUFFIX
+    source_mtime = os.path.getmtime(path)
+    if not os.path.exists(target) or os.path.getmtime(target) < source_mtime:
+        temporary = target + ".tmp"
+        try:
+            count = _write_probabilities(path, temporary, chunk_size)
+        except (OSError, ValueError):
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        os.replace(temporary, target)
+        logger.info(f"Вероятности {path} записаны в {target} ({count} строк)")
+    return memmap_idx(target)
+
+
+def open_results(results_path, images_path=None, labels_path=None):
+    """
+    Результаты recognize с изображениями и метками из файлов IDX
+    
+    Args:
+        results_path: файл результатов (.csv, .jsonl или IDX вероятностей)
+        images_path: файл IDX изображений, по которому получены результаты
+        labels_path: файл IDX меток
+    
+    Returns:
+        ResultsIndex
+    """
+    probabilities = memmap_results(results_path)
+    images = memmap_idx(images_path) if images_path else None
+    labels = memmap_idx(labels_path) if labels_path else None
+    return ResultsIndex(probabilities, images, labels)
+
+
+def open_capture(path):
+    """
+    Хранилище записанных образцов без копирования сегментов
+    
+    Returns:
+        ResultsIndex с изображениями, вероятностями и подтвержденными метками
+    """
+    segments = list(iter_capture(path))
+    return ResultsIndex(
+        SegmentedArray([segment["probabilities"] for segment in segments]),
+        SegmentedArray([segment["images"] for segment in segments]),
+        SegmentedArray([segment["labels"] for segment in segments]),
+    )
@@ -0,0 +1,482 @@
+"""Настройка ресурсов среды инференса: потоки, привязка к ядрам, память
+
+По умолчанию TensorFlow и BLAS создают пулы потоков по числу всех ядер.
+Когда на одной машине работает несколько экземпляров приложения, это
+перегружает процессоры. Настройки берутся по порядку из config.py
+(RUNTIME_*), файла результатов подбора (RUNTIME_SETTINGS_FILE) и
+переменных окружения DIGITS_*, и применяются до загрузки модели.
+
+Модуль не импортирует NumPy: переменные окружения для потоков BLAS
+действуют, только если установлены до первого импорта NumPy, поэтому
+main.py применяет настройки первым делом. TensorFlow настраивается при
+загрузке модели (configure_tensorflow).
+
+Подбор числа потоков на текущей машине:
+    python -m src.cli runtime-tune
+"""
+
+import gc
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Переменные окружения, ограничивающие число потоков библиотек в процессе
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "TF_NUM_INTRAOP_THREADS",
+    "TF_NUM_INTEROP_THREADS",
+)
+
+# Переменные окружения, переопределяющие настройки
+ENV_PREFIX = "DIGITS_"
+
+# Корень проекта: процессы замеров запускаются из него
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_cpu_list(value):
+    """
+    Разбор списка ядер в формате taskset: "0-3,6" -> (0, 1, 2, 3, 6)
+    
+    Args:
+        value: строка, последовательность номеров или None
+    
+    Returns:
+        отсортированный кортеж номеров ядер или None
+    """
+    if value is None or value == "":
+        return None
+    if not isinstance(value, str):
+        return tuple(sorted({int(cpu) for cpu in value}))
+    
+    cpus = set()
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    if not cpus:
+        raise ValueError(f"Пустой список ядер: {value!r}")
+    return tuple(sorted(cpus))
+
+
+def available_cpus():
+    """Ядра, на которых процессу разрешено выполняться"""
+    if hasattr(os, "sched_getaffinity"):
+        return tuple(sorted(os.sched_getaffinity(0)))
+    return tuple(range(os.cpu_count() or 1))
+
+
+class RuntimeSettings:
+    """Настройки ресурсов процесса инференса (0 и None - значение библиотек)"""
+    
+    __slots__ = ("intra_op_threads", "inter_op_threads", "cpu_affinity", "memory_budget_mb")
+    
+    FIELDS = __slots__
+    
+    def __init__(self, intra_op_threads=0, inter_op_threads=0, cpu_affinity=None,
+                 memory_budget_mb=None):
+        """
+        Инициализация настроек
+        
+        Args:
+            intra_op_threads: потоков внутри одной операции (TensorFlow, BLAS, OpenMP)
+            inter_op_threads: потоков для параллельных операций графа TensorFlow
+            cpu_affinity: ядра процесса ("0-3,6" или последовательность) или None
+            memory_budget_mb: мягкий предел резидентной памяти в МБ или None
+        """
+        self.intra_op_threads = int(intra_op_threads or 0)
+        self.inter_op_threads = int(inter_op_threads or 0)
+        self.cpu_affinity = parse_cpu_list(cpu_affinity)
+        self.memory_budget_mb = float(memory_budget_mb) if memory_budget_mb else None
+    
+    def as_dict(self):
+        """Настройки в виде словаря для JSON"""
+        result = {name: getattr(self, name) for name in self.FIELDS}
+        if self.cpu_affinity is not None:
+            result["cpu_affinity"] = list(self.cpu_affinity)
+        return result
+    
+    def updated(self, values):
+        """Копия с замененными полями из словаря (неизвестные ключи игнорируются)"""
+        merged = self.as_dict()
+        merged.update({name: value for name, value in values.items() if name in self.FIELDS})
+        return RuntimeSettings(**merged)
+    
+    def __eq__(self, other):
+        return isinstance(other, RuntimeSettings) and self.as_dict() == other.as_dict()
+    
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"RuntimeSettings({fields})"
+
+
+def load_runtime_settings(environ=None, settings_file=None):
+    """
+    Настройки из config.py, файла подбора и переменных окружения
+    
+    Args:
+        environ: словарь переменных окружения (по умолчанию os.environ)
+        settings_file: файл результатов runtime-tune (по умолчанию
+            DIGITS_SETTINGS_FILE или config.RUNTIME_SETTINGS_FILE; пустая
+            строка отключает файл, отсутствующий файл пропускается)
+    
+    Returns:
+        RuntimeSettings
+    """
+    environ = os.environ if environ is None else environ
+    settings = RuntimeSettings(
+        config.RUNTIME_INTRA_OP_THREADS,
+        config.RUNTIME_INTER_OP_THREADS,
+        config.RUNTIME_CPU_AFFINITY,
+        config.RUNTIME_MEMORY_BUDGET_MB,
+    )
+    
+    if settings_file is None:
+        settings_file = environ.get(ENV_PREFIX + "SETTINGS_FILE", config.RUNTIME_SETTINGS_FILE)
+    if settings_file and os.path.exists(settings_file):
+        try:
+            with open(settings_file, encoding="utf-8") as stream:
+                tuned = json.load(stream)
+            settings = settings.updated(tuned[tuned["selected"]]["settings"])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Файл настроек {settings_file} пропущен: {e}")
+    
+    overrides = {}
+    for name in RuntimeSettings.FIELDS:
+        value = environ.get(ENV_PREFIX + name.upper())
+        if value not in (None, ""):
+            overrides[name] = value
+    return settings.updated(overrides) if overrides else settings
+
+
+# Настройки, примененные к текущему процессу
+_active_settings = None
+
+
+def active_settings():
+    """Настройки, примененные apply_runtime_settings (None, если не применялись)"""
+    return _active_settings
+
+
+def apply_runtime_settings(settings=None):
+    """
+    Применение настроек к текущему процессу
+    
+    Сначала процесс привязывается к ядрам, затем задаются переменные
+    окружения потоков (они наследуются и процессами инференса). Если
+    задана только привязка, число потоков равно числу выбранных ядер,
+    чтобы пулы библиотек не создавали потоков больше, чем ядер.
+    
+    Args:
+        settings: RuntimeSettings (по умолчанию load_runtime_settings())
+    
+    Returns:
+        примененные RuntimeSettings
+    """
+    global _active_settings
+    settings = settings or load_runtime_settings()
+    
+    if settings.cpu_affinity is not None:
+        if hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, settings.cpu_affinity)
+            except OSError as e:
+                logger.error(f"Ошибка при привязке к ядрам {settings.cpu_affinity}: {e}")
+        else:
+            logger.warning("Привязка к ядрам не поддерживается на этой платформе")
+    
+    intra = settings.intra_op_threads
+    if not intra and settings.cpu_affinity is not None:
+        intra = len(settings.cpu_affinity)
+    if intra:
+        for name in THREAD_ENV_VARS:
+            if name != "TF_NUM_INTEROP_THREADS":
+                os.environ[name] = str(intra)
+    if settings.inter_op_threads:
+        os.environ["TF_NUM_INTEROP_THREADS"] = str(settings.inter_op_threads)
+    
+    if "numpy" in sys.modules and intra:
+        logger.debug("NumPy уже импортирован: число потоков BLAS не изменится")
+    
+    _active_settings = settings.updated({"intra_op_threads": intra})
+    logger.info(f"Настройки среды выполнения: {_active_settings.as_dict()}")
+    return _active_settings
+
+
+def configure_tensorflow(tf, settings=None):
+    """
+    Настройка потоков и памяти TensorFlow до первого выполнения операций
+    
+    Args:
+        tf: модуль tensorflow
+        settings: RuntimeSettings (по умолчанию примененные к процессу)
+    """
+    settings = settings or _active_settings
+    if settings is None:
+        return
+    
+    try:
+        if settings.intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(settings.intra_op_threads)
+        if settings.inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(settings.inter_op_threads)
+        
+        # Видеопамять выделяется по мере необходимости, а не вся сразу
+        for gpu in tf.config.list_physical_devices("GPU"):
+            if settings.memory_budget_mb:
+                tf.config.set_logical_device_configuration(
+                    gpu, [tf.config.LogicalDeviceConfiguration(memory_limit=settings.memory_budget_mb)]
+                )
+            else:
+                tf.config.experimental.set_memory_growth(gpu, True)
+    except RuntimeError as e:
+        # Среда выполнения уже инициализирована (например, вторая модель в процессе)
+        logger.debug(f"Настройки TensorFlow не изменены: {e}")
+
+
+def memory_usage_mb():
+    """Резидентная память процесса в МБ"""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as stream:
+            resident_pages = int(stream.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError, IndexError):
+        import resource
+        
+        # Пиковое значение: ru_maxrss в КБ на Linux и в байтах на macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def trim_memory():
+    """
+    Сборка мусора и возврат освобожденной памяти кучи системе
+    
+    Returns:
+        резидентная память после очистки в МБ
+    """
+    gc.collect()
+    if sys.platform.startswith("linux"):
+        try:
+            import ctypes
+            
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+    return memory_usage_mb()
+
+
+def enforce_memory_budget(model_handler=None, settings=None):
+    """
+    Проверка мягкого предела памяти
+    
+    При превышении очищается кэш результатов и освобожденная память
+    возвращается системе. Процесс не завершается: предел мягкий.
+    
+    Args:
+        model_handler: ModelHandler, кэш которого можно очистить
+        settings: RuntimeSettings (по умолчанию примененные к процессу)
+    
+    Returns:
+        (резидентная память в МБ, превышен ли предел после очистки)
+    """
+    settings = settings or _active_settings
+    usage = memory_usage_mb()
+    if settings is None or not settings.memory_budget_mb or usage <= settings.memory_budget_mb:
+        return usage, False
+    
+    if model_handler is not None and model_handler.cache is not None:
+        model_handler.cache.clear()
+    trimmed = trim_memory()
+    over = trimmed > settings.memory_budget_mb
+    log = logger.warning if over else logger.info
+    log(f"Память {usage:.0f} МБ превысила предел {settings.memory_budget_mb:.0f} МБ, "
+        f"после очистки {trimmed:.0f} МБ")
+    return trimmed, over
+
+
+def thread_candidates(cpus=None):
+    """Числа потоков для подбора: степени двойки до числа ядер и само число ядер"""
+    cpus = cpus or len(available_cpus())
+    candidates = {cpus}
+    threads = 1
+    while threads < cpus:
+        candidates.add(threads)
+        threads *= 2
+    return sorted(candidates)
+
+
+def run_benchmark(model_path, backend="auto", batch_size=64, repeats=200):
+    """
+    Задержка и пропускная способность модели в текущем процессе
+    
+    Args:
+        model_path: путь к модели
+        backend: бэкенд ModelHandler
+        batch_size: размер батча для пропускной способности
+        repeats: количество замеров одиночного изображения
+    
+    Returns:
+        словарь: latency_ms (медиана), throughput (изображений в секунду), memory_mb
+    """
+    import numpy as np
+    
+    from src.model_handler import ModelHandler
+    
+    handler = ModelHandler(model_path, backend=backend, warmup_batch_sizes=(1, batch_size))
+    if not handler.is_loaded:
+        raise RuntimeError(f"Не удалось загрузить модель из {model_path}")
+    
+    rng = np.random.default_rng(0)
+    single = rng.random((1, 28, 28, 1), dtype=np.float32)
+    batch = rng.random((batch_size, 28, 28, 1), dtype=np.float32)
+    
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        handler.predict_batch(single)
+        timings.append(time.perf_counter() - start)
+    
+    runs = max(repeats // 10, 3)
+    start = time.perf_counter()
+    for _ in range(runs):
+        handler.predict_batch(batch)
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "latency_ms": float(np.median(timings)) * 1000.0,
+        "throughput": runs * batch_size / elapsed,
+        "memory_mb": memory_usage_mb(),
+    }
+
+
+def autotune(model_path, backend="auto", intra_candidates=None, inter_candidates=(1, 2),
+             batch_size=64, repeats=200, timeout=300.0):
+    """
+    Перебор числа потоков с замером в отдельных процессах
+    
+    Пулы потоков библиотек создаются один раз при запуске, поэтому
+    каждый вариант замеряется в новом процессе с нужными переменными
+    окружения.
+    
+    Args:
+        model_path: путь к модели
+        backend: бэкенд ModelHandler
+        intra_candidates: числа потоков операций (по умолчанию thread_candidates())
+        inter_candidates: числа потоков графа TensorFlow
+        batch_size: размер батча для пропускной способности
+        repeats: количество замеров одиночного изображения
+        timeout: предельное время одного замера в секундах
+    
+    Returns:
+        словарь: cpus, backend, results - список {settings, latency_ms,
+        throughput, memory_mb}, latency и throughput - лучшие результаты
+    """
+    # Привязка к ядрам и предел памяти берутся из config.py и окружения,
+    # файл прежнего подбора не должен влиять на замер
+    base = load_runtime_settings(settings_file="")
+    cpus = len(base.cpu_affinity) if base.cpu_affinity else len(available_cpus())
+    intra_candidates = list(intra_candidates or thread_candidates(cpus))
+    
+    results = []
+    for intra in intra_candidates:
+        for inter in inter_candidates:
+            settings = base.updated({"intra_op_threads": intra, "inter_op_threads": inter})
+            environ = dict(os.environ)
+            environ[ENV_PREFIX + "INTRA_OP_THREADS"] = str(intra)
+            environ[ENV_PREFIX + "INTER_OP_THREADS"] = str(inter)
+            environ[ENV_PREFIX + "SETTINGS_FILE"] = ""
+            command = [sys.executable, "-m", "src.runtime_config", os.path.abspath(model_path),
+                       "--backend", backend, "--batch-size", str(batch_size),
+                       "--repeats", str(repeats)]
+            try:
+                completed = subprocess.run(command, cwd=PROJECT_DIR, env=environ, timeout=timeout,
+                                           capture_output=True, text=True, check=True)
+                measurement = json.loads(completed.stdout.strip().splitlines()[-1])
+            except (subprocess.SubprocessError, ValueError, IndexError) as e:
+                logger.error(f"Ошибка при замере {settings.as_dict()}: {e}")
+                continue
+            
+            logger.info(f"Потоки {intra}/{inter}: {measurement['latency_ms']:.3f} мс, "
+                        f"{measurement['throughput']:.0f} изобр./с")
+            results.append({"settings": settings.as_dict(), **measurement})
+    
+    if not results:
+        raise RuntimeError("Ни один замер не выполнен")
+    
+    # При равенстве предпочитается меньшее число потоков (варианты идут по возрастанию)
+    return {
+        "cpus": cpus,
+        "backend": backend,
+        "results": results,
+        "latency": min(results, key=lambda row: row["latency_ms"]),
+        "throughput": max(results, key=lambda row: row["throughput"]),
+    }
+
+
+def save_tuned_settings(report, path, objective="latency"):
+    """
+    Запись результатов подбора; load_runtime_settings берет вариант objective
+    
+    Args:
+        report: результат autotune
+        path: файл JSON
+        objective: "latency" (интерактивная работа) или "throughput" (пакетная)
+    """
+    report = dict(report, selected=objective)
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as stream:
+        json.dump(report, stream, ensure_ascii=False, indent=2)
+    os.replace(temporary, path)
+
+
+def format_report(report):
+    """Текстовая таблица результатов autotune"""
+    lines = [
+        f"Ядер: {report['cpus']}, бэкенд: {report['backend']}",
+        f"{'intra':>5s} {'inter':>5s} {'задержка, мс':>12s} {'изобр./с':>10s} {'память, МБ':>10s}",
+    ]
+    for row in report["results"]:
+        settings = row["settings"]
+        marks = [name for name in ("latency", "throughput") if report[name] == row]
+        lines.append(
+            f"{settings['intra_op_threads']:5d} {settings['inter_op_threads']:5d} "
+            f"{row['latency_ms']:12.4f} {row['throughput']:10.0f} {row['memory_mb']:10.0f}"
+            + (f"  <- лучшее: {', '.join(marks)}" if marks else "")
+        )
+    return "\n".join(lines)
+
+
+def _benchmark_main(argv=None):
+    """Замер в отдельном процессе для autotune: результат - строка JSON в stdout"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Замер модели с текущими настройками потоков")
+    parser.add_argument("model")
+    parser.add_argument("--backend", default="auto")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args(argv)
+    
+    print(json.dumps(run_benchmark(args.model, args.backend, args.batch_size, args.repeats)))
+    return 0
+
+
+if __name__ == "__main__":
+    # Настройки применяются до импорта NumPy и TensorFlow в run_benchmark
+    apply_runtime_settings()
+    sys.exit(_benchmark_main())
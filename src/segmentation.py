@@ -0,0 +1,255 @@
+"""Разделение холста на отдельные цифры для распознавания числа"""
+
+import logging
+
+import numpy as np
+
+from src.strokes import rasterize_strokes
+from src.utils import block_downsample, center_digits, color_channels, colors_to_ink
+
+logger = logging.getLogger(__name__)
+
+# Разрешение промежуточного изображения: пикселей на пиксель модели по
+# короткой стороне холста (280 / (28 * 4) -> уменьшение в 2 раза, 140x140)
+SEGMENTATION_SCALE = 4
+
+# Сдвиги восьми соседей пикселя
+_NEIGHBOR_SHIFTS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+
+def label_components(mask):
+    """
+    Разметка связных областей (8-связность) без циклов по пикселям
+    
+    Каждый пиксель начинает с собственной метки (своего индекса), затем
+    метки многократно заменяются минимумом по соседям, а "прыжки по
+    указателям" (метка := метка пикселя, на который она указывает)
+    сокращают число итераций до логарифма от размера области.
+    
+    Args:
+        mask: numpy array bool формы (H, W)
+    
+    Returns:
+        (labels, count): numpy array int32 формы (H, W), где 0 - фон, а
+        области пронумерованы 1..count в порядке первого пикселя
+    """
+    mask = np.asarray(mask, dtype=bool)
+    height, width = mask.shape
+    size = height * width
+    
+    # Фон получает метку size, большую любого индекса пикселя
+    labels = np.where(mask, np.arange(size, dtype=np.int64).reshape(height, width), size)
+    parents = np.empty(size + 1, dtype=np.int64)
+    parents[size] = size
+    
+    while True:
+        updated = labels.copy()
+        for dy, dx in _NEIGHBOR_SHIFTS:
+            # Обмен минимумами в обе стороны для пары (пиксель, сосед со сдвигом)
+            rows = slice(dy, None), slice(None, height - dy if dy else None)
+            if dx >= 0:
+                cols = slice(dx, None), slice(None, width - dx if dx else None)
+            else:
+                cols = slice(None, width + dx), slice(-dx, None)
+            a = updated[rows[0], cols[0]]
+            b = updated[rows[1], cols[1]]
+            np.minimum(a, labels[rows[1], cols[1]], out=a)
+            np.minimum(b, labels[rows[0], cols[0]], out=b)
+        updated[~mask] = size
+        
+        # Прыжки по указателям: метка - индекс пикселя той же области
+        parents[:size] = updated.ravel()
+        updated = parents[updated]
+        updated = parents[updated]
+        
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+    
+    roots, inverse = np.unique(labels, return_inverse=True)
+    inverse = inverse.reshape(height, width).astype(np.int32) + 1
+    count = len(roots) - (roots[-1] == size)
+    inverse[~mask] = 0
+    return inverse, int(count)
+
+
+def _extents(labels, count, axis):
+    """Границы [начало, конец) областей 1..count вдоль оси (0 - строки, 1 - столбцы)"""
+    length = labels.shape[axis]
+    positions = np.broadcast_to(
+        np.arange(length).reshape((-1, 1) if axis == 0 else (1, -1)), labels.shape
+    )
+    present = np.zeros((count + 1, length), dtype=bool)
+    present[labels.ravel(), positions.ravel()] = True
+    present = present[1:]
+    start = present.argmax(axis=1)
+    end = length - present[:, ::-1].argmax(axis=1)
+    return start, end
+
+
+def _merge_spans(left, right, min_overlap):
+    """
+    Объединение отрезков [left, right) по перекрытию проходом слева направо
+    
+    Returns:
+        список групп индексов отрезков, группы упорядочены слева направо
+    """
+    # Цикл по областям или штрихам: их на холсте единицы, а не пиксели
+    spans = []
+    members = []
+    for index in np.argsort(left, kind="stable"):
+        if spans:
+            span_left, span_right = spans[-1]
+            overlap = min(span_right, right[index]) - max(span_left, left[index])
+            narrow = min(span_right - span_left, right[index] - left[index])
+            if overlap >= min_overlap * narrow:
+                spans[-1] = (span_left, max(span_right, right[index]))
+                members[-1].append(index)
+                continue
+        spans.append((left[index], right[index]))
+        members.append([index])
+    return members
+
+
+def count_stroke_columns(strokes, brush_size=20, min_overlap=0.5):
+    """
+    Быстрая оценка количества цифр по столбцам, занятым штрихами
+    
+    Штрихи объединяются по тому же правилу перекрытия, что и области в
+    group_components, а касающиеся штрихи и так попадают в одну область.
+    Если все штрихи образуют одну группу, на холсте одна цифра, и
+    растеризацию холста для разделения можно пропустить.
+    
+    Args:
+        strokes: StrokeStore
+        brush_size: толщина кисти на холсте
+        min_overlap: см. group_components
+    
+    Returns:
+        количество групп штрихов
+    """
+    if strokes.num_strokes == 0:
+        return 0
+    
+    radius = brush_size / 2.0
+    xs = [stroke[:, 0] for stroke in strokes.strokes()]
+    left = np.array([x.min() for x in xs]) - radius
+    right = np.array([x.max() for x in xs]) + radius
+    return len(_merge_spans(left, right, min_overlap))
+
+
+def group_components(labels, count, min_overlap=0.5, min_area_ratio=0.1):
+    """
+    Объединение связных областей в цифры по перекрытию столбцов
+    
+    Цифра может состоять из нескольких штрихов (перекладина 5, 4 в два
+    штриха), поэтому области, столбцы которых перекрываются хотя бы на
+    min_overlap ширины более узкой из них, считаются одной цифрой. Мелкие
+    области (точки, случайные касания) без перекрытия отбрасываются.
+    
+    Args:
+        labels: разметка из label_components
+        count: количество областей
+        min_overlap: минимальная доля перекрытия по столбцам
+        min_area_ratio: минимальная площадь цифры относительно самой крупной
+    
+    Returns:
+        numpy array int32 формы (count + 1,): номер цифры слева направо
+        для каждой метки, -1 для фона и отброшенных областей
+    """
+    groups = np.full(count + 1, -1, dtype=np.int32)
+    if count == 0:
+        return groups
+    
+    left, right = _extents(labels, count, axis=1)
+    area = np.bincount(labels.ravel(), minlength=count + 1)[1:]
+    members = _merge_spans(left, right, min_overlap)
+    
+    areas = np.array([area[group].sum() for group in members])
+    digit = 0
+    for group, group_area in zip(members, areas):
+        if group_area >= min_area_ratio * areas.max():
+            groups[np.asarray(group) + 1] = digit
+            digit += 1
+    return groups
+
+
+def segment_digits(ink, target_size=28, box_size=20, threshold=0.1, min_overlap=0.5,
+                   min_area_ratio=0.1):
+    """
+    Выделение цифр на изображении и нормализация каждой в стиле MNIST
+    
+    Все цифры нормализуются одним вызовом center_digits: батч состоит из
+    копий изображения, в каждой из которых оставлены только пиксели одной
+    цифры.
+    
+    Args:
+        ink: numpy array интенсивности чернил [0, 1] формы (H, W)
+        target_size: размер изображения цифры
+        box_size: размер квадрата, в который вписывается цифра
+        threshold: порог интенсивности чернил
+        min_overlap: см. group_components
+        min_area_ratio: см. group_components
+    
+    Returns:
+        (images, boxes): numpy array float32 формы (N, target_size, target_size)
+        и numpy array int32 формы (N, 4) с рамками (left, top, right, bottom)
+        в координатах ink, цифры упорядочены слева направо
+    """
+    ink = np.asarray(ink, dtype=np.float32)
+    labels, count = label_components(ink > threshold)
+    groups = group_components(labels, count, min_overlap, min_area_ratio)
+    digits = int(groups.max()) + 1
+    if digits == 0:
+        return (np.empty((0, target_size, target_size), dtype=np.float32),
+                np.empty((0, 4), dtype=np.int32))
+    
+    pixel_digit = groups[labels]
+    masks = pixel_digit[np.newaxis] == np.arange(digits)[:, np.newaxis, np.newaxis]
+    images = center_digits(ink[np.newaxis] * masks, target_size, box_size, threshold)
+    
+    left, right = _extents(pixel_digit + 1, digits, axis=1)
+    top, bottom = _extents(pixel_digit + 1, digits, axis=0)
+    boxes = np.stack([left, top, right, bottom], axis=1).astype(np.int32)
+    return images, boxes
+
+
+def segment_rgb32_array(pixels, target_size=28, box_size=20):
+    """
+    Выделение цифр на пикселях холста в формате QImage RGB32
+    
+    Args:
+        pixels: numpy array uint8 формы (H, W, 4) в порядке байтов QImage
+        target_size: размер изображения цифры
+        box_size: размер квадрата, в который вписывается цифра
+    
+    Returns:
+        (images, boxes) как в segment_digits, рамки в пикселях холста
+    """
+    factor = max(1, min(pixels.shape[:2]) // (target_size * SEGMENTATION_SCALE))
+    ink = colors_to_ink(color_channels(block_downsample(pixels, factor)))
+    images, boxes = segment_digits(ink, target_size, box_size)
+    return images, boxes * factor
+
+
+def segment_strokes(strokes, brush_size=20, target_size=28, box_size=20):
+    """
+    Выделение цифр по векторным штрихам
+    
+    Штрихи растеризуются в квадрат по большей стороне холста, чтобы
+    сохранить пропорции цифр.
+    
+    Args:
+        strokes: StrokeStore
+        brush_size: толщина кисти на холсте
+        target_size: размер изображения цифры
+        box_size: размер квадрата, в который вписывается цифра
+    
+    Returns:
+        (images, boxes) как в segment_digits, рамки в пикселях холста
+    """
+    side = max(strokes.canvas_size)
+    resolution = side // max(1, min(strokes.canvas_size) // (target_size * SEGMENTATION_SCALE))
+    ink = rasterize_strokes(strokes, (side, side), brush_size, resolution)
+    images, boxes = segment_digits(ink, target_size, box_size)
+    return images, np.round(boxes * (side / resolution)).astype(np.int32)
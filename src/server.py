@@ -0,0 +1,588 @@
+"""Локальный HTTP-сервер распознавания цифр
+
+Сервер держит одну загруженную модель и объединяет одновременные
+запросы в батчи через MicroBatcher. Соединения переиспользуются
+(HTTP/1.1 keep-alive), количество ожидающих запросов ограничено,
+а /metrics отдает счетчики и гистограммы задержек в текстовом
+формате Prometheus. Поддерживается TCP и Unix-сокет.
+
+Запросы:
+    POST /predict  - тело: 784 байта uint8 (28x28, чернила = 255),
+                     784 * 4 байта float32, PNG/JPEG или JSON
+                     {"image": "<base64 одного из форматов>"}
+    GET  /health   - состояние сервера и модели
+    GET  /metrics  - метрики
+
+Запуск:
+    python -m src.server [--host 127.0.0.1] [--port 8765] [--unix /tmp/digits.sock]
+"""
+
+import argparse
+import asyncio
+import base64
+import binascii
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+import config
+from src.batching import MicroBatcher
+from src.model_handler import BACKENDS, ModelHandler
+from src.prediction_result import PredictionResult
+from src.instrumentation import setup_logging
+from src.quantization import VARIANTS
+from src.runtime_config import apply_runtime_settings
+from src.utils import decode_gray, preprocess_gray_array
+from src.worker_pool import InferenceWorkerPool
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SIZE = config.MODEL_IMAGE_SIZE
+RAW_UINT8_BYTES = IMAGE_SIZE * IMAGE_SIZE
+RAW_FLOAT32_BYTES = RAW_UINT8_BYTES * 4
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+STATUS_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    415: "Unsupported Media Type",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    501: "Not Implemented",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    """Ошибка обработки запроса с HTTP-статусом"""
+    
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами в формате Prometheus"""
+    
+    def __init__(self, buckets):
+        """
+        Инициализация гистограммы
+        
+        Args:
+            buckets: возрастающие верхние границы корзин
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+    
+    def observe(self, value):
+        """Регистрация одного значения"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += value
+            self.count += 1
+    
+    def quantile(self, q):
+        """Оценка квантиля по верхней границе корзины (для логов и тестов)"""
+        with self._lock:
+            if self.count == 0:
+                return 0.0
+            rank = q * self.count
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+                cumulative += count
+                if cumulative >= rank:
+                    return bound
+        return float("inf")
+    
+    def render(self, name, help_text):
+        """Строки метрики в текстовом формате Prometheus"""
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.total, self.count
+        
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{name}_sum {total:.6f}")
+        lines.append(f"{name}_count {count}")
+        return lines
+
+
+class Request:
+    """Разобранный HTTP-запрос"""
+    
+    __slots__ = ("method", "path", "version", "headers", "body")
+    
+    def __init__(self, method, path, version, headers, body=b""):
+        self.method = method
+        self.path = path
+        self.version = version
+        self.headers = headers
+        self.body = body
+    
+    @property
+    def keep_alive(self):
+        """Нужно ли оставить соединение открытым после ответа"""
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+def decode_image(body, content_type):
+    """
+    Разбор тела запроса в изображение для модели
+    
+    Args:
+        body: байты тела запроса
+        content_type: значение заголовка Content-Type
+    
+    Returns:
+        numpy array float32 формы (28, 28, 1) с интенсивностью [0, 1]
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    
+    if media_type == "application/json":
+        try:
+            payload = json.loads(body)
+            body = base64.b64decode(payload["image"], validate=True)
+        except (ValueError, KeyError, TypeError, binascii.Error) as e:
+            raise HttpError(400, f"Ожидается JSON вида {{\"image\": \"<base64>\"}}: {e}")
+        media_type = ""
+    
+    if len(body) == RAW_UINT8_BYTES and not media_type.startswith("image/"):
+        image = np.frombuffer(body, dtype=np.uint8).astype(np.float32) / 255.0
+    elif len(body) == RAW_FLOAT32_BYTES and not media_type.startswith("image/"):
+        image = np.clip(np.frombuffer(body, dtype="<f4"), 0.0, 1.0)
+    elif media_type.startswith("image/") or body[:4] in (b"\x89PNG", b"\xff\xd8\xff\xe0", b"\xff\xd8\xff\xe1"):
+        image = decode_encoded_image(body)
+    elif media_type in ("", "application/octet-stream"):
+        raise HttpError(400, f"Ожидается {RAW_UINT8_BYTES} или {RAW_FLOAT32_BYTES} байт, получено {len(body)}")
+    else:
+        raise HttpError(415, f"Неподдерживаемый тип содержимого: {media_type}")
+    
+    return image.reshape(IMAGE_SIZE, IMAGE_SIZE, 1)
+
+
+def decode_encoded_image(body):
+    """Декодирование PNG/JPEG (темная цифра на светлом фоне) в формат модели"""
+    try:
+        gray = decode_gray("encoded", body, IMAGE_SIZE)
+    except Exception as e:
+        raise HttpError(400, f"Не удалось декодировать изображение: {e}")
+    return preprocess_gray_array(
+        gray, IMAGE_SIZE, config.PREPROCESS_CENTERING, config.MNIST_BOX_SIZE
+    )
+
+
+class InferenceServer:
+    """
+    Асинхронный HTTP-сервер распознавания с объединением запросов в батчи
+    
+    Цикл событий только разбирает запросы и пишет ответы: декодирование
+    изображений выполняется в пуле потоков, инференс - в потоке
+    MicroBatcher, так что одновременные запросы разных соединений
+    попадают в один батч.
+    """
+    
+    def __init__(self, model_handler, host="127.0.0.1", port=8765, unix_path=None,
+                 max_batch_size=32, max_wait_ms=5.0, max_pending=256,
+                 max_connections=512, max_body_bytes=1 << 20, keepalive_timeout=15.0):
+        """
+        Инициализация сервера
+        
+        Args:
+            model_handler: загруженный ModelHandler
+            host, port: адрес TCP (port=0 - выбрать свободный)
+            unix_path: путь к Unix-сокету вместо TCP
+            max_batch_size: максимальный размер батча инференса
+            max_wait_ms: максимальное ожидание добора батча в мс
+            max_pending: предел одновременных запросов /predict, сверх него - 503
+            max_connections: предел открытых соединений, сверх него - 503
+            max_body_bytes: максимальный размер тела запроса
+            keepalive_timeout: время ожидания следующего запроса в соединении, с
+        """
+        self.model_handler = model_handler
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_pending = max_pending
+        self.max_connections = max_connections
+        self.max_body_bytes = max_body_bytes
+        self.keepalive_timeout = keepalive_timeout
+        
+        self.batcher = None
+        self._server = None
+        self._closing = False
+        self.pending = 0
+        self.connections = 0
+        self._connection_tasks = set()
+        
+        self.request_latency = Histogram(LATENCY_BUCKETS)
+        self.inference_latency = Histogram(LATENCY_BUCKETS)
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.responses = {}
+        self.rejected = 0
+    
+    @property
+    def address(self):
+        """Адрес, на котором слушает сервер: (host, port) или путь к сокету"""
+        if self._server is None:
+            return None
+        if self.unix_path:
+            return self.unix_path
+        return self._server.sockets[0].getsockname()[:2]
+    
+    async def start(self):
+        """Запуск приема соединений"""
+        self._closing = False
+        self.batcher = MicroBatcher(self._predict_batch, self.max_batch_size, self.max_wait_ms)
+        
+        if self.unix_path:
+            if os.path.exists(self.unix_path):
+                os.unlink(self.unix_path)
+            self._server = await asyncio.start_unix_server(self._handle_connection, self.unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+    
+    async def serve_forever(self):
+        """Запуск и обслуживание до отмены"""
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+    
+    async def close(self):
+        """Остановка приема соединений и очереди батчинга"""
+        self._closing = True
+        if self._server is not None:
+            self._server.close()
+            # Простаивающие keep-alive соединения ждут следующего запроса
+            for task in list(self._connection_tasks):
+                task.cancel()
+            await asyncio.gather(*self._connection_tasks, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+        if self.batcher is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.batcher.close)
+            self.batcher = None
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+    
+    def _predict_batch(self, images):
+        """Батчевый инференс с учетом метрик (выполняется в потоке MicroBatcher)"""
+        start = time.perf_counter()
+        probabilities = self.model_handler.predict_batch(images)
+        self.inference_latency.observe(time.perf_counter() - start)
+        self.batch_sizes.observe(len(images))
+        return probabilities
+    
+    async def _handle_connection(self, reader, writer):
+        """Обслуживание одного соединения (возможно, с несколькими запросами)"""
+        if self.connections >= self.max_connections:
+            self.rejected += 1
+            await self._write_response(writer, 503, {"error": "Слишком много соединений"},
+                                       keep_alive=False, retry_after=1)
+            writer.close()
+            return
+        
+        self.connections += 1
+        task = asyncio.current_task()
+        self._connection_tasks.add(task)
+        try:
+            while not self._closing:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.keepalive_timeout)
+                except asyncio.TimeoutError:
+                    break
+                except HttpError as e:
+                    self._count_response(e.status)
+                    await self._write_response(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                
+                if request is None:
+                    break
+                
+                status, payload, retry_after = await self._dispatch(request)
+                keep_alive = request.keep_alive and not self._closing
+                await self._write_response(writer, status, payload, keep_alive, retry_after)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Отмена при остановке сервера: соединение просто закрывается,
+            # задача завершается штатно, чтобы asyncio не логировал ее как ошибку
+            pass
+        finally:
+            self._connection_tasks.discard(task)
+            self.connections -= 1
+            writer.close()
+    
+    async def _read_request(self, reader):
+        """
+        Чтение одного запроса
+        
+        Returns:
+            Request или None, если клиент закрыл соединение
+        """
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if not e.partial.strip():
+                return None
+            raise HttpError(400, "Неполный заголовок запроса")
+        except asyncio.LimitOverrunError:
+            raise HttpError(431, "Слишком большой заголовок запроса")
+        
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, path, version = lines[0].split(" ")
+        except ValueError:
+            raise HttpError(400, f"Неверная строка запроса: {lines[0]!r}")
+        
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HttpError(501, "Chunked-кодирование тела не поддерживается")
+        
+        length = headers.get("content-length")
+        if length is None:
+            if method == "POST":
+                raise HttpError(411, "Требуется заголовок Content-Length")
+            return Request(method, path, version, headers)
+        
+        try:
+            length = int(length)
+        except ValueError:
+            raise HttpError(400, "Неверный Content-Length")
+        if length < 0 or length > self.max_body_bytes:
+            raise HttpError(413, f"Тело запроса больше {self.max_body_bytes} байт")
+        
+        body = await reader.readexactly(length)
+        return Request(method, path, version, headers, body)
+    
+    async def _dispatch(self, request):
+        """
+        Маршрутизация запроса
+        
+        Returns:
+            (статус, тело ответа: dict или str, Retry-After или None)
+        """
+        start = time.perf_counter()
+        path = request.path.split("?")[0]
+        routes = {
+            "/predict": ("POST", self._handle_predict),
+            "/health": ("GET", self._handle_health),
+            "/metrics": ("GET", self._handle_metrics),
+        }
+        
+        try:
+            if path not in routes:
+                raise HttpError(404, f"Неизвестный путь: {path}")
+            method, handler = routes[path]
+            if request.method != method:
+                raise HttpError(405, f"Метод {request.method} не поддерживается для {path}")
+            status, payload, retry_after = 200, await handler(request), None
+        except HttpError as e:
+            status, payload = e.status, {"error": e.message}
+            retry_after = 1 if e.status == 503 else None
+        except Exception as e:
+            status, payload, retry_after = 500, {"error": str(e)}, None
+        
+        if path == "/predict" and request.method == "POST":
+            self.request_latency.observe(time.perf_counter() - start)
+        self._count_response(status)
+        return status, payload, retry_after
+    
+    def _count_response(self, status):
+        """Учет ответа в счетчике по статусам"""
+        self.responses[status] = self.responses.get(status, 0) + 1
+    
+    async def _handle_predict(self, request):
+        """Распознавание одного изображения"""
+        # Ограничение очереди: при перегрузке быстро отказываем вместо
+        # неограниченного роста задержки
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HttpError(503, "Сервер перегружен, повторите запрос позже")
+        
+        self.pending += 1
+        try:
+            content_type = request.headers.get("content-type", "")
+            if len(request.body) in (RAW_UINT8_BYTES, RAW_FLOAT32_BYTES) and "image/" not in content_type:
+                image = decode_image(request.body, content_type)
+            else:
+                loop = asyncio.get_running_loop()
+                image = await loop.run_in_executor(None, decode_image, request.body, content_type)
+            
+            probabilities = await asyncio.wrap_future(self.batcher.submit(image))
+        finally:
+            self.pending -= 1
+        
+        result = PredictionResult(probabilities)
+        return {"digit": result.digit, "confidence": result.confidence,
+                "probabilities": result.tolist()}
+    
+    async def _handle_health(self, request):
+        """Состояние сервера"""
+        return {
+            "status": "ok" if self.model_handler.is_loaded else "model_not_loaded",
+            "backend": self.model_handler.backend_name,
+            "variant": self.model_handler.variant,
+            "pending": self.pending,
+            "connections": self.connections,
+        }
+    
+    async def _handle_metrics(self, request):
+        """Метрики в текстовом формате Prometheus"""
+        lines = ["# HELP digits_responses_total Ответы по HTTP-статусам",
+                 "# TYPE digits_responses_total counter"]
+        for status, count in sorted(self.responses.items()):
+            lines.append(f'digits_responses_total{{status="{status}"}} {count}')
+        
+        lines += [
+            "# HELP digits_rejected_total Запросы, отклоненные из-за перегрузки",
+            "# TYPE digits_rejected_total counter",
+            f"digits_rejected_total {self.rejected}",
+            "# HELP digits_pending_requests Запросы /predict в обработке",
+            "# TYPE digits_pending_requests gauge",
+            f"digits_pending_requests {self.pending}",
+            "# HELP digits_open_connections Открытые соединения",
+            "# TYPE digits_open_connections gauge",
+            f"digits_open_connections {self.connections}",
+        ]
+        lines += self.request_latency.render(
+            "digits_request_duration_seconds", "Время обработки запроса /predict")
+        lines += self.inference_latency.render(
+            "digits_inference_duration_seconds", "Время батчевого инференса")
+        lines += self.batch_sizes.render("digits_batch_size", "Размер батча инференса")
+        
+        cache = getattr(self.model_handler, "cache", None)
+        if cache is not None:
+            stats = cache.stats()
+            for name in ("hits", "misses", "evictions", "expirations"):
+                lines += [f"# TYPE digits_cache_{name}_total counter",
+                          f"digits_cache_{name}_total {stats[name]}"]
+            lines += ["# TYPE digits_cache_entries gauge", f"digits_cache_entries {stats['size']}"]
+        return "\n".join(lines) + "\n"
+    
+    async def _write_response(self, writer, status, payload, keep_alive=True, retry_after=None):
+        """Запись ответа"""
+        if isinstance(payload, str):
+            body = payload.encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        
+        head = [
+            f"HTTP/1.1 {status} {STATUS_REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if keep_alive:
+            head.append(f"Keep-Alive: timeout={int(self.keepalive_timeout)}")
+        if retry_after is not None:
+            head.append(f"Retry-After: {retry_after}")
+        
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+
+def main(argv=None):
+    """Точка входа: загрузка модели и запуск сервера"""
+    parser = argparse.ArgumentParser(description="Локальный HTTP-сервер распознавания цифр")
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--unix", dest="unix_path", help="путь к Unix-сокету вместо TCP")
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    parser.add_argument("--backend", default=config.MODEL_BACKEND, choices=BACKENDS)
+    parser.add_argument("--variant", default=config.MODEL_VARIANT, choices=VARIANTS)
+    parser.add_argument("--max-batch-size", type=int, default=config.BATCH_MAX_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=config.BATCH_MAX_WAIT_MS)
+    parser.add_argument("--max-pending", type=int, default=config.SERVER_MAX_PENDING)
+    parser.add_argument("--workers", type=int, default=config.WORKER_POOL_SIZE,
+                        help="процессов инференса (0 - модель в процессе сервера)")
+    parser.add_argument("--threads-per-worker", type=int, default=config.WORKER_POOL_THREADS)
+    args = parser.parse_args(argv)
+    setup_logging()
+    # NumPy уже импортирован: действуют привязка к ядрам и потоки TensorFlow
+    apply_runtime_settings()
+    
+    if args.workers > 0:
+        # Батчи делятся между процессами, каждый со своей копией модели
+        try:
+            handler = InferenceWorkerPool(
+                args.model, args.workers, args.threads_per_worker,
+                backend=args.backend, variant=args.variant,
+                max_batch_size=args.max_batch_size,
+                job_timeout=config.WORKER_POOL_JOB_TIMEOUT_S
+            )
+        except Exception as e:
+            logger.error(f"Не удалось запустить пул процессов: {e}")
+            return 1
+    else:
+        handler = ModelHandler(args.model, backend=args.backend, variant=args.variant,
+                               warmup_batch_sizes=(1, args.max_batch_size))
+        if not handler.is_loaded:
+            logger.error(f"Не удалось загрузить модель из {args.model}")
+            return 1
+        if config.PREDICTION_CACHE_SIZE > 0:
+            handler.enable_prediction_cache(config.PREDICTION_CACHE_SIZE,
+                                            config.PREDICTION_CACHE_TTL_S)
+    
+    server = InferenceServer(
+        handler, args.host, args.port, args.unix_path,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_pending=args.max_pending,
+        max_body_bytes=config.SERVER_MAX_BODY_BYTES,
+        keepalive_timeout=config.SERVER_KEEPALIVE_TIMEOUT_S
+    )
+    
+    async def run():
+        await server.start()
+        logger.info(f"Сервер распознавания слушает {server.address}")
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+    
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        logger.info("Сервер остановлен")
+    finally:
+        if isinstance(handler, InferenceWorkerPool):
+            handler.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,60 @@
+"""Замер времени этапов запуска приложения"""
+
+import time
+
+
+class StartupTimer:
+    """
+    Отметки времени этапов запуска относительно создания таймера
+    
+    Отметки ставятся из разных мест (main.py, окно, загрузчик модели),
+    поэтому используется один экземпляр модуля startup_timer.
+    """
+    
+    def __init__(self):
+        """Инициализация таймера"""
+        self.origin = time.perf_counter()
+        self.marks = {}
+        self.durations = {}
+    
+    def mark(self, name):
+        """
+        Отметка завершения этапа (повторные отметки игнорируются)
+        
+        Returns:
+            время от создания таймера в секундах
+        """
+        if name not in self.marks:
+            self.marks[name] = time.perf_counter() - self.origin
+        return self.marks[name]
+    
+    def add_duration(self, name, seconds):
+        """Длительность этапа, измеренного отдельно (например, в рабочем потоке)"""
+        self.durations[name] = seconds
+    
+    def has(self, *names):
+        """Поставлены ли все указанные отметки"""
+        return all(name in self.marks for name in names)
+    
+    def report(self):
+        """
+        Сводка этапов запуска
+        
+        Returns:
+            строка вида "импорт 0.41 с -> окно 0.52 с (+0.11) -> ..."
+        """
+        parts = []
+        previous = 0.0
+        for name, moment in sorted(self.marks.items(), key=lambda item: item[1]):
+            parts.append(f"{name} {moment:.2f} с (+{moment - previous:.2f})")
+            previous = moment
+        
+        report = " -> ".join(parts)
+        if self.durations:
+            details = ", ".join(f"{name} {seconds:.2f} с" for name, seconds in self.durations.items())
+            report += f"; {details}"
+        return report
+
+
+# Общий таймер процесса: создается при первом импорте модуля (первой строкой main.py)
+startup_timer = StartupTimer()
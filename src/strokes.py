@@ -0,0 +1,317 @@
+"""Векторная модель штрихов и растеризация сразу в разрешение модели"""
+
+import numpy as np
+
+# Колонки массива точек
+X, Y, T, PRESSURE = range(4)
+
+
+class StrokeStore:
+    """
+    Штрихи в виде компактных массивов точек
+    
+    Все точки хранятся в одном массиве float32 формы (n, 4) с колонками
+    x, y, t (секунды от первой точки), pressure, а границы штрихов - в
+    списке начальных индексов. Отмена и повтор перемещают целые штрихи
+    между хранилищем и стеком повтора без перерисовки растра.
+    """
+    
+    def __init__(self, capacity=1024, canvas_size=None):
+        """
+        Инициализация хранилища
+        
+        Args:
+            capacity: начальная емкость массива точек
+            canvas_size: (ширина, высота) холста, на котором рисуются штрихи
+        """
+        self.canvas_size = canvas_size
+        self._points = np.empty((capacity, 4), dtype=np.float32)
+        self._count = 0
+        self._starts = []
+        self._redo = []
+        self._time_origin = None
+        self._open = False
+    
+    @property
+    def num_points(self):
+        """Количество точек во всех штрихах"""
+        return self._count
+    
+    @property
+    def num_strokes(self):
+        """Количество штрихов"""
+        return len(self._starts)
+    
+    def is_empty(self):
+        """Пусто ли хранилище"""
+        return self._count == 0
+    
+    def _reserve(self, extra):
+        """Удвоение емкости массива точек при необходимости"""
+        needed = self._count + extra
+        if needed <= len(self._points):
+            return
+        
+        capacity = len(self._points)
+        while capacity < needed:
+            capacity *= 2
+        grown = np.empty((capacity, 4), dtype=np.float32)
+        grown[:self._count] = self._points[:self._count]
+        self._points = grown
+    
+    def _append(self, x, y, timestamp, pressure):
+        """Добавление одной точки"""
+        if self._time_origin is None:
+            self._time_origin = timestamp
+        
+        self._reserve(1)
+        self._points[self._count] = (x, y, timestamp - self._time_origin, pressure)
+        self._count += 1
+    
+    def begin_stroke(self, x, y, timestamp=0.0, pressure=1.0):
+        """
+        Начало нового штриха
+        
+        Args:
+            x, y: координаты на холсте
+            timestamp: время в секундах
+            pressure: нажим [0, 1]
+        """
+        if self._open:
+            self.end_stroke()
+        
+        self._starts.append(self._count)
+        self._redo.clear()
+        self._open = True
+        self._append(x, y, timestamp, pressure)
+    
+    def add_point(self, x, y, timestamp=0.0, pressure=1.0):
+        """Добавление точки в текущий штрих"""
+        if not self._open:
+            self.begin_stroke(x, y, timestamp, pressure)
+            return
+        self._append(x, y, timestamp, pressure)
+    
+    def end_stroke(self):
+        """Завершение текущего штриха; штрихи из одной точки отбрасываются"""
+        if not self._open:
+            return
+        self._open = False
+        if self._count - self._starts[-1] < 2:
+            self._count = self._starts.pop()
+    
+    def stroke(self, index):
+        """Представление точек штриха (n, 4) без копирования"""
+        start = self._starts[index]
+        end = self._starts[index + 1] if index + 1 < len(self._starts) else self._count
+        return self._points[start:end]
+    
+    def strokes(self):
+        """Список представлений точек всех штрихов"""
+        return [self.stroke(i) for i in range(len(self._starts))]
+    
+    @property
+    def points(self):
+        """Представление всех точек (n, 4) без копирования"""
+        return self._points[:self._count]
+    
+    def segments(self):
+        """
+        Отрезки между соседними точками внутри штрихов
+        
+        Returns:
+            (начала (m, 4), концы (m, 4)) - точки отрезков
+        """
+        points = self.points
+        if self._count < 2:
+            empty = np.empty((0, 4), dtype=np.float32)
+            return empty, empty
+        
+        # Отрезок не должен соединять конец штриха с началом следующего
+        valid = np.ones(self._count - 1, dtype=bool)
+        starts = np.asarray(self._starts[1:], dtype=np.intp)
+        valid[starts - 1] = False
+        return points[:-1][valid], points[1:][valid]
+    
+    def undo(self):
+        """
+        Отмена последнего штриха
+        
+        Returns:
+            True, если штрих был отменен
+        """
+        if self._open:
+            self.end_stroke()
+        if not self._starts:
+            return False
+        
+        start = self._starts.pop()
+        self._redo.append(self._points[start:self._count].copy())
+        self._count = start
+        return True
+    
+    def redo(self):
+        """
+        Повтор отмененного штриха
+        
+        Returns:
+            True, если штрих был восстановлен
+        """
+        if not self._redo:
+            return False
+        
+        stroke = self._redo.pop()
+        self._reserve(len(stroke))
+        self._starts.append(self._count)
+        self._points[self._count:self._count + len(stroke)] = stroke
+        self._count += len(stroke)
+        return True
+    
+    def clear(self):
+        """Удаление всех штрихов"""
+        self._count = 0
+        self._starts = []
+        self._redo = []
+        self._time_origin = None
+        self._open = False
+    
+    def snapshot(self):
+        """
+        Независимая копия штрихов для передачи в другой поток
+        
+        Returns:
+            StrokeStore с копией точек
+        """
+        copy = StrokeStore(max(self._count, 1), self.canvas_size)
+        copy._points[:self._count] = self._points[:self._count]
+        copy._count = self._count
+        copy._starts = list(self._starts)
+        copy._time_origin = self._time_origin
+        if self._open and self._count - self._starts[-1] < 2:
+            # Незавершенный штрих из одной точки в снимок не попадает
+            copy._count = copy._starts.pop()
+        return copy
+
+
+def _coverage(starts, ends, radii, pixel_x, pixel_y):
+    """
+    Сглаженное покрытие пикселей отрезками с круглыми концами
+    
+    Args:
+        starts, ends: координаты концов отрезков (m, 2)
+        radii: радиусы кисти (m,)
+        pixel_x, pixel_y: координаты центров пикселей, транслируемые к (m, ...)
+    
+    Returns:
+        покрытие [0, 1] формы (m, ...)
+    """
+    extra = (1,) * (pixel_x.ndim - 1)
+    ax = starts[:, 0].reshape((-1,) + extra)
+    ay = starts[:, 1].reshape((-1,) + extra)
+    dx = (ends[:, 0] - starts[:, 0]).reshape((-1,) + extra)
+    dy = (ends[:, 1] - starts[:, 1]).reshape((-1,) + extra)
+    length_sq = np.maximum(dx * dx + dy * dy, 1e-12)
+    
+    # Проекция центра пикселя на отрезок и расстояние до ближайшей точки
+    along = ((pixel_x - ax) * dx + (pixel_y - ay) * dy) / length_sq
+    np.clip(along, 0.0, 1.0, out=along)
+    distance = np.hypot(pixel_x - (ax + along * dx), pixel_y - (ay + along * dy))
+    
+    # Линейный спад на границе в один пиксель дает сглаживание
+    coverage = radii.reshape((-1,) + extra) + 0.5 - distance
+    return np.clip(coverage, 0.0, 1.0, out=coverage)
+
+
+def _draw_segments(canvas, starts, ends, radii, chunk=512):
+    """
+    Растеризация отрезков в canvas (максимум покрытия)
+    
+    Каждый отрезок обрабатывается только в своем локальном окне, поэтому
+    стоимость пропорциональна количеству отрезков, а не площади холста.
+    """
+    size_y, size_x = canvas.shape
+    flat = canvas.reshape(-1)
+    
+    for begin in range(0, len(starts), chunk):
+        a = starts[begin:begin + chunk]
+        b = ends[begin:begin + chunk]
+        r = radii[begin:begin + chunk]
+        
+        low = np.floor(np.minimum(a, b) - r[:, None] - 1.0).astype(np.intp)
+        high = np.ceil(np.maximum(a, b) + r[:, None] + 1.0).astype(np.intp)
+        window = int((high - low).max()) + 1
+        
+        if window * window >= size_x * size_y:
+            # Длинные отрезки: считаем сразу по всей сетке
+            grid_y, grid_x = np.mgrid[:size_y, :size_x].astype(np.float32) + 0.5
+            coverage = _coverage(a, b, r, grid_x[None], grid_y[None]).max(axis=0)
+            np.maximum(canvas, coverage, out=canvas)
+            continue
+        
+        offsets = np.arange(window)
+        cols = low[:, 0, None, None] + offsets[None, None, :]
+        rows = low[:, 1, None, None] + offsets[None, :, None]
+        coverage = _coverage(a, b, r, cols + 0.5, rows + 0.5)
+        
+        inside = (cols >= 0) & (cols < size_x) & (rows >= 0) & (rows < size_y) & (coverage > 0)
+        index = (rows * size_x + cols)
+        np.maximum.at(flat, np.broadcast_to(index, coverage.shape)[inside], coverage[inside])
+
+
+def rasterize_strokes(strokes, canvas_size=None, brush_size=20, target_size=28,
+                      center=False, box_size=20):
+    """
+    Растеризация штрихов сразу в разрешение модели со сглаживанием
+    
+    Стоимость зависит от количества точек штрихов, а не от площади холста.
+    
+    Args:
+        strokes: StrokeStore
+        canvas_size: (ширина, высота) холста; по умолчанию strokes.canvas_size
+        brush_size: толщина кисти на холсте
+        target_size: размер выходного изображения
+        center: вписать ли цифру в box_size и сдвинуть по центру масс (как MNIST)
+        box_size: размер квадрата для вписывания при center
+    
+    Returns:
+        numpy array float32 формы (target_size, target_size) с интенсивностью [0, 1]
+    """
+    canvas = np.zeros((target_size, target_size), dtype=np.float32)
+    starts, ends = strokes.segments()
+    if len(starts) == 0:
+        return canvas
+    
+    radius = brush_size / 2.0
+    pressure = (starts[:, PRESSURE] + ends[:, PRESSURE]) / 2.0
+    
+    if center:
+        # Рамка чернил с учетом толщины кисти
+        points = strokes.points[:, :2]
+        low = points.min(axis=0) - radius
+        high = points.max(axis=0) + radius
+        scale = np.float32(box_size / max(float((high - low).max()), 1.0))
+        scale_xy = np.array([scale, scale], dtype=np.float32)
+        offset = target_size / 2.0 - (low + high) / 2.0 * scale
+    else:
+        width, height = canvas_size or strokes.canvas_size
+        scale_xy = np.array([target_size / width, target_size / height], dtype=np.float32)
+        scale = np.float32(scale_xy.mean())
+        offset = np.zeros(2, dtype=np.float32)
+    
+    radii = (radius * scale * pressure).astype(np.float32)
+    a = starts[:, :2] * scale_xy + offset
+    b = ends[:, :2] * scale_xy + offset
+    _draw_segments(canvas, a, b, radii)
+    
+    if center and canvas.sum() > 0:
+        # Сдвиг по центру масс: растеризуем повторно с поправкой (субпиксельно)
+        grid = np.arange(target_size, dtype=np.float32) + 0.5
+        mass = canvas.sum()
+        shift = np.array([
+            target_size / 2.0 - canvas.sum(axis=0) @ grid / mass,
+            target_size / 2.0 - canvas.sum(axis=1) @ grid / mass,
+        ], dtype=np.float32)
+        canvas.fill(0.0)
+        _draw_segments(canvas, a + shift, b + shift, radii)
+    
+    return canvas
@@ -0,0 +1,253 @@
+"""Чтение чекпоинта TensorFlow (variables.index / variables.data-*) и графа
+saved_model.pb без импорта TensorFlow"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+# Магическое число в конце SSTable-файла variables.index
+_TABLE_MAGIC = 0xdb4775248b80fb57
+_FOOTER_SIZE = 48
+
+# Соответствие DataType из types.proto типам NumPy
+_DTYPES = {
+    1: np.float32,
+    2: np.float64,
+    3: np.int32,
+    4: np.uint8,
+    5: np.int16,
+    6: np.int8,
+    9: np.int64,
+    10: np.bool_,
+    17: np.uint16,
+    19: np.float16,
+}
+
+
+def _read_varint(buffer, pos):
+    """Чтение varint из буфера, возвращает (значение, новая позиция)"""
+    result = 0
+    shift = 0
+    while True:
+        byte = buffer[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _iter_proto_fields(buffer):
+    """Итерация по полям protobuf-сообщения: (номер поля, значение)"""
+    pos = 0
+    while pos < len(buffer):
+        key, pos = _read_varint(buffer, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, pos = _read_varint(buffer, pos)
+        elif wire_type == 1:
+            value = buffer[pos:pos + 8]
+            pos += 8
+        elif wire_type == 2:
+            length, pos = _read_varint(buffer, pos)
+            value = buffer[pos:pos + length]
+            pos += length
+        elif wire_type == 5:
+            value = buffer[pos:pos + 4]
+            pos += 4
+        else:
+            raise ValueError(f"Неподдерживаемый тип поля protobuf: {wire_type}")
+        yield field, value
+
+
+def _proto_field(buffer, number):
+    """Значения поля protobuf-сообщения с номером number"""
+    for field, value in _iter_proto_fields(buffer):
+        if field == number:
+            yield value
+
+
+def _read_block(data, offset, size):
+    """Чтение блока SSTable, возвращает список пар (ключ, значение)"""
+    if data[offset + size] != 0:
+        raise ValueError("Сжатые блоки чекпоинта не поддерживаются")
+    
+    block = data[offset:offset + size]
+    num_restarts = struct.unpack_from("<I", block, len(block) - 4)[0]
+    limit = len(block) - 4 - 4 * num_restarts
+    
+    entries = []
+    key = b""
+    pos = 0
+    while pos < limit:
+        shared, pos = _read_varint(block, pos)
+        non_shared, pos = _read_varint(block, pos)
+        value_length, pos = _read_varint(block, pos)
+        key = key[:shared] + bytes(block[pos:pos + non_shared])
+        pos += non_shared
+        entries.append((key, bytes(block[pos:pos + value_length])))
+        pos += value_length
+    return entries
+
+
+def _parse_entry(value):
+    """Разбор BundleEntryProto"""
+    entry = {"dtype": 0, "shape": (), "shard_id": 0, "offset": 0, "size": 0}
+    for field, field_value in _iter_proto_fields(value):
+        if field == 1:
+            entry["dtype"] = field_value
+        elif field == 2:
+            dims = []
+            for shape_field, dim in _iter_proto_fields(field_value):
+                if shape_field == 2:
+                    size = dict(_iter_proto_fields(dim)).get(1, 0)
+                    dims.append(size)
+            entry["shape"] = tuple(dims)
+        elif field == 3:
+            entry["shard_id"] = field_value
+        elif field == 4:
+            entry["offset"] = field_value
+        elif field == 5:
+            entry["size"] = field_value
+        elif field == 7:
+            raise ValueError("Секционированные переменные не поддерживаются")
+    return entry
+
+
+def read_checkpoint(prefix):
+    """
+    Чтение всех числовых переменных чекпоинта
+    
+    Args:
+        prefix: префикс чекпоинта, например "mnist_model/variables/variables"
+    
+    Returns:
+        словарь {имя переменной: numpy array}
+    """
+    with open(prefix + ".index", "rb") as f:
+        index_data = f.read()
+    
+    if len(index_data) < _FOOTER_SIZE:
+        raise ValueError(f"Поврежденный индекс чекпоинта: {prefix}.index")
+    
+    footer = index_data[-_FOOTER_SIZE:]
+    if struct.unpack("<Q", footer[-8:])[0] != _TABLE_MAGIC:
+        raise ValueError(f"Неверный формат индекса чекпоинта: {prefix}.index")
+    
+    # Футер: BlockHandle metaindex, затем BlockHandle индексного блока
+    _, pos = _read_varint(footer, 0)
+    _, pos = _read_varint(footer, pos)
+    index_offset, pos = _read_varint(footer, pos)
+    index_size, pos = _read_varint(footer, pos)
+    
+    entries = {}
+    num_shards = 1
+    for _, handle in _read_block(index_data, index_offset, index_size):
+        block_offset, pos = _read_varint(handle, 0)
+        block_size, _ = _read_varint(handle, pos)
+        for key, value in _read_block(index_data, block_offset, block_size):
+            if key == b"":
+                # BundleHeaderProto: поле 1 - количество шардов
+                num_shards = dict(_iter_proto_fields(value)).get(1, 1)
+            else:
+                entries[key.decode("utf-8")] = _parse_entry(value)
+    
+    shards = {}
+    variables = {}
+    try:
+        for name, entry in entries.items():
+            dtype = _DTYPES.get(entry["dtype"])
+            if dtype is None:
+                # Строки и служебные переменные (граф объектов) пропускаем
+                continue
+            
+            shard_id = entry["shard_id"]
+            if shard_id not in shards:
+                shard_path = f"{prefix}.data-{shard_id:05d}-of-{num_shards:05d}"
+                shards[shard_id] = open(shard_path, "rb")
+            
+            shard = shards[shard_id]
+            shard.seek(entry["offset"])
+            raw = shard.read(entry["size"])
+            variables[name] = np.frombuffer(raw, dtype=dtype).reshape(entry["shape"]).copy()
+    finally:
+        for shard in shards.values():
+            shard.close()
+    
+    return variables
+
+
+def checkpoint_prefix(model_path):
+    """Префикс чекпоинта внутри директории SavedModel"""
+    return os.path.join(model_path, "variables", "variables")
+
+
+def _parse_function(function):
+    """Разбор FunctionDef: (имя, список узлов (имя, операция, входы))"""
+    name = ""
+    for signature in _proto_field(function, 1):
+        name = bytes(next(_proto_field(signature, 1), b"")).decode("utf-8")
+    
+    nodes = []
+    for node in _proto_field(function, 3):
+        node_name, op, inputs = "", "", []
+        for field, value in _iter_proto_fields(node):
+            if field == 1:
+                node_name = bytes(value).decode("utf-8")
+            elif field == 2:
+                op = bytes(value).decode("utf-8")
+            elif field == 3:
+                inputs.append(bytes(value).decode("utf-8"))
+        nodes.append((node_name, op, inputs))
+    return name, nodes
+
+
+def read_graph_functions(model_path):
+    """
+    Функции библиотеки графа из saved_model.pb
+    
+    Args:
+        model_path: путь к директории SavedModel
+    
+    Returns:
+        словарь {имя функции: список узлов (имя, операция, входы)}
+    """
+    with open(os.path.join(model_path, "saved_model.pb"), "rb") as f:
+        data = memoryview(f.read())
+    
+    # SavedModel.meta_graphs -> MetaGraphDef.graph_def -> GraphDef.library -> function
+    functions = {}
+    for meta_graph in _proto_field(data, 2):
+        for graph in _proto_field(meta_graph, 2):
+            for library in _proto_field(graph, 2):
+                for function in _proto_field(library, 1):
+                    name, nodes = _parse_function(function)
+                    functions[name] = nodes
+    return functions
+
+
+def read_keras_metadata(model_path):
+    """
+    Конфигурация модели из keras_metadata.pb (SavedModel, сохраненные tf.keras)
+    
+    Args:
+        model_path: путь к директории SavedModel
+    
+    Returns:
+        словарь метаданных корневого объекта или None, если файла нет
+    """
+    path = os.path.join(model_path, "keras_metadata.pb")
+    if not os.path.exists(path):
+        return None
+    
+    with open(path, "rb") as f:
+        data = memoryview(f.read())
+    
+    # SavedMetadata.nodes: node_path = 3, metadata = 5
+    for node in _proto_field(data, 1):
+        fields = dict(_iter_proto_fields(node))
+        if bytes(fields.get(3, b"")) == b"root":
+            return json.loads(bytes(fields.get(5, b"{}")).decode("utf-8"))
+    return None
@@ -0,0 +1,480 @@
+"""Обучение и оценка модели MNIST на локальных файлах IDX
+
+Файлы IDX отображаются в память (memmap_idx) и подаются в tf.data:
+блоки записей читаются из отображения, один раз кэшируются в памяти
+в uint8, перемешиваются, собираются в батчи, аугментируются
+векторизованно сразу для всего батча и подготавливаются заранее
+(prefetch), пока модель обучается на предыдущем батче.
+
+Нормализация (среднее и стандартное отклонение пикселей обучающего
+набора) считается один раз до обучения, а при экспорте сворачивается в
+веса первого слоя: сохраненная модель принимает изображения в [0, 1],
+как их готовит приложение, и выполняется обоими бэкендами ModelHandler.
+Параметры нормализации и обучения записываются в preprocessing.json.
+
+Запуск:
+    python -m src.training --train-images train-images-idx3-ubyte.gz \\
+        --train-labels train-labels-idx1-ubyte.gz --test-images t10k-images-idx3-ubyte.gz \\
+        --test-labels t10k-labels-idx1-ubyte.gz --output mnist_model
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import shutil
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+import config
+from src.idx_io import iter_idx, memmap_idx
+from src.instrumentation import setup_logging
+from src.numpy_backend import WEIGHTS_CACHE_NAME, NumpyDenseModel, source_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Файл с параметрами предобработки рядом с экспортированной моделью
+METADATA_FILE_NAME = "preprocessing.json"
+
+# Количество записей, читаемых из отображения за один шаг конвейера
+READ_CHUNK = 4096
+
+
+def load_idx_pair(images_path, labels_path, cache_dir=None):
+    """
+    Отображение в память изображений и меток набора IDX
+    
+    Args:
+        images_path, labels_path: файлы IDX (в том числе .gz)
+        cache_dir: директория для распакованных копий сжатых файлов
+    
+    Returns:
+        (изображения uint8 формы (N, 28, 28), метки uint8 формы (N,))
+    """
+    images = memmap_idx(images_path, cache_dir)
+    labels = memmap_idx(labels_path, cache_dir)
+    if images.ndim != 3 or images.dtype != np.uint8:
+        raise ValueError(f"Ожидаются изображения uint8 формы (N, H, W): {images_path}")
+    if labels.ndim != 1 or len(labels) != len(images):
+        raise ValueError(f"Метки {labels_path} не соответствуют изображениям {images_path}")
+    return images, labels
+
+
+def compute_normalization(images, chunk_size=READ_CHUNK):
+    """
+    Среднее и стандартное отклонение пикселей в шкале [0, 1]
+    
+    Args:
+        images: numpy array (в том числе memmap) формы (N, H, W)
+        chunk_size: количество изображений в блоке чтения
+    
+    Returns:
+        словарь {"mean": float, "std": float}
+    """
+    total = total_squares = 0.0
+    count = 0
+    for start in range(0, len(images), chunk_size):
+        chunk = np.asarray(images[start:start + chunk_size], dtype=np.float64) / 255.0
+        total += chunk.sum()
+        total_squares += np.square(chunk).sum()
+        count += chunk.size
+    if count == 0:
+        raise ValueError("Пустой обучающий набор")
+    mean = total / count
+    std = math.sqrt(max(total_squares / count - mean * mean, 1e-12))
+    return {"mean": mean, "std": std}
+
+
+def augment_batch(images, max_shift=2.0, max_rotation=10.0, max_scale=0.1):
+    """
+    Случайные сдвиг, поворот и масштаб для всего батча одной операцией
+    
+    Args:
+        images: tf.Tensor float32 формы (N, H, W, 1)
+        max_shift: наибольший сдвиг в пикселях
+        max_rotation: наибольший угол поворота в градусах
+        max_scale: наибольшее относительное изменение масштаба
+    
+    Returns:
+        tf.Tensor той же формы
+    """
+    count = tf.shape(images)[0]
+    size = tf.cast(tf.shape(images)[1:3], tf.float32)
+    center_y, center_x = (size[0] - 1.0) / 2.0, (size[1] - 1.0) / 2.0
+    
+    angles = tf.random.uniform([count], -max_rotation, max_rotation) * (math.pi / 180.0)
+    scales = tf.random.uniform([count], 1.0 - max_scale, 1.0 + max_scale)
+    shifts = tf.random.uniform([count, 2], -max_shift, max_shift)
+    
+    # Преобразование отображает точку результата в точку исходного
+    # изображения: поворот и масштаб вокруг центра, затем сдвиг
+    cos = tf.cos(angles) / scales
+    sin = tf.sin(angles) / scales
+    zeros = tf.zeros_like(cos)
+    transforms = tf.stack([
+        cos, -sin, center_x - cos * center_x + sin * center_y - shifts[:, 0],
+        sin, cos, center_y - sin * center_x - cos * center_y - shifts[:, 1],
+        zeros, zeros,
+    ], axis=1)
+    return tf.raw_ops.ImageProjectiveTransformV3(
+        images=images, transforms=transforms, output_shape=tf.shape(images)[1:3],
+        fill_value=0.0, interpolation="BILINEAR", fill_mode="CONSTANT"
+    )
+
+
+def make_dataset(images, labels, batch_size, normalization, training=False, augment=False,
+                 shuffle_buffer=None, seed=None):
+    """
+    Конвейер tf.data поверх отображенных в память массивов
+    
+    Args:
+        images: изображения uint8 формы (N, H, W)
+        labels: метки формы (N,)
+        batch_size: размер батча
+        normalization: словарь {"mean", "std"} из compute_normalization
+        training: перемешивать ли записи на каждой эпохе
+        augment: применять ли augment_batch
+        shuffle_buffer: размер буфера перемешивания (по умолчанию весь набор)
+        seed: зерно перемешивания
+    
+    Returns:
+        tf.data.Dataset пар (float32 (B, H, W, 1), int32 (B,))
+    """
+    height, width = images.shape[1:]
+    
+    def read_chunk(start):
+        start = int(start)
+        return (np.asarray(images[start:start + READ_CHUNK]),
+                np.asarray(labels[start:start + READ_CHUNK], dtype=np.int32))
+    
+    def read(start):
+        chunk_images, chunk_labels = tf.numpy_function(read_chunk, [start], (tf.uint8, tf.int32))
+        chunk_images.set_shape((None, height, width))
+        chunk_labels.set_shape((None,))
+        return chunk_images, chunk_labels
+    
+    mean = np.float32(normalization["mean"])
+    scale = np.float32(1.0 / normalization["std"])
+    
+    def prepare(batch_images, batch_labels):
+        batch = tf.cast(batch_images, tf.float32)[..., tf.newaxis] * (1.0 / 255.0)
+        if augment:
+            batch = augment_batch(batch)
+        return (batch - mean) * scale, batch_labels
+    
+    dataset = tf.data.Dataset.range(0, len(images), READ_CHUNK)
+    dataset = dataset.map(read, num_parallel_calls=tf.data.AUTOTUNE).unbatch()
+    # После unbatch размер неизвестен; без него Keras не знает длину эпохи
+    dataset = dataset.apply(tf.data.experimental.assert_cardinality(len(images)))
+    # Кэш хранит uint8: вчетверо меньше памяти, чем готовые float32
+    dataset = dataset.cache()
+    if training:
+        dataset = dataset.shuffle(shuffle_buffer or len(images), seed=seed,
+                                  reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size, num_parallel_calls=tf.data.AUTOTUNE)
+    dataset = dataset.map(prepare, num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def measure_pipeline(dataset):
+    """
+    Пропускная способность конвейера без модели за один проход
+    
+    Returns:
+        изображений в секунду
+    """
+    start = time.perf_counter()
+    count = 0
+    for batch_images, _ in dataset:
+        count += int(batch_images.shape[0])
+    return count / max(time.perf_counter() - start, 1e-9)
+
+
+def build_model(hidden_units=(128,), dropout=0.2, image_size=28):
+    """
+    Полносвязная модель той же структуры, что и в create_test_model.py
+    
+    Args:
+        hidden_units: размеры скрытых слоев
+        dropout: доля прореживания после каждого скрытого слоя
+        image_size: сторона входного изображения
+    
+    Returns:
+        keras.Sequential
+    """
+    layers = [keras.layers.Input(shape=(image_size, image_size, 1)), keras.layers.Flatten()]
+    for units in hidden_units:
+        layers.append(keras.layers.Dense(units, activation="relu"))
+        layers.append(keras.layers.Dropout(dropout))
+    layers.append(keras.layers.Dense(10, activation="softmax"))
+    return keras.Sequential(layers)
+
+
+class ThroughputLogger(keras.callbacks.Callback):
+    """Время каждой эпохи и скорость обучения в изображениях в секунду"""
+    
+    def __init__(self, images_per_epoch):
+        """
+        Args:
+            images_per_epoch: количество обучающих изображений за эпоху
+        """
+        super().__init__()
+        self.images_per_epoch = images_per_epoch
+        self.history = []
+        self._start = None
+    
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+    
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = time.perf_counter() - self._start
+        record = {"epoch": epoch + 1, "seconds": seconds,
+                  "images_per_second": self.images_per_epoch / seconds}
+        record.update({name: float(value) for name, value in (logs or {}).items()})
+        self.history.append(record)
+        
+        metrics = ", ".join(f"{name} {value:.4f}" for name, value in (logs or {}).items())
+        logger.info(f"Эпоха {epoch + 1}: {seconds:.2f} с, "
+                    f"{record['images_per_second']:.0f} изобр./с; {metrics}")
+
+
+def fold_normalization(weights, normalization):
+    """
+    Перенос нормализации входа в веса первого слоя
+    
+    Для z = (x - mean) / std слой W z + b равен (W / std) x + (b - mean / std * sum W).
+    
+    Args:
+        weights: список [kernel_0, bias_0, kernel_1, bias_1, ...]
+        normalization: словарь {"mean", "std"}
+    
+    Returns:
+        новый список весов для входа в шкале [0, 1]
+    """
+    mean, std = normalization["mean"], normalization["std"]
+    kernel, bias = weights[0], weights[1]
+    folded = [kernel / std, bias - (mean / std) * kernel.sum(axis=0)]
+    return [weight.astype(np.float32) for weight in folded + list(weights[2:])]
+
+
+def export_model(model, path, normalization, hidden_units, metadata=None):
+    """
+    Сохранение модели в формате SavedModel для ModelHandler
+    
+    Директория собирается рядом и подменяется переименованием, поэтому
+    приложение и реестр версий не увидят наполовину записанную модель,
+    а устаревший кэш весов NumPy не переживет замену.
+    
+    Args:
+        model: обученная модель build_model (вход нормализован)
+        path: директория модели
+        normalization: словарь {"mean", "std"}, сворачиваемый в первый слой
+        hidden_units: размеры скрытых слоев model
+        metadata: дополнительные поля preprocessing.json
+    """
+    weights = fold_normalization(model.get_weights(), normalization)
+    export = build_model(hidden_units)
+    export.set_weights(weights)
+    
+    path = os.path.abspath(path)
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tf.saved_model.save(export, tmp_path)
+    
+    # Кэш весов NumPy-бэкенда сразу, чтобы первая загрузка не читала чекпоинт
+    activations = ["relu"] * len(hidden_units) + ["softmax"]
+    cache = NumpyDenseModel(weights[0::2], weights[1::2], activations)
+    cache.source = source_fingerprint(tmp_path)
+    cache.save_npz(os.path.join(tmp_path, WEIGHTS_CACHE_NAME))
+    
+    document = {
+        "input_scale": 1.0 / 255.0,
+        "image_size": config.MODEL_IMAGE_SIZE,
+        "preprocess_centering": config.PREPROCESS_CENTERING,
+        "mnist_box_size": config.MNIST_BOX_SIZE,
+        "normalization": dict(normalization, folded_into_first_layer=True),
+        "hidden_units": list(hidden_units),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    document.update(metadata or {})
+    with open(os.path.join(tmp_path, METADATA_FILE_NAME), "w", encoding="utf-8") as stream:
+        json.dump(document, stream, ensure_ascii=False, indent=2)
+    
+    old_path = path + ".old"
+    if os.path.exists(path):
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    logger.info(f"Модель сохранена в {path}")
+
+
+def evaluate_model(model_path, images_path, labels_path, backend="auto", batch_size=1024):
+    """
+    Точность экспортированной модели через ModelHandler
+    
+    Args:
+        model_path: директория модели
+        images_path, labels_path: файлы IDX с изображениями и метками
+        backend: бэкенд ModelHandler
+        batch_size: размер батча
+    
+    Returns:
+        словарь: accuracy, per_class (точность по цифрам), confusion
+        (матрица 10x10, строки - истинные метки), images_per_second
+    """
+    from src.model_handler import ModelHandler
+    
+    handler = ModelHandler(model_path, backend=backend, warmup_batch_sizes=())
+    if not handler.is_loaded:
+        raise ValueError(f"Не удалось загрузить модель из {model_path}")
+    
+    confusion = np.zeros((10, 10), dtype=np.int64)
+    seconds = 0.0
+    for images, labels in zip(iter_idx(images_path, batch_size), iter_idx(labels_path, batch_size)):
+        batch = images.astype(np.float32)[..., np.newaxis] / 255.0
+        start = time.perf_counter()
+        predicted = handler.predict_batch(batch).argmax(axis=1)
+        seconds += time.perf_counter() - start
+        np.add.at(confusion, (labels.astype(np.int64), predicted), 1)
+    
+    total = int(confusion.sum())
+    if total == 0:
+        raise ValueError(f"Файл {images_path} не содержит изображений")
+    per_class = confusion.diagonal() / np.maximum(confusion.sum(axis=1), 1)
+    return {
+        "accuracy": float(confusion.trace() / total),
+        "per_class": per_class.tolist(),
+        "confusion": confusion.tolist(),
+        "images_per_second": total / max(seconds, 1e-9),
+    }
+
+
+def train(train_images, train_labels, output, test_images=None, test_labels=None, epochs=10,
+          batch_size=128, hidden_units=(128,), dropout=0.2, learning_rate=1e-3, augment=True,
+          shuffle_buffer=None, cache_dir=None, seed=None):
+    """
+    Обучение, экспорт и проверка модели
+    
+    Args:
+        train_images, train_labels: файлы IDX обучающего набора
+        output: директория экспортируемой модели
+        test_images, test_labels: файлы IDX тестового набора (необязательны)
+        epochs: количество эпох
+        batch_size: размер батча
+        hidden_units: размеры скрытых слоев
+        dropout: доля прореживания
+        learning_rate: шаг Adam
+        augment: аугментировать ли обучающие батчи
+        shuffle_buffer: размер буфера перемешивания (по умолчанию весь набор)
+        cache_dir: директория для распакованных копий сжатых файлов
+        seed: зерно генераторов случайных чисел
+    
+    Returns:
+        словарь: normalization, pipeline_images_per_second, epochs (история
+        по эпохам), test (результат evaluate_model или None)
+    """
+    if seed is not None:
+        keras.utils.set_random_seed(seed)
+    
+    images, labels = load_idx_pair(train_images, train_labels, cache_dir)
+    normalization = compute_normalization(images)
+    logger.info(f"Обучающий набор: {len(images)} изображений, "
+                f"среднее {normalization['mean']:.4f}, отклонение {normalization['std']:.4f}")
+    
+    train_data = make_dataset(images, labels, batch_size, normalization, training=True,
+                              augment=augment, shuffle_buffer=shuffle_buffer, seed=seed)
+    validation_data = None
+    if test_images and test_labels:
+        validation_data = make_dataset(*load_idx_pair(test_images, test_labels, cache_dir),
+                                       batch_size=1024, normalization=normalization)
+    
+    # Первый проход заполняет кэш, второй показывает установившуюся скорость конвейера
+    first_pass = measure_pipeline(train_data)
+    pipeline_speed = measure_pipeline(train_data)
+    logger.info(f"Конвейер данных: {first_pass:.0f} изобр./с при чтении, "
+                f"{pipeline_speed:.0f} изобр./с из кэша")
+    
+    model = build_model(hidden_units, dropout)
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate),
+        loss="sparse_categorical_crossentropy",
+        metrics=["accuracy"]
+    )
+    throughput = ThroughputLogger(len(images))
+    model.fit(train_data, epochs=epochs, validation_data=validation_data,
+              callbacks=[throughput], verbose=0)
+    
+    training_speed = float(np.median([epoch["images_per_second"] for epoch in throughput.history]))
+    if pipeline_speed < 1.25 * training_speed:
+        logger.warning(
+            f"Конвейер данных ({pipeline_speed:.0f} изобр./с) близок к скорости обучения "
+            f"({training_speed:.0f} изобр./с) и может ее ограничивать"
+        )
+    
+    summary = {
+        "normalization": normalization,
+        "pipeline_images_per_second": pipeline_speed,
+        "epochs": throughput.history,
+        "test": None,
+    }
+    export_model(model, output, normalization, hidden_units, metadata={"training": {
+        "images": len(images),
+        "epochs": epochs,
+        "batch_size": batch_size,
+        "augment": augment,
+        "images_per_second": training_speed,
+    }})
+    
+    if validation_data is not None:
+        summary["test"] = evaluate_model(output, test_images, test_labels)
+        logger.info(f"Точность экспортированной модели на тестовом наборе: "
+                    f"{summary['test']['accuracy']:.4f}")
+    return summary
+
+
+def main(argv=None):
+    """Точка входа: обучение модели и экспорт в формате SavedModel"""
+    parser = argparse.ArgumentParser(description="Обучение модели MNIST на файлах IDX")
+    parser.add_argument("--train-images", required=True, help="файл IDX с обучающими изображениями")
+    parser.add_argument("--train-labels", required=True, help="файл IDX с обучающими метками")
+    parser.add_argument("--test-images", help="файл IDX с тестовыми изображениями")
+    parser.add_argument("--test-labels", help="файл IDX с тестовыми метками")
+    parser.add_argument("-o", "--output", default=config.MODEL_PATH, help="директория модели")
+    parser.add_argument("--epochs", type=int, default=config.TRAINING_EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=config.TRAINING_BATCH_SIZE)
+    parser.add_argument("--hidden", type=int, nargs="+", default=list(config.TRAINING_HIDDEN_UNITS),
+                        help="размеры скрытых слоев")
+    parser.add_argument("--dropout", type=float, default=0.2)
+    parser.add_argument("--learning-rate", type=float, default=1e-3)
+    parser.add_argument("--augment", action=argparse.BooleanOptionalAction, default=True,
+                        help="случайные сдвиг, поворот и масштаб обучающих изображений")
+    parser.add_argument("--shuffle-buffer", type=int, help="буфер перемешивания (по умолчанию весь набор)")
+    parser.add_argument("--cache-dir", help="директория для распакованных копий файлов .gz")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", action="store_true", help="вывести сводку в JSON")
+    args = parser.parse_args(argv)
+    setup_logging()
+    
+    try:
+        summary = train(
+            args.train_images, args.train_labels, args.output, args.test_images, args.test_labels,
+            epochs=args.epochs, batch_size=args.batch_size, hidden_units=tuple(args.hidden),
+            dropout=args.dropout, learning_rate=args.learning_rate, augment=args.augment,
+            shuffle_buffer=args.shuffle_buffer, cache_dir=args.cache_dir, seed=args.seed
+        )
+    except (ValueError, OSError) as e:
+        logger.error(f"Ошибка при обучении модели: {e}")
+        return 1
+    
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
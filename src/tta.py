@@ -0,0 +1,324 @@
+"""Адаптивная аугментация при распознавании (test-time augmentation)"""
+
+import logging
+import threading
+import time
+
+import numpy as np
+
+from src.idx_io import iter_idx
+from src.instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _affine_sampling(size, params):
+    """
+    Индексы и веса билинейной выборки для поворотов и сдвигов
+    
+    Преобразования не зависят от изображения, поэтому выборка строится
+    один раз: для каждого варианта и выходного пикселя - четыре индекса
+    в изображении с нулевой рамкой в 1 пиксель и их веса.
+    
+    Args:
+        size: размер изображения
+        params: numpy array формы (V, 3): угол в градусах, сдвиг по x, по y
+    
+    Returns:
+        (indices, weights): numpy array формы (V, size * size, 4)
+    """
+    center = (size - 1) / 2.0
+    ys, xs = np.mgrid[0:size, 0:size].astype(np.float32)
+    angle = np.deg2rad(params[:, 0]).astype(np.float32)[:, None, None]
+    cos, sin = np.cos(angle), np.sin(angle)
+    
+    # Обратное отображение: выходной пиксель -> точка исходного изображения
+    u = xs - center - params[:, 1, None, None]
+    v = ys - center - params[:, 2, None, None]
+    src_x = cos * u + sin * v + center
+    src_y = -sin * u + cos * v + center
+    
+    x0, y0 = np.floor(src_x), np.floor(src_y)
+    fx, fy = src_x - x0, src_y - y0
+    # Точки дальше пикселя от края получают нулевые веса
+    inside = (src_x > -1) & (src_x < size) & (src_y > -1) & (src_y < size)
+    x0 = np.clip(x0.astype(np.intp) + 1, 0, size)
+    y0 = np.clip(y0.astype(np.intp) + 1, 0, size)
+    
+    stride = size + 2
+    indices = np.stack([y0 * stride + x0, y0 * stride + x0 + 1,
+                        (y0 + 1) * stride + x0, (y0 + 1) * stride + x0 + 1], axis=-1)
+    weights = np.stack([(1 - fy) * (1 - fx), (1 - fy) * fx, fy * (1 - fx), fy * fx], axis=-1)
+    weights *= inside[..., None]
+    count = len(params)
+    return (indices.reshape(count, size * size, 4),
+            weights.reshape(count, size * size, 4).astype(np.float32))
+
+
+def thicken(images):
+    """
+    Утолщение штрихов: максимум по пикселю и четырем соседям
+    
+    Args:
+        images: numpy array формы (N, H, W)
+    
+    Returns:
+        numpy array той же формы
+    """
+    padded = np.pad(images, ((0, 0), (1, 1), (1, 1)))
+    return np.maximum.reduce([
+        images, padded[:, :-2, 1:-1], padded[:, 2:, 1:-1], padded[:, 1:-1, :-2], padded[:, 1:-1, 2:]
+    ])
+
+
+class AdaptiveTTA:
+    """
+    Усреднение ответов модели по искаженным копиям неуверенных изображений
+    
+    Если наибольшая вероятность ниже порога, из предобработанного
+    изображения 28x28 строятся варианты (сдвиги, повороты, утолщение
+    штрихов), все они проходят через модель одним батчем, и вероятности
+    усредняются вместе с исходными. Уверенные ответы не меняются и
+    ничего не стоят.
+    
+    Счетчики потокобезопасны: объект вызывается из рабочих потоков
+    распознавания.
+    """
+    
+    def __init__(self, threshold=0.8, shift=1, angles=(-10.0, 10.0), thickening=True, size=28):
+        """
+        Инициализация
+        
+        Args:
+            threshold: порог уверенности, ниже которого включается аугментация
+            shift: сдвиг в пикселях по каждой оси (0 - без сдвигов)
+            angles: углы поворота в градусах
+            thickening: добавлять ли вариант с утолщенными штрихами
+            size: размер изображения
+        """
+        self.threshold = threshold
+        self.size = size
+        self.thickening = thickening
+        
+        self.shift = int(shift)
+        # Сдвиги на целое число пикселей - срезы, интерполяция нужна только поворотам
+        self._shifts = ((-self.shift, 0), (self.shift, 0), (0, -self.shift), (0, self.shift)) \
+            if self.shift else ()
+        params = [(angle, 0.0, 0.0) for angle in angles]
+        self._indices, self._weights = _affine_sampling(
+            size, np.array(params, dtype=np.float32).reshape(-1, 3)
+        )
+        self.num_variants = len(self._shifts) + len(params) + int(thickening)
+        
+        self._lock = threading.Lock()
+        self.reset_stats()
+    
+    def reset_stats(self):
+        """Сброс статистики"""
+        with self._lock:
+            self.requests = 0
+            self.triggered = 0
+            self.seconds = 0.0
+    
+    def variants(self, images):
+        """
+        Искаженные копии изображений (без исходного)
+        
+        Args:
+            images: numpy array формы (N, size, size)
+        
+        Returns:
+            numpy array float32 формы (N, num_variants, size, size)
+        """
+        images = np.asarray(images, dtype=np.float32).reshape(-1, self.size, self.size)
+        count, size = len(images), self.size
+        result = np.empty((count, self.num_variants, size, size), dtype=np.float32)
+        
+        margin = max(self.shift, 1)
+        padded = np.pad(images, ((0, 0), (margin, margin), (margin, margin)))
+        for i, (dx, dy) in enumerate(self._shifts):
+            result[:, i] = padded[:, margin - dy:margin - dy + size, margin - dx:margin - dx + size]
+        
+        rotations = len(self._indices)
+        if rotations:
+            # Рамка в 1 пиксель, как у индексов выборки
+            border = slice(margin - 1, margin + size + 1)
+            flat = padded[:, border, border].reshape(count, -1)
+            # Выборка для всех изображений и поворотов одной операцией: (N, V, P, 4) -> (N, V, P)
+            first = len(self._shifts)
+            result[:, first:first + rotations] = np.einsum(
+                "nvpk,vpk->nvp", flat[:, self._indices], self._weights
+            ).reshape(count, rotations, size, size)
+        
+        if self.thickening:
+            result[:, -1] = thicken(images)
+        return result
+    
+    def ensemble(self, images, probabilities, predict_fn):
+        """
+        Усредненные вероятности по исходным изображениям и их вариантам
+        
+        Args:
+            images: numpy array формы (N, size, size) или (N, size, size, 1)
+            probabilities: вероятности модели для исходных изображений (N, 10)
+            predict_fn: функция батч (M, size, size, 1) -> вероятности (M, 10)
+        
+        Returns:
+            numpy array формы (N, 10)
+        """
+        variants = self.variants(images)
+        count = len(variants)
+        scores = predict_fn(variants.reshape(-1, self.size, self.size, 1))
+        scores = np.asarray(scores, dtype=np.float32).reshape(count, self.num_variants, -1)
+        return (scores.sum(axis=1) + probabilities) / (self.num_variants + 1)
+    
+    def run(self, images, probabilities, predict_fn):
+        """
+        Аугментация только для изображений с уверенностью ниже порога
+        
+        Args:
+            images: numpy array формы (N, size, size) или (N, size, size, 1)
+            probabilities: вероятности модели для исходных изображений (N, 10)
+            predict_fn: функция батч (M, size, size, 1) -> вероятности (M, 10)
+        
+        Returns:
+            numpy array вероятностей формы (N, 10)
+        """
+        images = np.asarray(images, dtype=np.float32).reshape(-1, self.size, self.size)
+        probabilities = np.asarray(probabilities, dtype=np.float32).reshape(len(images), -1)
+        flagged = np.flatnonzero(probabilities.max(axis=1) < self.threshold)
+        
+        elapsed = 0.0
+        if len(flagged):
+            start = time.perf_counter()
+            with metrics.timer("tta"):
+                probabilities = probabilities.copy()
+                probabilities[flagged] = self.ensemble(images[flagged], probabilities[flagged],
+                                                       predict_fn)
+            elapsed = time.perf_counter() - start
+        
+        with self._lock:
+            self.requests += len(images)
+            self.triggered += len(flagged)
+            self.seconds += elapsed
+        return probabilities
+    
+    def stats(self):
+        """
+        Доля изображений с аугментацией и добавленная задержка
+        
+        Returns:
+            словарь: requests, triggered, fraction, variants,
+            added_ms_mean (на одно изображение с аугментацией), added_ms_total
+        """
+        with self._lock:
+            requests, triggered, seconds = self.requests, self.triggered, self.seconds
+        return {
+            "requests": requests,
+            "triggered": triggered,
+            "fraction": triggered / requests if requests else 0.0,
+            "variants": self.num_variants,
+            "added_ms_mean": seconds * 1000.0 / triggered if triggered else 0.0,
+            "added_ms_total": seconds * 1000.0,
+        }
+
+
+def _median_latency(function, repeats):
+    """Медианное время вызова функции в секундах"""
+    function()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def evaluate_tta(handler, tta, images_path, labels_path, thresholds, batch_size=256,
+                 latency_repeats=200):
+    """
+    Точность и задержка адаптивной аугментации при разных порогах
+    
+    Модель и аугментация прогоняются по набору один раз; для каждого
+    порога по их ответам считается доля изображений с аугментацией и
+    точность. Задержка одного изображения - время модели плюс доля
+    изображений с аугментацией, умноженная на ее добавленное время.
+    
+    Args:
+        handler: ModelHandler (без аугментации)
+        tta: AdaptiveTTA, задающий варианты
+        images_path, labels_path: файлы IDX с изображениями и метками
+        thresholds: проверяемые пороги уверенности
+        batch_size: размер батча
+        latency_repeats: количество повторов для оценки задержки
+    
+    Returns:
+        словарь: variants, base_latency_ms, added_latency_ms (один батч
+        вариантов), separate_latency_ms (варианты отдельными вызовами) и
+        rows - список {threshold, triggered, accuracy, accuracy_delta,
+        latency_ms}; первая строка - без аугментации (threshold None)
+    """
+    confidence, base_correct, tta_correct = [], [], []
+    for images, labels in zip(iter_idx(images_path, batch_size), iter_idx(labels_path, batch_size)):
+        batch = images.astype(np.float32)[..., np.newaxis] / 255.0
+        probabilities = handler.predict_batch(batch)
+        averaged = tta.ensemble(batch, probabilities, handler.predict_batch)
+        confidence.append(probabilities.max(axis=1))
+        base_correct.append(probabilities.argmax(axis=1) == labels)
+        tta_correct.append(averaged.argmax(axis=1) == labels)
+    
+    if not confidence:
+        raise ValueError(f"Файл {images_path} не содержит изображений")
+    confidence = np.concatenate(confidence)
+    base_correct = np.concatenate(base_correct)
+    tta_correct = np.concatenate(tta_correct)
+    
+    single = np.zeros((1, tta.size, tta.size, 1), dtype=np.float32)
+    base = handler.predict_batch(single)
+    base_latency = _median_latency(lambda: handler.predict_batch(single), latency_repeats)
+    added = _median_latency(lambda: tta.ensemble(single, base, handler.predict_batch),
+                            latency_repeats)
+    separate = _median_latency(
+        lambda: [handler.predict_batch(variant[np.newaxis, ..., np.newaxis])
+                 for variant in tta.variants(single)[0]],
+        latency_repeats
+    )
+    
+    base_accuracy = float(base_correct.mean())
+    rows = [{"threshold": None, "triggered": 0.0, "accuracy": base_accuracy,
+             "accuracy_delta": 0.0, "latency_ms": base_latency * 1000.0}]
+    for threshold in thresholds:
+        flagged = confidence < threshold
+        accuracy = float(np.where(flagged, tta_correct, base_correct).mean())
+        rows.append({
+            "threshold": threshold,
+            "triggered": float(flagged.mean()),
+            "accuracy": accuracy,
+            "accuracy_delta": accuracy - base_accuracy,
+            "latency_ms": (base_latency + flagged.mean() * added) * 1000.0,
+        })
+    return {
+        "variants": tta.num_variants,
+        "base_latency_ms": base_latency * 1000.0,
+        "added_latency_ms": added * 1000.0,
+        "separate_latency_ms": separate * 1000.0,
+        "rows": rows,
+    }
+
+
+def format_report(report):
+    """Текстовая таблица результатов evaluate_tta"""
+    lines = [
+        f"Вариантов: {report['variants']}, модель: {report['base_latency_ms']:.4f} мс, "
+        f"аугментация одним батчем: +{report['added_latency_ms']:.4f} мс "
+        f"(отдельными вызовами: +{report['separate_latency_ms']:.4f} мс)",
+        f"{'порог':>8s} {'с аугментацией':>14s} {'точность':>9s} {'разница':>8s} "
+        f"{'задержка, мс':>12s}",
+    ]
+    for row in report["rows"]:
+        threshold = "без TTA" if row["threshold"] is None else f"{row['threshold']:.3f}"
+        lines.append(
+            f"{threshold:>8s} {row['triggered']:14.1%} {row['accuracy']:9.4f} "
+            f"{row['accuracy_delta']:+8.4f} {row['latency_ms']:12.4f}"
+        )
+    return "\n".join(lines)
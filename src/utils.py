@@ -1,54 +1,357 @@
 """Вспомогательные функции для обработки изображений"""
 
+import io
+import logging
+import sys
+
 import numpy as np
-from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Коэффициенты яркости ITU-R 601-2 (как в PIL convert('L')) в порядке R, G, B
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+# Порядок байтов пикселя 0xAARRGGBB в памяти зависит от порядка байтов платформы:
+# на little-endian это B, G, R, A, на big-endian - A, R, G, B
+if sys.byteorder == "little":
+    _COLOR_BYTES = slice(0, 3)
+    _COLOR_WEIGHTS = LUMA_WEIGHTS[::-1].copy()
+else:
+    _COLOR_BYTES = slice(1, 4)
+    _COLOR_WEIGHTS = LUMA_WEIGHTS
+
+
+def qimage_to_array(qt_image):
+    """
+    Представление пикселей QImage в виде numpy array без копирования
+    
+    Массив ссылается на буфер QImage, поэтому изображение должно жить,
+    пока используется массив. Форматы, отличные от 32-битных, предварительно
+    конвертируются в Format_RGB32.
+    
+    Args:
+        qt_image: QImage
+    
+    Returns:
+        numpy array uint8 формы (height, width, 4) только для чтения
+    """
+    from PyQt6.QtGui import QImage
+    
+    if qt_image.format() not in (
+        QImage.Format.Format_RGB32,
+        QImage.Format.Format_ARGB32,
+        QImage.Format.Format_ARGB32_Premultiplied,
+    ):
+        qt_image = qt_image.convertToFormat(QImage.Format.Format_RGB32)
+    
+    width, height = qt_image.width(), qt_image.height()
+    pointer = qt_image.constBits()
+    pointer.setsize(qt_image.sizeInBytes())
+    
+    rows = np.frombuffer(pointer, dtype=np.uint8).reshape(height, qt_image.bytesPerLine())
+    return rows[:, :width * 4].reshape(height, width, 4)
+
+
+def color_channels(pixels_rgb32):
+    """Представление трех цветовых байтов пикселей 0xAARRGGBB без альфа-канала"""
+    return pixels_rgb32[..., _COLOR_BYTES]
+
+
+def area_downsample(pixels, target_height, target_width):
+    """
+    Уменьшение изображения усреднением по площади
+    
+    Args:
+        pixels: numpy array формы (height, width, ...)
+        target_height: целевая высота
+        target_width: целевая ширина
+    
+    Returns:
+        numpy array float32 формы (target_height, target_width, ...)
+    """
+    height, width = pixels.shape[:2]
+    channels = pixels.shape[2:]
+    
+    if height < target_height or width < target_width:
+        raise ValueError(f"Изображение {width}x{height} меньше целевого размера")
+    
+    if height % target_height == 0 and width % target_width == 0:
+        # Быстрый путь: суммируем непрерывные полосы строк, затем
+        # складываем небольшие строки блоков по столбцам
+        block_h, block_w = height // target_height, width // target_width
+        rows = pixels.reshape((target_height, block_h, width) + channels)
+        rows = rows.sum(axis=1, dtype=np.float32)
+        blocks = rows.reshape((target_height, target_width, block_w) + channels)
+        
+        summed = blocks[:, :, 0].copy()
+        for j in range(1, block_w):
+            summed += blocks[:, :, j]
+        summed /= block_h * block_w
+        return summed
+    
+    # Общий случай: границы бинов неравного размера, суммируем по бинам
+    row_edges = np.arange(target_height + 1) * height // target_height
+    col_edges = np.arange(target_width + 1) * width // target_width
+    
+    rows = np.empty((target_height, width) + channels, dtype=np.float32)
+    for i in range(target_height):
+        pixels[row_edges[i]:row_edges[i + 1]].sum(axis=0, dtype=np.float32, out=rows[i])
+    
+    summed = np.empty((target_height, target_width) + channels, dtype=np.float32)
+    for j in range(target_width):
+        rows[:, col_edges[j]:col_edges[j + 1]].sum(axis=1, out=summed[:, j])
+    
+    counts = np.outer(np.diff(row_edges), np.diff(col_edges)).astype(np.float32)
+    summed /= counts.reshape(counts.shape + (1,) * len(channels))
+    return summed
+
+
+def colors_to_ink(colors):
+    """
+    Перевод цветовых каналов в интенсивность чернил [0, 1]
+    
+    Выполняет перевод в оттенки серого и инверсию (белый фон -> 0,
+    черная цифра -> 1), как в данных MNIST.
+    
+    Args:
+        colors: numpy array (..., 3) из color_channels
+    
+    Returns:
+        numpy array float32 формы (...)
+    """
+    gray = colors @ _COLOR_WEIGHTS
+    return 1.0 - gray / 255.0
+
+
+def block_downsample(pixels, factor):
+    """
+    Уменьшение изображения в целое число раз усреднением блоков
+    
+    Края, не кратные factor, отбрасываются (на холсте это пустые поля).
+    
+    Args:
+        pixels: numpy array формы (height, width, ...)
+        factor: коэффициент уменьшения
+    
+    Returns:
+        numpy array float32 формы (height // factor, width // factor, ...)
+    """
+    height, width = pixels.shape[0] // factor, pixels.shape[1] // factor
+    return area_downsample(pixels[:height * factor, :width * factor], height, width)
 
 
-def preprocess_image_for_model(qt_image, target_size=28):
+def _sampling_matrix(positions, size, target_size, supersample):
+    """
+    Матрица билинейной выборки с усреднением отсчетов
+    
+    Args:
+        positions: координаты отсчетов формы (N, target_size * supersample)
+        size: размер исходной оси
+        target_size: размер целевой оси
+        supersample: количество отсчетов на целевой пиксель
+    
+    Returns:
+        numpy array float32 формы (N, target_size, size)
+    """
+    pixels = np.arange(size, dtype=np.float32)
+    weights = 1.0 - np.abs(positions[:, :, None] - pixels)
+    np.maximum(weights, 0.0, out=weights)
+    count = len(positions)
+    return weights.reshape(count, target_size, supersample, size).mean(axis=2)
+
+
+def center_digits(ink, target_size=28, box_size=20, threshold=0.1, supersample=4):
+    """
+    Нормализация цифр в стиле MNIST
+    
+    Для каждого изображения находится рамка чернил, цифра масштабируется
+    с сохранением пропорций так, чтобы большая сторона рамки заняла
+    box_size пикселей, и сдвигается так, чтобы центр масс оказался в
+    центре изображения target_size x target_size. Все изображения батча
+    обрабатываются одной векторизованной выборкой: каждый целевой пиксель
+    усредняет supersample x supersample билинейных отсчетов исходника.
+    
+    Args:
+        ink: numpy array интенсивности чернил [0, 1] формы (N, H, W) или (H, W)
+        target_size: размер выходного изображения
+        box_size: размер квадрата, в который вписывается цифра
+        threshold: порог интенсивности для определения рамки
+        supersample: количество отсчетов на целевой пиксель по каждой оси
+    
+    Returns:
+        numpy array float32 формы (N, target_size, target_size) или
+        (target_size, target_size) для одиночного изображения
+    """
+    ink = np.asarray(ink, dtype=np.float32)
+    single = ink.ndim == 2
+    if single:
+        ink = ink[np.newaxis]
+    
+    count, height, width = ink.shape
+    
+    # Рамка чернил
+    mask = ink > threshold
+    rows = mask.any(axis=2)
+    cols = mask.any(axis=1)
+    has_ink = rows.any(axis=1)
+    
+    top = rows.argmax(axis=1)
+    bottom = height - rows[:, ::-1].argmax(axis=1)
+    left = cols.argmax(axis=1)
+    right = width - cols[:, ::-1].argmax(axis=1)
+    
+    extent = np.maximum(bottom - top, right - left).clip(min=1)
+    scale = box_size / extent.astype(np.float32)
+    
+    # Центр масс в координатах центров пикселей
+    mass = ink.sum(axis=(1, 2))
+    safe_mass = np.where(mass > 0, mass, 1.0)
+    center_y = ink.sum(axis=2) @ (np.arange(height, dtype=np.float32) + 0.5) / safe_mass
+    center_x = ink.sum(axis=1) @ (np.arange(width, dtype=np.float32) + 0.5) / safe_mass
+    
+    # Координаты отсчетов в исходнике: (целевая точка - центр) / масштаб + центр масс
+    samples = target_size * supersample
+    grid = (np.arange(samples, dtype=np.float32) + 0.5) / supersample - target_size / 2
+    src_y = center_y[:, None] + grid[None, :] / scale[:, None] - 0.5
+    src_x = center_x[:, None] + grid[None, :] / scale[:, None] - 0.5
+    
+    # Билинейная выборка на сетке разделима: веса по каждой оси задаются
+    # "треугольным" ядром, а усреднение отсчетов сворачивается в матрицы,
+    # так что результат - произведение (N, T, H) @ (N, H, W) @ (N, W, T)
+    weights_y = _sampling_matrix(src_y, height, target_size, supersample)
+    weights_x = _sampling_matrix(src_x, width, target_size, supersample)
+    result = weights_y @ ink @ weights_x.transpose(0, 2, 1)
+    
+    result[~has_ink] = 0.0
+    np.clip(result, 0.0, 1.0, out=result)
+    
+    return result[0] if single else result
+
+
+def decode_gray(kind, data, target_size):
+    """
+    Декодирование файла изображения в массив оттенков серого uint8
+    
+    Args:
+        kind: "path" - data является путем к файлу, иначе байтами файла
+        data: путь или содержимое PNG/JPEG/BMP
+        target_size: изображения меньше этого размера увеличиваются до него
+    
+    Returns:
+        numpy array uint8 формы (H, W)
+    """
+    from PIL import Image
+    
+    source = data if kind == "path" else io.BytesIO(data)
+    with Image.open(source) as image:
+        if image.mode in ("RGBA", "LA", "P"):
+            # Прозрачный фон считаем белым, как у холста
+            image = image.convert("RGBA")
+            background = Image.new("RGBA", image.size, "white")
+            image = Image.alpha_composite(background, image)
+        gray = image.convert("L")
+        
+        if gray.width < target_size or gray.height < target_size:
+            gray = gray.resize(
+                (max(gray.width, target_size), max(gray.height, target_size)),
+                Image.Resampling.BILINEAR
+            )
+        return np.asarray(gray)
+
+
+def preprocess_gray_array(gray, target_size=28, center=False, box_size=20, white_background=True):
+    """
+    Предобработка изображения в оттенках серого без Qt
+    
+    Используется в пакетной обработке файлов, где QImage недоступен.
+    
+    Args:
+        gray: numpy array uint8 формы (H, W), не меньше target_size по каждой оси
+        target_size: целевой размер изображения
+        center: нормализовать ли цифру в стиле MNIST (см. center_digits)
+        box_size: размер квадрата, в который вписывается цифра при center
+        white_background: темная цифра на белом фоне (True) или светлая на черном (как в MNIST)
+    
+    Returns:
+        numpy array float32 формы (target_size, target_size) с интенсивностью [0, 1]
+    """
+    if center:
+        factor = max(1, min(gray.shape) // (target_size * 2))
+        small = block_downsample(gray, factor)
+    else:
+        small = area_downsample(gray, target_size, target_size)
+    
+    # Инверсия и нормализация линейны, поэтому выполняются на уменьшенном изображении
+    ink = small / 255.0
+    if white_background:
+        ink = 1.0 - ink
+    
+    if center:
+        return center_digits(ink, target_size, box_size)
+    return np.clip(ink, 0.0, 1.0, out=ink)
+
+
+def preprocess_rgb32_array(pixels, target_size=28, center=False, box_size=20):
+    """
+    Предобработка пикселей в формате QImage RGB32 без Qt
+    
+    Используется рабочими процессами, получающими буфер холста через
+    разделяемую память (см. src/worker_pool.py).
+    
+    Args:
+        pixels: numpy array uint8 формы (H, W, 4) в порядке байтов QImage
+        target_size: целевой размер изображения
+        center: нормализовать ли цифру в стиле MNIST (см. center_digits)
+        box_size: размер квадрата, в который вписывается цифра при center
+    
+    Returns:
+        numpy array float32 формы (target_size, target_size) с интенсивностью [0, 1]
+    """
+    if center:
+        # Центрированию достаточно промежуточного разрешения ~2 пикселя
+        # на целевой пиксель, поэтому сначала уменьшаем холст в целое число раз
+        factor = max(1, min(pixels.shape[:2]) // (target_size * 2))
+        small = block_downsample(pixels, factor)
+        return center_digits(colors_to_ink(color_channels(small)), target_size, box_size)
+    
+    # Усредняем по площади каждый канал до целевого размера,
+    # затем оттенки серого, инверсия и нормализация в [0, 1]
+    small = area_downsample(pixels, target_size, target_size)
+    ink = colors_to_ink(color_channels(small))
+    return np.clip(ink, 0.0, 1.0, out=ink)
+
+
+def preprocess_image_for_model(qt_image, target_size=28, out=None, center=False, box_size=20):
     """
     Предобработка изображения Qt для подачи в модель
     
+    Буфер QImage читается без копирования, усредняется по площади до
+    target_size x target_size по каждому байту пикселя, и только затем
+    переводится в оттенки серого, инвертируется и нормализуется: все
+    эти операции линейны, поэтому порядок не меняет результат, но
+    полноразмерных промежуточных массивов не создается.
+    
     Args:
         qt_image: QImage для обработки
         target_size: целевой размер изображения
+        out: необязательный предвыделенный буфер float32 формы
+            (1, target_size, target_size, 1) для результата
+        center: нормализовать ли цифру в стиле MNIST (см. center_digits)
+        box_size: размер квадрата, в который вписывается цифра при center
     
     Returns:
         numpy array с нормализованным изображением
     """
+    if out is None:
+        out = np.empty((1, target_size, target_size, 1), dtype=np.float32)
+    
     try:
-        # Конвертируем QImage в PIL Image
-        byte_data = qt_image.bits().asstring(qt_image.width() * qt_image.height() * 4)
-        pil_image = Image.frombuffer(
-            "RGBA",
-            (qt_image.width(), qt_image.height()),
-            byte_data,
-            "raw",
-            "RGBA",
-            0,
-            1
-        )
-        
-        # Конвертируем в grayscale
-        pil_image = pil_image.convert('L')
-        
-        # Инвертируем цвета (MNIST использует белый фон, черные цифры)
-        pil_image = ImageOps.invert(pil_image)
-        
-        # Изменяем размер до target_size x target_size
-        pil_image = pil_image.resize((target_size, target_size), Image.Resampling.LANCZOS)
-        
-        # Конвертируем в numpy array
-        image_array = np.array(pil_image)
-        
-        # Нормализуем значения пикселей в диапазон [0, 1]
-        image_array = image_array.astype(np.float32) / 255.0
-        
-        # Добавляем размерности для батча и канала
-        image_array = image_array.reshape(1, target_size, target_size, 1)
-        
-        return image_array
+        out[0, :, :, 0] = preprocess_rgb32_array(qimage_to_array(qt_image), target_size,
+                                                 center, box_size)
+        return out
         
     except Exception as e:
-        print(f"Ошибка при предобработке изображения: {e}")
+        logger.error(f"Ошибка при предобработке изображения: {e}")
         # Возвращаем нулевой массив в случае ошибки
-        return np.zeros((1, target_size, target_size, 1), dtype=np.float32)
+        out.fill(0.0)
+        return out
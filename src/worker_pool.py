@@ -0,0 +1,521 @@
+"""Пул процессов инференса с обменом данными через разделяемую память
+
+Один процесс с ModelHandler не загружает все ядра: PIL, связующий код
+NumPy и GIL выполняют предобработку и инференс последовательно. Пул
+запускает несколько процессов, каждый из которых один раз загружает
+модель. Входные изображения и вероятности не сериализуются pickle, а
+записываются в блоки multiprocessing.shared_memory, закрепленные за
+каждым процессом; по каналу передаются только короткие команды.
+
+Пример:
+    with InferenceWorkerPool("mnist_model", workers=4) as pool:
+        probabilities = pool.predict_batch(images)
+"""
+
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+import config
+from src.runtime_config import THREAD_ENV_VARS
+
+logger = logging.getLogger(__name__)
+
+# Окружение дочерних процессов подменяется на время их запуска
+_environ_lock = threading.Lock()
+
+
+class WorkerCrashedError(RuntimeError):
+    """Рабочий процесс завершился во время обработки задания"""
+
+
+def _run_job(handler, message, input_shm, output_shm, image_size):
+    """
+    Выполнение одного задания в рабочем процессе
+    
+    Все представления разделяемой памяти локальны и освобождаются при
+    выходе из функции, иначе блок нельзя будет закрыть.
+    
+    Returns:
+        форма массива вероятностей, записанного в выходной блок
+    """
+    from src.utils import preprocess_gray_array, preprocess_rgb32_array
+    
+    pixels = (image_size, image_size)
+    if message[0] == "predict":
+        images = np.ndarray((message[1],) + pixels, dtype=np.float32, buffer=input_shm.buf)
+    else:
+        shapes, center = message[1], message[2]
+        images = np.empty((len(shapes),) + pixels, dtype=np.float32)
+        offset = 0
+        for i, shape in enumerate(shapes):
+            array = np.ndarray(shape, dtype=np.uint8, buffer=input_shm.buf, offset=offset)
+            if len(shape) == 3:
+                images[i] = preprocess_rgb32_array(array, image_size, center, config.MNIST_BOX_SIZE)
+            else:
+                images[i] = preprocess_gray_array(array, image_size, center, config.MNIST_BOX_SIZE)
+            offset += array.size
+    
+    probabilities = handler.predict_batch(images[..., np.newaxis])
+    outputs = np.ndarray(probabilities.shape, dtype=np.float32, buffer=output_shm.buf)
+    outputs[...] = probabilities
+    return probabilities.shape
+
+
+def _worker_main(conn, input_name, output_name, model_path, handler_options, image_size):
+    """
+    Цикл рабочего процесса
+    
+    Команды:
+        ("predict", count) - во входном блоке count изображений float32
+            формы (image_size, image_size)
+        ("recognize", shapes, center) - во входном блоке подряд лежат
+            массивы uint8 указанных форм: (H, W) в оттенках серого или
+            (H, W, 4) в формате QImage RGB32
+        ("stop",) - завершение работы
+    
+    Ответы: ("ready", pid, бэкенд, вариант), ("ok", форма) или ("error", сообщение).
+    Вероятности записываются в выходной блок.
+    """
+    # Ctrl+C обрабатывает родитель, он же останавливает пул
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    
+    from src.instrumentation import setup_logging
+    from src.model_handler import ModelHandler
+    
+    setup_logging()
+    
+    # Блоки принадлежат родителю; процессы spawn используют его resource_tracker,
+    # поэтому подключение не приводит к удалению блока при выходе процесса
+    input_shm = SharedMemory(name=input_name)
+    output_shm = SharedMemory(name=output_name)
+    try:
+        handler = ModelHandler(model_path, **handler_options)
+        if not handler.is_loaded:
+            conn.send(("error", f"Не удалось загрузить модель из {model_path}"))
+            return
+        conn.send(("ready", os.getpid(), handler.backend_name, handler.variant))
+        
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message[0] == "stop":
+                break
+            
+            try:
+                conn.send(("ok", _run_job(handler, message, input_shm, output_shm, image_size)))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        input_shm.close()
+        output_shm.close()
+        conn.close()
+
+
+class _Worker:
+    """Рабочий процесс с закрепленными за ним блоками разделяемой памяти"""
+    
+    def __init__(self, index, input_bytes, output_bytes):
+        self.index = index
+        self.input_shm = SharedMemory(create=True, size=input_bytes)
+        self.output_shm = SharedMemory(create=True, size=output_bytes)
+        self.process = None
+        self.conn = None
+        self.restarts = 0
+        self.jobs = 0
+        self.pid = None
+    
+    @property
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+    
+    def launch(self, context, model_path, handler_options, image_size, threads):
+        """Запуск процесса без ожидания загрузки модели"""
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(
+            target=_worker_main,
+            args=(child_conn, self.input_shm.name, self.output_shm.name,
+                  model_path, handler_options, image_size),
+            name=f"inference-worker-{self.index}",
+            daemon=True
+        )
+        
+        # Дочерний процесс (spawn) получает копию окружения в момент запуска
+        with _environ_lock:
+            saved = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+            os.environ.update({name: str(threads) for name in THREAD_ENV_VARS})
+            try:
+                process.start()
+            finally:
+                for name, value in saved.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+        child_conn.close()
+        
+        self.process, self.conn = process, parent_conn
+    
+    def wait_ready(self, timeout):
+        """
+        Ожидание загрузки модели в процессе
+        
+        Returns:
+            ответ ("ready", pid, бэкенд, вариант)
+        """
+        try:
+            reply = self._receive(timeout)
+        except Exception:
+            self.kill()
+            raise
+        if reply[0] != "ready":
+            self.kill()
+            raise RuntimeError(reply[1])
+        self.pid = reply[1]
+        return reply
+    
+    def _receive(self, timeout):
+        """Ожидание ответа с проверкой, что процесс еще жив"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.conn.poll(0.05):
+            if not self.process.is_alive() and not self.conn.poll():
+                raise WorkerCrashedError(
+                    f"Рабочий процесс {self.index} завершился (код {self.process.exitcode})"
+                )
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Рабочий процесс {self.index} не ответил за {timeout} с")
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise WorkerCrashedError(f"Рабочий процесс {self.index} закрыл канал: {e}") from e
+    
+    def submit(self, job):
+        """Запись входных данных в разделяемую память и отправка команды"""
+        kind, payload = job
+        if kind == "predict":
+            view = np.ndarray(payload.shape, dtype=np.float32, buffer=self.input_shm.buf)
+            view[...] = payload
+            message = ("predict", len(payload))
+        else:
+            images, center = payload
+            offset = 0
+            for image in images:
+                view = np.ndarray(image.shape, dtype=np.uint8, buffer=self.input_shm.buf, offset=offset)
+                view[...] = image
+                offset += image.size
+            message = ("recognize", [image.shape for image in images], center)
+        view = None
+        self.jobs += 1
+        self.conn.send(message)
+    
+    def result(self, timeout):
+        """Ожидание результата текущего задания"""
+        reply = self._receive(timeout)
+        if reply[0] != "ok":
+            raise RuntimeError(f"Ошибка в рабочем процессе {self.index}: {reply[1]}")
+        shape = reply[1]
+        size = int(np.prod(shape))
+        return np.ndarray((size,), dtype=np.float32, buffer=self.output_shm.buf).reshape(shape).copy()
+    
+    def stop(self, timeout):
+        """Штатная остановка процесса"""
+        if self.process is None:
+            return
+        try:
+            self.conn.send(("stop",))
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        self.kill()
+    
+    def kill(self):
+        """Принудительное завершение процесса и закрытие канала"""
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.kill()
+            self.process.join()
+            self.process.close()
+            self.process = None
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+    
+    def release_memory(self):
+        """Освобождение блоков разделяемой памяти"""
+        for shm in (self.input_shm, self.output_shm):
+            shm.close()
+            shm.unlink()
+
+
+class InferenceWorkerPool:
+    """
+    Пул процессов, каждый из которых держит свою копию модели
+    
+    Пул безопасен для вызова из нескольких потоков: задания раздаются
+    свободным процессам, а упавший процесс перезапускается, и его
+    задание выполняется повторно (один раз). Предоставляет интерфейс,
+    совместимый с ModelHandler.predict_batch, поэтому может заменить
+    обработчик модели, например, в src/server.py.
+    """
+    
+    def __init__(self, model_path=config.MODEL_PATH, workers=None, threads_per_worker=1,
+                 backend="auto", variant="float32", max_batch_size=256,
+                 max_input_bytes=16 << 20, job_timeout=30.0, start_timeout=120.0):
+        """
+        Инициализация и запуск пула
+        
+        Args:
+            model_path: путь к директории с моделью
+            workers: количество процессов (None - по числу ядер)
+            threads_per_worker: число потоков BLAS/TensorFlow в каждом процессе
+            backend, variant: параметры ModelHandler в рабочих процессах
+            max_batch_size: максимальный размер батча одного задания
+            max_input_bytes: размер входного блока для исходных изображений
+            job_timeout: время ожидания результата задания в секундах
+            start_timeout: время ожидания загрузки модели в процессе
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size должен быть положительным")
+        
+        self.model_path = model_path
+        self.size = workers or os.cpu_count() or 1
+        self.threads_per_worker = int(threads_per_worker)
+        self.max_batch_size = int(max_batch_size)
+        self.job_timeout = job_timeout
+        self.start_timeout = start_timeout
+        self.image_size = config.MODEL_IMAGE_SIZE
+        self.num_classes = 10
+        self.handler_options = {"backend": backend, "variant": variant,
+                                "warmup_batch_sizes": (1, self.max_batch_size)}
+        
+        # Совместимость с ModelHandler
+        self.is_loaded = False
+        self.backend_name = None
+        self.variant = variant
+        self.cache = None
+        
+        # spawn: рабочие процессы не наследуют Qt, TensorFlow и потоки родителя
+        self._context = get_context("spawn")
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        
+        batch_bytes = 4 * self.max_batch_size * self.image_size * self.image_size
+        self._workers = [
+            _Worker(i, max(batch_bytes, max_input_bytes), 4 * self.max_batch_size * self.num_classes)
+            for i in range(self.size)
+        ]
+        ready = 0
+        try:
+            # Процессы загружают модель параллельно
+            for worker in self._workers:
+                self._launch_worker(worker)
+            for worker in self._workers:
+                reply = worker.wait_ready(self.start_timeout)
+                self._idle.put(worker)
+                ready += 1
+            self.backend_name = reply[2]
+            self.is_loaded = True
+        except Exception:
+            # Не дождавшиеся загрузки процессы останавливаются вместе с остальными
+            for worker in self._workers[ready:]:
+                self._idle.put(worker)
+            self.close()
+            raise
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def _launch_worker(self, worker):
+        worker.launch(self._context, self.model_path, self.handler_options,
+                      self.image_size, self.threads_per_worker)
+    
+    def _restart(self, worker):
+        """Перезапуск упавшего или зависшего процесса"""
+        worker.kill()
+        worker.restarts += 1
+        logger.warning(f"Перезапуск рабочего процесса {worker.index} (перезапусков: {worker.restarts})")
+        self._launch_worker(worker)
+        worker.wait_ready(self.start_timeout)
+    
+    def _acquire(self):
+        if self._closed:
+            raise RuntimeError("Пул процессов остановлен")
+        return self._idle.get()
+    
+    def _release(self, worker):
+        self._idle.put(worker)
+    
+    def _finish(self, worker, job):
+        """
+        Получение результата задания с перезапуском процесса при сбое
+        
+        Задание, на котором процесс упал, выполняется повторно один раз:
+        повторное падение означает, что сбой вызывают сами данные.
+        """
+        try:
+            for attempt in range(2):
+                try:
+                    return worker.result(self.job_timeout)
+                except (WorkerCrashedError, TimeoutError) as e:
+                    self._restart(worker)
+                    if attempt or isinstance(e, TimeoutError):
+                        raise
+                    worker.submit(job)
+        finally:
+            self._release(worker)
+    
+    def _run(self, jobs):
+        """
+        Выполнение заданий на свободных процессах
+        
+        Задания раздаются по мере освобождения процессов; если свободных
+        нет, сначала дожидаемся самого старого своего задания.
+        """
+        results = [None] * len(jobs)
+        pending = []
+        errors = []
+        try:
+            for index, job in enumerate(jobs):
+                while True:
+                    try:
+                        worker = self._idle.get_nowait()
+                        break
+                    except queue.Empty:
+                        if not pending:
+                            worker = self._acquire()
+                            break
+                        done_index, done_worker = pending.pop(0)
+                        results[done_index] = self._finish(done_worker, jobs[done_index])
+                
+                try:
+                    if not worker.alive:
+                        self._restart(worker)
+                    worker.submit(job)
+                except Exception:
+                    self._release(worker)
+                    raise
+                pending.append((index, worker))
+        finally:
+            # Ответы всех отправленных заданий читаются и при ошибке одного из них,
+            # иначе процессы не вернутся в пул, а их ответы достанутся чужим заданиям
+            for index, worker in pending:
+                try:
+                    results[index] = self._finish(worker, jobs[index])
+                except Exception as e:
+                    errors.append(e)
+        
+        if errors:
+            raise errors[0]
+        return results
+    
+    def predict_batch(self, images):
+        """
+        Распознавание батча подготовленных изображений
+        
+        Батч делится между процессами поровну (не больше max_batch_size
+        изображений на задание).
+        
+        Args:
+            images: numpy array [0, 1] формы (N, 28, 28, 1) или (N, 28, 28)
+        
+        Returns:
+            numpy array вероятностей формы (N, 10)
+        """
+        images = np.asarray(images, dtype=np.float32)
+        count = len(images)
+        if count == 0:
+            return np.empty((0, self.num_classes), dtype=np.float32)
+        images = images.reshape(count, self.image_size, self.image_size)
+        
+        step = min(self.max_batch_size, -(-count // self.size))
+        jobs = [("predict", images[start:start + step]) for start in range(0, count, step)]
+        return np.concatenate(self._run(jobs))
+    
+    def recognize_arrays(self, arrays, center=config.PREPROCESS_CENTERING):
+        """
+        Предобработка и распознавание исходных изображений в рабочих процессах
+        
+        Args:
+            arrays: последовательность numpy array uint8 формы (H, W) в оттенках
+                серого (темная цифра на белом фоне) или (H, W, 4) в формате RGB32
+            center: нормализовать ли цифру в стиле MNIST
+        
+        Returns:
+            numpy array вероятностей формы (N, 10)
+        """
+        capacity = self._workers[0].input_shm.size
+        arrays = [np.ascontiguousarray(array, dtype=np.uint8) for array in arrays]
+        if not arrays:
+            return np.empty((0, self.num_classes), dtype=np.float32)
+        
+        # Задания ограничены и количеством изображений, и объемом входного блока
+        per_job = min(self.max_batch_size, -(-len(arrays) // self.size))
+        jobs, chunk, chunk_bytes = [], [], 0
+        for array in arrays:
+            if array.ndim not in (2, 3) or (array.ndim == 3 and array.shape[2] != 4):
+                raise ValueError(f"Неподдерживаемая форма изображения: {array.shape}")
+            if array.nbytes > capacity:
+                raise ValueError(f"Изображение {array.shape} больше входного блока ({capacity} байт)")
+            if chunk and (len(chunk) == per_job or chunk_bytes + array.nbytes > capacity):
+                jobs.append(("recognize", (chunk, center)))
+                chunk, chunk_bytes = [], 0
+            chunk.append(array)
+            chunk_bytes += array.nbytes
+        jobs.append(("recognize", (chunk, center)))
+        
+        return np.concatenate(self._run(jobs))
+    
+    def stats(self):
+        """
+        Состояние рабочих процессов
+        
+        Returns:
+            список словарей: index, pid, alive, jobs, restarts
+        """
+        return [
+            {"index": worker.index, "pid": worker.pid, "alive": worker.alive,
+             "jobs": worker.jobs, "restarts": worker.restarts}
+            for worker in self._workers
+        ]
+    
+    def close(self, timeout=5.0):
+        """
+        Остановка пула
+        
+        Дожидается завершения выполняющихся заданий, затем просит процессы
+        завершиться, а не ответившие за timeout секунд завершает принудительно.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        
+        # Процессы, занятые заданиями других потоков, возвращаются в очередь
+        running = sum(worker.process is not None for worker in self._workers)
+        stopped = 0
+        deadline = time.monotonic() + timeout
+        while stopped < running:
+            try:
+                worker = self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            worker.stop(max(0.0, deadline - time.monotonic()))
+            stopped += 1
+        
+        for worker in self._workers:
+            worker.kill()
+            worker.release_memory()
+        self.is_loaded = False
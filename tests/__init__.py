@@ -1 +1,32 @@
 """Пакет с тестами для приложения"""
+
+import os
+
+import numpy as np
+
+from src.numpy_backend import WEIGHTS_CACHE_NAME, NumpyDenseModel
+
+
+def make_numpy_model_dir(tmp_dir, layers=(10,), seed=0, scale=0.1):
+    """
+    Сохранение случайной полносвязной модели в директорию модели NumPy-бэкенда
+    
+    Args:
+        tmp_dir: директория модели (создается, если ее нет)
+        layers: размеры слоев; скрытые слои используют relu, выходной - softmax
+        seed: зерно генератора весов
+        scale: стандартное отклонение весов (0 - нулевые веса); смещения нулевые
+    
+    Returns:
+        NumpyDenseModel
+    """
+    rng = np.random.default_rng(seed)
+    sizes = (784,) + tuple(layers)
+    model = NumpyDenseModel(
+        [rng.normal(0, scale, shape).astype(np.float32) for shape in zip(sizes[:-1], sizes[1:])],
+        [np.zeros(size, dtype=np.float32) for size in layers],
+        ["relu"] * (len(layers) - 1) + ["softmax"]
+    )
+    os.makedirs(tmp_dir, exist_ok=True)
+    model.save_npz(os.path.join(tmp_dir, WEIGHTS_CACHE_NAME))
+    return model
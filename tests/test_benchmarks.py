@@ -0,0 +1,64 @@
+"""Тесты средств бенчмарков"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks.harness import compare, measure
+from benchmarks.suite import main
+
+
+class TestHarness(unittest.TestCase):
+    """Тесты замеров и сравнения с эталоном"""
+    
+    def test_measure_summary(self):
+        """Тест состава и упорядоченности метрик замера"""
+        calls = []
+        result = measure(lambda: calls.append(bytearray(1 << 16)), repeats=20, warmup=2,
+                         items=4, memory_calls=3)
+        
+        self.assertEqual(len(calls), 25)
+        self.assertLessEqual(result["min_ms"], result["p50_ms"])
+        self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+        self.assertLessEqual(result["p95_ms"], result["p99_ms"])
+        self.assertGreater(result["throughput"], 0)
+        self.assertGreaterEqual(result["peak_alloc_kb"], 64)
+    
+    def test_compare_threshold(self):
+        """Тест обнаружения регрессии по порогу"""
+        baseline = {"a": {"p50_ms": 1.0}, "b": {"p50_ms": 1.0}}
+        results = {"a": {"p50_ms": 1.2}, "b": {"p50_ms": 1.5}, "new": {"p50_ms": 9.0}}
+        
+        lines, regressions = compare(results, baseline, threshold=0.25)
+        self.assertEqual(regressions, ["b"])
+        self.assertEqual(len(lines), 2)
+
+
+class TestSuite(unittest.TestCase):
+    """Тест прогона набора без дисплея"""
+    
+    def test_run_and_compare(self):
+        """Тест сохранения результатов и сравнения с эталоном"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = os.path.join(tmp_dir, "results.json")
+            argv = ["--stages", "preprocess", "inference", "--repeats", "5",
+                    "--batch-sizes", "1", "16", "--samples", "4"]
+            self.assertEqual(main(argv + ["--output", output]), 0)
+            
+            with open(output, encoding="utf-8") as stream:
+                document = json.load(stream)
+            self.assertIn("environment", document)
+            self.assertIn("inference/batch_16", document["results"])
+            self.assertIn("p99_ms", document["results"]["preprocess/raster"])
+            
+            # Эталон с заведомо меньшими задержками дает регрессию
+            for result in document["results"].values():
+                result["p50_ms"] /= 100.0
+            with open(output, "w", encoding="utf-8") as stream:
+                json.dump(document, stream)
+            self.assertEqual(main(argv + ["--baseline", output]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
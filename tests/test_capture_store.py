@@ -0,0 +1,97 @@
+"""Тесты хранилища записанных образцов"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.capture_store import (
+    NO_LABEL, CaptureWriter, export_labeled, open_segment, read_capture, read_index
+)
+from src.cli import main as cli_main
+from src.idx_io import memmap_idx, read_idx
+
+
+class TestCaptureStore(unittest.TestCase):
+    """Тесты фоновой записи, ротации и чтения без копирования"""
+    
+    def setUp(self):
+        """Создание временной директории и образцов"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, True)
+        self.store = os.path.join(self.tmp_dir, "captures")
+        rng = np.random.default_rng(0)
+        self.images = rng.random((12, 28, 28)).astype(np.float32)
+        self.probabilities = rng.random((12, 10)).astype(np.float32)
+    
+    def test_roundtrip(self):
+        """Тест записи образцов и чтения через отображение в память"""
+        writer = CaptureWriter(self.store, flush_records=4, flush_interval=60.0)
+        self.addCleanup(writer.close)
+        writer.append(self.images[0], self.probabilities[0], labels=7, timestamp=100.0)
+        writer.append(self.images[1:3], self.probabilities[1:3], labels=[1, 2])
+        writer.append(self.images[3:5], self.probabilities[3:5])
+        self.assertTrue(writer.flush(timeout=10))
+        
+        segment = open_segment(os.path.join(self.store, "000001"))
+        self.assertIsInstance(segment["images"], np.memmap)
+        self.assertEqual(len(segment["images"]), 5)
+        np.testing.assert_array_equal(segment["labels"], [7, 1, 2, NO_LABEL, NO_LABEL])
+        np.testing.assert_allclose(segment["images"] / 255.0, self.images[:5], atol=0.5 / 255 + 1e-6)
+        np.testing.assert_array_equal(segment["probabilities"], self.probabilities[:5])
+        self.assertEqual(segment["timestamps"][0], 100.0)
+        
+        # Файлы сегмента - обычные IDX, читаемые остальными инструментами
+        images = memmap_idx(os.path.join(self.store, "000001", "images-idx3-ubyte"))
+        np.testing.assert_array_equal(images, segment["images"])
+        self.assertEqual(read_index(self.store)["segments"][0]["count"], 5)
+        self.assertEqual(writer.stats()["written"], 5)
+    
+    def test_rotation_and_resume(self):
+        """Тест ротации по размеру, удаления старых сегментов и продолжения"""
+        writer = CaptureWriter(self.store, max_segment_bytes=4 * 833, max_segments=2,
+                               flush_records=1)
+        writer.append(self.images[:10], self.probabilities[:10], labels=np.arange(10))
+        writer.close()
+        
+        # Сегменты по 4 записи, самый старый удален
+        index = read_index(self.store)
+        self.assertEqual([segment["name"] for segment in index["segments"]], ["000002", "000003"])
+        self.assertEqual([segment["count"] for segment in index["segments"]], [4, 2])
+        self.assertFalse(os.path.exists(os.path.join(self.store, "000001")))
+        
+        # Недописанный хвост после сбоя отбрасывается при открытии
+        with open(os.path.join(self.store, "000003", "images-idx3-ubyte"), "ab") as stream:
+            stream.write(b"\x00" * 100)
+        writer = CaptureWriter(self.store, max_segment_bytes=4 * 833, max_segments=2)
+        writer.append(self.images[10:12], self.probabilities[10:12])
+        writer.close()
+        
+        captured = read_capture(self.store)
+        np.testing.assert_array_equal(captured["labels"], [4, 5, 6, 7, 8, 9, NO_LABEL, NO_LABEL])
+        self.assertEqual(writer.stats()["segments"], 2)
+        self.assertEqual(os.path.getsize(os.path.join(self.store, "000003", "images-idx3-ubyte")),
+                         16 + 4 * 784)
+    
+    def test_export_labeled(self):
+        """Тест выгрузки образцов с метками в пару файлов IDX"""
+        writer = CaptureWriter(self.store)
+        writer.append(self.images[:6], self.probabilities[:6], labels=[3, -1, 5, -1, -1, 0])
+        writer.close()
+        
+        images_path = os.path.join(self.tmp_dir, "user-images-idx3-ubyte")
+        labels_path = os.path.join(self.tmp_dir, "user-labels-idx1-ubyte")
+        self.assertEqual(export_labeled(self.store, images_path, labels_path), 3)
+        np.testing.assert_array_equal(read_idx(labels_path), [3, 5, 0])
+        np.testing.assert_array_equal(read_idx(images_path),
+                                      read_capture(self.store)["images"][[0, 2, 5]])
+        
+        exit_code = cli_main(["capture-export", self.store, "--images", images_path,
+                              "--labels", labels_path])
+        self.assertEqual(exit_code, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""Тесты каскада моделей с ранним выходом"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.cascade import (
+    Cascade, CascadeStage, downsample, evaluate_cascade, load_cascade, train_first_stage
+)
+from src.idx_io import write_idx
+from src.model_handler import ModelHandler
+from src.numpy_backend import NumpyDenseModel
+from tests import make_numpy_model_dir
+
+
+def make_dataset(count, seed=0):
+    """Изображения, в которых метка задает яркую полосу (легко разделимы)"""
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, 10, count).astype(np.uint8)
+    images = (rng.random((count, 28, 28)) * 40).astype(np.uint8)
+    for image, label in zip(images, labels):
+        image[2 + 2 * label:4 + 2 * label, 4:24] = 255
+    return images, labels
+
+
+class TestCascade(unittest.TestCase):
+    """Тесты ступеней, каскада и обучения первой ступени"""
+    
+    def setUp(self):
+        """Создание полной модели и набора IDX во временной директории"""
+        self.tmp_dir = tempfile.mkdtemp()
+        make_numpy_model_dir(self.tmp_dir, layers=(32, 10))
+        
+        images, labels = make_dataset(600)
+        self.images_path = os.path.join(self.tmp_dir, "images-idx3-ubyte")
+        self.labels_path = os.path.join(self.tmp_dir, "labels-idx1-ubyte")
+        write_idx(self.images_path, images)
+        write_idx(self.labels_path, labels)
+        self.images = images.astype(np.float32)[..., np.newaxis] / 255.0
+    
+    def tearDown(self):
+        """Удаление временной директории"""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def test_expanded_stage_matches_downsampled(self):
+        """Тест переноса уменьшения изображения в веса ступени"""
+        rng = np.random.default_rng(1)
+        small = NumpyDenseModel([rng.normal(0, 1, (49, 10)).astype(np.float32)],
+                                [np.zeros(10, dtype=np.float32)], ["softmax"], (7, 7, 1))
+        stage = CascadeStage(small)
+        
+        np.testing.assert_allclose(stage(self.images[:8]), small(downsample(self.images[:8], 4)),
+                                   rtol=1e-4, atol=1e-6)
+        self.assertEqual(stage.name, "7x7")
+    
+    def test_train_and_run(self):
+        """Тест раннего выхода и статистики ступеней"""
+        path, accuracy = train_first_stage(self.images_path, self.labels_path, self.tmp_dir)
+        self.assertGreater(accuracy, 0.9)
+        
+        handler = ModelHandler(self.tmp_dir, backend="numpy", warmup_batch_sizes=())
+        full = handler.predict_batch(self.images)
+        stage_output = CascadeStage.load(path)(self.images)
+        
+        # Порог по медиане уверенности: примерно половина ответов ступени принимается
+        threshold = float(np.median(stage_output.max(axis=1)))
+        stages = [(os.path.basename(path), threshold, 0.0)]
+        cascade = handler.enable_cascade(load_cascade(self.tmp_dir, stages))
+        result = handler.predict_batch(self.images)
+        accepted = stage_output.max(axis=1) >= threshold
+        self.assertTrue(0 < accepted.sum() < len(accepted))
+        np.testing.assert_allclose(result[accepted], stage_output[accepted], rtol=1e-5)
+        np.testing.assert_allclose(result[~accepted], full[~accepted], rtol=1e-5)
+        
+        stats = cascade.stats()
+        self.assertEqual(stats["requests"], len(self.images))
+        self.assertEqual(stats["stages"][0]["handled"], int(accepted.sum()))
+        self.assertAlmostEqual(sum(stage["fraction"] for stage in stats["stages"]), 1.0)
+        
+        handler.disable_cascade()
+        np.testing.assert_allclose(handler.predict_batch(self.images), full, rtol=1e-6)
+    
+    def test_margin_threshold(self):
+        """Тест порога отрыва лучшей цифры от второй"""
+        stage = CascadeStage(NumpyDenseModel([np.zeros((784, 10), dtype=np.float32)],
+                                             [np.zeros(10, dtype=np.float32)], ["softmax"]),
+                             threshold=0.4, margin=0.2)
+        probabilities = np.array([[0.5, 0.4] + [0.0125] * 8, [0.7, 0.1] + [0.025] * 8],
+                                 dtype=np.float32)
+        np.testing.assert_array_equal(stage.accepts(probabilities), [False, True])
+        
+        # Неуверенная ступень передает все изображения полной модели
+        cascade = Cascade([stage])
+        result = cascade.run(self.images[:4], lambda images: np.full((len(images), 10), 0.1))
+        np.testing.assert_allclose(result, 0.1)
+        self.assertEqual(cascade.stats()["stages"][-1]["handled"], 4)
+    
+    def test_evaluate_report(self):
+        """Тест отчета о компромиссе точности и задержки"""
+        path, _ = train_first_stage(self.images_path, self.labels_path, self.tmp_dir)
+        handler = ModelHandler(self.tmp_dir, backend="numpy", warmup_batch_sizes=())
+        report = evaluate_cascade(handler, CascadeStage.load(path), self.images_path,
+                                  self.labels_path, [0.5, 1.1], latency_repeats=5)
+        
+        self.assertIsNone(report[0]["threshold"])
+        self.assertEqual(report[0]["early_exit"], 0.0)
+        self.assertGreater(report[1]["early_exit"], 0.5)
+        self.assertGreater(report[1]["accuracy"], report[0]["accuracy"])
+        # Порог выше единицы не пропускает ни одного ответа ступени
+        self.assertEqual(report[2]["early_exit"], 0.0)
+        self.assertAlmostEqual(report[2]["accuracy"], report[0]["accuracy"])
+
+
+if __name__ == "__main__":
+    unittest.main()
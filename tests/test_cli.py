@@ -0,0 +1,125 @@
+"""Тесты пакетного распознавания без GUI"""
+
+import csv
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import zipfile
+
+import numpy as np
+from PIL import Image
+
+from src import cli
+from src.idx_io import iter_idx, read_idx, write_idx
+from tests import make_numpy_model_dir
+
+
+class TestIdx(unittest.TestCase):
+    """Тесты чтения и записи файлов IDX"""
+    
+    def test_roundtrip_and_chunks(self):
+        """Тест записи, чтения целиком и потокового чтения блоками"""
+        images = np.arange(5 * 4 * 3, dtype=np.uint8).reshape(5, 4, 3)
+        labels = np.array([1, -2, 3], dtype=np.int32)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            images_path = os.path.join(tmp_dir, "images-idx3-ubyte.gz")
+            labels_path = os.path.join(tmp_dir, "labels-idx1-ubyte")
+            write_idx(images_path, images)
+            write_idx(labels_path, labels)
+            
+            np.testing.assert_array_equal(read_idx(images_path), images)
+            np.testing.assert_array_equal(read_idx(labels_path), labels)
+            self.assertEqual([len(c) for c in iter_idx(images_path, chunk_size=2)], [2, 2, 1])
+
+
+class TestRecognizeCommand(unittest.TestCase):
+    """Тесты команды recognize"""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Создание модели NumPy и входных данных во временной директории"""
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.model_path = os.path.join(cls.tmp_dir, "model")
+        make_numpy_model_dir(cls.model_path, layers=(16, 10), scale=1.0)
+        
+        cls.images_dir = os.path.join(cls.tmp_dir, "images")
+        os.makedirs(cls.images_dir)
+        digit = np.full((140, 140), 255, dtype=np.uint8)
+        digit[30:110, 60:80] = 0
+        for i in range(3):
+            Image.fromarray(digit).save(os.path.join(cls.images_dir, f"{i}.png"))
+        with open(os.path.join(cls.images_dir, "broken.png"), "wb") as f:
+            f.write(b"not an image")
+        
+        cls.zip_path = os.path.join(cls.tmp_dir, "digits.zip")
+        with zipfile.ZipFile(cls.zip_path, "w") as archive:
+            archive.write(os.path.join(cls.images_dir, "0.png"), "a/0.png")
+        
+        cls.idx_path = os.path.join(cls.tmp_dir, "t10k-images-idx3-ubyte")
+        write_idx(cls.idx_path, np.random.default_rng(0).integers(0, 256, (7, 28, 28), dtype=np.uint8))
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Удаление временной директории"""
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+    
+    def run_cli(self, output, *extra):
+        """Запуск команды recognize для всех входов"""
+        code = cli.main([
+            "recognize", self.images_dir, self.zip_path, self.idx_path,
+            "--model", self.model_path, "--backend", "numpy",
+            "--batch-size", "4", "-o", output, *extra
+        ])
+        self.assertEqual(code, 0)
+    
+    def test_csv_output(self):
+        """Тест вывода CSV, включая строку с ошибкой декодирования"""
+        output = os.path.join(self.tmp_dir, "results.csv")
+        self.run_cli(output, "--workers", "0")
+        
+        with open(output, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        
+        self.assertEqual(len(rows), 4 + 1 + 7)
+        self.assertTrue(rows[3]["name"].endswith("broken.png"))
+        self.assertTrue(rows[3]["error"])
+        self.assertEqual(rows[0]["digit"], rows[4]["digit"])
+        probabilities = [float(rows[5][f"p{i}"]) for i in range(10)]
+        self.assertAlmostEqual(sum(probabilities), 1.0, places=4)
+    
+    def test_worker_processes_match_inline(self):
+        """Тест совпадения результатов рабочих процессов и обработки на месте"""
+        inline = os.path.join(self.tmp_dir, "inline.jsonl")
+        pooled = os.path.join(self.tmp_dir, "pooled.jsonl")
+        self.run_cli(inline, "--workers", "0")
+        self.run_cli(pooled, "--workers", "2")
+        
+        with open(inline, encoding="utf-8") as f:
+            inline_rows = [json.loads(line) for line in f]
+        with open(pooled, encoding="utf-8") as f:
+            pooled_rows = [json.loads(line) for line in f]
+        
+        self.assertEqual(inline_rows, pooled_rows)
+        self.assertEqual(inline_rows[-1]["name"], f"{self.idx_path}:6")
+    
+    def test_no_qt_import(self):
+        """Тест того, что пакетная обработка не импортирует PyQt6"""
+        code = (
+            "import sys\n"
+            "from src import cli\n"
+            f"cli.main(['recognize', {self.idx_path!r}, '--model', {self.model_path!r}, "
+            "'--backend', 'numpy', '--workers', '0'])\n"
+            "assert not any(name.startswith('PyQt6') for name in sys.modules)\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+        self.assertEqual(len(list(csv.reader(io.StringIO(result.stdout)))), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
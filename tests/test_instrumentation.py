@@ -0,0 +1,70 @@
+"""Тесты инструментации горячих путей"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from src.instrumentation import Instrumentation
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Тесты таймеров, счетчиков и экспорта"""
+    
+    def test_disabled_is_noop(self):
+        """Тест отсутствия записи в выключенном состоянии"""
+        metrics = Instrumentation(enabled=False)
+        self.assertIs(metrics.timer("a"), metrics.timer("b"))
+        with metrics.timer("preprocess"):
+            pass
+        metrics.record("inference", 0.5)
+        metrics.count("recognitions")
+        self.assertEqual(metrics.snapshot(), {"timers": {}, "counters": {}})
+    
+    def test_timers_and_counters(self):
+        """Тест статистики таймеров и счетчиков"""
+        metrics = Instrumentation(enabled=True, window=4)
+        for seconds in (0.001, 0.002, 0.003, 0.004, 0.010):
+            metrics.record("inference", seconds)
+        with metrics.timer("preprocess"):
+            pass
+        metrics.count("recognitions", 2)
+        
+        state = metrics.snapshot()
+        inference = state["timers"]["inference"]
+        self.assertEqual(inference["count"], 5)
+        self.assertAlmostEqual(inference["total_ms"], 20.0)
+        self.assertAlmostEqual(inference["last_ms"], 10.0)
+        self.assertAlmostEqual(inference["max_ms"], 10.0)
+        # Перцентили считаются по окну из 4 последних замеров
+        self.assertAlmostEqual(inference["p50_ms"], 3.5)
+        self.assertEqual(state["timers"]["preprocess"]["count"], 1)
+        self.assertEqual(state["counters"], {"recognitions": 2})
+        
+        metrics.reset()
+        self.assertEqual(metrics.snapshot()["timers"], {})
+    
+    def test_export(self):
+        """Тест экспорта в JSON и текстовый формат Prometheus"""
+        metrics = Instrumentation(enabled=True)
+        metrics.record("softmax", 0.002)
+        metrics.count("recognitions")
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = os.path.join(tmp_dir, "metrics.json")
+            prom_path = os.path.join(tmp_dir, "metrics.prom")
+            metrics.export(json_path)
+            metrics.export(prom_path)
+            
+            with open(json_path, encoding="utf-8") as stream:
+                self.assertEqual(json.load(stream)["timers"]["softmax"]["count"], 1)
+            with open(prom_path, encoding="utf-8") as stream:
+                text = stream.read()
+        
+        self.assertIn('digits_stage_seconds{stage="softmax",quantile="0.5"} 0.002000000', text)
+        self.assertIn('digits_stage_seconds_count{stage="softmax"} 1', text)
+        self.assertIn("digits_recognitions_total 1", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,24 +1,255 @@
 """Тесты для работы с моделью"""
 
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+
 import numpy as np
-import os
 
-# Эти тесты можно запустить после реализации функционала
-# Пока что это заглушка для будущих тестов
+from create_test_model import create_and_save_test_model
+from src.batching import MicroBatcher
+from src.model_handler import ModelHandler
+from src.numpy_backend import WEIGHTS_CACHE_NAME, NumpyDenseModel, UnsupportedModelError
+from src.prediction_result import PredictionResult
+from tests import make_numpy_model_dir
+
 
 class TestModelHandler(unittest.TestCase):
     """Тесты для обработчика модели"""
     
+    @classmethod
+    def setUpClass(cls):
+        """Создание тестовой модели во временной директории"""
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.model_path = os.path.join(cls.tmp_dir, "mnist_model")
+        create_and_save_test_model(cls.model_path)
+        cls.handler = ModelHandler(cls.model_path, backend="tensorflow")
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Удаление временной директории"""
+        cls.handler.disable_batch_queue()
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+    
     def test_model_loading(self):
         """Тест загрузки модели"""
-        # Пока пустой тест - будет реализован позже
-        pass
+        self.assertTrue(self.handler.is_loaded)
+        self.assertIn(1, self.handler.warmup_report)
+        
+        missing = ModelHandler(os.path.join(self.tmp_dir, "missing"))
+        self.assertFalse(missing.is_loaded)
     
     def test_prediction_shape(self):
         """Тест формы результата предсказания"""
-        # Пока пустой тест - будет реализован позже
-        pass
+        image = np.random.rand(1, 28, 28, 1).astype(np.float32)
+        probabilities = self.handler.predict(image)
+        
+        self.assertEqual(len(probabilities), 10)
+        self.assertAlmostEqual(sum(probabilities), 1.0, places=5)
+    
+    def test_output_format_detection(self):
+        """Тест того, что к выходу модели с softmax он не применяется повторно"""
+        self.assertTrue(self.handler.outputs_probabilities)
+        
+        images = np.random.rand(4, 28, 28, 1).astype(np.float32)
+        np.testing.assert_allclose(
+            self.handler.predict_batch(images), self.handler._run_model(images), rtol=1e-6
+        )
+    
+    def test_prediction_result(self):
+        """Тест однократно вычисленных argmax и top-k"""
+        result = self.handler.predict(np.random.rand(1, 28, 28, 1).astype(np.float32))
+        self.assertIsInstance(result, PredictionResult)
+        self.assertEqual(result.digit, int(np.argmax(result.probabilities)))
+        self.assertEqual(self.handler.get_prediction_result(result), result.digit)
+        
+        result = PredictionResult([0.1, 0.3, 0.0, 0.3, 0.2, 0.1, 0.0, 0.0, 0.0, 0.0])
+        self.assertEqual(result.digit, 1)
+        self.assertAlmostEqual(result.confidence, 0.3, places=6)
+        self.assertEqual([digit for digit, _ in result.top_k], [1, 3, 4])
+    
+    def test_predict_batch(self):
+        """Тест батчевого предсказания"""
+        images = np.random.rand(5, 28, 28, 1).astype(np.float32)
+        probabilities = self.handler.predict_batch(images)
+        
+        self.assertEqual(probabilities.shape, (5, 10))
+        np.testing.assert_allclose(
+            probabilities[2], self.handler.predict(images[2:3]), rtol=1e-5
+        )
+        self.assertEqual(self.handler.predict_batch(images[:0]).shape, (0, 10))
+    
+    def test_batch_queue(self):
+        """Тест объединения конкурентных запросов в батчи"""
+        images = np.random.rand(16, 28, 28, 1).astype(np.float32)
+        expected = self.handler.predict_batch(images)
+        
+        self.handler.enable_batch_queue(max_batch_size=8, max_wait_ms=20)
+        try:
+            results = [None] * len(images)
+            
+            def worker(i):
+                results[i] = self.handler.predict(images[i:i + 1])
+            
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(images))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            self.handler.disable_batch_queue()
+        
+        np.testing.assert_allclose(np.array(results), expected, rtol=1e-5)
+
+
+class TestMicroBatcher(unittest.TestCase):
+    """Тесты очереди батчинга"""
+    
+    def test_close_while_submitting(self):
+        """Тест ответа на запрос, поставленный одновременно с закрытием очереди"""
+        batcher = MicroBatcher(lambda images: images.reshape(len(images), -1), max_wait_ms=0)
+        put = batcher._queue.put
+        entered = threading.Event()
+        
+        def slow_put(item):
+            # Запрос уже прошел проверку закрытия, но еще не попал в очередь
+            if item is not None:
+                entered.set()
+                time.sleep(0.2)
+            put(item)
+        
+        batcher._queue.put = slow_put
+        futures = []
+        thread = threading.Thread(target=lambda: futures.append(batcher.submit(np.ones(10))))
+        thread.start()
+        entered.wait(5)
+        batcher.close()
+        thread.join()
+        
+        np.testing.assert_array_equal(futures[0].result(timeout=5), np.ones(10))
+        with self.assertRaises(RuntimeError):
+            batcher.submit(np.ones(10))
+
+
+class TestNumpyBackend(unittest.TestCase):
+    """Тесты NumPy-бэкенда"""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Создание тестовой модели во временной директории"""
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.model_path = os.path.join(cls.tmp_dir, "mnist_model")
+        create_and_save_test_model(cls.model_path)
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Удаление временной директории"""
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+    
+    def test_matches_tensorflow(self):
+        """Тест совпадения результатов NumPy и TensorFlow"""
+        images = np.random.rand(8, 28, 28, 1).astype(np.float32)
+        numpy_handler = ModelHandler(self.model_path, backend="numpy")
+        tf_handler = ModelHandler(self.model_path, backend="tensorflow")
+        
+        self.assertEqual(numpy_handler.backend_name, "numpy")
+        np.testing.assert_allclose(
+            numpy_handler.predict_batch(images),
+            tf_handler.predict_batch(images),
+            rtol=1e-4, atol=1e-6
+        )
+        self.assertTrue(os.path.exists(os.path.join(self.model_path, WEIGHTS_CACHE_NAME)))
+    
+    def test_no_tensorflow_import(self):
+        """Тест того, что NumPy-бэкенд не импортирует TensorFlow"""
+        code = (
+            "import sys\n"
+            "from src.model_handler import ModelHandler\n"
+            f"handler = ModelHandler({self.model_path!r}, backend='numpy')\n"
+            "assert handler.is_loaded\n"
+            "assert 'tensorflow' not in sys.modules\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
+    
+    def test_softmax_output_not_repeated(self):
+        """Тест перенормировки вместо повторного softmax при выходе больше 10"""
+        model_path = os.path.join(self.tmp_dir, "twelve_outputs")
+        model = make_numpy_model_dir(model_path, layers=(12,), scale=1.0)
+        handler = ModelHandler(model_path, backend="numpy", warmup_batch_sizes=())
+        self.assertTrue(handler.outputs_probabilities)
+        
+        images = np.random.rand(4, 28, 28, 1).astype(np.float32)
+        outputs = model(images)[:, :10]
+        np.testing.assert_allclose(
+            handler.predict_batch(images), outputs / outputs.sum(axis=1, keepdims=True), rtol=1e-5
+        )
+    
+    def test_unsupported_layers(self):
+        """Тест отказа от неподдерживаемых слоев"""
+        variables = {
+            "_layers/1/_kernel/.ATTRIBUTES/VARIABLE_VALUE": np.zeros((3, 3, 1, 8)),
+            "_layers/1/bias/.ATTRIBUTES/VARIABLE_VALUE": np.zeros(8),
+        }
+        with self.assertRaises(UnsupportedModelError):
+            NumpyDenseModel.from_variables(variables)
+    
+    def test_activations_from_graph(self):
+        """Тест чтения активаций из графа модели вместо relu/softmax по умолчанию"""
+        import tensorflow as tf
+        from tensorflow import keras
+        
+        model_path = os.path.join(self.tmp_dir, "tanh_logits")
+        model = keras.Sequential([
+            keras.layers.Input(shape=(28, 28, 1)),
+            keras.layers.Flatten(),
+            keras.layers.Dense(16, activation="tanh"),
+            keras.layers.Dense(10),
+        ])
+        tf.saved_model.save(model, model_path)
+        
+        images = np.random.rand(8, 28, 28, 1).astype(np.float32)
+        auto_handler = ModelHandler(model_path, warmup_batch_sizes=())
+        tf_handler = ModelHandler(model_path, backend="tensorflow", warmup_batch_sizes=())
+        self.assertEqual(auto_handler.backend_name, "numpy")
+        self.assertEqual(auto_handler.model.activations, ["tanh", "linear"])
+        self.assertFalse(auto_handler.outputs_probabilities)
+        np.testing.assert_allclose(
+            auto_handler.predict_batch(images), tf_handler.predict_batch(images),
+            rtol=1e-4, atol=1e-6
+        )
+        
+        # Без графа активации неизвестны: NumPy-бэкенд отказывается от модели
+        os.remove(os.path.join(model_path, WEIGHTS_CACHE_NAME))
+        os.remove(os.path.join(model_path, "saved_model.pb"))
+        with self.assertRaises(UnsupportedModelError):
+            NumpyDenseModel.load(model_path)
+    
+    def test_cache_rebuilt_after_update(self):
+        """Тест пересоздания кэша весов после обновления модели на месте"""
+        import tensorflow as tf
+        from tensorflow import keras
+        
+        model_path = os.path.join(self.tmp_dir, "updated")
+        model = keras.Sequential([
+            keras.layers.Input(shape=(28, 28, 1)),
+            keras.layers.Flatten(),
+            keras.layers.Dense(10, activation="softmax"),
+        ])
+        tf.saved_model.save(model, model_path)
+        first = NumpyDenseModel.load(model_path)
+        
+        model.set_weights([weight + 1.0 for weight in model.get_weights()])
+        tf.saved_model.save(model, model_path)
+        updated = NumpyDenseModel.load(model_path)
+        np.testing.assert_allclose(updated.kernels[0], first.kernels[0] + 1.0)
+        self.assertEqual(NumpyDenseModel.load_npz(
+            os.path.join(model_path, WEIGHTS_CACHE_NAME)).source, updated.source)
+        self.assertFalse([name for name in os.listdir(model_path) if name.endswith(".tmp.npz")])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,82 @@
+"""Тесты фоновой загрузки модели и замера времени запуска"""
+
+import shutil
+import tempfile
+import unittest
+
+from PyQt6.QtCore import QCoreApplication, QEventLoop, QTimer
+
+from src.model_loader import ModelLoader
+from src.startup import StartupTimer
+from tests import make_numpy_model_dir
+
+
+def wait_for_signal(signal, timeout_ms=10000):
+    """Ожидание сигнала с обработкой событий Qt"""
+    received = []
+    loop = QEventLoop()
+    signal.connect(lambda *args: (received.append(args), loop.quit()))
+    QTimer.singleShot(timeout_ms, loop.quit)
+    loop.exec()
+    return received
+
+
+class TestModelLoader(unittest.TestCase):
+    """Тесты загрузчика модели"""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Создание модели NumPy во временной директории"""
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+        cls.tmp_dir = tempfile.mkdtemp()
+        make_numpy_model_dir(cls.tmp_dir, scale=0.0)
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Удаление временной директории"""
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+    
+    def test_ready_signal(self):
+        """Тест загрузки модели в фоне и сигнала готовности"""
+        loader = ModelLoader()
+        loader.load(self.tmp_dir, backend="numpy", warmup_batch_sizes=())
+        self.assertTrue(loader.loading)
+        
+        received = wait_for_signal(loader.ready)
+        loader.wait()
+        self.assertEqual(len(received), 1)
+        handler = received[0][0]
+        self.assertTrue(handler.is_loaded)
+        self.assertFalse(loader.loading)
+        self.assertIn("загрузка и прогрев модели", loader.timings)
+    
+    def test_failed_signal(self):
+        """Тест сигнала ошибки при неверных аргументах обработчика"""
+        loader = ModelLoader()
+        loader.load(self.tmp_dir, backend="unknown")
+        received = wait_for_signal(loader.failed)
+        loader.wait()
+        self.assertEqual(len(received), 1)
+        self.assertIn("unknown", received[0][0])
+
+
+class TestStartupTimer(unittest.TestCase):
+    """Тесты таймера запуска"""
+    
+    def test_marks_and_report(self):
+        """Тест отметок этапов и сводки"""
+        timer = StartupTimer()
+        first = timer.mark("импорт")
+        self.assertEqual(timer.mark("импорт"), first)
+        timer.mark("окно")
+        timer.add_duration("загрузка", 1.5)
+        
+        self.assertTrue(timer.has("импорт", "окно"))
+        self.assertFalse(timer.has("модель"))
+        report = timer.report()
+        self.assertLess(report.index("импорт"), report.index("окно"))
+        self.assertIn("загрузка 1.50 с", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
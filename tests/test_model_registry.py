@@ -0,0 +1,88 @@
+"""Тесты реестра версий модели"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from src.model_registry import ModelRegistry, list_versions
+from src.numpy_backend import WEIGHTS_CACHE_NAME
+
+
+class FakeHandler:
+    """Обработчик модели без инференса"""
+    
+    def __init__(self, is_loaded=True):
+        self.is_loaded = is_loaded
+
+
+class TestModelRegistry(unittest.TestCase):
+    """Тесты выбора версий, активации и отката"""
+    
+    def setUp(self):
+        """Создание директории версий"""
+        self.models_dir = tempfile.mkdtemp()
+        for name in ("1", "v2", "3"):
+            self.add_version(name)
+        # Не версии: неподходящее имя и подкаталог без модели
+        self.add_version("latest")
+        os.makedirs(os.path.join(self.models_dir, "7"))
+    
+    def tearDown(self):
+        """Удаление директории версий"""
+        shutil.rmtree(self.models_dir, ignore_errors=True)
+    
+    def add_version(self, name):
+        """Создание подкаталога версии с файлом весов"""
+        path = os.path.join(self.models_dir, name)
+        os.makedirs(path)
+        open(os.path.join(path, WEIGHTS_CACHE_NAME), "wb").close()
+        return path
+    
+    def test_list_versions(self):
+        """Тест поиска версий и пропуска недокопированных"""
+        versions = list_versions(self.models_dir)
+        self.assertEqual([version for version, _ in versions], [1, 2, 3])
+        self.assertTrue(versions[1][1].endswith("v2"))
+        
+        old = time.time() - 60
+        for name in ("1", "v2"):
+            os.utime(os.path.join(self.models_dir, name), (old, old))
+            os.utime(os.path.join(self.models_dir, name, WEIGHTS_CACHE_NAME), (old, old))
+        self.assertEqual([version for version, _ in list_versions(self.models_dir, 10.0)], [1, 2])
+        self.assertEqual(list_versions(os.path.join(self.models_dir, "missing")), [])
+    
+    def test_activate_and_rollback(self):
+        """Тест подмены активной версии и отката к предыдущей"""
+        registry = ModelRegistry(self.models_dir, settle_seconds=0)
+        version, path = registry.next_version()
+        self.assertEqual(version, 3)
+        
+        # Версия, которую не удалось загрузить, пропускается
+        with self.assertRaises(ValueError):
+            registry.activate(version, path, FakeHandler(is_loaded=False))
+        self.assertEqual(registry.next_version()[0], 2)
+        
+        first = registry.activate(2, path, FakeHandler(), {"загрузка": 0.5})
+        self.assertIsNone(registry.next_version())
+        with self.assertRaises(RuntimeError):
+            registry.rollback()
+        
+        second = registry.activate(4, self.add_version("4"), FakeHandler())
+        self.assertIs(registry.active, second)
+        self.assertEqual(registry.status()["previous"], [2])
+        
+        # Откат возвращает тот же загруженный обработчик, версия 4 больше не предлагается
+        self.assertIs(registry.rollback(), first)
+        self.assertEqual(registry.status()["active"], 2)
+        self.assertEqual(registry.status()["timings"], {"загрузка": 0.5})
+        self.assertIsNone(registry.next_version())
+        self.assertEqual(registry.status()["skipped"], [3, 4])
+        
+        self.add_version("5")
+        self.assertEqual(registry.next_version()[0], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
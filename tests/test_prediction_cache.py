@@ -0,0 +1,91 @@
+"""Тесты кэша результатов распознавания"""
+
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from src.model_handler import ModelHandler
+from src.prediction_cache import PredictionCache
+from tests import make_numpy_model_dir
+
+
+class TestPredictionCache(unittest.TestCase):
+    """Тесты LRU-кэша"""
+    
+    def test_lru_eviction(self):
+        """Тест вытеснения самой давно использованной записи"""
+        cache = PredictionCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get_many(["a", "c"]), [1, 3])
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (3, 1, 1))
+    
+    def test_ttl(self):
+        """Тест истечения времени жизни записи"""
+        cache = PredictionCache(ttl=0.01)
+        cache.put("a", 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+    
+    def test_keys_quantized(self):
+        """Тест совпадения ключей для неразличимых после квантования изображений"""
+        image = np.random.randint(0, 256, (1, 28, 28, 1)).astype(np.float32) / 255.0
+        same = PredictionCache.keys_for(image + 1e-4)
+        self.assertEqual(PredictionCache.keys_for(image), same)
+        self.assertNotEqual(PredictionCache.keys_for(image, generation=2), same)
+        self.assertNotEqual(PredictionCache.keys_for(1.0 - image), same)
+
+
+class TestModelHandlerCache(unittest.TestCase):
+    """Тесты кэша в ModelHandler"""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Создание модели NumPy во временной директории"""
+        cls.tmp_dir = tempfile.mkdtemp()
+        make_numpy_model_dir(cls.tmp_dir, scale=1.0)
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Удаление временной директории"""
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+    
+    def test_cached_batch_matches_uncached(self):
+        """Тест совпадения результатов с кэшем и без, включая дубликаты в батче"""
+        handler = ModelHandler(self.tmp_dir, backend="numpy", warmup_batch_sizes=())
+        images = np.random.rand(6, 28, 28, 1).astype(np.float32)
+        images[3] = images[0]
+        expected = handler.predict_batch(images)
+        
+        cache = handler.enable_prediction_cache(max_size=16)
+        np.testing.assert_allclose(handler.predict_batch(images), expected, rtol=1e-6)
+        self.assertEqual(len(cache), 5)
+        np.testing.assert_allclose(handler.predict_batch(images[::-1]), expected[::-1], rtol=1e-6)
+        self.assertEqual(cache.stats()["hits"], 6)
+    
+    def test_invalidated_on_reload(self):
+        """Тест сброса кэша при перезагрузке модели"""
+        handler = ModelHandler(self.tmp_dir, backend="numpy", warmup_batch_sizes=())
+        cache = handler.enable_prediction_cache()
+        image = np.random.rand(1, 28, 28, 1).astype(np.float32)
+        handler.predict(image)
+        generation = handler.model_generation
+        
+        handler.load_model()
+        self.assertEqual(handler.model_generation, generation + 1)
+        self.assertEqual(len(cache), 0)
+        handler.predict(image)
+        self.assertEqual(cache.stats()["hits"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
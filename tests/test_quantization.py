@@ -0,0 +1,97 @@
+"""Тесты квантованных вариантов модели"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.idx_io import write_idx
+from src.model_handler import ModelHandler
+from src.numpy_backend import WEIGHTS_CACHE_NAME
+from src.quantization import evaluate_variants, load_variant, quantize_int8, variant_path
+from tests import make_numpy_model_dir
+
+
+class TestQuantization(unittest.TestCase):
+    """Тесты квантования весов и отчета о точности"""
+    
+    def setUp(self):
+        """Создание двухслойной модели NumPy во временной директории"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.model = make_numpy_model_dir(self.tmp_dir, layers=(32, 10))
+    
+    def tearDown(self):
+        """Удаление временной директории"""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def test_quantize_int8_error(self):
+        """Тест точности восстановления весов int8"""
+        kernel = self.model.kernels[0]
+        quantized, scale = quantize_int8(kernel)
+        self.assertEqual(quantized.dtype, np.int8)
+        self.assertEqual(scale.shape, (32,))
+        
+        restored = quantized.astype(np.float32) * scale
+        self.assertTrue(np.all(np.abs(restored - kernel) <= scale / 2 + 1e-7))
+    
+    def test_variants_smaller_and_close(self):
+        """Тест размера файлов и близости предсказаний вариантов"""
+        images = np.random.default_rng(1).random((64, 28, 28, 1), dtype=np.float32)
+        expected = self.model(images)
+        base_size = os.path.getsize(variant_path(self.tmp_dir, "float32"))
+        
+        for variant in ("float16", "int8"):
+            model = load_variant(self.tmp_dir, variant)
+            self.assertEqual(model.variant, variant)
+            self.assertEqual(model.kernels[0].dtype, np.float32)
+            self.assertLess(os.path.getsize(variant_path(self.tmp_dir, variant)), base_size * 0.6)
+            np.testing.assert_allclose(model(images), expected, atol=0.02)
+    
+    def test_missing_variant_without_create(self):
+        """Тест ошибки при отсутствии варианта и запрете создания"""
+        with self.assertRaises(FileNotFoundError):
+            load_variant(self.tmp_dir, "int8", create=False)
+    
+    def test_variant_rebuilt_after_update(self):
+        """Тест пересоздания варианта после обновления весов float32"""
+        images = np.random.default_rng(2).random((16, 28, 28, 1), dtype=np.float32)
+        load_variant(self.tmp_dir, "int8")
+        
+        self.model.kernels[0] = -self.model.kernels[0]
+        self.model.save_npz(os.path.join(self.tmp_dir, WEIGHTS_CACHE_NAME))
+        model = load_variant(self.tmp_dir, "int8")
+        np.testing.assert_allclose(model(images), self.model(images), atol=0.02)
+    
+    def test_model_handler_variant(self):
+        """Тест загрузки варианта через обработчик модели"""
+        handler = ModelHandler(self.tmp_dir, backend="numpy", variant="int8", warmup_batch_sizes=())
+        self.assertTrue(handler.is_loaded)
+        self.assertEqual(handler.model.variant, "int8")
+        
+        with self.assertRaises(ValueError):
+            ModelHandler(self.tmp_dir, backend="tensorflow", variant="int8")
+        with self.assertRaises(ValueError):
+            ModelHandler(self.tmp_dir, backend="numpy", variant="int4")
+    
+    def test_evaluate_variants(self):
+        """Тест отчета о точности на наборе IDX"""
+        images = (np.random.default_rng(2).random((300, 28, 28)) * 255).astype(np.uint8)
+        labels = self.model(images[..., np.newaxis].astype(np.float32) / 255.0).argmax(axis=1)
+        images_path = os.path.join(self.tmp_dir, "images-idx3-ubyte")
+        labels_path = os.path.join(self.tmp_dir, "labels-idx1-ubyte")
+        write_idx(images_path, images)
+        write_idx(labels_path, labels.astype(np.uint8))
+        
+        report = evaluate_variants(self.tmp_dir, images_path, labels_path, ("int8",),
+                                   batch_size=128, latency_repeats=3)
+        self.assertEqual([row["variant"] for row in report], ["float32", "int8"])
+        self.assertEqual(report[0]["accuracy"], 1.0)
+        self.assertEqual(report[0]["accuracy_delta"], 0.0)
+        self.assertGreater(report[1]["agreement"], 0.9)
+        self.assertLess(report[1]["size_bytes"], report[0]["size_bytes"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""Тесты фонового распознавания с дебаунсом"""
+
+import threading
+import unittest
+
+from PyQt6.QtCore import QCoreApplication
+
+from src.recognition_worker import BackgroundRecognizer
+from tests.test_model_loader import wait_for_signal
+
+
+class TestBackgroundRecognizer(unittest.TestCase):
+    """Тесты распознавателя в пуле потоков"""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Создание приложения Qt для цикла событий"""
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+    
+    def test_result_tagged_with_canvas_generation(self):
+        """Тест версии холста у результата, пришедшего во время дебаунса нового снимка"""
+        started = threading.Event()
+        release = threading.Event()
+        
+        def recognize(image):
+            started.set()
+            release.wait(10)
+            return image
+        
+        recognizer = BackgroundRecognizer(recognize, debounce_ms=60000)
+        self.addCleanup(recognizer.wait, 10000)
+        self.addCleanup(release.set)
+        
+        recognizer.recognize_now("A", 1)
+        self.assertTrue(started.wait(10))
+        # Снимок B ждет дебаунса, пока выполняется распознавание A
+        recognizer.schedule("B", 2)
+        release.set()
+        
+        self.assertEqual(wait_for_signal(recognizer.result_ready), [(1, "A")])
+        recognizer.cancel()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+"""Тесты индексов и модели просмотра результатов"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from PyQt6.QtCore import Qt
+
+from src.capture_store import CaptureWriter, read_capture
+from src.cli import CsvResultWriter, JsonlResultWriter
+from src.idx_io import write_idx
+from src.results_browser import ResultsTableModel
+from src.results_index import (
+    PROBABILITIES_SUFFIX, ResultsIndex, memmap_results, open_capture, open_results
+)
+
+
+class TestResultsIndex(unittest.TestCase):
+    """Тесты сортировки, фильтров и источников результатов"""
+    
+    def setUp(self):
+        """Создание временной директории и результатов"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, True)
+        rng = np.random.default_rng(0)
+        self.probabilities = rng.dirichlet(np.full(10, 0.3), 200).astype(np.float32)
+        self.probabilities[5] = np.nan
+        self.images = rng.integers(0, 256, (200, 28, 28), dtype=np.uint8)
+        self.labels = rng.integers(0, 10, 200).astype(np.int8)
+    
+    def test_query(self):
+        """Тест совпадения индексов с прямым вычислением"""
+        results = ResultsIndex(self.probabilities, self.images, self.labels, chunk_size=64)
+        digits = np.nan_to_num(self.probabilities, nan=-1.0).argmax(axis=1)
+        confidence = self.probabilities.max(axis=1)
+        self.assertEqual(results.digits[5], -1)
+        np.testing.assert_array_equal(np.delete(results.digits, 5), np.delete(digits, 5))
+        
+        order = results.query("confidence", descending=True, digit=3, min_confidence=0.5)
+        expected = [i for i in np.argsort(-np.nan_to_num(confidence, nan=-1.0), kind="stable")
+                    if digits[i] == 3 and confidence[i] >= 0.5]
+        np.testing.assert_array_equal(order, expected)
+        
+        order = results.query("label", mismatches=True, max_confidence=0.9)
+        self.assertTrue(np.all(np.diff(self.labels[order]) >= 0))
+        self.assertTrue(np.all(self.labels[order] != digits[order]))
+        self.assertNotIn(5, order)
+        self.assertEqual(len(results.query()), 200)
+    
+    def test_results_file(self):
+        """Тест результатов recognize в CSV и JSONL с изображениями IDX"""
+        images_path = os.path.join(self.tmp_dir, "images-idx3-ubyte")
+        write_idx(images_path, self.images)
+        rows = [None if i == 5 else row.tolist() for i, row in enumerate(self.probabilities)]
+        names = [f"{images_path}:{i}" for i in range(len(rows))]
+        errors = ["ошибка" if row is None else None for row in rows]
+        
+        for name, writer_class in (("results.csv", CsvResultWriter),
+                                   ("results.jsonl", JsonlResultWriter)):
+            path = os.path.join(self.tmp_dir, name)
+            stream = io.StringIO()
+            writer_class(stream).write_batch(names, rows, errors)
+            with open(path, "w", encoding="utf-8") as output:
+                output.write(stream.getvalue())
+            
+            results = open_results(path, images_path)
+            self.assertTrue(os.path.exists(path + PROBABILITIES_SUFFIX))
+            self.assertIsInstance(results.probabilities, np.memmap)
+            np.testing.assert_allclose(results.probabilities, self.probabilities, atol=1e-6)
+            self.assertIsInstance(results.images, np.memmap)
+            
+            # Повторное открытие использует уже записанный файл IDX
+            mtime = os.path.getmtime(path + PROBABILITIES_SUFFIX)
+            memmap_results(path)
+            self.assertEqual(os.path.getmtime(path + PROBABILITIES_SUFFIX), mtime)
+    
+    def test_capture_source(self):
+        """Тест хранилища образцов из нескольких сегментов без объединения"""
+        store = os.path.join(self.tmp_dir, "captures")
+        writer = CaptureWriter(store, max_segment_bytes=30 * 833)
+        valid = np.delete(np.arange(200), 5)[:70]
+        writer.append(self.images[valid], self.probabilities[valid], self.labels[valid])
+        writer.close()
+        
+        results = open_capture(store)
+        captured = read_capture(store)
+        self.assertEqual(len(results.images.arrays), 3)
+        self.assertEqual(len(results), 70)
+        for index in (0, 29, 30, 69, -1):
+            np.testing.assert_array_equal(results.images[index], captured["images"][index])
+        np.testing.assert_array_equal(results.labels, self.labels[valid])
+    
+    def test_table_model(self):
+        """Тест ленивых данных, сортировки и ограниченного кэша модели"""
+        results = ResultsIndex(self.probabilities, self.images, self.labels)
+        model = ResultsTableModel(results, thumbnail_size=28, cache_size=4)
+        self.assertEqual(model.rowCount(), 200)
+        self.assertEqual(model.columnCount(), 6)
+        
+        model.sort(3, Qt.SortOrder.DescendingOrder)
+        top = model.source_row(0)
+        self.assertEqual(top, int(np.nanargmax(self.probabilities.max(axis=1))))
+        self.assertEqual(model.data(model.index(0, 0)), str(top))
+        self.assertEqual(model.data(model.index(0, 2)), str(results.digits[top]))
+        # Строка ошибки остается последней
+        self.assertEqual(model.source_row(199), 5)
+        self.assertEqual(model.data(model.index(199, 2)), "ошибка")
+        
+        for row in range(10):
+            image = model.data(model.index(row, 1), Qt.ItemDataRole.DecorationRole)
+            model.data(model.index(row, 5))
+        self.assertEqual((image.width(), image.height()), (28, 28))
+        self.assertEqual(image.pixelColor(0, 0).red(), 255 - self.images[model.source_row(9), 0, 0])
+        self.assertEqual(len(model._thumbnails), 4)
+        self.assertEqual(len(model._rows), 4)
+        
+        model.set_filters(digit=7)
+        self.assertEqual(model.rowCount(), int((results.digits == 7).sum()))
+        self.assertEqual(model.data(model.index(0, 2)), "7")
+
+
+if __name__ == "__main__":
+    unittest.main()
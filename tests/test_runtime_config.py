@@ -0,0 +1,106 @@
+"""Тесты настроек ресурсов среды инференса"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from src import runtime_config
+from src.runtime_config import (
+    THREAD_ENV_VARS, RuntimeSettings, apply_runtime_settings, autotune,
+    load_runtime_settings, parse_cpu_list, save_tuned_settings
+)
+from tests import make_numpy_model_dir
+
+
+class TestRuntimeConfig(unittest.TestCase):
+    """Тесты порядка источников настроек, применения и подбора"""
+    
+    def setUp(self):
+        """Временная директория и сохранение окружения процесса"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, True)
+        patcher = mock.patch.dict(os.environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, runtime_config, "_active_settings", None)
+    
+    def test_parse_cpu_list(self):
+        """Тест формата taskset"""
+        self.assertEqual(parse_cpu_list("0-3,6, 2"), (0, 1, 2, 3, 6))
+        self.assertEqual(parse_cpu_list([3, 1, 3]), (1, 3))
+        self.assertIsNone(parse_cpu_list(""))
+        with self.assertRaises(ValueError):
+            parse_cpu_list("a-b")
+    
+    def test_load_precedence(self):
+        """Тест порядка: config.py, файл подбора, переменные окружения"""
+        path = os.path.join(self.tmp_dir, "tuned.json")
+        report = {
+            "latency": {"settings": {"intra_op_threads": 1, "inter_op_threads": 1}},
+            "throughput": {"settings": {"intra_op_threads": 4, "inter_op_threads": 2}},
+        }
+        save_tuned_settings(report, path, objective="throughput")
+        
+        self.assertEqual(load_runtime_settings({}, settings_file=""), RuntimeSettings())
+        settings = load_runtime_settings({}, settings_file=path)
+        self.assertEqual((settings.intra_op_threads, settings.inter_op_threads), (4, 2))
+        
+        environ = {
+            "DIGITS_SETTINGS_FILE": path,
+            "DIGITS_INTER_OP_THREADS": "3",
+            "DIGITS_CPU_AFFINITY": "0",
+            "DIGITS_MEMORY_BUDGET_MB": "512",
+        }
+        settings = load_runtime_settings(environ)
+        self.assertEqual(settings, RuntimeSettings(4, 3, (0,), 512))
+        
+        # Поврежденный файл пропускается
+        with open(path, "w", encoding="utf-8") as stream:
+            stream.write("{")
+        self.assertEqual(load_runtime_settings({}, settings_file=path), RuntimeSettings())
+    
+    def test_apply(self):
+        """Тест переменных окружения потоков и привязки к ядрам"""
+        for name in THREAD_ENV_VARS:
+            os.environ.pop(name, None)
+        cpu = min(runtime_config.available_cpus())
+        
+        with mock.patch.object(os, "sched_setaffinity", create=True) as setaffinity:
+            settings = apply_runtime_settings(RuntimeSettings(cpu_affinity=[cpu]))
+        setaffinity.assert_called_once_with(0, (cpu,))
+        # Без явного числа потоков оно равно числу выбранных ядер
+        self.assertEqual(settings.intra_op_threads, 1)
+        self.assertEqual(os.environ["OMP_NUM_THREADS"], "1")
+        self.assertNotIn("TF_NUM_INTEROP_THREADS", os.environ)
+        self.assertIs(runtime_config.active_settings(), settings)
+        
+        apply_runtime_settings(RuntimeSettings(intra_op_threads=3, inter_op_threads=2))
+        self.assertEqual(os.environ["TF_NUM_INTRAOP_THREADS"], "3")
+        self.assertEqual(os.environ["TF_NUM_INTEROP_THREADS"], "2")
+    
+    def test_autotune(self):
+        """Тест замеров в отдельных процессах и выбора лучшего варианта"""
+        make_numpy_model_dir(self.tmp_dir)
+        
+        report = autotune(self.tmp_dir, backend="numpy", intra_candidates=[1],
+                          inter_candidates=(1, 2), batch_size=8, repeats=5)
+        self.assertEqual(len(report["results"]), 2)
+        self.assertEqual([row["settings"]["inter_op_threads"] for row in report["results"]], [1, 2])
+        self.assertTrue(all(row["latency_ms"] > 0 and row["throughput"] > 0
+                            for row in report["results"]))
+        self.assertIn(report["latency"], report["results"])
+        self.assertIn("лучшее", runtime_config.format_report(report))
+        
+        path = os.path.join(self.tmp_dir, "tuned.json")
+        save_tuned_settings(report, path)
+        with open(path, encoding="utf-8") as stream:
+            self.assertEqual(json.load(stream)["selected"], "latency")
+        settings = load_runtime_settings({}, settings_file=path)
+        self.assertEqual(settings.as_dict(), report["latency"]["settings"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""Тесты разделения холста на цифры"""
+
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.model_handler import ModelHandler
+from src.prediction_result import SequenceResult
+from src.segmentation import (
+    count_stroke_columns, label_components, segment_digits, segment_strokes
+)
+from src.strokes import StrokeStore
+from tests import make_numpy_model_dir
+
+
+def reference_labels(mask):
+    """Разметка 8-связных областей обходом в глубину (эталон)"""
+    height, width = mask.shape
+    labels = np.zeros((height, width), dtype=np.int32)
+    count = 0
+    for y, x in zip(*np.nonzero(mask)):
+        if labels[y, x]:
+            continue
+        count += 1
+        labels[y, x] = count
+        stack = [(y, x)]
+        while stack:
+            cy, cx = stack.pop()
+            for ny in range(max(cy - 1, 0), min(cy + 2, height)):
+                for nx in range(max(cx - 1, 0), min(cx + 2, width)):
+                    if mask[ny, nx] and not labels[ny, nx]:
+                        labels[ny, nx] = count
+                        stack.append((ny, nx))
+    return labels, count
+
+
+def make_store(*strokes, canvas_size=(280, 280)):
+    """Создание хранилища из списков точек (x, y)"""
+    store = StrokeStore(canvas_size=canvas_size)
+    for points in strokes:
+        store.begin_stroke(*points[0])
+        for x, y in points[1:]:
+            store.add_point(x, y)
+        store.end_stroke()
+    return store
+
+
+class TestSegmentation(unittest.TestCase):
+    """Тесты разметки областей и выделения цифр"""
+    
+    def test_label_components(self):
+        """Тест совпадения разметки с обходом в глубину"""
+        rng = np.random.default_rng(0)
+        for density in (0.3, 0.45, 0.6):
+            mask = rng.random((40, 50)) < density
+            labels, count = label_components(mask)
+            expected, expected_count = reference_labels(mask)
+            self.assertEqual(count, expected_count)
+            np.testing.assert_array_equal(labels, expected)
+        
+        labels, count = label_components(np.zeros((5, 5), dtype=bool))
+        self.assertEqual(count, 0)
+        self.assertFalse(labels.any())
+    
+    def test_segment_strokes(self):
+        """Тест порядка цифр и объединения штрихов одной цифры"""
+        strokes = [[(30 + 60 * i, 60), (30 + 60 * i, 200)] for i in range(4)]
+        # Перекладина над последней цифрой (как у 7) - часть той же цифры
+        strokes.append([(190, 60), (230, 60)])
+        # Точка-помарка не считается цифрой
+        strokes.append([(120, 250), (121, 250)])
+        images, boxes = segment_strokes(make_store(*strokes), brush_size=12)
+        
+        self.assertEqual(images.shape, (4, 28, 28))
+        self.assertTrue(np.all(np.diff(boxes[:, 0]) > 0))
+        self.assertLess(boxes[3, 0], 190)
+        self.assertGreater(boxes[3, 2], 225)
+        # Каждая цифра нормализована отдельно: вписана в центр изображения
+        np.testing.assert_allclose(images.sum(axis=(1, 2))[:3], images[0].sum(), rtol=0.05)
+        self.assertGreater(images[:, 2:26, 2:26].sum(), 0.99 * images.sum())
+    
+    def test_count_stroke_columns(self):
+        """Тест быстрой оценки количества цифр по штрихам"""
+        four = make_store([(40, 60), (40, 140), (120, 140)], [(100, 60), (100, 220)])
+        self.assertEqual(count_stroke_columns(four), 1)
+        self.assertEqual(count_stroke_columns(make_store([(40, 60), (40, 200)],
+                                                         [(120, 60), (120, 200)])), 2)
+        self.assertEqual(count_stroke_columns(make_store()), 0)
+    
+    def test_empty_canvas(self):
+        """Тест пустого холста"""
+        images, boxes = segment_digits(np.zeros((56, 56), dtype=np.float32))
+        self.assertEqual(images.shape, (0, 28, 28))
+        self.assertEqual(boxes.shape, (0, 4))
+    
+    def test_predict_sequence(self):
+        """Тест распознавания всех цифр одним вызовом модели"""
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, True)
+        model = make_numpy_model_dir(tmp_dir)
+        rng = np.random.default_rng(1)
+        handler = ModelHandler(tmp_dir, backend="numpy", warmup_batch_sizes=())
+        
+        calls = []
+        run_model = handler._run_model
+        handler._run_model = lambda images: calls.append(len(images)) or run_model(images)
+        
+        images = rng.random((5, 28, 28)).astype(np.float32)
+        result = handler.predict_sequence(images)
+        self.assertIsInstance(result, SequenceResult)
+        self.assertEqual(calls, [5])
+        expected = model(images[..., np.newaxis]).argmax(axis=1)
+        self.assertEqual(result.text, "".join(map(str, expected)))
+        self.assertEqual(result.confidence, min(digit.confidence for digit in result.digits))
+        self.assertEqual(result.least_confident.confidence, result.confidence)
+
+
+if __name__ == "__main__":
+    unittest.main()
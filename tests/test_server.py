@@ -0,0 +1,205 @@
+"""Тесты локального HTTP-сервера распознавания"""
+
+import asyncio
+import base64
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from src.server import Histogram, InferenceServer
+
+
+class FakeHandler:
+    """Обработчик модели с предсказуемым ответом и задержкой"""
+    
+    is_loaded = True
+    backend_name = "fake"
+    variant = "float32"
+    
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batch_sizes = []
+        self.release = threading.Event()
+        self.release.set()
+    
+    def predict_batch(self, images):
+        self.release.wait()
+        time.sleep(self.delay)
+        self.batch_sizes.append(len(images))
+        # Класс - номер строки, в которой больше всего чернил (для проверки порядка)
+        rows = images[..., 0].sum(axis=2).argmax(axis=1) % 10
+        return np.eye(10, dtype=np.float32)[rows]
+
+
+def raw_digit(row):
+    """Изображение 28x28 uint8 с закрашенной строкой row"""
+    image = np.zeros((28, 28), dtype=np.uint8)
+    image[row] = 255
+    return image.tobytes()
+
+
+class HttpClient:
+    """Минимальный клиент HTTP/1.1 поверх одного соединения"""
+    
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+    
+    @classmethod
+    async def connect(cls, server):
+        if server.unix_path:
+            return cls(*await asyncio.open_unix_connection(server.unix_path))
+        return cls(*await asyncio.open_connection(*server.address))
+    
+    async def request(self, method, path, body=b"", headers=None):
+        head = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(body)}"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+        await self.writer.drain()
+        
+        status_line, *header_lines = (await self.reader.readuntil(b"\r\n\r\n")).decode().split("\r\n")
+        response_headers = {}
+        for line in header_lines:
+            if line:
+                name, _, value = line.partition(":")
+                response_headers[name.lower()] = value.strip()
+        payload = await self.reader.readexactly(int(response_headers["content-length"]))
+        return int(status_line.split()[1]), response_headers, payload
+    
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+class TestInferenceServer(unittest.IsolatedAsyncioTestCase):
+    """Тесты сервера на localhost"""
+    
+    async def start_server(self, handler=None, **kwargs):
+        server = InferenceServer(handler or FakeHandler(), port=0, **kwargs)
+        await server.start()
+        self.addAsyncCleanup(server.close)
+        return server
+    
+    async def test_keep_alive_and_payload_formats(self):
+        """Тест нескольких запросов разных форматов в одном соединении"""
+        server = await self.start_server()
+        client = await HttpClient.connect(server)
+        
+        png = io.BytesIO()
+        Image.new("L", (56, 56), 255).save(png, format="PNG")
+        payloads = [
+            (raw_digit(3), {"Content-Type": "application/octet-stream"}),
+            (json.dumps({"image": base64.b64encode(raw_digit(7)).decode()}).encode(),
+             {"Content-Type": "application/json"}),
+            (png.getvalue(), {"Content-Type": "image/png"}),
+        ]
+        
+        digits = []
+        for body, headers in payloads:
+            status, response_headers, payload = await client.request("POST", "/predict", body, headers)
+            self.assertEqual(status, 200)
+            self.assertEqual(response_headers["connection"], "keep-alive")
+            digits.append(json.loads(payload)["digit"])
+        
+        self.assertEqual(digits[:2], [3, 7])
+        self.assertEqual(server.connections, 1)
+        await client.close()
+    
+    async def test_concurrent_requests_are_batched(self):
+        """Тест объединения одновременных запросов в батчи с сохранением соответствия"""
+        handler = FakeHandler()
+        server = await self.start_server(handler, max_batch_size=16, max_wait_ms=50)
+        clients = [await HttpClient.connect(server) for _ in range(8)]
+        
+        handler.release.clear()
+        tasks = [
+            asyncio.create_task(client.request("POST", "/predict", raw_digit(i)))
+            for i, client in enumerate(clients)
+        ]
+        await asyncio.sleep(0.1)
+        handler.release.set()
+        responses = await asyncio.gather(*tasks)
+        
+        self.assertEqual([json.loads(body)["digit"] for _, _, body in responses], list(range(8)))
+        self.assertLess(len(handler.batch_sizes), 8)
+        for client in clients:
+            await client.close()
+    
+    async def test_backpressure(self):
+        """Тест отказа 503 при переполнении очереди запросов"""
+        handler = FakeHandler()
+        server = await self.start_server(handler, max_pending=2, max_wait_ms=0)
+        clients = [await HttpClient.connect(server) for _ in range(3)]
+        
+        handler.release.clear()
+        tasks = [asyncio.create_task(c.request("POST", "/predict", raw_digit(1))) for c in clients[:2]]
+        await asyncio.sleep(0.05)
+        status, headers, _ = await clients[2].request("POST", "/predict", raw_digit(1))
+        handler.release.set()
+        
+        self.assertEqual(status, 503)
+        self.assertIn("retry-after", headers)
+        self.assertEqual([s for s, _, _ in await asyncio.gather(*tasks)], [200, 200])
+        for client in clients:
+            await client.close()
+    
+    async def test_errors_and_metrics(self):
+        """Тест ошибок запросов и метрик"""
+        server = await self.start_server(max_body_bytes=4096)
+        client = await HttpClient.connect(server)
+        
+        self.assertEqual((await client.request("POST", "/predict", raw_digit(2)))[0], 200)
+        self.assertEqual((await client.request("POST", "/predict", b"abc"))[0], 400)
+        self.assertEqual((await client.request("GET", "/predict"))[0], 405)
+        self.assertEqual((await client.request("GET", "/unknown"))[0], 404)
+        
+        status, _, body = await client.request("GET", "/metrics")
+        metrics = body.decode()
+        self.assertEqual(status, 200)
+        self.assertIn('digits_responses_total{status="200"} 1', metrics)
+        self.assertIn("digits_request_duration_seconds_count 2", metrics)
+        self.assertIn('digits_batch_size_bucket{le="1"} 1', metrics)
+        
+        status, headers, _ = await client.request("POST", "/predict", b"x" * 5000)
+        self.assertEqual(status, 413)
+        self.assertEqual(headers["connection"], "close")
+        await client.close()
+    
+    async def test_unix_socket(self):
+        """Тест обслуживания через Unix-сокет"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "digits.sock")
+            server = await self.start_server(unix_path=path)
+            client = await HttpClient.connect(server)
+            status, _, body = await client.request("GET", "/health")
+            await client.close()
+            await server.close()
+        
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["backend"], "fake")
+
+
+class TestHistogram(unittest.TestCase):
+    """Тесты гистограммы"""
+    
+    def test_buckets_and_quantile(self):
+        """Тест накопленных корзин и оценки квантиля"""
+        histogram = Histogram((1, 2, 5))
+        for value in (0.5, 1.5, 1.7, 3, 10):
+            histogram.observe(value)
+        
+        lines = histogram.render("x", "test")
+        self.assertIn('x_bucket{le="2"} 3', lines)
+        self.assertIn('x_bucket{le="+Inf"} 5', lines)
+        self.assertEqual(histogram.quantile(0.5), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
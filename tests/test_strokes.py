@@ -0,0 +1,110 @@
+"""Тесты для векторной модели штрихов"""
+
+import unittest
+
+import numpy as np
+from PyQt6.QtCore import QPointF, Qt
+from PyQt6.QtGui import QColor, QImage, QPainter, QPen, QPolygonF
+
+from src.strokes import StrokeStore, rasterize_strokes
+from src.utils import preprocess_image_for_model
+
+
+def make_store(*strokes):
+    """Создание хранилища из списков точек (x, y)"""
+    store = StrokeStore(capacity=2)
+    for points in strokes:
+        store.begin_stroke(*points[0])
+        for x, y in points[1:]:
+            store.add_point(x, y)
+        store.end_stroke()
+    return store
+
+
+class TestStrokeStore(unittest.TestCase):
+    """Тесты хранилища штрихов"""
+    
+    def test_strokes_and_segments(self):
+        """Тест разбиения на штрихи и отрезки без соединения штрихов"""
+        store = make_store([(0, 0), (10, 0), (10, 10)], [(50, 50), (60, 60)])
+        
+        self.assertEqual(store.num_strokes, 2)
+        self.assertEqual(store.num_points, 5)
+        starts, ends = store.segments()
+        self.assertEqual(len(starts), 3)
+        np.testing.assert_array_equal(ends[-1, :2], [60, 60])
+    
+    def test_single_point_stroke_dropped(self):
+        """Тест отбрасывания штриха из одной точки"""
+        store = make_store([(0, 0), (10, 0)], [(5, 5)])
+        self.assertEqual(store.num_strokes, 1)
+        self.assertEqual(store.num_points, 2)
+    
+    def test_undo_redo(self):
+        """Тест отмены и повтора штрихов"""
+        store = make_store([(0, 0), (10, 0)], [(20, 20), (30, 30), (40, 40)])
+        
+        self.assertTrue(store.undo())
+        self.assertEqual(store.num_points, 2)
+        self.assertTrue(store.redo())
+        self.assertEqual(store.num_points, 5)
+        np.testing.assert_array_equal(store.stroke(1)[:, :2], [[20, 20], [30, 30], [40, 40]])
+        self.assertFalse(store.redo())
+        
+        # Новый штрих очищает стек повтора
+        store.undo()
+        store.begin_stroke(1, 1)
+        self.assertFalse(store.redo())
+    
+    def test_snapshot_is_independent(self):
+        """Тест независимости снимка от исходного хранилища"""
+        store = make_store([(0, 0), (10, 0)])
+        store.canvas_size = (100, 100)
+        snapshot = store.snapshot()
+        store.clear()
+        
+        self.assertEqual(snapshot.num_points, 2)
+        self.assertEqual(snapshot.canvas_size, (100, 100))
+
+
+class TestRasterizeStrokes(unittest.TestCase):
+    """Тесты растеризации штрихов в разрешение модели"""
+    
+    def test_empty(self):
+        """Тест пустого холста"""
+        result = rasterize_strokes(StrokeStore(), (280, 280))
+        self.assertEqual(result.shape, (28, 28))
+        self.assertEqual(result.sum(), 0.0)
+    
+    def test_matches_raster_pipeline(self):
+        """Тест совпадения с уменьшением полноразмерного холста"""
+        points = [(60, 60), (200, 80), (140, 220), (70, 150)]
+        store = make_store(points)
+        
+        image = QImage(280, 280, QImage.Format.Format_RGB32)
+        image.fill(Qt.GlobalColor.white)
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(QPen(
+            QColor(0, 0, 0), 20, Qt.PenStyle.SolidLine,
+            Qt.PenCapStyle.RoundCap, Qt.PenJoinStyle.RoundJoin
+        ))
+        painter.drawPolyline(QPolygonF([QPointF(x, y) for x, y in points]))
+        painter.end()
+        
+        expected = preprocess_image_for_model(image)[0, :, :, 0]
+        result = rasterize_strokes(store, (280, 280), brush_size=20)
+        self.assertLess(np.abs(result - expected).mean(), 0.02)
+    
+    def test_centering(self):
+        """Тест вписывания маленькой цифры в центр"""
+        store = make_store([(10, 10), (10, 40)])
+        result = rasterize_strokes(store, (280, 280), brush_size=6, center=True)
+        
+        ys, xs = np.mgrid[:28, :28] + 0.5
+        self.assertAlmostEqual((result * ys).sum() / result.sum(), 14.0, delta=0.2)
+        self.assertAlmostEqual((result * xs).sum() / result.sum(), 14.0, delta=0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
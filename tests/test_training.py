@@ -0,0 +1,104 @@
+"""Тесты обучения модели на файлах IDX"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+from src.idx_io import memmap_idx, read_idx, write_idx
+from src.model_handler import ModelHandler
+from src.training import (
+    METADATA_FILE_NAME, augment_batch, compute_normalization, load_idx_pair, make_dataset, train
+)
+
+
+def make_dataset_files(directory, count, seed=0):
+    """Набор IDX, в котором метка задает положение яркой полосы"""
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, 10, count).astype(np.uint8)
+    images = (rng.random((count, 28, 28)) * 40).astype(np.uint8)
+    for image, label in zip(images, labels):
+        image[2 + 2 * label:4 + 2 * label, 4:24] = 255
+    images_path = os.path.join(directory, f"images-{seed}-idx3-ubyte.gz")
+    labels_path = os.path.join(directory, f"labels-{seed}-idx1-ubyte")
+    write_idx(images_path, images)
+    write_idx(labels_path, labels)
+    return images_path, labels_path
+
+
+class TestTraining(unittest.TestCase):
+    """Тесты конвейера данных, обучения и экспорта"""
+    
+    def setUp(self):
+        """Создание обучающего и тестового наборов"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.train_files = make_dataset_files(self.tmp_dir, 640, seed=0)
+        self.test_files = make_dataset_files(self.tmp_dir, 200, seed=1)
+    
+    def tearDown(self):
+        """Удаление временной директории"""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def test_memmap_reader(self):
+        """Тест отображения в память сжатого и несжатого файла IDX"""
+        for path in self.train_files:
+            mapped = memmap_idx(path)
+            np.testing.assert_array_equal(mapped, read_idx(path))
+        self.assertTrue(os.path.exists(self.train_files[0][:-3]))
+    
+    def test_dataset_pipeline(self):
+        """Тест батчей, нормализации и перемешивания конвейера"""
+        images, labels = load_idx_pair(*self.train_files)
+        normalization = compute_normalization(images)
+        self.assertAlmostEqual(normalization["mean"], images.mean() / 255.0, places=6)
+        
+        dataset = make_dataset(images, labels, 100, normalization)
+        self.assertEqual(int(dataset.cardinality()), 7)
+        batches = list(dataset)
+        self.assertEqual(batches[0][0].shape, (100, 28, 28, 1))
+        merged = np.concatenate([batch.numpy() for batch, _ in batches])
+        self.assertAlmostEqual(float(merged.mean()), 0.0, places=4)
+        np.testing.assert_array_equal(np.concatenate([y.numpy() for _, y in batches]), labels)
+        
+        shuffled = make_dataset(images, labels, 100, normalization, training=True, seed=0)
+        order = np.concatenate([y.numpy() for _, y in shuffled])
+        self.assertFalse(np.array_equal(order, labels))
+        self.assertEqual(sorted(order), sorted(labels))
+    
+    def test_augment_batch(self):
+        """Тест формы и сохранения яркости при аугментации"""
+        images = np.zeros((16, 28, 28, 1), dtype=np.float32)
+        images[:, 10:18, 10:18] = 1.0
+        augmented = augment_batch(tf.constant(images)).numpy()
+        
+        self.assertEqual(augmented.shape, images.shape)
+        self.assertFalse(np.allclose(augmented, images))
+        np.testing.assert_allclose(augmented.sum(axis=(1, 2, 3)), 64.0, rtol=0.3)
+    
+    def test_train_and_export(self):
+        """Тест обучения, экспорта с нормализацией в весах и загрузки обоими бэкендами"""
+        output = os.path.join(self.tmp_dir, "model")
+        summary = train(*self.train_files, output, *self.test_files, epochs=3, batch_size=32,
+                        hidden_units=(32,), augment=False, seed=0)
+        
+        self.assertEqual(len(summary["epochs"]), 3)
+        self.assertGreater(summary["epochs"][-1]["images_per_second"], 0)
+        self.assertGreater(summary["test"]["accuracy"], 0.9)
+        with open(os.path.join(output, METADATA_FILE_NAME), encoding="utf-8") as stream:
+            metadata = json.load(stream)
+        self.assertTrue(metadata["normalization"]["folded_into_first_layer"])
+        self.assertFalse(os.path.exists(output + ".tmp"))
+        
+        images = read_idx(self.test_files[0]).astype(np.float32)[..., np.newaxis] / 255.0
+        numpy_handler = ModelHandler(output, backend="numpy", warmup_batch_sizes=())
+        tf_handler = ModelHandler(output, backend="tensorflow", warmup_batch_sizes=())
+        np.testing.assert_allclose(numpy_handler.predict_batch(images),
+                                   tf_handler.predict_batch(images), rtol=1e-4, atol=1e-5)
+
+
+if __name__ == "__main__":
+    unittest.main()
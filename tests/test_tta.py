@@ -0,0 +1,97 @@
+"""Тесты адаптивной аугментации при распознавании"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.idx_io import write_idx
+from src.model_handler import ModelHandler
+from src.tta import AdaptiveTTA, evaluate_tta
+from tests import make_numpy_model_dir
+
+
+class TestAdaptiveTTA(unittest.TestCase):
+    """Тесты вариантов изображения, порога и усреднения"""
+    
+    def setUp(self):
+        """Создание модели во временной директории"""
+        self.tmp_dir = tempfile.mkdtemp()
+        make_numpy_model_dir(self.tmp_dir, scale=0.2)
+        rng = np.random.default_rng(1)
+        self.handler = ModelHandler(self.tmp_dir, backend="numpy", warmup_batch_sizes=())
+        self.images = rng.random((6, 28, 28)).astype(np.float32)
+    
+    def tearDown(self):
+        """Удаление временной директории"""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def test_variants(self):
+        """Тест сдвигов, поворотов и утолщения штрихов"""
+        tta = AdaptiveTTA(shift=2, angles=(0.0, 90.0))
+        variants = tta.variants(self.images[:2])
+        image = self.images[0]
+        
+        self.assertEqual(variants.shape, (2, 7, 28, 28))
+        np.testing.assert_array_equal(variants[0, 1, :, 2:], image[:, :-2])
+        np.testing.assert_array_equal(variants[0, 1, :, :2], 0.0)
+        np.testing.assert_array_equal(variants[0, 2, :-2], image[2:])
+        np.testing.assert_allclose(variants[0, 4], image, atol=1e-6)
+        np.testing.assert_allclose(variants[0, 5], np.rot90(image, -1), atol=1e-4)
+        
+        dot = np.zeros((1, 28, 28), dtype=np.float32)
+        dot[0, 10, 10] = 1.0
+        self.assertEqual(AdaptiveTTA(shift=0, angles=()).variants(dot)[0, 0].sum(), 5.0)
+    
+    def test_adaptive_run(self):
+        """Тест одного батча для неуверенных изображений и статистики"""
+        tta = self.handler.enable_tta(AdaptiveTTA(threshold=0.5))
+        probabilities = self.handler.predict_batch(self.images)
+        confident = probabilities.max(axis=1) >= 0.5
+        self.assertTrue(0 < confident.sum() < len(confident))
+        
+        calls = []
+        predict = self.handler._predict_probabilities
+        self.handler._predict_probabilities = lambda images: calls.append(len(images)) or predict(images)
+        result = self.handler.predict_sequence(self.images)
+        
+        refined = np.array([digit.probabilities for digit in result.digits])
+        # Исходный батч и один батч вариантов для неуверенных изображений
+        self.assertEqual(calls, [len(self.images), tta.num_variants * int((~confident).sum())])
+        np.testing.assert_array_equal(refined[confident], probabilities[confident])
+        np.testing.assert_allclose(
+            refined[~confident],
+            tta.ensemble(self.images[~confident], probabilities[~confident], predict), rtol=1e-5
+        )
+        
+        stats = tta.stats()
+        self.assertEqual(stats["requests"], len(self.images))
+        self.assertEqual(stats["triggered"], int((~confident).sum()))
+        self.assertGreater(stats["added_ms_mean"], 0.0)
+        
+        self.handler.disable_tta()
+        single = self.handler.predict(self.images[~confident][:1])
+        np.testing.assert_allclose(single.probabilities, probabilities[~confident][0], rtol=1e-5)
+    
+    def test_evaluate_report(self):
+        """Тест отчета о точности и задержке при разных порогах"""
+        rng = np.random.default_rng(1)
+        images_path = os.path.join(self.tmp_dir, "images-idx3-ubyte")
+        labels_path = os.path.join(self.tmp_dir, "labels-idx1-ubyte")
+        write_idx(images_path, (rng.random((50, 28, 28)) * 255).astype(np.uint8))
+        write_idx(labels_path, rng.integers(0, 10, 50).astype(np.uint8))
+        
+        report = evaluate_tta(self.handler, AdaptiveTTA(), images_path, labels_path,
+                              [0.0, 1.01], latency_repeats=5)
+        rows = report["rows"]
+        self.assertIsNone(rows[0]["threshold"])
+        self.assertEqual(rows[1]["triggered"], 0.0)
+        self.assertAlmostEqual(rows[1]["accuracy"], rows[0]["accuracy"])
+        self.assertEqual(rows[2]["triggered"], 1.0)
+        self.assertGreater(report["added_latency_ms"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
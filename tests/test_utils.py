@@ -0,0 +1,105 @@
+"""Тесты для предобработки изображений"""
+
+import unittest
+
+import numpy as np
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QColor, QImage, QPainter
+
+from src.utils import (
+    area_downsample, center_digits, preprocess_image_for_model, qimage_to_array
+)
+
+
+def make_image(width, height, color=Qt.GlobalColor.white):
+    """Создание залитого QImage"""
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(color)
+    return image
+
+
+class TestPreprocessing(unittest.TestCase):
+    """Тесты предобработки изображения холста"""
+    
+    def test_qimage_view(self):
+        """Тест чтения пикселей QImage без копирования"""
+        image = make_image(30, 20, QColor(10, 20, 30))
+        pixels = qimage_to_array(image)
+        
+        self.assertEqual(pixels.shape, (20, 30, 4))
+        self.assertFalse(pixels.flags.owndata)
+        # Format_RGB32 хранит 0xffRRGGBB
+        self.assertEqual(pixels.view(np.uint32)[0, 0, 0], 0xff0a141e)
+    
+    def test_blank_and_filled_canvas(self):
+        """Тест инверсии и нормализации"""
+        blank = preprocess_image_for_model(make_image(280, 280))
+        filled = preprocess_image_for_model(make_image(280, 280, Qt.GlobalColor.black))
+        
+        self.assertEqual(blank.shape, (1, 28, 28, 1))
+        self.assertEqual(blank.dtype, np.float32)
+        np.testing.assert_allclose(blank, 0.0, atol=1e-6)
+        np.testing.assert_allclose(filled, 1.0, atol=1e-6)
+    
+    def test_output_buffer_reuse(self):
+        """Тест записи результата в предвыделенный буфер"""
+        buffer = np.empty((1, 28, 28, 1), dtype=np.float32)
+        result = preprocess_image_for_model(make_image(280, 280), out=buffer)
+        self.assertIs(result, buffer)
+    
+    def test_area_downsample_matches_block_mean(self):
+        """Тест усреднения по площади для кратных и некратных размеров"""
+        pixels = np.random.randint(0, 256, (280, 280, 4), dtype=np.uint8)
+        expected = pixels.reshape(28, 10, 28, 10, 4).mean(axis=(1, 3))
+        np.testing.assert_allclose(area_downsample(pixels, 28, 28), expected, rtol=1e-5)
+        
+        uneven = np.random.randint(0, 256, (30, 45), dtype=np.uint8)
+        result = area_downsample(uneven, 3, 4)
+        self.assertEqual(result.shape, (3, 4))
+        self.assertAlmostEqual(result[0, 0], uneven[:10, :11].mean(), places=4)
+
+
+
+class TestCentering(unittest.TestCase):
+    """Тесты нормализации цифр в стиле MNIST"""
+    
+    def test_small_offcenter_digit(self):
+        """Тест вписывания маленькой цифры в угол холста в рамку 20x20"""
+        ink = np.zeros((140, 140), dtype=np.float32)
+        ink[10:30, 100:110] = 1.0
+        result = center_digits(ink, box_size=20)
+        
+        self.assertEqual(result.shape, (28, 28))
+        rows = np.nonzero(result.max(axis=1) > 0.5)[0]
+        self.assertEqual(rows.max() - rows.min() + 1, 20)
+        
+        # Центр масс совпадает с центром изображения
+        ys, xs = np.mgrid[:28, :28] + 0.5
+        self.assertAlmostEqual((result * ys).sum() / result.sum(), 14.0, places=3)
+        self.assertAlmostEqual((result * xs).sum() / result.sum(), 14.0, places=3)
+    
+    def test_batch_matches_single(self):
+        """Тест совпадения батчевой и одиночной обработки"""
+        batch = np.zeros((3, 60, 80), dtype=np.float32)
+        batch[0, 5:50, 10:20] = 1.0
+        batch[1, 30:40, 40:75] = 0.8
+        result = center_digits(batch)
+        
+        self.assertEqual(result.shape, (3, 28, 28))
+        np.testing.assert_allclose(result[1], center_digits(batch[1]), atol=1e-6)
+        self.assertEqual(result[2].sum(), 0.0)
+    
+    def test_preprocess_with_centering(self):
+        """Тест предобработки холста с центрированием"""
+        image = make_image(280, 280)
+        painter = QPainter(image)
+        painter.fillRect(5, 5, 10, 30, Qt.GlobalColor.black)
+        painter.end()
+        result = preprocess_image_for_model(image, center=True)
+        
+        self.assertEqual(result.shape, (1, 28, 28, 1))
+        self.assertGreater(result[0, 10:18, 10:18, 0].sum(), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
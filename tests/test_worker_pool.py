@@ -0,0 +1,114 @@
+"""Тесты пула процессов инференса"""
+
+import os
+import shutil
+import signal
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.model_handler import ModelHandler
+from src.utils import preprocess_gray_array, preprocess_rgb32_array
+from src.worker_pool import InferenceWorkerPool
+from tests import make_numpy_model_dir
+
+
+class TestInferenceWorkerPool(unittest.TestCase):
+    """Тесты пула процессов с разделяемой памятью"""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Создание модели и запуск пула из двух процессов"""
+        cls.tmp_dir = tempfile.mkdtemp()
+        make_numpy_model_dir(cls.tmp_dir)
+        cls.handler = ModelHandler(cls.tmp_dir, backend="numpy", warmup_batch_sizes=())
+        cls.pool = InferenceWorkerPool(cls.tmp_dir, workers=2, backend="numpy", max_batch_size=16)
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Остановка пула и удаление временной директории"""
+        cls.pool.close()
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+    
+    def test_predict_batch_matches_handler(self):
+        """Тест совпадения результатов пула и обработчика в текущем процессе"""
+        images = np.random.default_rng(1).random((50, 28, 28, 1), dtype=np.float32)
+        result = self.pool.predict_batch(images)
+        self.assertEqual(result.shape, (50, 10))
+        np.testing.assert_allclose(result, self.handler.predict_batch(images), atol=1e-6)
+        self.assertEqual(self.pool.predict_batch(images[:0]).shape, (0, 10))
+    
+    def test_recognize_arrays(self):
+        """Тест предобработки исходных изображений в рабочих процессах"""
+        rng = np.random.default_rng(2)
+        gray = (rng.random((56, 84)) * 255).astype(np.uint8)
+        rgb32 = (rng.random((140, 140, 4)) * 255).astype(np.uint8)
+        
+        result = self.pool.recognize_arrays([gray, rgb32, gray], center=False)
+        expected = self.handler.predict_batch(np.stack([
+            preprocess_gray_array(gray), preprocess_rgb32_array(rgb32), preprocess_gray_array(gray)
+        ]))
+        np.testing.assert_allclose(result, expected, atol=1e-6)
+        
+        with self.assertRaises(ValueError):
+            self.pool.recognize_arrays([np.zeros((28, 28, 3), dtype=np.uint8)])
+    
+    def test_failed_job_releases_workers(self):
+        """Тест возврата всех процессов в пул после ошибки в одном из заданий"""
+        small = np.zeros((10, 10), dtype=np.uint8)
+        good = np.full((28, 28), 255, dtype=np.uint8)
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                self.pool.recognize_arrays([small, good], center=False)
+        self.assertEqual(self.pool._idle.qsize(), self.pool.size)
+        
+        images = np.random.default_rng(4).random((32, 28, 28), dtype=np.float32)
+        result = self.pool.predict_batch(images)
+        np.testing.assert_allclose(result, self.handler.predict_batch(images), atol=1e-6)
+    
+    def test_restart_after_crash(self):
+        """Тест перезапуска упавшего процесса и повтора задания"""
+        worker = self.pool._workers[0]
+        old_pid = worker.pid
+        os.kill(old_pid, signal.SIGKILL)
+        worker.process.join(5)
+        
+        images = np.random.default_rng(3).random((32, 28, 28), dtype=np.float32)
+        result = self.pool.predict_batch(images)
+        np.testing.assert_allclose(result, self.handler.predict_batch(images), atol=1e-6)
+        
+        stats = self.pool.stats()
+        self.assertTrue(all(item["alive"] for item in stats))
+        self.assertNotEqual(stats[0]["pid"], old_pid)
+        self.assertGreaterEqual(stats[0]["restarts"], 1)
+
+
+class TestPoolShutdown(unittest.TestCase):
+    """Тесты остановки пула"""
+    
+    def test_close_releases_resources(self):
+        """Тест завершения процессов и удаления разделяемой памяти"""
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, True)
+        make_numpy_model_dir(tmp_dir, scale=0.0)
+        
+        with InferenceWorkerPool(tmp_dir, workers=1, backend="numpy") as pool:
+            names = [worker.input_shm.name for worker in pool._workers]
+        
+        self.assertFalse(pool.is_loaded)
+        self.assertFalse(any(item["alive"] for item in pool.stats()))
+        if os.path.isdir("/dev/shm"):
+            self.assertFalse(any(os.path.exists(f"/dev/shm/{name}") for name in names))
+        with self.assertRaises(RuntimeError):
+            pool.predict_batch(np.zeros((1, 28, 28), dtype=np.float32))
+    
+    def test_start_failure(self):
+        """Тест ошибки запуска при отсутствии модели"""
+        with self.assertRaises(RuntimeError):
+            InferenceWorkerPool(os.path.join(tempfile.gettempdir(), "missing_model"),
+                                workers=1, backend="numpy")
+
+
+if __name__ == "__main__":
+    unittest.main()